@@ -3,25 +3,130 @@ import os
 dir_path = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(dir_path)
 from random import randint
-import logging
-from flask import Flask, render_template, jsonify, request
+from typing import Optional, Any
+import click
+from flask import Flask, Blueprint, Response, render_template, jsonify, request
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
+from flask_jwt_extended import JWTManager, get_jwt_identity, get_raw_jwt
 import backend.api.api as api
+import backend.api.asgi as asgi
+import backend.api.errors as errors
+import backend.api.hashing as hashing
+import backend.api.imports as imports
+import backend.api.logs as logs
+import backend.api.metrics as metrics
 import backend.api.secrets as secrets
+import backend.api.tokens as tokens
+from backend.data_model.data_model import Database
+from backend.data_model.db_interface import set_database
+import backend.data_model.exports as exports
+import backend.data_model.refresh as refresh
+import backend.data_model.stats as stats
 
-app = Flask(__name__,
-            static_folder="./dist/static",
-            template_folder="./dist")
-cors = CORS(app, resources={r"/api/*": {"origins": "*"}})
-app.config['CORS_HEADERS'] = 'Content-Type'
-app.config['JWT_SECRET_KEY'] = secrets.JWT_KEY
+routes = Blueprint('routes', __name__)
 
-jwt = JWTManager(app)
-logging.basicConfig(filename='logfile', level=logging.DEBUG)
+# Forked workers (e.g. gunicorn --preload) must not share the parent's
+# pooled connections or hashing pool, and need their own log listener thread.
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=Database.reset_pool_after_fork)
+    os.register_at_fork(after_in_child=hashing.reset_after_fork)
+    os.register_at_fork(after_in_child=logs.restart_after_fork)
+    os.register_at_fork(after_in_child=metrics.reset_after_fork)
 
 
-@app.route('/random', methods=['GET'])
+def create_app(db_name: Optional[str] = None) -> Flask:
+    """Build the Flask app, this process's database engine and its hashing pool.
+
+    Schema creation is not done here; run `flask init-db` once per database.
+    """
+    app = Flask(__name__,
+                static_folder="./dist/static",
+                template_folder="./dist")
+    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    app.config['CORS_HEADERS'] = 'Content-Type'
+    app.config['JWT_SECRET_KEY'] = secrets.JWT_KEY
+    # Routes use backend.api.tokens' decorators; this covers any that use
+    # flask_jwt_extended's own.
+    app.config['JWT_BLACKLIST_ENABLED'] = True
+    app.config['JWT_BLACKLIST_TOKEN_CHECKS'] = [tokens.ACCESS, tokens.REFRESH]
+
+    logs.configure_logging()
+    # First, so the timing covers the other before_request hooks.
+    metrics.init_metrics(app)
+    logs.init_request_ids(app)
+    jwt = JWTManager(app)
+    jwt.token_in_blacklist_loader(tokens.is_revoked)
+    app.register_blueprint(routes)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(refresh_orgs_command)
+    app.cli.add_command(rebuild_stats_command)
+    app.cli.add_command(import_users_command)
+    app.cli.add_command(import_organizations_command)
+
+    Database.init_engine(db_name)
+    set_database(Database.Engine)
+    hashing.start()
+    return app
+
+
+@click.command('init-db')
+@click.option('--name', default=None, help='Database name, defaults to the production database.')
+def init_db_command(name: Optional[str]) -> None:
+    """Create the database schema and seed the type tables."""
+    Database.create_database(name)
+    set_database(Database.Engine)
+    click.echo('Initialized database.')
+
+
+@click.command('refresh-orgs')
+def refresh_orgs_command() -> None:
+    """Refresh every organization whose refresh is due.  Run from cron on any number of nodes."""
+    refreshed, error_code = refresh.run_due_refreshes()
+    click.echo('Refreshed ' + str(refreshed) + ' organizations.')
+    if error_code is not None:
+        raise click.ClickException(errors.get_error_string(error_code))
+
+
+@click.command('rebuild-stats')
+def rebuild_stats_command() -> None:
+    """Recompute the stats rollups from every recorded transaction."""
+    written, error_code = stats.rebuild_stats()
+    if error_code is not None:
+        raise click.ClickException(errors.get_error_string(error_code))
+    click.echo('Wrote ' + str(written) + ' stats rows.')
+
+
+@click.command('import-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_users_command(path: str) -> None:
+    """Register users from a CSV file with a header row, or an .ndjson file."""
+    _run_import(imports.import_users, path)
+
+
+@click.command('import-organizations')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_organizations_command(path: str) -> None:
+    """Create organizations from a CSV file with a header row, or an .ndjson file."""
+    _run_import(imports.import_organizations, path)
+
+
+def _run_import(run_import: Any, path: str) -> None:
+    import_format = imports.NDJSON if path.endswith(('.ndjson', '.jsonl')) else imports.CSV
+    with open(path, 'rb') as stream:
+        result, error_code = run_import(imports.read_rows(stream, import_format))
+    for row_number, error_codes in result.failed:
+        click.echo('Row %d: %s' % (row_number, '; '.join(errors.get_error_string(code) for code in error_codes)))
+    click.echo('Imported %d rows, %d not imported.' % (result.imported, len(result.failed)))
+    if error_code is not None:
+        raise click.ClickException(errors.get_error_string(error_code))
+
+
+@routes.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@routes.route('/random', methods=['GET'])
 def random_number():
     response = {
         'randomNumber': randint(1, 100)
@@ -29,19 +134,176 @@ def random_number():
     return jsonify(response)
 
 
-@app.route('/login-user', methods=['POST'])
+@routes.route('/login-user', methods=['POST'])
 def login_user():
     json_request = request.get_json()
     return api.login_user(json_request)
 
 
-@app.route('/register-user', methods=['POST'])
+@routes.route('/register-user', methods=['POST'])
 def register_user():
     json_request = request.get_json()
     return api.register_user(json_request)
 
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
+@routes.route('/refresh-token', methods=['POST'])
+@tokens.refresh_token_required
+def refresh_token():
+    return api.refresh_access_token(get_jwt_identity())
+
+
+@routes.route('/logout', methods=['POST'])
+@tokens.access_token_required
+def logout():
+    return api.revoke_token(get_raw_jwt())
+
+
+@routes.route('/logout-refresh', methods=['POST'])
+@tokens.refresh_token_required
+def logout_refresh():
+    return api.revoke_token(get_raw_jwt())
+
+
+@routes.route('/organizations/nearby', methods=['GET'])
+def nearby_organizations():
+    return api.find_nearby_organizations(request.args.to_dict())
+
+
+@routes.route('/organizations/<int:organization_id>/location', methods=['PUT'])
+@tokens.access_token_required
+def set_organization_location(organization_id):
+    json_request = request.get_json()
+    return api.set_organization_location(json_request, get_jwt_identity(), organization_id)
+
+
+@routes.route('/stats', methods=['GET'])
+@tokens.access_token_required
+def user_stats():
+    return api.get_user_stats(request.args.to_dict(), get_jwt_identity())
+
+
+@routes.route('/organizations/<int:organization_id>/stats', methods=['GET'])
+@tokens.access_token_required
+def organization_stats(organization_id):
+    return api.get_organization_stats(request.args.to_dict(), get_jwt_identity(), organization_id)
+
+
+@routes.route('/leaderboard', methods=['GET'])
+def leaderboard():
+    return api.get_leaderboard(request.args.to_dict())
+
+
+@routes.route('/leaderboard/me', methods=['GET'])
+@tokens.access_token_required
+def leaderboard_rank():
+    return api.get_leaderboard_rank(request.args.to_dict(), get_jwt_identity())
+
+
+@routes.route('/admin/organization-requests/decisions', methods=['POST'])
+@tokens.access_token_required
+def decide_organization_requests():
+    json_request = request.get_json()
+    return api.decide_organization_requests(json_request, get_jwt_identity())
+
+
+@routes.route('/transactions/activities', methods=['GET'])
+@tokens.access_token_required
+def activity_transactions():
+    return api.list_activity_transactions(request.args.to_dict(), get_jwt_identity())
+
+
+@routes.route('/transactions/rewards', methods=['GET'])
+@tokens.access_token_required
+def reward_transactions():
+    return api.list_reward_transactions(request.args.to_dict(), get_jwt_identity())
+
+
+@routes.route('/organizations/<int:organization_id>/activities', methods=['GET'])
+@tokens.access_token_required
+def organization_activities(organization_id):
+    return api.list_organization_activities(request.args.to_dict(), get_jwt_identity(), organization_id)
+
+
+@routes.route('/organizations/<int:organization_id>/rewards', methods=['GET'])
+@tokens.access_token_required
+def organization_rewards(organization_id):
+    return api.list_organization_rewards(request.args.to_dict(), get_jwt_identity(), organization_id)
+
+
+@routes.route('/admin/organization-requests', methods=['GET'])
+@tokens.access_token_required
+def organization_requests():
+    return api.list_organization_requests(request.args.to_dict(), get_jwt_identity())
+
+
+@routes.route('/transactions/activities/export', methods=['GET'])
+@tokens.access_token_required
+def export_activity_transactions():
+    return api.export_transactions(request.args.to_dict(), get_jwt_identity(), exports.ACTIVITIES,
+                                   _accepts_gzip())
+
+
+@routes.route('/transactions/rewards/export', methods=['GET'])
+@tokens.access_token_required
+def export_reward_transactions():
+    return api.export_transactions(request.args.to_dict(), get_jwt_identity(), exports.REWARDS, _accepts_gzip())
+
+
+@routes.route('/organizations/<int:organization_id>/ledger/export', methods=['GET'])
+@tokens.access_token_required
+def export_organization_ledger(organization_id):
+    return api.export_organization_ledger(request.args.to_dict(), get_jwt_identity(), organization_id,
+                                          _accepts_gzip())
+
+
+def _accepts_gzip() -> bool:
+    return request.accept_encodings['gzip'] > 0
+
+
+@routes.route('/admin/import/users', methods=['POST'])
+@tokens.access_token_required
+def import_users():
+    return api.import_users(request.stream, request.mimetype, get_jwt_identity())
+
+
+@routes.route('/admin/import/organizations', methods=['POST'])
+@tokens.access_token_required
+def import_organizations():
+    return api.import_organizations(request.stream, request.mimetype, get_jwt_identity())
+
+
+@routes.route('/claim-code', methods=['POST'])
+@tokens.access_token_required
+def issue_claim_code():
+    json_request = request.get_json()
+    return api.issue_claim_code(json_request, get_jwt_identity())
+
+
+@routes.route('/redeem-claim-code', methods=['POST'])
+@tokens.access_token_required
+def redeem_claim_code():
+    json_request = request.get_json()
+    return api.redeem_claim_code(json_request, get_jwt_identity())
+
+
+@routes.route('/claim-code/<code>/events', methods=['GET'])
+@tokens.access_token_required
+def claim_code_events(code):
+    return api.claim_code_events(code, get_jwt_identity())
+
+
+@routes.route('/events', methods=['GET'])
+@tokens.access_token_required
+def user_events():
+    return api.user_events(get_jwt_identity())
+
+
+@routes.route('/', defaults={'path': ''})
+@routes.route('/<path:path>')
 def catch_all(path):
     return render_template("index.html")
+
+
+app = create_app()
+# For ASGI servers, e.g. uvicorn app:asgi_app.
+asgi_app = asgi.AsgiApp(app)
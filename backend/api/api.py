@@ -0,0 +1,693 @@
+import os
+from typing import Tuple, Dict, Any, List, Optional, Union, BinaryIO
+from flask import jsonify, Response
+from flask_jwt_extended import create_access_token, create_refresh_token, JWTManager
+import backend.api.errors as errors
+import backend.api.hashing as hashing
+import backend.api.imports as imports
+import backend.api.claim_codes as claim_codes
+import backend.api.geo_index as geo_index
+import backend.api.notifications as notifications
+import backend.api.tokens as tokens
+import backend.api.validation as validation
+import backend.data_model.approvals as approvals
+import backend.data_model.db_interface as db_int
+import backend.data_model.exports as exports
+import backend.data_model.leaderboard as leaderboard
+import backend.data_model.listings as listings
+import backend.data_model.stats as stats
+from backend.data_model.data_model import User, OrganizationRegistrationRequest
+
+# Users allowed to approve organizations, as comma separated emails.
+ADMIN_EMAILS = frozenset(db_int.normalize_email(email) for email in
+                         os.environ.get('VOLUNTEER_ADMIN_EMAILS', '').split(',') if email.strip())
+
+
+'''
+===================================================================================
+================================LOGIN USER=========================================
+===================================================================================
+'''
+
+
+def login_user(request: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    if request is None:
+        return _error_response(errors.REQUEST_INVALID_CODE, 400)
+
+    user, error_codes = _parse_and_validate_login(request, False)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    try:
+        valid_username, error_code = db_int.check_login(user.Email, request.get('password'))
+    except hashing.HashingServiceBusyError:
+        return _busy_response()
+
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    if not valid_username:
+        return _error_response(errors.LOGIN_INVALID_CODE, 422)
+    else:
+        access_token = create_access_token(identity=user.Email)
+        refresh_token = create_refresh_token(identity=user.Email)
+        return _success_response(access_token, refresh_token)
+
+
+def refresh_access_token(identity: str) -> Tuple[Dict[str, Any], int]:
+    """New access token for the identity of an already verified refresh token."""
+    return _success_response(create_access_token(identity=identity))
+
+
+def revoke_token(claims: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Revoke the verified token the request was made with."""
+    error_code = tokens.revoke(claims)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+    return _success_response()
+
+
+'''
+===================================================================================
+================================REGISTER USER======================================
+===================================================================================
+'''
+
+
+def register_user(request: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    if request is None:
+        return _error_response(errors.REQUEST_INVALID_CODE, 400)
+
+    try:
+        user, error_codes = _parse_and_validate_login(request, True)
+    except hashing.HashingServiceBusyError:
+        return _busy_response()
+
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    identity_email = user.Email
+    error_code = db_int.save_login(user)
+    if error_code == errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE:
+        return _error_response(error_code, 200)
+    elif error_code is not None:
+        return _error_response(error_code, 500)
+
+    access_token = create_access_token(identity=identity_email)
+    refresh_token = create_refresh_token(identity=identity_email)
+    return _success_response(access_token, refresh_token)
+
+
+def _create_user(email: str, password: str, last_name: str, phone_number: str, first_name: str = None) -> User:
+    hashed_pass = hash_password(password)
+    return User(Email=email, PasswordHash=hashed_pass, FirstName=first_name,
+                LastName=last_name, PhoneNumber=phone_number)
+
+
+'''
+===================================================================================
+==============================ORGANIZATION REQUEST=================================
+===================================================================================
+'''
+
+
+def submit_organization_request(request: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    if request is None:
+        return _error_response(errors.REQUEST_INVALID_CODE, 400)
+
+    org_request, error_codes = _parse_and_validate_org_request(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    error_code = db_int.save_org_request(org_request)
+    if error_code == errors.ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_CODE:
+        return _error_response(error_code, 200)
+    elif error_code is not None:
+        return _error_response(error_code, 500)
+
+    return _success_response()
+
+
+def decide_organization_requests(request: Dict[str, Any], identity: str) -> Tuple[Dict[str, Any], int]:
+    """Approve and reject a batch of organization requests at once, with a result per request."""
+    if not is_admin(identity):
+        return _error_response(errors.ADMIN_REQUIRED_CODE, 403)
+
+    values, error_codes = validation.ORGANIZATION_REQUEST_DECISIONS(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+    approve_ids = values['approve'] or []
+    reject_ids = values['reject'] or []
+    if not set(approve_ids).isdisjoint(reject_ids) or \
+            len(approve_ids) + len(reject_ids) > validation.MAX_DECISION_BATCH:
+        return _error_response(errors.REQUEST_INVALID_CODE, 400)
+
+    admin_id, error_code = db_int.get_user_id(identity)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    options = {}
+    for name in ('organization_type', 'refresh_amount', 'refresh_interval_in_days'):
+        if values[name] is not None:
+            options[name] = values[name]
+    results, error_code = approvals.decide_org_requests(approve_ids, reject_ids, admin_id, **options)
+    if error_code == errors.ORGANIZATION_TYPE_INVALID_CODE:
+        return _error_response(error_code, 422)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    response = _create_success_response()
+    response['results'] = [{'request_id': request_id, 'status': results[request_id][0],
+                            'organization_id': results[request_id][1]} for request_id in approve_ids + reject_ids]
+    return jsonify(response), 200
+
+
+def import_users(stream: BinaryIO, content_type: str, identity: str) -> Tuple[Dict[str, Any], int]:
+    """Register users from a CSV or NDJSON upload, for administrators.  Reports each row not imported."""
+    return _import_response(imports.import_users, stream, content_type, identity)
+
+
+def import_organizations(stream: BinaryIO, content_type: str, identity: str) -> Tuple[Dict[str, Any], int]:
+    return _import_response(imports.import_organizations, stream, content_type, identity)
+
+
+def _import_response(run_import: Any, stream: BinaryIO, content_type: str,
+                     identity: str) -> Tuple[Dict[str, Any], int]:
+    if not is_admin(identity):
+        return _error_response(errors.ADMIN_REQUIRED_CODE, 403)
+    import_format = imports.FORMATS.get(content_type)
+    if import_format is None:
+        return _error_response(errors.REQUEST_INVALID_CODE, 415)
+
+    result, error_code = run_import(imports.read_rows(stream, import_format))
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    response = _create_success_response()
+    response['imported'] = result.imported
+    response['failed'] = [{'row': row_number, 'errors': error_codes} for row_number, error_codes in result.failed]
+    return jsonify(response), 200
+
+
+def is_admin(identity: str) -> bool:
+    return identity is not None and db_int.normalize_email(identity) in ADMIN_EMAILS
+
+
+def _check_organization_owner(identity: str, organization_id: int) -> Optional[Tuple[Response, int]]:
+    """None if the user owns the organization or is an administrator, else the error response."""
+    owner_id, error_code = db_int.get_organization_owner_id(organization_id)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+    if owner_id is None:
+        return _error_response(errors.REQUEST_INVALID_CODE, 404)
+    if is_admin(identity):
+        return None
+
+    user_id, error_code = db_int.get_user_id(identity)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+    if user_id != owner_id:
+        return _error_response(errors.OWNER_REQUIRED_CODE, 403)
+    return None
+
+
+def _parse_and_validate_org_request(request: Dict[str, Any]) -> Tuple[OrganizationRegistrationRequest, List[int]]:
+    # TODO: Manage User ID with JWT, and default the contact details to the submitting user's
+    values, error_codes = validation.ORGANIZATION_REQUEST(request)
+    if error_codes is not None:
+        return None, error_codes
+
+    org_request = _create_org_request(values['organization_name'], values['message'] or '',
+                                      values['explicit_phone_number'], values['email'],
+                                      values['organization_url'])
+    return org_request, None
+
+
+def _create_org_request(org_name: str, message: str, phone_number: str,
+                        email: str, org_url: str):
+    # TODO: Add real user ID here
+    dummy_user_id = "1"
+
+    return OrganizationRegistrationRequest(SubmittingUserId=dummy_user_id,
+                                           OrganizationName=org_name,
+                                           Message=message,
+                                           ContactPhoneNumber=phone_number,
+                                           ContactEmail=email,
+                                           OrganizationURL=org_url)
+
+
+'''
+===================================================================================
+=============================NEARBY ORGANIZATIONS==================================
+===================================================================================
+'''
+
+NEARBY_PAGE_SIZE = 20
+
+
+def find_nearby_organizations(request: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Nearest organizations to a point, optionally within radius_km and of one type, a page at a time."""
+    values, error_codes = validation.NEARBY_ORGANIZATIONS(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    index, error_code = geo_index.get_index().get()
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    limit = values['limit'] or NEARBY_PAGE_SIZE
+    offset = values['offset'] or 0
+    if values['radius_km'] is None:
+        found, has_more = index.nearest(values['latitude'], values['longitude'], limit, offset, values['type'])
+    else:
+        found, has_more = index.within(values['latitude'], values['longitude'], values['radius_km'], limit,
+                                       offset, values['type'])
+
+    summaries, error_code = db_int.get_organization_summaries([org_id for org_id, _ in found])
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    organizations = []
+    for org_id, distance_km in found:
+        summary = summaries.get(org_id)
+        if summary is None:
+            # Deleted since the index last synced.
+            continue
+        organizations.append({'id': org_id, 'name': summary[0], 'type': summary[1],
+                              'distance_km': round(distance_km, 3)})
+
+    response = _create_success_response()
+    response['organizations'] = organizations
+    response['next_offset'] = offset + limit if has_more else None
+    return jsonify(response), 200
+
+
+def set_organization_location(request: Dict[str, Any], identity: str,
+                              organization_id: int) -> Tuple[Dict[str, Any], int]:
+    """Set where an organization is for nearby searches, or clear it with null for both, as its owner."""
+    values, error_codes = validation.ORGANIZATION_LOCATION(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+    if (values['latitude'] is None) != (values['longitude'] is None):
+        return _error_response(errors.LOCATION_INVALID_CODE, 400)
+
+    error_response = _check_organization_owner(identity, organization_id)
+    if error_response is not None:
+        return error_response
+
+    summaries, error_code = db_int.get_organization_summaries([organization_id])
+    if error_code is not None:
+        return _error_response(error_code, 500)
+    if organization_id not in summaries:
+        return _error_response(errors.REQUEST_INVALID_CODE, 404)
+
+    _, organization_type = summaries[organization_id]
+    error_code = geo_index.get_index().set_location(organization_id, values['latitude'], values['longitude'],
+                                                    organization_type)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+    return _success_response()
+
+
+'''
+===================================================================================
+====================================STATS==========================================
+===================================================================================
+'''
+
+DEFAULT_STATS_BUCKETS = 30
+
+
+def get_user_stats(request: Dict[str, Any], identity: str) -> Tuple[Dict[str, Any], int]:
+    values, error_codes = validation.STATS(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    user_id, error_code = db_int.get_user_id(identity)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+    if user_id is None:
+        return _error_response(errors.LOGIN_INVALID_CODE, 422)
+
+    return _stats_response(stats.get_user_stats, user_id, values)
+
+
+def get_organization_stats(request: Dict[str, Any], identity: str, organization_id: int) -> Tuple[Dict[str, Any], int]:
+    """An organization's statistics, for its owner or an administrator."""
+    values, error_codes = validation.STATS(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    error_response = _check_organization_owner(identity, organization_id)
+    if error_response is not None:
+        return error_response
+
+    return _stats_response(stats.get_organization_stats, organization_id, values)
+
+
+def _stats_response(get_stats: Any, owner_id: int, values: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    period = values['period'] or stats.DAY
+    buckets, error_code = get_stats(owner_id, period, values['buckets'] or DEFAULT_STATS_BUCKETS)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    response = _create_success_response()
+    response['buckets'] = buckets
+    return jsonify(response), 200
+
+
+'''
+===================================================================================
+=================================LEADERBOARD=======================================
+===================================================================================
+'''
+
+LEADERBOARD_PAGE_SIZE = 20
+
+
+def get_leaderboard(request: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Top contributors overall, or to organization_id, a page at a time."""
+    values, error_codes = validation.LEADERBOARD(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    board, error_code = leaderboard.get_leaderboard()
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    limit = values['limit'] or LEADERBOARD_PAGE_SIZE
+    offset = values['offset'] or 0
+    top, has_more = board.top(values['organization_id'] or leaderboard.OVERALL, limit, offset)
+    names, error_code = db_int.get_user_display_names([user_id for user_id, _ in top])
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    response = _create_success_response()
+    response['leaders'] = [{'rank': offset + i + 1, 'user_id': user_id, 'name': names.get(user_id),
+                            'points': points} for i, (user_id, points) in enumerate(top)]
+    response['next_offset'] = offset + limit if has_more else None
+    return jsonify(response), 200
+
+
+def get_leaderboard_rank(request: Dict[str, Any], identity: str) -> Tuple[Dict[str, Any], int]:
+    """The signed-in user's rank overall, or among organization_id's contributors."""
+    values, error_codes = validation.LEADERBOARD(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    user_id, error_code = db_int.get_user_id(identity)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+    if user_id is None:
+        return _error_response(errors.LOGIN_INVALID_CODE, 422)
+
+    board, error_code = leaderboard.get_leaderboard()
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    rank, points = board.rank(values['organization_id'] or leaderboard.OVERALL, user_id)
+    response = _create_success_response()
+    response['rank'] = rank
+    response['points'] = points
+    return jsonify(response), 200
+
+
+'''
+===================================================================================
+===================================LISTINGS========================================
+===================================================================================
+'''
+
+LISTING_PAGE_SIZE = 50
+
+
+def list_activity_transactions(request: Dict[str, Any], identity: str) -> Tuple[Dict[str, Any], int]:
+    """The signed-in user's activity history, newest first, a page at a time."""
+    return _user_listing_response(listings.list_activity_transactions, request, identity)
+
+
+def list_reward_transactions(request: Dict[str, Any], identity: str) -> Tuple[Dict[str, Any], int]:
+    return _user_listing_response(listings.list_reward_transactions, request, identity)
+
+
+def list_organization_activities(request: Dict[str, Any], identity: str,
+                                 organization_id: int) -> Tuple[Dict[str, Any], int]:
+    """An organization's public activities, or with visibility=private, for its owner, its private ones."""
+    return _catalog_listing_response(listings.list_activities, request, identity, organization_id)
+
+
+def list_organization_rewards(request: Dict[str, Any], identity: str,
+                              organization_id: int) -> Tuple[Dict[str, Any], int]:
+    return _catalog_listing_response(listings.list_rewards, request, identity, organization_id)
+
+
+def list_organization_requests(request: Dict[str, Any], identity: str) -> Tuple[Dict[str, Any], int]:
+    """Pending organization requests, oldest first, for administrators."""
+    if not is_admin(identity):
+        return _error_response(errors.ADMIN_REQUIRED_CODE, 403)
+
+    values, error_codes = validation.PAGE(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    return _listing_response(listings.list_organization_requests(values['limit'] or LISTING_PAGE_SIZE,
+                                                                 values['cursor']))
+
+
+def _user_listing_response(list_page: Any, request: Dict[str, Any], identity: str) -> Tuple[Dict[str, Any], int]:
+    values, error_codes = validation.PAGE(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    user_id, error_code = db_int.get_user_id(identity)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+    if user_id is None:
+        return _error_response(errors.LOGIN_INVALID_CODE, 422)
+
+    return _listing_response(list_page(user_id, values['limit'] or LISTING_PAGE_SIZE, values['cursor']))
+
+
+def _catalog_listing_response(list_page: Any, request: Dict[str, Any], identity: str,
+                              organization_id: int) -> Tuple[Dict[str, Any], int]:
+    values, error_codes = validation.ORGANIZATION_CATALOG_PAGE(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    visibility = values['visibility'] or listings.PUBLIC_VISIBILITY
+    if visibility == listings.PRIVATE_VISIBILITY:
+        error_response = _check_organization_owner(identity, organization_id)
+        if error_response is not None:
+            return error_response
+    return _listing_response(list_page(organization_id, visibility, values['limit'] or LISTING_PAGE_SIZE,
+                                       values['cursor']))
+
+
+def _listing_response(result: Tuple[listings.Page, int]) -> Tuple[Dict[str, Any], int]:
+    page, error_code = result
+    if error_code == errors.CURSOR_INVALID_CODE:
+        return _error_response(error_code, 400)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    response = _create_success_response()
+    response['items'], response['next_cursor'] = page
+    return jsonify(response), 200
+
+
+'''
+===================================================================================
+===================================EXPORTS=========================================
+===================================================================================
+'''
+
+
+def export_transactions(request: Dict[str, Any], identity: str, kind: str, compress: bool) -> Response:
+    """The signed-in user's activity or reward transactions as a streamed CSV or NDJSON download."""
+    values, error_codes = validation.EXPORT(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    user_id, error_code = db_int.get_user_id(identity)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+    if user_id is None:
+        return _error_response(errors.LOGIN_INVALID_CODE, 422)
+
+    return _export_response(exports.user_transactions(user_id, kind), kind, values['format'], compress)
+
+
+def export_organization_ledger(request: Dict[str, Any], identity: str, organization_id: int,
+                               compress: bool) -> Response:
+    """An organization's ledger as a streamed download, for its owner or an administrator."""
+    values, error_codes = validation.EXPORT(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    error_response = _check_organization_owner(identity, organization_id)
+    if error_response is not None:
+        return error_response
+
+    return _export_response(exports.organization_ledger(organization_id), 'organization-%d-ledger' % organization_id,
+                            values['format'], compress)
+
+
+def _export_response(export: Tuple[exports.Columns, exports.Rows], name: str, export_format: str,
+                     compress: bool) -> Response:
+    export_format = export_format or exports.CSV
+    headers = {'Content-Disposition': 'attachment; filename="%s.%s"' % (name, export_format),
+               'Vary': 'Accept-Encoding'}
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    return Response(exports.stream(*export, export_format, compress), mimetype=exports.MIMETYPES[export_format],
+                    headers=headers)
+
+
+'''
+===================================================================================
+=================================CLAIM CODES=======================================
+===================================================================================
+'''
+
+
+def issue_claim_code(request: Dict[str, Any], identity: str) -> Tuple[Dict[str, Any], int]:
+    if request is None:
+        return _error_response(errors.REQUEST_INVALID_CODE, 400)
+
+    values, error_codes = validation.ISSUE_CLAIM_CODE(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    user_id, error_code = db_int.get_user_id(identity)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+    if user_id is None:
+        return _error_response(errors.LOGIN_INVALID_CODE, 422)
+
+    claim, error_code = claim_codes.issue_claim(user_id, values['kind'])
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    response = _create_success_response()
+    response['code'] = claim.code
+    response['expires_in'] = claim.seconds_left()
+    return jsonify(response), 200
+
+
+def redeem_claim_code(request: Dict[str, Any], identity: str) -> Tuple[Dict[str, Any], int]:
+    """Redeem a code at an organization's terminal, signed in as its owner or an administrator."""
+    if request is None:
+        return _error_response(errors.REQUEST_INVALID_CODE, 400)
+
+    values, error_codes = validation.REDEEM_CLAIM_CODE(request)
+    if error_codes is not None:
+        return _error_response(error_codes, 400)
+
+    error_response = _check_organization_owner(identity, values['organization_id'])
+    if error_response is not None:
+        return error_response
+
+    redemption, error_code = claim_codes.redeem_claim(values['code'], values['organization_id'], values['item_id'],
+                                                      values['hours'])
+    if error_code in (errors.CLAIM_CODE_INVALID_CODE, errors.ITEM_INVALID_CODE):
+        return _error_response(error_code, 422)
+    elif error_code in (errors.INSUFFICIENT_POINTS_CODE, errors.INSUFFICIENT_ORGANIZATION_POINTS_CODE):
+        return _error_response(error_code, 200)
+    elif error_code is not None:
+        return _error_response(error_code, 500)
+
+    response = _create_success_response()
+    response['kind'] = redemption.claim.kind
+    response['points'] = redemption.points
+    return jsonify(response), 200
+
+
+def claim_code_events(code: str, identity: str) -> Response:
+    """Server-Sent Events stream that fires once when the code is redeemed, for the user it was issued to."""
+    if validation.parse_claim_code(code) is validation.INVALID:
+        return _error_response(errors.CLAIM_CODE_INVALID_CODE, 400)
+
+    user_id, error_code = db_int.get_user_id(identity)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+
+    store = claim_codes.get_store()
+    claim = store.get(code)
+    # Another user's code answers as an unknown one, so live codes can't be probed for.
+    if claim is None or claim.user_id != user_id:
+        return _error_response(errors.CLAIM_CODE_INVALID_CODE, 422)
+
+    subscription = notifications.get_hub().subscribe(notifications.claim_key(code))
+    # Redeemed between the lookup and the subscribe: end the stream right away.
+    timeout = claim.seconds_left() if store.get(code) is not None else 0
+    return _event_stream_response(subscription, timeout)
+
+
+def user_events(identity: str) -> Response:
+    """Server-Sent Events stream of the signed-in user's next redemption."""
+    user_id, error_code = db_int.get_user_id(identity)
+    if error_code is not None:
+        return _error_response(error_code, 500)
+    if user_id is None:
+        return _error_response(errors.LOGIN_INVALID_CODE, 422)
+
+    subscription = notifications.get_hub().subscribe(notifications.user_key(user_id))
+    return _event_stream_response(subscription, notifications.USER_STREAM_SECONDS)
+
+
+def _event_stream_response(subscription: notifications.Subscription, timeout: float) -> Response:
+    response = Response(notifications.stream_events(subscription, timeout), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Also covers clients that disconnect before the stream is first read.
+    response.call_on_close(lambda: notifications.get_hub().unsubscribe(subscription))
+    return response
+
+
+'''
+===================================================================================
+==================================SHARED===========================================
+===================================================================================
+'''
+
+
+def _create_success_response(access_token: str = None, refresh_token: str = None) -> Dict[str, Any]:
+    return_dict = {'success': True}
+    if access_token is not None:
+        return_dict['access_token'] = access_token
+    if refresh_token is not None:
+        return_dict['refresh_token'] = refresh_token
+    return return_dict
+
+
+def _success_response(access_token: str = None, refresh_token: str = None, http_code: int = 200) -> Dict[str, Any]:
+    return jsonify(_create_success_response(access_token, refresh_token)), http_code
+
+
+def _error_response(error_codes: Union[int, List[int]], http_code: int) -> Tuple[Response, int]:
+    # The body is serialized once per code (or code combination) in errors.
+    return Response(errors.error_response_body(error_codes), mimetype='application/json'), http_code
+
+
+def _busy_response() -> Tuple[Dict[str, Any], int, Dict[str, str]]:
+    response, http_code = _error_response(errors.SERVER_BUSY_CODE, 503)
+    return response, http_code, {'Retry-After': str(hashing.RETRY_AFTER_SECONDS)}
+
+
+def hash_password(password: str) -> str:
+    return hashing.hash_password(password)  # TODO: Make sure passwords are non null
+
+
+def _parse_and_validate_login(request: Dict[str, Any], is_register: bool) -> Tuple[User, List[int]]:
+    if not is_register:
+        values, error_codes = validation.LOGIN_USER(request)
+        if error_codes is not None:
+            return None, error_codes
+        return User(Email=values['email']), None
+
+    values, error_codes = validation.REGISTER_USER(request)
+    if error_codes is not None:
+        return None, error_codes
+
+    user = _create_user(values['email'], values['password'], values['last_name'], values['phone_number'],
+                        values['first_name'])
+    return user, None
@@ -0,0 +1,341 @@
+import asyncio
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Any, List, Tuple, Optional, Callable, Awaitable, AsyncIterator, Union
+from flask import Flask
+from flask_jwt_extended import create_access_token, create_refresh_token
+from flask_jwt_extended.config import config
+import backend.api.claim_codes as claim_codes
+import backend.api.errors as errors
+import backend.api.hashing as hashing
+import backend.api.notifications as notifications
+import backend.api.tokens as tokens
+import backend.api.validation as validation
+import backend.data_model.db_interface as db_int
+from backend.data_model.data_model import User
+
+'''
+ASGI entry point, app.asgi_app, for any ASGI server:
+
+    uvicorn app:asgi_app --workers 4
+
+The routes that spend their time waiting are served on the event loop, so a
+worker holds thousands of them without a thread each:
+
+  * POST /login-user and /register-user await bcrypt in the hashing pool and
+    their queries through db_interface.async_session_scope;
+  * GET /claim-code/<code>/events checks the access token and waits for the
+    redemption as an AsyncSubscription.
+
+They answer as the Flask routes of the same name do.  Every other
+request goes to the Flask app on one of WSGI_THREADS threads, with its body
+read in full first.  Loop routes are not in /metrics' per-route series.
+'''
+
+# Threads the Flask app runs on.  A WSGI request holds one until its response
+# has been sent, streams included.
+WSGI_THREADS = int(os.environ.get('VOLUNTEER_ASGI_WSGI_THREADS', 32))
+
+JSON_HEADERS = [(b'content-type', b'application/json')]
+EVENT_STREAM_HEADERS = [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                        (b'x-accel-buffering', b'no')]
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class AsgiApp:
+
+    def __init__(self, flask_app: Flask) -> None:
+        self.flask_app = flask_app
+        self._routes = [
+            ('POST', re.compile(r'/login-user$'), self._login_user),
+            ('POST', re.compile(r'/register-user$'), self._register_user),
+            ('GET', re.compile(r'/claim-code/(?P<code>[^/]+)/events$'), self._claim_code_events),
+        ]
+        self._executor = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type ' + scope['type'])
+
+        for method, pattern, handler in self._routes:
+            match = pattern.match(scope['path'])
+            if match is not None and scope['method'] == method:
+                await handler(scope, receive, send, **match.groupdict())
+                return
+        await self._call_wsgi(scope, receive, send)
+
+    async def run_in_thread(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run blocking work on the Flask app's threads."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='wsgi')
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        db_int.shutdown_database_threads()
+        hashing.shutdown()
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.run_in_thread(hashing.start)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.run_in_thread(self.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _login_user(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = await _read_json(scope, receive)
+        if request is None:
+            await _send_error(send, errors.REQUEST_INVALID_CODE, 400)
+            return
+
+        values, error_codes = validation.LOGIN_USER(request)
+        if error_codes is not None:
+            await _send_error(send, error_codes, 400)
+            return
+
+        try:
+            valid_username, error_code = await db_int.check_login_async(values['email'], request.get('password'))
+        except hashing.HashingServiceBusyError:
+            await _send_busy(send)
+            return
+
+        if error_code is not None:
+            await _send_error(send, error_code, 500)
+        elif not valid_username:
+            await _send_error(send, errors.LOGIN_INVALID_CODE, 422)
+        else:
+            await self._send_tokens(send, values['email'])
+
+    async def _register_user(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = await _read_json(scope, receive)
+        if request is None:
+            await _send_error(send, errors.REQUEST_INVALID_CODE, 400)
+            return
+
+        values, error_codes = validation.REGISTER_USER(request)
+        if error_codes is not None:
+            await _send_error(send, error_codes, 400)
+            return
+
+        try:
+            password_hash = await hashing.hash_password_async(values['password'])
+        except hashing.HashingServiceBusyError:
+            await _send_busy(send)
+            return
+
+        user = User(Email=values['email'], PasswordHash=password_hash, FirstName=values['first_name'],
+                    LastName=values['last_name'], PhoneNumber=values['phone_number'])
+        error_code = await db_int.run_in_database_thread(db_int.save_login, user)
+        if error_code == errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE:
+            await _send_error(send, error_code, 200)
+        elif error_code is not None:
+            await _send_error(send, error_code, 500)
+        else:
+            await self._send_tokens(send, values['email'])
+
+    async def _claim_code_events(self, scope: Scope, receive: Receive, send: Send, code: str) -> None:
+        identity = await self.run_in_thread(self._verify_access_token, scope)
+        if identity is None:
+            # The Flask route refuses it too, through JWTManager's error handlers.
+            await self._call_wsgi(scope, receive, send)
+            return
+
+        if validation.parse_claim_code(code) is validation.INVALID:
+            await _send_error(send, errors.CLAIM_CODE_INVALID_CODE, 400)
+            return
+
+        user_id, error_code = await db_int.run_in_database_thread(db_int.get_user_id, identity)
+        if error_code is not None:
+            await _send_error(send, error_code, 500)
+            return
+
+        # The store may be Redis, so its lookups go to a thread.
+        store = claim_codes.get_store()
+        claim = await self.run_in_thread(store.get, code)
+        if claim is None or claim.user_id != user_id:
+            await _send_error(send, errors.CLAIM_CODE_INVALID_CODE, 422)
+            return
+
+        subscription = notifications.AsyncSubscription(notifications.claim_key(code), asyncio.get_running_loop())
+        notifications.get_hub().add(subscription)
+        # Redeemed between the lookup and the subscribe: end the stream right away.
+        try:
+            timeout = claim.seconds_left() if await self.run_in_thread(store.get, code) is not None else 0
+            await _send_stream(receive, send, 200, EVENT_STREAM_HEADERS,
+                               _encode(notifications.stream_events_async(subscription, timeout)))
+        finally:
+            # Also covers streams that end before their first chunk is read.
+            notifications.get_hub().unsubscribe(subscription)
+
+    def _verify_access_token(self, scope: Scope) -> Optional[str]:
+        """The identity of the request's access token, or None if it is missing or refused."""
+        with self.flask_app.app_context():
+            auth_header = dict(scope['headers']).get(config.header_name.lower().encode('latin-1'))
+            try:
+                claims = tokens.verify_authorization_header(
+                    auth_header.decode('latin-1') if auth_header is not None else None, tokens.ACCESS)
+            except Exception:
+                return None
+            return tokens.get_identity(claims)
+
+    async def _send_tokens(self, send: Send, identity: str) -> None:
+        with self.flask_app.app_context():
+            body = {'success': True, 'access_token': create_access_token(identity=identity),
+                    'refresh_token': create_refresh_token(identity=identity)}
+        await _send_response(send, 200, JSON_HEADERS, json.dumps(body).encode())
+
+    async def _call_wsgi(self, scope: Scope, receive: Receive, send: Send) -> None:
+        environ = _build_environ(scope, await _read_body(receive))
+        started = []
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info: Any = None) -> None:
+            started[:] = [status, headers]
+
+        def start() -> Tuple[Any, Any]:
+            iterable = self.flask_app(environ, start_response)
+            return iterable, iter(iterable)
+
+        iterable, iterator = await self.run_in_thread(start)
+        status, headers = started
+        try:
+            await _send_stream(receive, send, int(status.split(' ', 1)[0]),
+                               [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+                               self._iterate_in_thread(iterator))
+        finally:
+            if hasattr(iterable, 'close'):
+                await self.run_in_thread(iterable.close)
+
+    async def _iterate_in_thread(self, iterator: Any) -> AsyncIterator[bytes]:
+        end = object()
+        while True:
+            chunk = await self.run_in_thread(next, iterator, end)
+            if chunk is end:
+                return
+            yield chunk
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+async def _read_json(scope: Scope, receive: Receive) -> Any:
+    """The JSON body, or None if it is not JSON, as Flask's get_json."""
+    body = await _read_body(receive)
+    content_type = dict(scope['headers']).get(b'content-type', b'').split(b';', 1)[0].strip().lower()
+    if content_type != b'application/json' and not (content_type.startswith(b'application/')
+                                                    and content_type.endswith(b'+json')):
+        return None
+    try:
+        return json.loads(body.decode('utf-8'))
+    except ValueError:
+        return None
+
+
+async def _send_response(send: Send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': headers + [(b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_error(send: Send, error_codes: Union[int, List[int]], status: int,
+                      headers: List[Tuple[bytes, bytes]] = ()) -> None:
+    await _send_response(send, status, JSON_HEADERS + list(headers), errors.error_response_body(error_codes))
+
+
+async def _send_busy(send: Send) -> None:
+    await _send_error(send, errors.SERVER_BUSY_CODE, 503,
+                      [(b'retry-after', str(hashing.RETRY_AFTER_SECONDS).encode())])
+
+
+async def _send_stream(receive: Receive, send: Send, status: int, headers: List[Tuple[bytes, bytes]],
+                       chunks: AsyncIterator[bytes]) -> None:
+    """Send chunks as they come, stopping early if the client disconnects."""
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+
+    async def send_chunks() -> None:
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            await chunks.aclose()
+
+    sending = asyncio.ensure_future(send_chunks())
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await asyncio.wait([sending, disconnected], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        sending.cancel()
+        disconnected.cancel()
+        await asyncio.wait([sending, disconnected])
+    if not sending.cancelled():
+        sending.result()
+
+
+async def _wait_for_disconnect(receive: Receive) -> None:
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _encode(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in chunks:
+            yield chunk.encode()
+    finally:
+        await chunks.aclose()
+
+
+def _build_environ(scope: Scope, body: bytes) -> Dict[str, Any]:
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+
+    for name, value in scope['headers']:
+        name, value = name.decode('latin-1').upper().replace('-', '_'), value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else 'HTTP_' + name
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
@@ -0,0 +1,254 @@
+import heapq
+import os
+import threading
+import time
+from random import SystemRandom
+from typing import Tuple, Optional, Any
+import backend.api.errors as errors
+import backend.api.notifications as notifications
+import backend.data_model.db_interface as db_int
+import backend.data_model.ledger as ledger
+
+'''
+Six digit claim codes for the point dissemination and consumption workflows in
+`plan`.  A user asks for a code, reads it out at a terminal, and the terminal
+redeems it into an ActivityTransaction (claim) or RewardTransaction (use).
+
+Active codes live in a TTL store.  The in-process store is enough for a single
+worker; set VOLUNTEER_CLAIM_STORE_URL=redis://... so several workers share one.
+'''
+
+CODE_DIGITS = 6
+CODE_TTL_SECONDS = int(os.environ.get('VOLUNTEER_CLAIM_CODE_TTL_SECONDS', 120))
+CLAIM_STORE_URL = os.environ.get('VOLUNTEER_CLAIM_STORE_URL')
+
+# Random codes are drawn until one is free.  With a million codes this only
+# gives up if the store is nearly full.
+MAX_ISSUE_ATTEMPTS = 20
+
+ACTIVITY = 'activity'
+REWARD = 'reward'
+
+_random = SystemRandom()
+_store = None
+_store_lock = threading.Lock()
+
+
+class Claim:
+    __slots__ = ('code', 'user_id', 'kind', 'expires_at')
+
+    def __init__(self, code: str, user_id: int, kind: str, expires_at: float) -> None:
+        self.code = code
+        self.user_id = user_id
+        self.kind = kind
+        self.expires_at = expires_at
+
+    def seconds_left(self, now: float = None) -> int:
+        return max(0, int(round(self.expires_at - (now or time.time()))))
+
+
+class Redemption:
+    __slots__ = ('claim', 'points')
+
+    def __init__(self, claim: Claim, points: int) -> None:
+        self.claim = claim
+        self.points = points
+
+
+class InMemoryClaimStore:
+    """Dict for O(1) lookup plus a heap of expiry times for sweeping."""
+
+    def __init__(self) -> None:
+        self._claims = {}
+        self._expiries = []
+        self._lock = threading.Lock()
+
+    def add(self, claim: Claim) -> bool:
+        """Store a claim unless its code is already active."""
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            existing = self._claims.get(claim.code)
+            if existing is not None and existing.expires_at > now:
+                return False
+            self._claims[claim.code] = claim
+            heapq.heappush(self._expiries, (claim.expires_at, claim.code))
+            return True
+
+    def get(self, code: str) -> Optional[Claim]:
+        claim = self._claims.get(code)
+        if claim is None or claim.expires_at <= time.time():
+            return None
+        return claim
+
+    def take(self, code: str) -> Optional[Claim]:
+        """Atomically remove and return an active claim."""
+        with self._lock:
+            claim = self._claims.pop(code, None)
+        if claim is None or claim.expires_at <= time.time():
+            return None
+        return claim
+
+    def sweep(self) -> int:
+        with self._lock:
+            return self._sweep(time.time())
+
+    def __len__(self) -> int:
+        return len(self._claims)
+
+    def _sweep(self, now: float) -> int:
+        removed = 0
+        while self._expiries and self._expiries[0][0] <= now:
+            expires_at, code = heapq.heappop(self._expiries)
+            claim = self._claims.get(code)
+            # Heap entries for codes already redeemed or reissued are skipped.
+            if claim is not None and claim.expires_at == expires_at:
+                del self._claims[code]
+                removed += 1
+        return removed
+
+
+class RedisClaimStore:
+    """Claims as Redis keys with a TTL, so any worker can redeem any code.
+
+    Works with any client exposing set(nx=, px=), get and pipeline (redis-py).
+    """
+
+    KEY_PREFIX = 'claim:'
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+
+    @staticmethod
+    def from_url(url: str) -> 'RedisClaimStore':
+        import redis
+        return RedisClaimStore(redis.Redis.from_url(url))
+
+    def add(self, claim: Claim) -> bool:
+        ttl_ms = max(1, int((claim.expires_at - time.time()) * 1000))
+        value = '%d:%s:%r' % (claim.user_id, claim.kind, claim.expires_at)
+        return bool(self._client.set(self.KEY_PREFIX + claim.code, value, nx=True, px=ttl_ms))
+
+    def get(self, code: str) -> Optional[Claim]:
+        return self._parse(code, self._client.get(self.KEY_PREFIX + code))
+
+    def take(self, code: str) -> Optional[Claim]:
+        # GET and DEL in one MULTI/EXEC: only one caller can see the value.
+        pipe = self._client.pipeline(transaction=True)
+        pipe.get(self.KEY_PREFIX + code)
+        pipe.delete(self.KEY_PREFIX + code)
+        value, deleted = pipe.execute()
+        if not deleted:
+            return None
+        return self._parse(code, value)
+
+    def sweep(self) -> int:
+        # Redis expires keys itself.
+        return 0
+
+    def _parse(self, code: str, value: Any) -> Optional[Claim]:
+        if value is None:
+            return None
+        if isinstance(value, bytes):
+            value = value.decode()
+        user_id, kind, expires_at = value.split(':')
+        return Claim(code, int(user_id), kind, float(expires_at))
+
+
+def get_store() -> Any:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if CLAIM_STORE_URL is not None:
+                    _store = RedisClaimStore.from_url(CLAIM_STORE_URL)
+                else:
+                    _store = InMemoryClaimStore()
+    return _store
+
+
+def set_store(store: Any) -> None:
+    global _store
+    _store = store
+
+
+def issue_claim(user_id: int, kind: str) -> Tuple[Claim, int]:
+    """Reserve a fresh code for a user.  Returns (claim, error code)."""
+    store = get_store()
+    for _ in range(MAX_ISSUE_ATTEMPTS):
+        code = str(_random.randrange(10 ** CODE_DIGITS)).zfill(CODE_DIGITS)
+        claim = Claim(code, user_id, kind, time.time() + CODE_TTL_SECONDS)
+        try:
+            if store.add(claim):
+                return claim, None
+        except BaseException as e:
+            errors.log_error(errors.FAILED_TO_ISSUE_CLAIM_CODE_CODE, str(e), 'backend.api.claim_codes',
+                             'issue_claim')
+            return None, errors.FAILED_TO_ISSUE_CLAIM_CODE_CODE
+
+    errors.log_error(errors.FAILED_TO_ISSUE_CLAIM_CODE_CODE, module_name='backend.api.claim_codes',
+                     function_name='issue_claim')
+    return None, errors.FAILED_TO_ISSUE_CLAIM_CODE_CODE
+
+
+def redeem_claim(code: str, organization_id: int, item_id: int, hours: int = None) -> Tuple[Redemption, int]:
+    """Consume a code and record the matching ledger transaction.  Returns (redemption, error code).
+
+    The points are the catalog's: an activity pays PointsPerCompletion plus
+    PointsPerHour for each of the hours, a reward costs PointsPerReward.  The
+    item must belong to the organization.
+
+    Taking the code out of the store is the atomic step: of several terminals
+    redeeming the same code, exactly one gets the claim.  If the ledger write
+    then fails the code is put back so it can be retried before it expires;
+    a code that cannot be put back is logged and the user needs a new one.
+    """
+    store = get_store()
+    claim = store.take(code)
+    if claim is None:
+        return None, errors.CLAIM_CODE_INVALID_CODE
+
+    points, error_code = _item_points(claim.kind, organization_id, item_id, hours)
+    if error_code is None:
+        if claim.kind == REWARD:
+            _, error_code = ledger.record_reward(claim.user_id, organization_id, points, item_id)
+        else:
+            _, error_code = ledger.record_activity(claim.user_id, organization_id, points, item_id)
+
+    if error_code is not None:
+        _restore_claim(store, claim)
+        return None, error_code
+
+    message = {'event': notifications.REDEEMED_EVENT, 'kind': claim.kind, 'points': points}
+    notifications.publish(notifications.claim_key(code), message)
+    notifications.publish(notifications.user_key(claim.user_id), message)
+    return Redemption(claim, points), None
+
+
+def _restore_claim(store: Any, claim: Claim) -> None:
+    try:
+        if store.add(claim):
+            return
+        error_string = None
+    except BaseException as e:
+        error_string = str(e)
+    errors.log_error(errors.FAILED_TO_RESTORE_CLAIM_CODE_CODE, error_string, 'backend.api.claim_codes',
+                     'redeem_claim')
+
+
+def _item_points(kind: str, organization_id: int, item_id: int, hours: int) -> Tuple[int, int]:
+    if kind == REWARD:
+        points, error_code = db_int.get_reward_points(item_id, organization_id)
+    else:
+        activity_points, error_code = db_int.get_activity_points(item_id, organization_id)
+        points = None
+        if activity_points is not None:
+            points_per_hour, points_per_completion = activity_points
+            points = points_per_completion + points_per_hour * (hours or 0)
+
+    if error_code is not None:
+        return None, error_code
+    # Not the organization's, or worth no points.
+    if points is None or points <= 0:
+        return None, errors.ITEM_INVALID_CODE
+    return points, None
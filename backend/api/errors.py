@@ -0,0 +1,262 @@
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, Any, Union, List, Tuple
+_error_dict = {}
+_logger = logging.getLogger('backend.api.errors')
+
+EMAIL_INVALID_CODE = 101
+EMAIL_INVALID_STRING = "Email invalid"
+PASSWORD_INVALID_CODE = 102
+PASSWORD_INVALID_STRING = "Password invalid"
+NAME_INVALID_CODE = 103
+NAME_INVALID_STRING = "Name invalid"
+PHONE_NUMBER_INVALID_CODE = 104
+PHONE_NUMBER_INVALID_STRING = "Phone number invalid"
+REQUEST_INVALID_CODE = 105
+REQUEST_INVALID_STRING = "Request was invalid"
+LOGIN_INVALID_CODE = 106
+LOGIN_INVALID_STRING = "Username or password incorrect"
+CLAIM_CODE_INVALID_CODE = 107
+CLAIM_CODE_INVALID_STRING = "Claim code invalid or expired"
+POINTS_INVALID_CODE = 108
+POINTS_INVALID_STRING = "Points invalid"
+URL_INVALID_CODE = 109
+URL_INVALID_STRING = "URL invalid"
+LOCATION_INVALID_CODE = 110
+LOCATION_INVALID_STRING = "Latitude or longitude invalid"
+ADMIN_REQUIRED_CODE = 111
+ADMIN_REQUIRED_STRING = "Only administrators can do this"
+CURSOR_INVALID_CODE = 112
+CURSOR_INVALID_STRING = "Page cursor invalid"
+OWNER_REQUIRED_CODE = 113
+OWNER_REQUIRED_STRING = "Only the organization's owner can do this"
+OWNER_NOT_FOUND_CODE = 114
+OWNER_NOT_FOUND_STRING = "No user with the owner's email"
+ITEM_INVALID_CODE = 115
+ITEM_INVALID_STRING = "No such activity or reward at this organization"
+ORGANIZATION_TYPE_INVALID_CODE = 116
+ORGANIZATION_TYPE_INVALID_STRING = "No such organization type"
+
+_error_dict[EMAIL_INVALID_CODE] = EMAIL_INVALID_STRING
+_error_dict[PASSWORD_INVALID_CODE] = PASSWORD_INVALID_STRING
+_error_dict[NAME_INVALID_CODE] = NAME_INVALID_STRING
+_error_dict[PHONE_NUMBER_INVALID_CODE] = PHONE_NUMBER_INVALID_STRING
+_error_dict[REQUEST_INVALID_CODE] = REQUEST_INVALID_STRING
+_error_dict[LOGIN_INVALID_CODE] = LOGIN_INVALID_STRING
+_error_dict[CLAIM_CODE_INVALID_CODE] = CLAIM_CODE_INVALID_STRING
+_error_dict[POINTS_INVALID_CODE] = POINTS_INVALID_STRING
+_error_dict[URL_INVALID_CODE] = URL_INVALID_STRING
+_error_dict[LOCATION_INVALID_CODE] = LOCATION_INVALID_STRING
+_error_dict[ADMIN_REQUIRED_CODE] = ADMIN_REQUIRED_STRING
+_error_dict[CURSOR_INVALID_CODE] = CURSOR_INVALID_STRING
+_error_dict[OWNER_REQUIRED_CODE] = OWNER_REQUIRED_STRING
+_error_dict[OWNER_NOT_FOUND_CODE] = OWNER_NOT_FOUND_STRING
+_error_dict[ITEM_INVALID_CODE] = ITEM_INVALID_STRING
+_error_dict[ORGANIZATION_TYPE_INVALID_CODE] = ORGANIZATION_TYPE_INVALID_STRING
+
+FAILED_TO_COMMIT_USER_CODE = 201
+FAILED_TO_COMMIT_USER_STRING = "Failed to commit user to database"
+FAILED_TO_QUERY_FOR_USER_CODE = 202
+FAILED_TO_QUERY_FOR_USER_STRING = "Failed to query database for user"
+FAILED_TO_COMMIT_ORG_REQUEST_CODE = 203
+FAILED_TO_COMMIT_ORG_REQUEST_STRING = "Failed to commit organization request to database"
+FAILED_TO_QUERY_FOR_ORG_CODE = 204
+FAILED_TO_QUERY_FOR_ORG_STRING = "Failed to query database for organization or organization request"
+FAILED_TO_UPDATE_PASSWORD_HASH_CODE = 205
+FAILED_TO_UPDATE_PASSWORD_HASH_STRING = "Failed to update user password hash"
+FAILED_TO_COMMIT_TRANSACTION_CODE = 206
+FAILED_TO_COMMIT_TRANSACTION_STRING = "Failed to commit point transaction to database"
+FAILED_TO_QUERY_FOR_BALANCE_CODE = 207
+FAILED_TO_QUERY_FOR_BALANCE_STRING = "Failed to query database for point balance"
+FAILED_TO_ISSUE_CLAIM_CODE_CODE = 208
+FAILED_TO_ISSUE_CLAIM_CODE_STRING = "Failed to issue a claim code"
+FAILED_TO_REFRESH_ORGANIZATIONS_CODE = 209
+FAILED_TO_REFRESH_ORGANIZATIONS_STRING = "Failed to refresh organization points"
+FAILED_TO_REVOKE_TOKEN_CODE = 210
+FAILED_TO_REVOKE_TOKEN_STRING = "Failed to revoke token"
+FAILED_TO_QUERY_FOR_REVOKED_TOKEN_CODE = 211
+FAILED_TO_QUERY_FOR_REVOKED_TOKEN_STRING = "Failed to query database for revoked tokens"
+FAILED_TO_UPDATE_ORG_CODE = 212
+FAILED_TO_UPDATE_ORG_STRING = "Failed to update organization"
+FAILED_TO_QUERY_FOR_STATS_CODE = 213
+FAILED_TO_QUERY_FOR_STATS_STRING = "Failed to query database for statistics"
+FAILED_TO_REBUILD_STATS_CODE = 214
+FAILED_TO_REBUILD_STATS_STRING = "Failed to rebuild statistics"
+FAILED_TO_LOAD_LEADERBOARD_CODE = 215
+FAILED_TO_LOAD_LEADERBOARD_STRING = "Failed to load leaderboard"
+FAILED_TO_UPDATE_LEADERBOARD_CODE = 216
+FAILED_TO_UPDATE_LEADERBOARD_STRING = "Failed to update leaderboard"
+FAILED_TO_DECIDE_ORG_REQUESTS_CODE = 217
+FAILED_TO_DECIDE_ORG_REQUESTS_STRING = "Failed to approve or reject organization requests"
+FAILED_TO_QUERY_FOR_TRANSACTIONS_CODE = 218
+FAILED_TO_QUERY_FOR_TRANSACTIONS_STRING = "Failed to query database for transactions"
+FAILED_TO_EXPORT_CODE = 219
+FAILED_TO_EXPORT_STRING = "Failed to export transactions"
+FAILED_TO_IMPORT_CODE = 220
+FAILED_TO_IMPORT_STRING = "Failed to import rows"
+FAILED_TO_PUBLISH_NOTIFICATION_CODE = 221
+FAILED_TO_PUBLISH_NOTIFICATION_STRING = "Failed to publish notification"
+FAILED_TO_RESTORE_CLAIM_CODE_CODE = 222
+FAILED_TO_RESTORE_CLAIM_CODE_STRING = "Failed to restore a claim code after a failed redemption"
+
+_error_dict[FAILED_TO_COMMIT_USER_CODE] = FAILED_TO_COMMIT_USER_STRING
+_error_dict[FAILED_TO_QUERY_FOR_USER_CODE] = FAILED_TO_QUERY_FOR_USER_STRING
+_error_dict[FAILED_TO_QUERY_FOR_ORG_CODE] = FAILED_TO_QUERY_FOR_ORG_STRING
+_error_dict[FAILED_TO_COMMIT_ORG_REQUEST_CODE] = FAILED_TO_COMMIT_ORG_REQUEST_STRING
+_error_dict[FAILED_TO_UPDATE_PASSWORD_HASH_CODE] = FAILED_TO_UPDATE_PASSWORD_HASH_STRING
+_error_dict[FAILED_TO_COMMIT_TRANSACTION_CODE] = FAILED_TO_COMMIT_TRANSACTION_STRING
+_error_dict[FAILED_TO_QUERY_FOR_BALANCE_CODE] = FAILED_TO_QUERY_FOR_BALANCE_STRING
+_error_dict[FAILED_TO_ISSUE_CLAIM_CODE_CODE] = FAILED_TO_ISSUE_CLAIM_CODE_STRING
+_error_dict[FAILED_TO_REFRESH_ORGANIZATIONS_CODE] = FAILED_TO_REFRESH_ORGANIZATIONS_STRING
+_error_dict[FAILED_TO_REVOKE_TOKEN_CODE] = FAILED_TO_REVOKE_TOKEN_STRING
+_error_dict[FAILED_TO_QUERY_FOR_REVOKED_TOKEN_CODE] = FAILED_TO_QUERY_FOR_REVOKED_TOKEN_STRING
+_error_dict[FAILED_TO_UPDATE_ORG_CODE] = FAILED_TO_UPDATE_ORG_STRING
+_error_dict[FAILED_TO_QUERY_FOR_STATS_CODE] = FAILED_TO_QUERY_FOR_STATS_STRING
+_error_dict[FAILED_TO_REBUILD_STATS_CODE] = FAILED_TO_REBUILD_STATS_STRING
+_error_dict[FAILED_TO_LOAD_LEADERBOARD_CODE] = FAILED_TO_LOAD_LEADERBOARD_STRING
+_error_dict[FAILED_TO_UPDATE_LEADERBOARD_CODE] = FAILED_TO_UPDATE_LEADERBOARD_STRING
+_error_dict[FAILED_TO_DECIDE_ORG_REQUESTS_CODE] = FAILED_TO_DECIDE_ORG_REQUESTS_STRING
+_error_dict[FAILED_TO_QUERY_FOR_TRANSACTIONS_CODE] = FAILED_TO_QUERY_FOR_TRANSACTIONS_STRING
+_error_dict[FAILED_TO_EXPORT_CODE] = FAILED_TO_EXPORT_STRING
+_error_dict[FAILED_TO_IMPORT_CODE] = FAILED_TO_IMPORT_STRING
+_error_dict[FAILED_TO_PUBLISH_NOTIFICATION_CODE] = FAILED_TO_PUBLISH_NOTIFICATION_STRING
+_error_dict[FAILED_TO_RESTORE_CLAIM_CODE_CODE] = FAILED_TO_RESTORE_CLAIM_CODE_STRING
+
+USER_WITH_EMAIL_ALREADY_EXISTS_CODE = 301
+USER_WITH_EMAIL_ALREADY_EXISTS_STRING = "User with that email already exists"
+ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_CODE = 302
+ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_STRING = "Organization with that name already exists or is being requested."
+INSUFFICIENT_POINTS_CODE = 303
+INSUFFICIENT_POINTS_STRING = "User does not have enough points"
+INSUFFICIENT_ORGANIZATION_POINTS_CODE = 304
+INSUFFICIENT_ORGANIZATION_POINTS_STRING = "Organization does not have enough points"
+
+_error_dict[USER_WITH_EMAIL_ALREADY_EXISTS_CODE] = USER_WITH_EMAIL_ALREADY_EXISTS_STRING
+_error_dict[ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_CODE] = ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_STRING
+_error_dict[INSUFFICIENT_POINTS_CODE] = INSUFFICIENT_POINTS_STRING
+_error_dict[INSUFFICIENT_ORGANIZATION_POINTS_CODE] = INSUFFICIENT_ORGANIZATION_POINTS_STRING
+
+SERVER_BUSY_CODE = 401
+SERVER_BUSY_STRING = "Server is busy, try again later"
+
+_error_dict[SERVER_BUSY_CODE] = SERVER_BUSY_STRING
+
+
+def create_single_error_response(code: int) -> Dict[str, Dict[str, Union[bool, int, str]]]:
+    err_object = ErrorObject(code)
+    err_list = ErrorList()
+    err_list.add_error(err_object)
+
+    return err_list
+
+
+def create_multiple_error_response(codes: List[int]) -> Dict[str, Dict[str, Union[bool, int, str]]]:
+    err_list = ErrorList()
+    for code in codes:
+        err_object = ErrorObject(code)
+        err_list.add_error(err_object)
+
+    return err_list
+
+
+# Logged as the error string (or override) with error_code, error_module and
+# error_function attached to the record; see backend.api.logs.
+def log_error(code: int=None, error_string_override: str=None, module_name: str=None,
+              function_name: str=None) -> None:
+    if code is not None and code not in _error_dict:
+        logging.error("Called log_error with an invalid error code.")
+        raise ValueError("Not a valid code.")
+    if code is None and error_string_override is None:
+        raise ValueError("log_error called with no code or error_string_override")
+
+    if not _logger.isEnabledFor(logging.ERROR):
+        return
+
+    err_string = error_string_override if error_string_override is not None else _error_dict[code]
+    _logger.error(err_string, extra={'error_code': code, 'error_module': module_name,
+                                     'error_function': function_name})
+
+
+def get_error_string(code: int) -> str:
+    if code not in _error_dict:
+        logging.error("Called get_error_string with an invalid error code.")
+        raise ValueError("Not a valid code.")
+
+    return _error_dict[code]
+
+
+def log_generic_error(error_string: str, module_name: str=None, function_name: str=None) -> None:
+    _logger.error(error_string, extra={'error_module': module_name, 'error_function': function_name})
+
+
+class ErrorObject:
+    __slots__ = ('error_string', 'error_code')
+
+    def __init__(self, error_code: int) -> None:
+        self.error_string = get_error_string(error_code)
+        self.error_code = error_code
+
+    def to_dict(self) -> Dict[str, Union[bool, int, str]]:
+        return {'error_string': self.error_string, 'error_code': self.error_code}
+
+
+class ErrorList:
+    __slots__ = ('errors', '_error_set')
+
+    def __init__(self, errors: List[ErrorObject]=None) -> None:
+        if errors is None:
+            self.errors = []
+            self._error_set = set()
+        else:
+            self.errors = errors
+            self._error_set = set([err.error_code for err in self.errors])
+
+    def to_response_dict(self) -> Dict[str, Dict[str, Union[bool, int, str]]]:
+        if self.errors is None or len(self.errors) == 0:
+            return None
+        dic = {}
+        dic['errors'] = []
+        for error in self.errors:
+            dic['errors'].append({'error': error.to_dict()})
+        dic['success'] = False
+        return dic
+
+    def add_error(self, error: ErrorObject) -> None:
+        self.errors.append(error)
+        self._error_set.add(error.error_code)
+
+    def contains_error(self, error_code: int) -> bool:
+        return (error_code in self._error_set)
+
+
+'''
+Error responses are a fixed set of bodies, so they are serialized once.  The
+JSON matches what jsonify produced for to_response_dict().
+'''
+
+MULTIPLE_ERROR_CACHE_SIZE = 256
+
+
+def error_response_body(error_codes: Union[int, List[int]]) -> bytes:
+    """The serialized response for one code or a list of codes."""
+    if type(error_codes) == list:
+        return _multiple_error_response_body(tuple(error_codes))
+
+    body = _single_error_bodies.get(error_codes)
+    if body is None:
+        get_error_string(error_codes)
+    return body
+
+
+@lru_cache(maxsize=MULTIPLE_ERROR_CACHE_SIZE)
+def _multiple_error_response_body(error_codes: Tuple[int, ...]) -> bytes:
+    return _serialize(create_multiple_error_response(list(error_codes)).to_response_dict())
+
+
+def _serialize(response_dict: Dict[str, Any]) -> bytes:
+    return (json.dumps(response_dict, sort_keys=True, separators=(',', ':')) + '\n').encode()
+
+
+_single_error_bodies = {code: _serialize(create_single_error_response(code).to_response_dict())
+                        for code in _error_dict}
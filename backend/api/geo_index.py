@@ -0,0 +1,335 @@
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Tuple, List, Optional, Iterable
+import numpy as np
+import backend.data_model.db_interface as db_int
+
+'''
+In-process spatial index for "find participating orgs near me" (plan item 9).
+
+Located organizations are bucketed into a latitude/longitude grid of
+CELL_DEGREES cells.  A query only reads the cells around the point: a radius
+search reads the cells overlapping the circle's bounding box, and a k-nearest
+search reads rings of cells outward until the k-th result is provably closer
+than anything outside the rings.  Candidates are ranked by haversine distance
+computed with NumPy over each cell's coordinate arrays.
+
+A cell's arrays are rebuilt lazily after its organizations change, so updates
+are O(1).  Each worker re-reads the organizations whose LocationUpdatedAt is
+newer than its last sync every GEO_INDEX_SYNC_SECONDS, dropping those whose
+location was cleared, and reloads the whole index every
+GEO_INDEX_RELOAD_SECONDS so organizations deleted outright drop out too.
+'''
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEGREES = float(os.environ.get('VOLUNTEER_GEO_CELL_DEGREES', 0.25))
+GEO_INDEX_SYNC_SECONDS = float(os.environ.get('VOLUNTEER_GEO_INDEX_SYNC_SECONDS', 60))
+GEO_INDEX_RELOAD_SECONDS = float(os.environ.get('VOLUNTEER_GEO_INDEX_RELOAD_SECONDS', 3600))
+# Location updates are pulled with this much overlap, in case worker clocks differ.
+_SYNC_OVERLAP = timedelta(seconds=30)
+
+_index = None
+_index_lock = threading.Lock()
+
+
+class _Cell:
+    __slots__ = ('members', 'ids', 'lats', 'lons', 'types')
+
+    def __init__(self) -> None:
+        # id -> (latitude radians, longitude radians, type)
+        self.members = {}
+        self.ids = None
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        if self.ids is None:
+            count = len(self.members)
+            self.ids = np.fromiter(self.members.keys(), dtype=np.int64, count=count)
+            values = np.array(list(self.members.values()), dtype=np.float64).reshape(count, 3)
+            self.lats = values[:, 0]
+            self.lons = values[:, 1]
+            self.types = values[:, 2].astype(np.int64)
+        return self.ids, self.lats, self.lons, self.types
+
+
+class GeoIndex:
+
+    def __init__(self, cell_degrees: float = CELL_DEGREES) -> None:
+        self.cell_degrees = cell_degrees
+        self._cell_radians = math.radians(cell_degrees)
+        self._lat_cells = int(math.ceil(180 / cell_degrees))
+        self._lon_cells = int(math.ceil(360 / cell_degrees))
+        self._cells = {}
+        self._cell_of = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cell_of)
+
+    def upsert(self, organization_id: int, latitude: float, longitude: float, organization_type: int) -> None:
+        key = self._cell_key(latitude, longitude)
+        with self._lock:
+            self._remove(organization_id)
+            cell = self._cells.get(key)
+            if cell is None:
+                cell = self._cells[key] = _Cell()
+            cell.members[organization_id] = (math.radians(latitude), math.radians(longitude), organization_type)
+            cell.ids = None
+            self._cell_of[organization_id] = key
+
+    def upsert_many(self, rows: Iterable[Tuple[int, float, float, int]]) -> None:
+        """Index each row; a row without a location removes its organization."""
+        for organization_id, latitude, longitude, organization_type in rows:
+            if latitude is None or longitude is None:
+                self.remove(organization_id)
+            else:
+                self.upsert(organization_id, latitude, longitude, organization_type)
+
+    def remove(self, organization_id: int) -> None:
+        with self._lock:
+            self._remove(organization_id)
+
+    def nearest(self, latitude: float, longitude: float, limit: int, offset: int = 0,
+                organization_type: int = None) -> Tuple[List[Tuple[int, float]], bool]:
+        """The organizations ranked offset..offset+limit by distance.  Returns ([(id, km)], more after these)."""
+        wanted = offset + limit + 1
+        lat_cell, lon_cell = self._cell_key(latitude, longitude)
+        lat = math.radians(latitude)
+        lon = math.radians(longitude)
+
+        found_ids = []
+        found_distances = []
+        candidates = 0
+        ring = 0
+        while True:
+            if ring > 0 and 8 * ring >= len(self._cells):
+                # Sparse index: the remaining occupied cells are fewer than the
+                # next ring's, so rank all of them and stop.
+                rest = [key for key in list(self._cells) if self._ring_of(key, lat_cell, lon_cell) >= ring]
+                ids, distances = self._rank_cells(rest, lat, lon, organization_type)
+                found_ids.append(ids)
+                found_distances.append(distances)
+                break
+
+            ids, distances = self._rank_cells(self._ring(lat_cell, lon_cell, ring), lat, lon, organization_type)
+            if len(ids):
+                found_ids.append(ids)
+                found_distances.append(distances)
+                candidates += len(ids)
+
+            covered_km = self._covered_km(lat, lat_cell, ring)
+            if covered_km is None:
+                break
+            if candidates >= wanted:
+                # Enough candidates are inside the searched rings' guaranteed radius.
+                within = sum(int(np.count_nonzero(d <= covered_km)) for d in found_distances)
+                if within >= wanted:
+                    break
+            ring += 1
+
+        return self._page(found_ids, found_distances, offset, limit)
+
+    def within(self, latitude: float, longitude: float, radius_km: float, limit: int, offset: int = 0,
+               organization_type: int = None) -> Tuple[List[Tuple[int, float]], bool]:
+        """Organizations within radius_km, nearest first.  Returns ([(id, km)], more after these)."""
+        lat = math.radians(latitude)
+        lon = math.radians(longitude)
+        angular = radius_km / EARTH_RADIUS_KM
+
+        lat_low = int(math.floor((math.degrees(lat - angular) + 90) / self.cell_degrees))
+        lat_high = int(math.floor((math.degrees(lat + angular) + 90) / self.cell_degrees))
+        lat_low = max(0, lat_low)
+        lat_high = min(self._lat_cells - 1, lat_high)
+
+        # Longitude half-width of the circle's bounding box; every longitude near the poles.
+        if abs(lat) + angular >= math.pi / 2 or math.sin(angular) >= math.cos(lat):
+            lon_cells = range(self._lon_cells)
+        else:
+            half_width = math.asin(math.sin(angular) / math.cos(lat))
+            lon_low = int(math.floor((math.degrees(lon - half_width) + 180) / self.cell_degrees))
+            lon_high = int(math.floor((math.degrees(lon + half_width) + 180) / self.cell_degrees))
+            lon_cells = [cell % self._lon_cells for cell in range(lon_low, lon_high + 1)]
+            if len(lon_cells) >= self._lon_cells:
+                lon_cells = range(self._lon_cells)
+
+        if (lat_high - lat_low + 1) * len(lon_cells) > len(self._cells):
+            # Wide circle: cheaper to filter the occupied cells than list the box.
+            lon_wanted = set(lon_cells)
+            keys = [key for key in list(self._cells) if lat_low <= key[0] <= lat_high and key[1] in lon_wanted]
+        else:
+            keys = [(lat_cell, lon_cell) for lat_cell in range(lat_low, lat_high + 1) for lon_cell in lon_cells]
+        ids, distances = self._rank_cells(keys, lat, lon, organization_type)
+        inside = distances <= radius_km
+        return self._page([ids[inside]], [distances[inside]], offset, limit)
+
+    def _remove(self, organization_id: int) -> None:
+        key = self._cell_of.pop(organization_id, None)
+        if key is None:
+            return
+        cell = self._cells[key]
+        del cell.members[organization_id]
+        cell.ids = None
+        if not cell.members:
+            del self._cells[key]
+
+    def _cell_key(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        lat_cell = min(self._lat_cells - 1, int((latitude + 90) // self.cell_degrees))
+        lon_cell = int((longitude + 180) // self.cell_degrees) % self._lon_cells
+        return lat_cell, lon_cell
+
+    def _ring(self, lat_cell: int, lon_cell: int, ring: int) -> List[Tuple[int, int]]:
+        """Cells on the square ring at Chebyshev distance ring, clipped at the poles, wrapped in longitude."""
+        if ring == 0:
+            return [(lat_cell, lon_cell)]
+
+        keys = set()
+        lon_span = range(lon_cell - ring, lon_cell + ring + 1)
+        for lat in (lat_cell - ring, lat_cell + ring):
+            if 0 <= lat < self._lat_cells:
+                keys.update((lat, lon % self._lon_cells) for lon in lon_span)
+        if 2 * ring + 1 <= self._lon_cells:
+            for lat in range(max(0, lat_cell - ring + 1), min(self._lat_cells, lat_cell + ring)):
+                keys.add((lat, (lon_cell - ring) % self._lon_cells))
+                keys.add((lat, (lon_cell + ring) % self._lon_cells))
+        return list(keys)
+
+    def _ring_of(self, key: Tuple[int, int], lat_cell: int, lon_cell: int) -> int:
+        lon_distance = abs(key[1] - lon_cell)
+        return max(abs(key[0] - lat_cell), min(lon_distance, self._lon_cells - lon_distance))
+
+    def _covered_km(self, lat: float, lat_cell: int, ring: int) -> Optional[float]:
+        """A distance every organization outside rings 0..ring is beyond; None once the globe is covered."""
+        south_done = lat_cell - ring <= 0
+        north_done = lat_cell + ring >= self._lat_cells - 1
+        lon_done = 2 * ring + 1 >= self._lon_cells
+        if south_done and north_done and lon_done:
+            return None
+
+        reach = ring * self._cell_radians
+        bounds = []
+        if not (south_done and north_done):
+            bounds.append(EARTH_RADIUS_KM * reach)
+        if not lon_done:
+            # Distance from the point to the meridian reach radians of longitude away.
+            bounds.append(EARTH_RADIUS_KM * math.asin(min(1.0, math.cos(lat) * math.sin(min(reach, math.pi / 2)))))
+        return min(bounds)
+
+    def _rank_cells(self, keys: List[Tuple[int, int]], lat: float, lon: float,
+                    organization_type: int) -> Tuple[np.ndarray, np.ndarray]:
+        ids, lats, lons = [], [], []
+        with self._lock:
+            for key in keys:
+                cell = self._cells.get(key)
+                if cell is None:
+                    continue
+                cell_ids, cell_lats, cell_lons, cell_types = cell.arrays()
+                if organization_type is not None:
+                    matches = cell_types == organization_type
+                    cell_ids, cell_lats, cell_lons = cell_ids[matches], cell_lats[matches], cell_lons[matches]
+                ids.append(cell_ids)
+                lats.append(cell_lats)
+                lons.append(cell_lons)
+
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        ids = np.concatenate(ids)
+        return ids, haversine_km(lat, lon, np.concatenate(lats), np.concatenate(lons))
+
+    def _page(self, ids: List[np.ndarray], distances: List[np.ndarray], offset: int,
+              limit: int) -> Tuple[List[Tuple[int, float]], bool]:
+        if not ids:
+            return [], False
+        ids = np.concatenate(ids)
+        distances = np.concatenate(distances)
+        end = offset + limit
+        if len(ids) > end + 1:
+            # Only the first end + 1 need ordering.
+            nearest = np.argpartition(distances, end)[:end + 1]
+            ids, distances = ids[nearest], distances[nearest]
+        order = np.lexsort((ids, distances))
+        page = order[offset:end]
+        return [(int(ids[i]), float(distances[i])) for i in page], len(order) > end
+
+
+class SyncedGeoIndex:
+    """The process's GeoIndex, loaded from and kept in step with the Organization table."""
+
+    def __init__(self, sync_seconds: float = GEO_INDEX_SYNC_SECONDS, cell_degrees: float = CELL_DEGREES,
+                 reload_seconds: float = GEO_INDEX_RELOAD_SECONDS) -> None:
+        self.index = GeoIndex(cell_degrees)
+        self.cell_degrees = cell_degrees
+        self.sync_seconds = sync_seconds
+        self.reload_seconds = reload_seconds
+        self._synced_at = None
+        self._next_sync = 0.0
+        self._next_reload = 0.0
+        self._lock = threading.Lock()
+
+    def sync(self) -> int:
+        """Load organizations whose location changed since the last sync, or all of them when a reload is due.
+
+        Returns an error code.
+        """
+        with self._lock:
+            started_at = datetime.utcnow()
+            reload = self._synced_at is None or time.time() >= self._next_reload
+            since = None if reload else self._synced_at - _SYNC_OVERLAP
+            rows, error_code = db_int.get_organization_locations(since)
+            self._next_sync = time.time() + self.sync_seconds
+            if error_code is not None:
+                return error_code
+            if reload:
+                # Built aside and swapped in, so queries meanwhile use the old index.
+                index = GeoIndex(self.cell_degrees)
+                index.upsert_many(rows)
+                self.index = index
+                self._next_reload = time.time() + self.reload_seconds
+            else:
+                self.index.upsert_many(rows)
+            self._synced_at = started_at
+            return None
+
+    def get(self) -> Tuple[GeoIndex, int]:
+        """The index, synced first if it is due.  Returns (index, error code)."""
+        error_code = None
+        if time.time() >= self._next_sync:
+            with self._lock:
+                due = time.time() >= self._next_sync
+            if due:
+                error_code = self.sync()
+        if error_code is not None and self._synced_at is None:
+            return None, error_code
+        # A failed incremental sync still leaves a usable, slightly stale index.
+        return self.index, None
+
+    def set_location(self, organization_id: int, latitude: Optional[float], longitude: Optional[float],
+                     organization_type: int) -> int:
+        """Save an organization's location and index it here at once.  None for both clears it."""
+        error_code = db_int.set_organization_location(organization_id, latitude, longitude)
+        if error_code is None:
+            self.index.upsert_many([(organization_id, latitude, longitude, organization_type)])
+        return error_code
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distances from one point to arrays of points, all in radians."""
+    half_dlat = np.sin((lats - lat) * 0.5)
+    half_dlon = np.sin((lons - lon) * 0.5)
+    a = half_dlat * half_dlat + math.cos(lat) * np.cos(lats) * half_dlon * half_dlon
+    return (2 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def get_index() -> SyncedGeoIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SyncedGeoIndex()
+    return _index
+
+
+def set_index(index: Optional[SyncedGeoIndex]) -> None:
+    global _index
+    _index = index
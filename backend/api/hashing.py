@@ -0,0 +1,215 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Callable, Any, Iterable, Iterator
+import bcrypt
+import backend.api.metrics as metrics
+
+# Cost factor used for new hashes.  Each stored hash carries its own salt and
+# cost in the bcrypt modular crypt format ($2b$<cost>$<salt><digest>), so this
+# can be raised at any time; outdated hashes are upgraded on the next login.
+BCRYPT_ROUNDS = 12
+
+# Size of the process pool bcrypt work is handed to, and how many hashing jobs
+# may be queued or running before new requests are turned away.
+POOL_WORKERS = 4
+MAX_QUEUE_DEPTH = 64
+
+# Seconds a client is asked to wait (Retry-After) when the pool is saturated.
+RETRY_AFTER_SECONDS = 1
+
+# When False, hashing runs inline on the calling thread.
+USE_POOL = True
+
+_pool = None
+_dummy_hash = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_QUEUE_DEPTH)
+
+
+class HashingServiceBusyError(Exception):
+    """Raised when the hashing pool already has MAX_QUEUE_DEPTH jobs in flight."""
+    pass
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with a freshly generated per-user salt."""
+    return _run(_hash, password, BCRYPT_ROUNDS)
+
+
+def hash_passwords(passwords: Iterable[str]) -> Iterator[str]:
+    """Hash many passwords in the pool, yielding the hashes in order.
+
+    Bulk hashing takes no queue slots, so it never turns interactive requests
+    away; instead it keeps at most two jobs per worker in flight, so a login
+    queued behind it waits for about one hash, not the whole batch.
+    """
+    if not USE_POOL:
+        for password in passwords:
+            yield _hash(password, BCRYPT_ROUNDS)
+        return
+
+    pool = _get_pool()
+    in_flight = deque()
+    for password in passwords:
+        if len(in_flight) >= 2 * POOL_WORKERS:
+            yield in_flight.popleft().result()
+        in_flight.append(pool.submit(_hash, password, BCRYPT_ROUNDS))
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    """Check a password against a stored hash, in constant time."""
+    return _run(_verify, password, password_hash)
+
+
+def dummy_verify(password: str) -> bool:
+    """Verify against a throwaway hash of the current cost, to equalize timing for unknown users."""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = _hash('dummy password', BCRYPT_ROUNDS)
+    verify_password(password, _dummy_hash)
+    return False
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password for the ASGI app: the event loop serves other requests while the hash is computed."""
+    return await _run_async(_hash, password, BCRYPT_ROUNDS)
+
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    return await _run_async(_verify, password, password_hash)
+
+
+async def dummy_verify_async(password: str) -> bool:
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = await _run_async(_hash, 'dummy password', BCRYPT_ROUNDS)
+    await verify_password_async(password, _dummy_hash)
+    return False
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """True if the stored hash was made with a different cost than BCRYPT_ROUNDS."""
+    cost = get_cost(password_hash)
+    return cost is None or cost != BCRYPT_ROUNDS
+
+
+def get_cost(password_hash: str) -> int:
+    if isinstance(password_hash, bytes):
+        password_hash = password_hash.decode()
+    parts = password_hash.split('$')
+    if len(parts) != 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def configure(rounds: int = None, workers: int = None, max_queue_depth: int = None,
+              use_pool: bool = None) -> None:
+    """Change hashing parameters.  Shuts down any running pool so the next job starts a new one."""
+    global BCRYPT_ROUNDS, POOL_WORKERS, MAX_QUEUE_DEPTH, USE_POOL, _slots, _dummy_hash
+
+    if rounds is not None:
+        BCRYPT_ROUNDS = rounds
+        _dummy_hash = None
+    if workers is not None:
+        POOL_WORKERS = workers
+    if max_queue_depth is not None:
+        MAX_QUEUE_DEPTH = max_queue_depth
+        _slots = threading.BoundedSemaphore(MAX_QUEUE_DEPTH)
+    if use_pool is not None:
+        USE_POOL = use_pool
+
+    shutdown()
+
+
+def start() -> None:
+    """Fork the pool's workers now, before the server has connections for them to inherit.
+
+    Forked during a request instead, they hold that request's socket open
+    after the server closes it.  create_app and the ASGI lifespan call it.  A
+    gunicorn --preload worker drops the pool it inherits (reset_after_fork),
+    so call it again from gunicorn's post_fork hook there.
+    """
+    if USE_POOL:
+        _get_pool().submit(int).result()
+
+
+def reset_after_fork() -> None:
+    """Forget a pool inherited across fork: its workers and management thread belong to the parent."""
+    global _pool, _pool_lock, _slots
+    _pool = None
+    _pool_lock = threading.Lock()
+    _slots = threading.BoundedSemaphore(MAX_QUEUE_DEPTH)
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def _run(func: Callable[..., Any], *args: Any) -> Any:
+    started = time.perf_counter()
+    try:
+        return _run_in_pool(func, *args) if USE_POOL else func(*args)
+    finally:
+        metrics.add_bcrypt_time(time.perf_counter() - started)
+
+
+async def _run_async(func: Callable[..., Any], *args: Any) -> Any:
+    started = time.perf_counter()
+    try:
+        if USE_POOL:
+            return await asyncio.wrap_future(_submit(func, *args))
+        # Not inline: that would stall every request on the event loop.  bcrypt releases the GIL.
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+    finally:
+        metrics.add_bcrypt_time(time.perf_counter() - started)
+
+
+def _run_in_pool(func: Callable[..., Any], *args: Any) -> Any:
+    return _submit(func, *args).result()
+
+
+def _submit(func: Callable[..., Any], *args: Any) -> Future:
+    """Queue a job in the pool, taking a queue slot until it finishes."""
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        raise HashingServiceBusyError()
+
+    try:
+        future = _get_pool().submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+
+    future.add_done_callback(lambda f: slots.release())
+    return future
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS)
+    return _pool
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    if isinstance(password_hash, str):
+        password_hash = password_hash.encode()
+    try:
+        return bcrypt.checkpw(password.encode(), password_hash)
+    except ValueError:
+        return False
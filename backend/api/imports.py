@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+from typing import Tuple, Dict, Any, List, Iterable, Iterator, BinaryIO, Callable
+import backend.api.errors as errors
+import backend.api.hashing as hashing
+import backend.api.validation as validation
+import backend.data_model.approvals as approvals
+import backend.data_model.bulk_import as bulk_import
+
+'''
+Bulk import of users and organizations, e.g. when onboarding a school
+district.  Input is CSV with a header row, or NDJSON, read from a stream a
+chunk of bulk_import.CHUNK_SIZE rows at a time:
+
+  * every row is validated with the same schema as the single-row endpoint;
+  * duplicates within the chunk, then against the database (one IN query),
+    are dropped before any password is hashed;
+  * passwords are hashed in the hashing process pool;
+  * the chunk is written with one bulk insert and committed.
+
+Memory stays bounded by the chunk size, and each committed chunk stays
+imported if a later one fails.  Rows are numbered from 1, not counting a CSV
+header; a row that is not imported is reported with its error codes.
+'''
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+FORMATS = {'text/csv': CSV, 'application/x-ndjson': NDJSON}
+
+
+class ImportResult:
+    """How many rows were imported, and [(row number, error codes)] for each row that was not."""
+    __slots__ = ('imported', 'failed')
+
+    def __init__(self) -> None:
+        self.imported = 0
+        self.failed = []
+
+
+def read_rows(stream: BinaryIO, import_format: str) -> Iterator[Any]:
+    """Rows as dicts.  A line that isn't a JSON object is passed on as is, for validation to reject."""
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if import_format == CSV:
+        for row in csv.DictReader(text):
+            # An empty cell is a missing value.
+            yield {name: value for name, value in row.items() if value != ''}
+        return
+
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def import_users(rows: Iterable[Any]) -> Tuple[ImportResult, int]:
+    """Register users from rows shaped like a register-user request.  Returns (result, error code)."""
+    return _import(rows, validation.REGISTER_USER, 'email', errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE,
+                   _write_users)
+
+
+def import_organizations(rows: Iterable[Any]) -> Tuple[ImportResult, int]:
+    """Create organizations from rows of name, owner_email and optionally type, refresh_amount and
+    refresh_interval_in_days."""
+    return _import(rows, validation.IMPORT_ORGANIZATION, 'name',
+                   errors.ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_CODE, _write_organizations)
+
+
+def _import(rows: Iterable[Any], validate: Callable[[Any], Tuple[Dict[str, Any], List[int]]], unique: str,
+            duplicate_code: int, write: Callable[[List[Dict[str, Any]]], Tuple[List[int], int]]) \
+        -> Tuple[ImportResult, int]:
+    result = ImportResult()
+    for chunk in _chunks(enumerate(rows, 1)):
+        valid, failed, seen = [], [], set()
+        for row_number, row in chunk:
+            values, error_codes = validate(row)
+            if error_codes is not None:
+                failed.append((row_number, error_codes))
+            elif values[unique] in seen:
+                failed.append((row_number, [duplicate_code]))
+            else:
+                seen.add(values[unique])
+                valid.append((row_number, values))
+
+        if valid:
+            codes, error_code = write([values for _, values in valid])
+            if error_code is not None:
+                return result, error_code
+            for (row_number, _), code in zip(valid, codes):
+                if code is None:
+                    result.imported += 1
+                else:
+                    failed.append((row_number, [code]))
+        result.failed.extend(sorted(failed))
+    return result, None
+
+
+def _write_users(users: List[Dict[str, Any]]) -> Tuple[List[int], int]:
+    registered, error_code = bulk_import.find_registered_emails([user['email'] for user in users])
+    if error_code is not None:
+        return None, error_code
+
+    new_users = [user for user in users if user['email'] not in registered]
+    hashes = hashing.hash_passwords(user['password'] for user in new_users)
+    codes, error_code = bulk_import.insert_users([
+        {'Email': user['email'], 'PasswordHash': password_hash, 'FirstName': user['first_name'],
+         'LastName': user['last_name'], 'PhoneNumber': user['phone_number']}
+        for user, password_hash in zip(new_users, hashes)])
+    if error_code is not None:
+        return None, error_code
+
+    new_codes = iter(codes)
+    return [errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE if user['email'] in registered else next(new_codes)
+            for user in users], None
+
+
+def _write_organizations(organizations: List[Dict[str, Any]]) -> Tuple[List[int], int]:
+    return bulk_import.insert_organizations([{
+        'name': organization['name'], 'owner_email': organization['owner_email'],
+        'type': organization['type'] or approvals.DEFAULT_ORGANIZATION_TYPE,
+        'refresh_amount': organization['refresh_amount'] or approvals.DEFAULT_REFRESH_AMOUNT,
+        'refresh_interval_in_days':
+            organization['refresh_interval_in_days'] or approvals.DEFAULT_REFRESH_INTERVAL_IN_DAYS,
+    } for organization in organizations])
+
+
+def _chunks(rows: Iterable[Tuple[int, Any]]) -> Iterator[List[Tuple[int, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == bulk_import.CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
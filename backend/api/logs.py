@@ -0,0 +1,220 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import uuid
+from datetime import datetime
+from typing import Any
+from flask import Flask, g, has_request_context, request
+
+'''
+Log pipeline.  Request threads only put the LogRecord on a bounded queue; a
+QueueListener thread formats it as one JSON object per line and writes it to
+a size-rotated file.  Message arguments are interpolated on the listener
+thread, and DEBUG records are dropped by the level check before a record is
+even built unless VOLUNTEER_LOG_LEVEL=DEBUG.
+
+A process forked from the one that configured logging, e.g. a gunicorn
+--preload worker, writes to its own file, LOG_FILE with its pid added
+(logfile-1234), rotated independently.  The file is created by the first
+record, so forked processes that never log, like the hashing pool's, leave
+none behind.
+
+Repeated warnings and errors are sampled: each distinct error code (or message
+template) is written at most LOG_SAMPLE_LIMIT times per LOG_SAMPLE_WINDOW_SECONDS,
+and the next record written for it carries a "suppressed" count.
+'''
+
+LOG_FILE = os.environ.get('VOLUNTEER_LOG_FILE', 'logfile')
+LOG_LEVEL = os.environ.get('VOLUNTEER_LOG_LEVEL', 'INFO').upper()
+LOG_MAX_BYTES = int(os.environ.get('VOLUNTEER_LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get('VOLUNTEER_LOG_BACKUP_COUNT', 5))
+LOG_QUEUE_SIZE = int(os.environ.get('VOLUNTEER_LOG_QUEUE_SIZE', 10000))
+LOG_SAMPLE_LIMIT = int(os.environ.get('VOLUNTEER_LOG_SAMPLE_LIMIT', 20))
+LOG_SAMPLE_WINDOW_SECONDS = float(os.environ.get('VOLUNTEER_LOG_SAMPLE_WINDOW_SECONDS', 60))
+
+REQUEST_ID_HEADER = 'X-Request-Id'
+
+# Extra record attributes copied into the JSON line when present.
+_EXTRA_FIELDS = ('request_id', 'error_code', 'error_module', 'error_function', 'suppressed')
+
+_lock = threading.Lock()
+_queue_handler = None
+_listener = None
+# (filename, max_bytes, backup_count) of the current setup, for forked children.
+_file_settings = None
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in _EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Pass at most limit WARNING+ records per key per window; count the rest."""
+
+    MAX_KEYS = 10000
+
+    def __init__(self, limit: int = LOG_SAMPLE_LIMIT, window_seconds: float = LOG_SAMPLE_WINDOW_SECONDS) -> None:
+        super().__init__()
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.limit <= 0:
+            return True
+
+        error_code = getattr(record, 'error_code', None)
+        key = (record.name, record.levelno, error_code, record.msg if error_code is None else None)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or record.created - window[0] >= self.window_seconds:
+                if window is None and len(self._windows) >= self.MAX_KEYS:
+                    self._windows.clear()
+                # [window start, records passed, records suppressed]
+                self._windows[key] = [record.created, 1, 0]
+                if window is not None and window[2] > 0:
+                    record.suppressed = window[2]
+                return True
+            if window[1] < self.limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class RequestIdFilter(logging.Filter):
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, 'request_id', None) is None and has_request_context():
+            record.request_id = g.get('request_id')
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records unformatted and drops them, counted, when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in this process, so the record needs no pickling
+        # and getMessage() can wait for the listener thread.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(filename: str = LOG_FILE, level: str = LOG_LEVEL, max_bytes: int = LOG_MAX_BYTES,
+                      backup_count: int = LOG_BACKUP_COUNT, sample_limit: int = LOG_SAMPLE_LIMIT,
+                      sample_window_seconds: float = LOG_SAMPLE_WINDOW_SECONDS) -> None:
+    """Route the root logger through the queue.  Calling it again replaces the previous setup."""
+    global _queue_handler, _listener, _file_settings
+    with _lock:
+        _stop_listener()
+
+        _file_settings = (filename, max_bytes, backup_count)
+        file_handler = _file_handler(filename, max_bytes, backup_count)
+
+        _queue_handler = _DeferredQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(SamplingFilter(sample_limit, sample_window_seconds))
+        _queue_handler.addFilter(RequestIdFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+            handler.close()
+        root.addHandler(_queue_handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, file_handler)
+        _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Write out everything still queued.  Runs at exit."""
+    with _lock:
+        _stop_listener()
+
+
+def restart_after_fork() -> None:
+    # The listener thread does not survive fork; give the child its own queue
+    # and thread.  It also gets its own file: processes each rotating the same
+    # file would rename it from under one another and lose records.
+    global _listener
+    if _listener is None:
+        return
+    for handler in _listener.handlers:
+        handler.close()
+    filename, max_bytes, backup_count = _file_settings
+    _queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(
+        _queue_handler.queue, _file_handler(worker_log_file(filename), max_bytes, backup_count, delay=True))
+    _listener.start()
+
+
+def worker_log_file(filename: str, pid: int = None) -> str:
+    """The file a forked process logs to: filename with the pid before its extension."""
+    root, extension = os.path.splitext(filename)
+    return '%s-%d%s' % (root, os.getpid() if pid is None else pid, extension)
+
+
+def dropped_records() -> int:
+    return 0 if _queue_handler is None else _queue_handler.dropped
+
+
+def init_request_ids(app: Flask) -> None:
+    """Tag every request with an id (the caller's X-Request-Id if sent) and echo it back."""
+
+    @app.before_request
+    def assign_request_id() -> None:
+        g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+
+    @app.after_request
+    def return_request_id(response: Any) -> Any:
+        request_id = g.get('request_id')
+        if request_id is not None:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+
+
+def _file_handler(filename: str, max_bytes: int, backup_count: int, delay: bool = False) -> logging.Handler:
+    file_handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count,
+                                                        delay=delay)
+    file_handler.setFormatter(JsonFormatter())
+    return file_handler
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,331 @@
+import atexit
+import bisect
+import glob
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Tuple, Optional
+from flask import Flask, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+'''
+Request metrics, served in the Prometheus text format by /metrics.
+
+For every request the middleware records, under the route's URL rule (so
+/organizations/<int:organization_id>/stats is one series, not one per id):
+
+  * its latency, in a histogram;
+  * its response status;
+  * how many SQL statements it ran and how long they took;
+  * how long it waited on bcrypt.
+
+Each update is a few additions under one lock at the end of the request.
+Under gunicorn every worker keeps its own totals; with VOLUNTEER_METRICS_DIR
+set each worker also writes them to <dir>/metrics-<pid>.json at most every
+METRICS_FLUSH_SECONDS, and /metrics, on whichever worker answers it, sums
+every file in the directory.  Files of workers that have exited are kept, so
+counters never go backwards.
+
+With VOLUNTEER_PROFILE_SLOW_MS set, a sampling profiler thread also records
+the stack of every thread serving a request each PROFILE_INTERVAL_MS, and a
+request slower than the threshold has its samples written to PROFILE_DIR in
+the folded format flamegraph.pl and speedscope read ("a;b;c 12" per line).
+'''
+
+METRICS_ENABLED = os.environ.get('VOLUNTEER_METRICS', '1') == '1'
+METRICS_DIR = os.environ.get('VOLUNTEER_METRICS_DIR')
+METRICS_FLUSH_SECONDS = float(os.environ.get('VOLUNTEER_METRICS_FLUSH_SECONDS', 5))
+# 0 leaves the profiler off.
+PROFILE_SLOW_MS = float(os.environ.get('VOLUNTEER_PROFILE_SLOW_MS', 0))
+PROFILE_INTERVAL_MS = float(os.environ.get('VOLUNTEER_PROFILE_INTERVAL_MS', 5))
+PROFILE_DIR = os.environ.get('VOLUNTEER_PROFILE_DIR', 'profiles')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds; the upper bound of each histogram bucket, +Inf last.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = 'unmatched'
+_UNSAFE_FILE_CHARACTERS = re.compile(r'[^A-Za-z0-9_.-]+')
+
+# Index of each total in a series' list, after the histogram buckets.
+_SUM, _COUNT, _DB_QUERIES, _DB_SECONDS, _BCRYPT_CALLS, _BCRYPT_SECONDS = range(
+    len(LATENCY_BUCKETS) + 1, len(LATENCY_BUCKETS) + 7)
+_SERIES_LENGTH = len(LATENCY_BUCKETS) + 7
+
+_lock = threading.Lock()
+# (route, method) -> [bucket counts..., +Inf count, sum, count, db queries, db seconds, bcrypt calls, bcrypt seconds]
+_series = {}
+# (route, method, status) -> requests
+_statuses = Counter()
+_last_flush = 0.0
+_current = threading.local()
+_sampler = None
+# Thread id -> the Counter of folded stacks for the request it is serving.
+_profiled = {}
+
+
+class _RequestTotals:
+    __slots__ = ('start', 'db_queries', 'db_seconds', 'bcrypt_calls', 'bcrypt_seconds', 'samples')
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.bcrypt_calls = 0
+        self.bcrypt_seconds = 0.0
+        self.samples = None
+
+
+def init_metrics(app: Flask) -> None:
+    """Time every request of app, and count its SQL statements on any engine."""
+    if not METRICS_ENABLED:
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_request_metrics() -> None:
+        totals = _RequestTotals()
+        _current.totals = totals
+        if PROFILE_SLOW_MS > 0:
+            _start_sampler()
+            totals.samples = Counter()
+            _profiled[threading.get_ident()] = totals.samples
+
+    @app.after_request
+    def record_request_metrics(response: Any) -> Any:
+        _finish(response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_failed_request_metrics(error: Optional[BaseException]) -> None:
+        # Only still set if after_request never ran, i.e. the view raised.
+        if getattr(_current, 'totals', None) is not None:
+            _finish(500)
+
+
+def add_bcrypt_time(seconds: float) -> None:
+    """Charge time spent waiting on a bcrypt hash or verify to the current request."""
+    totals = getattr(_current, 'totals', None)
+    if totals is not None:
+        totals.bcrypt_calls += 1
+        totals.bcrypt_seconds += seconds
+
+
+def render() -> str:
+    """Every worker's totals in the Prometheus text format."""
+    series, statuses = _snapshot()
+    if METRICS_DIR is not None:
+        _flush(series, statuses)
+        series, statuses = _read_all()
+
+    lines = ['# HELP volunteer_request_duration_seconds Time from the start of a request to its response.',
+             '# TYPE volunteer_request_duration_seconds histogram']
+    for (route, method), values in sorted(series.items()):
+        labels = 'route="%s",method="%s"' % (_escape(route), method)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), values):
+            cumulative += count
+            lines.append('volunteer_request_duration_seconds_bucket{%s,le="%s"} %d' % (labels, bound, cumulative))
+        lines.append('volunteer_request_duration_seconds_sum{%s} %r' % (labels, values[_SUM]))
+        lines.append('volunteer_request_duration_seconds_count{%s} %d' % (labels, values[_COUNT]))
+
+    lines += ['# HELP volunteer_requests_total Requests answered, by response status.',
+              '# TYPE volunteer_requests_total counter']
+    for (route, method, status), count in sorted(statuses.items()):
+        lines.append('volunteer_requests_total{route="%s",method="%s",status="%d"} %d' % (
+            _escape(route), method, status, count))
+
+    for name, index, kind, description in (
+            ('volunteer_db_queries_total', _DB_QUERIES, '%d', 'SQL statements run while serving requests.'),
+            ('volunteer_db_query_seconds_total', _DB_SECONDS, '%r', 'Time spent in SQL statements.'),
+            ('volunteer_bcrypt_calls_total', _BCRYPT_CALLS, '%d', 'bcrypt hashes and verifies waited on.'),
+            ('volunteer_bcrypt_seconds_total', _BCRYPT_SECONDS, '%r', 'Time spent waiting on bcrypt.')):
+        lines += ['# HELP %s %s' % (name, description), '# TYPE %s counter' % name]
+        for (route, method), values in sorted(series.items()):
+            lines.append(('%s{route="%s",method="%s"} ' + kind) % (name, _escape(route), method, values[index]))
+    return '\n'.join(lines) + '\n'
+
+
+def reset() -> None:
+    """Forget this process's totals.  A forked worker starts from zero rather than from its parent's."""
+    global _last_flush
+    with _lock:
+        _series.clear()
+        _statuses.clear()
+        _last_flush = 0.0
+
+
+def reset_after_fork() -> None:
+    global _sampler
+    reset()
+    # The sampler thread did not survive the fork.
+    _sampler = None
+    _profiled.clear()
+
+
+def flush() -> None:
+    """Write this process's totals to METRICS_DIR now.  Runs at exit."""
+    if METRICS_DIR is not None:
+        _flush(*_snapshot())
+
+
+'''
+===================================================================================
+=================================RECORDING=========================================
+===================================================================================
+'''
+
+
+def _finish(status: int) -> None:
+    global _last_flush
+    totals = getattr(_current, 'totals', None)
+    if totals is None:
+        return
+    _current.totals = None
+    elapsed = time.perf_counter() - totals.start
+    # Each access through the request proxy costs a context-stack lookup; one is enough.
+    current_request = request._get_current_object()
+    rule = current_request.url_rule
+    route = rule.rule if rule is not None else UNMATCHED_ROUTE
+    key = (route, current_request.method)
+
+    with _lock:
+        values = _series.get(key)
+        if values is None:
+            values = _series[key] = [0] * _SERIES_LENGTH
+        values[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        values[_SUM] += elapsed
+        values[_COUNT] += 1
+        values[_DB_QUERIES] += totals.db_queries
+        values[_DB_SECONDS] += totals.db_seconds
+        values[_BCRYPT_CALLS] += totals.bcrypt_calls
+        values[_BCRYPT_SECONDS] += totals.bcrypt_seconds
+        _statuses[key + (status,)] += 1
+        flush_due = METRICS_DIR is not None and time.monotonic() - _last_flush >= METRICS_FLUSH_SECONDS
+        if flush_due:
+            _last_flush = time.monotonic()
+
+    if totals.samples is not None:
+        _profiled.pop(threading.get_ident(), None)
+        if elapsed * 1000 >= PROFILE_SLOW_MS and totals.samples:
+            # A copy, taken in one step, as the sampler may be adding a last sample.
+            _write_profile(route, elapsed, Counter(dict(totals.samples)))
+    if flush_due:
+        flush()
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any,
+                           executemany: bool) -> None:
+    if getattr(_current, 'totals', None) is not None:
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any,
+                          executemany: bool) -> None:
+    totals = getattr(_current, 'totals', None)
+    starts = conn.info.get('metrics_query_start')
+    if totals is not None and starts:
+        totals.db_queries += 1
+        totals.db_seconds += time.perf_counter() - starts.pop()
+
+
+'''
+===================================================================================
+===============================AGGREGATION=========================================
+===================================================================================
+'''
+
+
+def _snapshot() -> Tuple[Dict[Tuple[str, str], List[float]], Counter]:
+    with _lock:
+        return {key: list(values) for key, values in _series.items()}, Counter(_statuses)
+
+
+def _flush(series: Dict[Tuple[str, str], List[float]], statuses: Counter) -> None:
+    path = os.path.join(METRICS_DIR, 'metrics-%d.json' % os.getpid())
+    snapshot = {'series': [[route, method, values] for (route, method), values in series.items()],
+                'statuses': [[route, method, status, count] for (route, method, status), count in statuses.items()]}
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    # Written aside and renamed, so a reader never sees half a file.
+    with open(path + '.tmp', 'w') as output:
+        json.dump(snapshot, output)
+    os.replace(path + '.tmp', path)
+
+
+def _read_all() -> Tuple[Dict[Tuple[str, str], List[float]], Counter]:
+    series, statuses = {}, Counter()
+    for path in glob.glob(os.path.join(METRICS_DIR, 'metrics-*.json')):
+        try:
+            with open(path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            continue
+        for route, method, values in snapshot['series']:
+            totals = series.setdefault((route, method), [0] * _SERIES_LENGTH)
+            for i, value in enumerate(values):
+                totals[i] += value
+        for route, method, status, count in snapshot['statuses']:
+            statuses[(route, method, status)] += count
+    return series, statuses
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+'''
+===================================================================================
+=================================PROFILER==========================================
+===================================================================================
+'''
+
+
+def _start_sampler() -> None:
+    global _sampler
+    if _sampler is None:
+        with _lock:
+            if _sampler is None:
+                _sampler = threading.Thread(target=_sample_forever, name='metrics-sampler', daemon=True)
+                _sampler.start()
+
+
+def _sample_forever() -> None:
+    while True:
+        time.sleep(PROFILE_INTERVAL_MS / 1000)
+        if not _profiled:
+            continue
+        frames = sys._current_frames()
+        for thread_id, samples in list(_profiled.items()):
+            frame = frames.get(thread_id)
+            if frame is not None:
+                samples[_fold(frame)] += 1
+
+
+def _fold(frame: Any) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append('%s:%s' % (os.path.basename(code.co_filename), code.co_name))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _write_profile(route: str, elapsed: float, samples: Counter) -> None:
+    route_name = _UNSAFE_FILE_CHARACTERS.sub('_', route.strip('/')) or 'root'
+    name = '%d-%s-%s-%dms.folded' % (time.time() * 1000, request.method, route_name, elapsed * 1000)
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, name), 'w') as output:
+            for stack, count in samples.most_common():
+                output.write('%s %d\n' % (stack, count))
+    except OSError:
+        pass
+
+
+atexit.register(flush)
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Iterator, AsyncIterator, Optional
+import backend.api.errors as errors
+
+'''
+Push notifications for waiting devices, delivered as Server-Sent Events.
+
+A device showing a claim code subscribes to that code and sleeps until a
+terminal redeems it, instead of polling.  Waiting subscribers cost one small
+object and a blocked greenlet each, so run the app under an async worker
+(gunicorn -k gevent) to hold many of them per process.  Under the ASGI entry
+point (backend.api.asgi) claim code streams are AsyncSubscriptions, waiting
+on the event loop instead.
+
+The hub fans out within one process.  With several workers, set
+VOLUNTEER_NOTIFY_REDIS_URL (defaults to VOLUNTEER_CLAIM_STORE_URL) and
+publishes go through Redis pub/sub to every worker's hub.
+'''
+
+HEARTBEAT_SECONDS = 15
+# A user stream closes after one event or this long; EventSource reconnects.
+USER_STREAM_SECONDS = 300
+REDIS_URL = os.environ.get('VOLUNTEER_NOTIFY_REDIS_URL', os.environ.get('VOLUNTEER_CLAIM_STORE_URL'))
+REDIS_CHANNEL_PREFIX = 'notify:'
+
+REDEEMED_EVENT = 'redeemed'
+EXPIRED_EVENT = 'expired'
+
+_hub = None
+_hub_lock = threading.Lock()
+_redis_client = None
+
+
+class Subscription:
+    __slots__ = ('key', '_messages', '_ready')
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self._messages = deque()
+        self._ready = threading.Event()
+
+    def deliver(self, message: Dict[str, Any]) -> None:
+        self._messages.append(message)
+        self._ready.set()
+
+    def wait(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Block until a message arrives or timeout seconds pass."""
+        if not self._messages:
+            self._ready.wait(timeout)
+        if not self._messages:
+            return None
+        message = self._messages.popleft()
+        if not self._messages:
+            self._ready.clear()
+        return message
+
+
+class AsyncSubscription(Subscription):
+    """A Subscription awaited on an event loop.  deliver may still be called from any thread."""
+    __slots__ = ('_loop', '_arrived')
+
+    def __init__(self, key: str, loop: asyncio.AbstractEventLoop) -> None:
+        super().__init__(key)
+        self._loop = loop
+        self._arrived = asyncio.Event()
+
+    def deliver(self, message: Dict[str, Any]) -> None:
+        self._messages.append(message)
+        try:
+            self._loop.call_soon_threadsafe(self._arrived.set)
+        except RuntimeError:
+            # The loop has closed; nothing is waiting any more.
+            pass
+
+    async def wait_async(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Wait until a message arrives or timeout seconds pass."""
+        if not self._messages:
+            # A set left over from an already taken message only costs one early heartbeat.
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._messages.popleft() if self._messages else None
+
+
+class NotificationHub:
+
+    def __init__(self) -> None:
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, key: str) -> Subscription:
+        return self.add(Subscription(key))
+
+    def add(self, subscription: Subscription) -> Subscription:
+        key = subscription.key
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.key]
+
+    def publish(self, key: str, message: Dict[str, Any]) -> int:
+        """Deliver to every local subscriber of key.  Returns how many were woken."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
+
+    def __len__(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+def get_hub() -> NotificationHub:
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = NotificationHub()
+                if REDIS_URL is not None:
+                    _start_redis_relay(_hub, REDIS_URL)
+    return _hub
+
+
+def publish(key: str, message: Dict[str, Any]) -> None:
+    if REDIS_URL is None:
+        get_hub().publish(key, message)
+        return
+
+    try:
+        _get_redis_client().publish(REDIS_CHANNEL_PREFIX + key, json.dumps(message))
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_PUBLISH_NOTIFICATION_CODE, str(e), 'backend.api.notifications', 'publish')
+
+
+def claim_key(code: str) -> str:
+    return 'claim:' + code
+
+
+def user_key(user_id: int) -> str:
+    return 'user:' + str(user_id)
+
+
+def stream_events(subscription: Subscription, timeout: float) -> Iterator[str]:
+    """SSE body: heartbeats while waiting, then one event, then the stream ends."""
+    hub = get_hub()
+    deadline = time.time() + timeout
+    try:
+        # Sent straight away so headers reach the client through buffering proxies.
+        yield ': connected\n\n'
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                yield format_event(EXPIRED_EVENT, {})
+                return
+            message = subscription.wait(min(HEARTBEAT_SECONDS, remaining))
+            if message is not None:
+                yield format_event(message.get('event', REDEEMED_EVENT), message)
+                return
+            yield ': keep-alive\n\n'
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def stream_events_async(subscription: AsyncSubscription, timeout: float) -> AsyncIterator[str]:
+    """stream_events for an AsyncSubscription."""
+    hub = get_hub()
+    deadline = time.time() + timeout
+    try:
+        yield ': connected\n\n'
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                yield format_event(EXPIRED_EVENT, {})
+                return
+            message = await subscription.wait_async(min(HEARTBEAT_SECONDS, remaining))
+            if message is not None:
+                yield format_event(message.get('event', REDEEMED_EVENT), message)
+                return
+            yield ': keep-alive\n\n'
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def format_event(event: str, data: Dict[str, Any]) -> str:
+    return 'event: ' + event + '\ndata: ' + json.dumps(data) + '\n\n'
+
+
+def _get_redis_client() -> Any:
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+
+def _start_redis_relay(hub: NotificationHub, url: str) -> None:
+    import redis
+    pubsub = redis.Redis.from_url(url).pubsub(ignore_subscribe_messages=True)
+
+    def relay(message: Dict[str, Any]) -> None:
+        channel = message['channel']
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        hub.publish(channel[len(REDIS_CHANNEL_PREFIX):], json.loads(message['data']))
+
+    pubsub.psubscribe(**{REDIS_CHANNEL_PREFIX + '*': relay})
+    pubsub.run_in_thread(sleep_time=0.01, daemon=True)
@@ -0,0 +1,280 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Dict, Any, Callable, Optional, Tuple
+from flask import request, _app_ctx_stack
+from flask_jwt_extended import decode_token
+from flask_jwt_extended.config import config
+from flask_jwt_extended.exceptions import NoAuthorizationError, InvalidHeaderError, WrongTokenError, \
+    RevokedTokenError
+import backend.data_model.db_interface as db_int
+
+'''
+Access and refresh token checks for protected routes (see designs/jwt).
+
+access_token_required / refresh_token_required replace flask_jwt_extended's
+decorators.  Claims of recently seen tokens are kept in a bounded LRU cache,
+so a hot token's signature is verified once per TOKEN_CACHE_SECONDS instead of
+on every request.
+
+Revoked tokens are stored in the RevokedToken table with a Bloom filter of
+their jtis in front of it.  A token not in the filter is certainly not
+revoked, so the database is only read for the rare filter hits.  Each worker
+pulls newly revoked jtis into its filter every REVOCATION_SYNC_SECONDS; a
+token revoked on another worker is refused here within that interval.  Until
+a worker's first sync succeeds its filter proves nothing, and every check
+reads the database.
+'''
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+TOKEN_CACHE_SIZE = int(os.environ.get('VOLUNTEER_TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_SECONDS = float(os.environ.get('VOLUNTEER_TOKEN_CACHE_SECONDS', 60))
+REVOCATION_SYNC_SECONDS = float(os.environ.get('VOLUNTEER_REVOCATION_SYNC_SECONDS', 5))
+REVOCATION_CAPACITY = int(os.environ.get('VOLUNTEER_REVOCATION_CAPACITY', 100000))
+REVOCATION_FALSE_POSITIVE_RATE = 0.01
+# Revocations are pulled with this much overlap, in case worker clocks differ.
+_SYNC_OVERLAP = timedelta(seconds=30)
+
+_claims_cache = None
+_revocations = None
+_lock = threading.Lock()
+
+
+class BloomFilter:
+    __slots__ = ('_bits', '_size', '_hash_count')
+
+    def __init__(self, capacity: int, false_positive_rate: float) -> None:
+        capacity = max(1, capacity)
+        self._size = max(8, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self._hash_count = max(1, int(round(self._size / capacity * math.log(2))))
+        self._bits = bytearray((self._size + 7) // 8)
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def _positions(self, key: str) -> Any:
+        # Double hashing: two 64 bit halves of one digest give every position.
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self._size for i in range(self._hash_count))
+
+
+class ClaimsCache:
+    """LRU map of encoded token to its verified claims, each entry valid until a deadline."""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, ttl_seconds: float = TOKEN_CACHE_SECONDS) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, encoded_token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(encoded_token)
+            if entry is None:
+                return None
+            claims, valid_until = entry
+            if valid_until <= time.time():
+                del self._entries[encoded_token]
+                return None
+            self._entries.move_to_end(encoded_token)
+            return claims
+
+    def put(self, encoded_token: str, claims: Dict[str, Any]) -> None:
+        if self.max_size <= 0:
+            return
+        # Never past the token's own expiry.
+        valid_until = min(time.time() + self.ttl_seconds, claims.get('exp', float('inf')))
+        with self._lock:
+            self._entries[encoded_token] = (claims, valid_until)
+            self._entries.move_to_end(encoded_token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RevocationIndex:
+
+    def __init__(self, capacity: int = REVOCATION_CAPACITY, sync_seconds: float = REVOCATION_SYNC_SECONDS) -> None:
+        self.capacity = capacity
+        self.sync_seconds = sync_seconds
+        self.database_checks = 0
+        self._filter = BloomFilter(capacity, REVOCATION_FALSE_POSITIVE_RATE)
+        self._synced_at = None
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti: str) -> bool:
+        if time.time() >= self._next_sync:
+            self._sync_if_due()
+        # Fail closed while the filter has never synced: it may be missing any revoked jti.
+        if self._synced_at is not None and jti not in self._filter:
+            return False
+
+        self.database_checks += 1
+        revoked, error_code = db_int.is_token_revoked(jti)
+        # Fail closed: a token we can't check is refused.
+        return error_code is not None or revoked
+
+    def revoke(self, jti: str, expires_at: datetime) -> int:
+        error_code = db_int.save_revoked_token(jti, expires_at)
+        if error_code is None:
+            self._filter.add(jti)
+        return error_code
+
+    def sync(self, rebuild: bool = False) -> int:
+        """Add jtis revoked since the last sync, or all unexpired ones.  Returns an error code."""
+        with self._lock:
+            return self._sync(rebuild)
+
+    def _sync_if_due(self) -> None:
+        # Checked and synced under one lock, so concurrent requests start one sync between them.
+        with self._lock:
+            if time.time() < self._next_sync:
+                # Another request thread synced while this one waited.
+                return
+            self._sync(False)
+
+    def _sync(self, rebuild: bool) -> int:
+        started_at = datetime.utcnow()
+        since = None if rebuild or self._synced_at is None else self._synced_at - _SYNC_OVERLAP
+        jtis, error_code = db_int.get_revoked_token_ids(since)
+        self._next_sync = time.time() + self.sync_seconds
+        if error_code is not None:
+            return error_code
+
+        bloom = BloomFilter(self.capacity, REVOCATION_FALSE_POSITIVE_RATE) if since is None else self._filter
+        for jti in jtis:
+            bloom.add(jti)
+        self._filter = bloom
+        self._synced_at = started_at
+        return None
+
+    def purge_expired(self) -> Tuple[int, int]:
+        """Delete expired rows and rebuild the filter without them.  Returns (rows deleted, error code)."""
+        deleted, error_code = db_int.delete_expired_revoked_tokens()
+        if error_code is not None:
+            return None, error_code
+        return deleted, self.sync(rebuild=True)
+
+
+def get_claims_cache() -> ClaimsCache:
+    global _claims_cache
+    if _claims_cache is None:
+        with _lock:
+            if _claims_cache is None:
+                _claims_cache = ClaimsCache()
+    return _claims_cache
+
+
+def set_claims_cache(cache: Optional[ClaimsCache]) -> None:
+    global _claims_cache
+    _claims_cache = cache
+
+
+def get_revocations() -> RevocationIndex:
+    global _revocations
+    if _revocations is None:
+        with _lock:
+            if _revocations is None:
+                _revocations = RevocationIndex()
+    return _revocations
+
+
+def set_revocations(revocations: Optional[RevocationIndex]) -> None:
+    global _revocations
+    _revocations = revocations
+
+
+def is_revoked(claims: Dict[str, Any]) -> bool:
+    jti = claims.get('jti')
+    return jti is not None and get_revocations().is_revoked(jti)
+
+
+def revoke(claims: Dict[str, Any]) -> int:
+    return get_revocations().revoke(claims['jti'], datetime.utcfromtimestamp(claims['exp']))
+
+
+def access_token_required(fn: Callable) -> Callable:
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        verify_token_in_request(ACCESS)
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def refresh_token_required(fn: Callable) -> Callable:
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        verify_token_in_request(REFRESH)
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def verify_token_in_request(token_type: str) -> Dict[str, Any]:
+    """Check the request's bearer token and expose its claims to get_jwt_identity() / get_raw_jwt().
+
+    Raises flask_jwt_extended's exceptions, so JWTManager's error handlers answer as before.
+    """
+    claims = verify_authorization_header(request.headers.get(config.header_name), token_type)
+    _app_ctx_stack.top.jwt = claims
+    return claims
+
+
+def verify_authorization_header(auth_header: Optional[str], token_type: str) -> Dict[str, Any]:
+    """The claims of a bearer token, checked as verify_token_in_request does, for a request Flask isn't serving.
+
+    Needs an app context for the JWT settings.
+    """
+    encoded_token = _get_encoded_token(auth_header)
+    cache = get_claims_cache()
+    claims = cache.get(encoded_token)
+    if claims is None:
+        claims = decode_token(encoded_token)
+        cache.put(encoded_token, claims)
+
+    if claims.get('type') != token_type:
+        raise WrongTokenError('Only {} tokens are allowed'.format(token_type))
+    if is_revoked(claims):
+        raise RevokedTokenError('Token has been revoked')
+    return claims
+
+
+def get_identity(claims: Dict[str, Any]) -> Any:
+    """The identity in a token's claims, as get_jwt_identity() returns it."""
+    return claims.get(config.identity_claim_key)
+
+
+def _get_encoded_token(auth_header: Optional[str]) -> str:
+    if not auth_header:
+        raise NoAuthorizationError('Missing {} Header'.format(config.header_name))
+
+    parts = auth_header.split()
+    if not config.header_type and len(parts) == 1:
+        return parts[0]
+    if len(parts) != 2 or parts[0] != config.header_type:
+        raise InvalidHeaderError("Bad {} header. Expected value '{} <JWT>'".format(config.header_name,
+                                                                                   config.header_type))
+    return parts[1]
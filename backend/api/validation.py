@@ -0,0 +1,402 @@
+import math
+import re
+from typing import Tuple, Dict, Any, List, Callable, Sequence
+import backend.api.errors as errors
+import backend.api.claim_codes as claim_codes
+import backend.data_model.exports as exports
+import backend.data_model.listings as listings
+import backend.data_model.stats as stats
+from backend.data_model.db_interface import normalize_email
+
+'''
+Declarative request validation.  Each endpoint's schema is a list of Fields,
+compiled once at import into a validator that reads every field in a single
+pass, collects all of the error codes, and returns the normalized values:
+
+    values, error_codes = REGISTER_USER(request)
+
+A field's parser returns the cleaned value, or INVALID.  Parsers are plain
+functions over precompiled patterns so they can be shared between schemas.
+'''
+
+INVALID = object()
+
+MIN_PASSWORD_LENGTH = 6
+MAX_PAGE_SIZE = 100
+MAX_OFFSET = 10000
+# Half the Earth's circumference.
+MAX_RADIUS_KM = 20038
+MAX_STATS_BUCKETS = 366
+MAX_DECISION_BATCH = 10000
+MAX_CURSOR_LENGTH = 200
+MAX_HOURS = 24
+# An organization's refresh, kept within what timedelta and a 32-bit Integer column hold.
+MAX_REFRESH_INTERVAL_IN_DAYS = 3650
+MAX_REFRESH_AMOUNT = 2 ** 31 - 1
+
+_STATS_PERIODS = {'day': stats.DAY, 'week': stats.WEEK, 'month': stats.MONTH}
+_VISIBILITIES = {'public': listings.PUBLIC_VISIBILITY, 'private': listings.PRIVATE_VISIBILITY}
+
+_EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+# 608-608-6008, 16086086008, 1-608-608-6008 etc., with an optional leading 1.
+_PHONE_NUMBER_PATTERN = re.compile(r"1?-?(\d{3})-?(\d{3})-?(\d{4})")
+_URL_PATTERN = re.compile(r"(https?://)?([a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z]{2,}(:\d+)?(/\S*)?",
+                          re.IGNORECASE)
+
+
+class Field:
+    __slots__ = ('name', 'parse', 'error_code', 'required')
+
+    def __init__(self, name: str, parse: Callable[[Any], Any], error_code: int, required: bool = True) -> None:
+        self.name = name
+        self.parse = parse
+        self.error_code = error_code
+        self.required = required
+
+
+def compile_schema(fields: Sequence[Field]) -> Callable[[Dict[str, Any]], Tuple[Dict[str, Any], List[int]]]:
+    """Build a validator returning (normalized values, error codes).  Error codes are None when valid."""
+    compiled = tuple((field.name, field.parse, field.error_code, field.required) for field in fields)
+    request_invalid = [errors.REQUEST_INVALID_CODE]
+
+    def validate(request: Dict[str, Any]) -> Tuple[Dict[str, Any], List[int]]:
+        if type(request) != dict:
+            return None, list(request_invalid)
+
+        values = {}
+        error_codes = None
+        for name, parse, error_code, required in compiled:
+            value = request.get(name)
+            if value is None:
+                if not required:
+                    values[name] = None
+                    continue
+            else:
+                value = parse(value)
+                if value is not INVALID:
+                    values[name] = value
+                    continue
+
+            if error_codes is None:
+                error_codes = [error_code]
+            elif error_code not in error_codes:
+                error_codes.append(error_code)
+
+        if error_codes is not None:
+            return None, error_codes
+        return values, None
+
+    return validate
+
+
+'''
+===================================================================================
+==================================PARSERS==========================================
+===================================================================================
+'''
+
+
+def parse_email(email: Any) -> Any:
+    if type(email) != str:
+        return INVALID
+    email = normalize_email(email)
+    if _EMAIL_PATTERN.fullmatch(email) is None:
+        return INVALID
+    return email
+
+
+def parse_phone_number(phone_number: Any) -> Any:
+    """Phone numbers are stored as ten digits, without dashes or a leading 1."""
+    if type(phone_number) != str:
+        return INVALID
+    match = _PHONE_NUMBER_PATTERN.fullmatch(phone_number.strip())
+    if match is None:
+        return INVALID
+    return ''.join(match.groups())
+
+
+def parse_password(password: Any) -> Any:
+    if type(password) != str or len(password) < MIN_PASSWORD_LENGTH:
+        return INVALID
+    return password
+
+
+def parse_text(text: Any) -> Any:
+    """Any string with something other than whitespace in it, stripped."""
+    if type(text) != str:
+        return INVALID
+    text = text.strip()
+    if len(text) == 0:
+        return INVALID
+    return text
+
+
+def parse_optional_text(text: Any) -> Any:
+    """Like parse_text, but blank strings become None."""
+    if type(text) != str:
+        return INVALID
+    return text.strip() or None
+
+
+def parse_url(url: Any) -> Any:
+    if type(url) != str:
+        return INVALID
+    url = url.strip()
+    if _URL_PATTERN.fullmatch(url) is None:
+        return INVALID
+    return url
+
+
+def parse_id(value: Any) -> Any:
+    # bool is an int subclass; reject it explicitly.
+    if type(value) != int or value <= 0:
+        return INVALID
+    return value
+
+
+def parse_points(points: Any) -> Any:
+    if type(points) != int or points <= 0:
+        return INVALID
+    return points
+
+
+def parse_hours(hours: Any) -> Any:
+    if type(hours) != int or not 0 < hours <= MAX_HOURS:
+        return INVALID
+    return hours
+
+
+def parse_claim_code(code: Any) -> Any:
+    if type(code) != str or len(code) != claim_codes.CODE_DIGITS or not (code.isascii() and code.isdigit()):
+        return INVALID
+    return code
+
+
+def parse_claim_kind(kind: Any) -> Any:
+    if kind != claim_codes.ACTIVITY and kind != claim_codes.REWARD:
+        return INVALID
+    return kind
+
+
+def _number(value: Any) -> Any:
+    # Query string values arrive as text.
+    if type(value) == str:
+        try:
+            value = float(value)
+        except ValueError:
+            return INVALID
+    elif type(value) not in (int, float):
+        return INVALID
+    if not math.isfinite(value):
+        return INVALID
+    return float(value)
+
+
+def _integer(value: Any) -> Any:
+    if type(value) == str:
+        value = value.strip()
+        # isdigit alone also passes digits int() rejects, e.g. '²'.
+        if not (value.isascii() and value.isdigit()):
+            return INVALID
+        return int(value)
+    if type(value) != int:
+        return INVALID
+    return value
+
+
+def parse_latitude(latitude: Any) -> Any:
+    latitude = _number(latitude)
+    if latitude is INVALID or not -90 <= latitude <= 90:
+        return INVALID
+    return latitude
+
+
+def parse_longitude(longitude: Any) -> Any:
+    longitude = _number(longitude)
+    if longitude is INVALID or not -180 <= longitude <= 180:
+        return INVALID
+    return longitude
+
+
+def parse_radius_km(radius_km: Any) -> Any:
+    radius_km = _number(radius_km)
+    if radius_km is INVALID or not 0 < radius_km <= MAX_RADIUS_KM:
+        return INVALID
+    return radius_km
+
+
+def parse_page_size(limit: Any) -> Any:
+    limit = _integer(limit)
+    if limit is INVALID or not 0 < limit <= MAX_PAGE_SIZE:
+        return INVALID
+    return limit
+
+
+def parse_offset(offset: Any) -> Any:
+    offset = _integer(offset)
+    if offset is INVALID or offset > MAX_OFFSET:
+        return INVALID
+    return offset
+
+
+def parse_query_id(value: Any) -> Any:
+    """An id, also accepted as the text of a query string value."""
+    return parse_id(_integer(value))
+
+
+def parse_whole_number(value: Any) -> Any:
+    """A positive integer, also accepted as text."""
+    value = _integer(value)
+    if value is INVALID or value <= 0:
+        return INVALID
+    return value
+
+
+def parse_refresh_amount(value: Any) -> Any:
+    """A positive point amount, at most MAX_REFRESH_AMOUNT, also accepted as text."""
+    value = parse_whole_number(value)
+    if value is INVALID or value > MAX_REFRESH_AMOUNT:
+        return INVALID
+    return value
+
+
+def parse_refresh_interval(value: Any) -> Any:
+    """A positive number of days, at most MAX_REFRESH_INTERVAL_IN_DAYS, also accepted as text."""
+    value = parse_whole_number(value)
+    if value is INVALID or value > MAX_REFRESH_INTERVAL_IN_DAYS:
+        return INVALID
+    return value
+
+
+def parse_stats_period(period: Any) -> Any:
+    return _STATS_PERIODS.get(period, INVALID) if type(period) == str else INVALID
+
+
+def parse_bucket_count(buckets: Any) -> Any:
+    buckets = _integer(buckets)
+    if buckets is INVALID or not 0 < buckets <= MAX_STATS_BUCKETS:
+        return INVALID
+    return buckets
+
+
+def parse_cursor(cursor: Any) -> Any:
+    """A page cursor is only checked for shape here; listings decodes it."""
+    if type(cursor) != str or not 0 < len(cursor) <= MAX_CURSOR_LENGTH:
+        return INVALID
+    return cursor
+
+
+def parse_visibility(visibility: Any) -> Any:
+    return _VISIBILITIES.get(visibility, INVALID) if type(visibility) == str else INVALID
+
+
+def parse_export_format(export_format: Any) -> Any:
+    return export_format if export_format in exports.MIMETYPES else INVALID
+
+
+def parse_id_list(ids: Any) -> Any:
+    """A list of distinct ids, at most MAX_DECISION_BATCH long."""
+    if type(ids) != list or len(ids) > MAX_DECISION_BATCH:
+        return INVALID
+    for value in ids:
+        if parse_id(value) is INVALID:
+            return INVALID
+    if len(set(ids)) != len(ids):
+        return INVALID
+    return ids
+
+
+'''
+===================================================================================
+==================================SCHEMAS==========================================
+===================================================================================
+'''
+
+
+LOGIN_USER = compile_schema([
+    Field('email', parse_email, errors.EMAIL_INVALID_CODE),
+    Field('password', parse_password, errors.PASSWORD_INVALID_CODE),
+])
+
+REGISTER_USER = compile_schema([
+    Field('email', parse_email, errors.EMAIL_INVALID_CODE),
+    Field('password', parse_password, errors.PASSWORD_INVALID_CODE),
+    Field('first_name', parse_optional_text, errors.NAME_INVALID_CODE, required=False),
+    Field('last_name', parse_text, errors.NAME_INVALID_CODE),
+    Field('phone_number', parse_phone_number, errors.PHONE_NUMBER_INVALID_CODE),
+])
+
+ORGANIZATION_REQUEST = compile_schema([
+    Field('organization_name', parse_text, errors.NAME_INVALID_CODE),
+    Field('message', parse_optional_text, errors.REQUEST_INVALID_CODE, required=False),
+    Field('explicit_phone_number', parse_phone_number, errors.PHONE_NUMBER_INVALID_CODE),
+    Field('email', parse_email, errors.EMAIL_INVALID_CODE),
+    Field('organization_url', parse_url, errors.URL_INVALID_CODE),
+])
+
+ISSUE_CLAIM_CODE = compile_schema([
+    Field('kind', parse_claim_kind, errors.REQUEST_INVALID_CODE),
+])
+
+REDEEM_CLAIM_CODE = compile_schema([
+    Field('code', parse_claim_code, errors.CLAIM_CODE_INVALID_CODE),
+    Field('organization_id', parse_id, errors.REQUEST_INVALID_CODE),
+    Field('item_id', parse_id, errors.REQUEST_INVALID_CODE),
+    Field('hours', parse_hours, errors.REQUEST_INVALID_CODE, required=False),
+])
+
+NEARBY_ORGANIZATIONS = compile_schema([
+    Field('latitude', parse_latitude, errors.LOCATION_INVALID_CODE),
+    Field('longitude', parse_longitude, errors.LOCATION_INVALID_CODE),
+    Field('radius_km', parse_radius_km, errors.REQUEST_INVALID_CODE, required=False),
+    Field('type', parse_query_id, errors.REQUEST_INVALID_CODE, required=False),
+    Field('limit', parse_page_size, errors.REQUEST_INVALID_CODE, required=False),
+    Field('offset', parse_offset, errors.REQUEST_INVALID_CODE, required=False),
+])
+
+ORGANIZATION_LOCATION = compile_schema([
+    Field('latitude', parse_latitude, errors.LOCATION_INVALID_CODE, required=False),
+    Field('longitude', parse_longitude, errors.LOCATION_INVALID_CODE, required=False),
+])
+
+STATS = compile_schema([
+    Field('period', parse_stats_period, errors.REQUEST_INVALID_CODE, required=False),
+    Field('buckets', parse_bucket_count, errors.REQUEST_INVALID_CODE, required=False),
+])
+
+LEADERBOARD = compile_schema([
+    Field('organization_id', parse_query_id, errors.REQUEST_INVALID_CODE, required=False),
+    Field('limit', parse_page_size, errors.REQUEST_INVALID_CODE, required=False),
+    Field('offset', parse_offset, errors.REQUEST_INVALID_CODE, required=False),
+])
+
+ORGANIZATION_REQUEST_DECISIONS = compile_schema([
+    Field('approve', parse_id_list, errors.REQUEST_INVALID_CODE, required=False),
+    Field('reject', parse_id_list, errors.REQUEST_INVALID_CODE, required=False),
+    Field('organization_type', parse_id, errors.REQUEST_INVALID_CODE, required=False),
+    Field('refresh_amount', parse_refresh_amount, errors.POINTS_INVALID_CODE, required=False),
+    Field('refresh_interval_in_days', parse_refresh_interval, errors.REQUEST_INVALID_CODE, required=False),
+])
+
+PAGE = compile_schema([
+    Field('limit', parse_page_size, errors.REQUEST_INVALID_CODE, required=False),
+    Field('cursor', parse_cursor, errors.CURSOR_INVALID_CODE, required=False),
+])
+
+ORGANIZATION_CATALOG_PAGE = compile_schema([
+    Field('visibility', parse_visibility, errors.REQUEST_INVALID_CODE, required=False),
+    Field('limit', parse_page_size, errors.REQUEST_INVALID_CODE, required=False),
+    Field('cursor', parse_cursor, errors.CURSOR_INVALID_CODE, required=False),
+])
+
+EXPORT = compile_schema([
+    Field('format', parse_export_format, errors.REQUEST_INVALID_CODE, required=False),
+])
+
+IMPORT_ORGANIZATION = compile_schema([
+    Field('name', parse_text, errors.NAME_INVALID_CODE),
+    Field('owner_email', parse_email, errors.EMAIL_INVALID_CODE),
+    Field('type', parse_query_id, errors.REQUEST_INVALID_CODE, required=False),
+    Field('refresh_amount', parse_refresh_amount, errors.POINTS_INVALID_CODE, required=False),
+    Field('refresh_interval_in_days', parse_refresh_interval, errors.REQUEST_INVALID_CODE, required=False),
+])
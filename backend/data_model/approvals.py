@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+from typing import Tuple, Dict, List, Any, Iterable
+from sqlalchemy import select, literal, and_, exists, DateTime, Integer, Boolean
+import backend.api.errors as errors
+from backend.data_model.db_interface import session_scope, Session, get_organization_type_ids
+from backend.data_model.data_model import (Organization, OrganizationRegistrationRequest,
+                                           OrganizationRegistrationDecision)
+
+'''
+Approve-orgs workflow (plan item 8).  An administrator approves or rejects a
+batch of OrganizationRegistrationRequests in one database transaction:
+
+  * approved requests become Organizations through one INSERT ... SELECT per
+    chunk, with their point budget, LastRefreshInstant and NextRefreshAt set
+    in the same statement;
+  * every decided request is copied to OrganizationRegistrationDecision with
+    INSERT ... SELECT and deleted, so the pending table only holds open requests.
+
+Requests whose name an Organization already has are left pending and
+reported as NAME_TAKEN.  The batch's requests are locked FOR UPDATE
+(PostgreSQL), so two administrators deciding the same request can't both do it.
+'''
+
+APPROVED = 'approved'
+REJECTED = 'rejected'
+NOT_FOUND = 'not_found'
+NAME_TAKEN = 'name_taken'
+
+DEFAULT_ORGANIZATION_TYPE = 1
+DEFAULT_REFRESH_AMOUNT = 1000
+DEFAULT_REFRESH_INTERVAL_IN_DAYS = 30
+# Ids per IN list, well under SQLite's bound parameter limit.
+CHUNK_SIZE = 500
+
+_Request = OrganizationRegistrationRequest
+
+
+def decide_org_requests(approve_ids: List[int], reject_ids: List[int], decided_by: int = None,
+                        organization_type: int = DEFAULT_ORGANIZATION_TYPE,
+                        refresh_amount: int = DEFAULT_REFRESH_AMOUNT,
+                        refresh_interval_in_days: int = DEFAULT_REFRESH_INTERVAL_IN_DAYS,
+                        now: datetime = None) -> Tuple[Dict[int, Tuple[str, int]], int]:
+    """Approve and reject requests together.  Returns ({request id: (status, organization id)}, error code).
+
+    The organization id is only set for APPROVED.  Nothing is changed if an error code is returned, which is
+    ORGANIZATION_TYPE_INVALID if requests are approved as a type that doesn't exist.
+    """
+    now = now or datetime.utcnow()
+    try:
+        with session_scope() as session:
+            if approve_ids and organization_type not in get_organization_type_ids(session):
+                return None, errors.ORGANIZATION_TYPE_INVALID_CODE
+            return _decide(approve_ids, reject_ids, decided_by, organization_type, refresh_amount,
+                           refresh_interval_in_days, now, session), None
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_DECIDE_ORG_REQUESTS_CODE, str(e), 'backend.data_model.approvals',
+                         'decide_org_requests')
+        return None, errors.FAILED_TO_DECIDE_ORG_REQUESTS_CODE
+
+
+def _decide(approve_ids: List[int], reject_ids: List[int], decided_by: int, organization_type: int,
+            refresh_amount: int, refresh_interval_in_days: int, now: datetime,
+            session: Session) -> Dict[int, Tuple[str, int]]:
+    results = {request_id: (NOT_FOUND, None) for request_id in list(approve_ids) + list(reject_ids)}
+
+    pending = {}
+    for chunk in _chunks(list(results)):
+        pending.update(session.query(_Request.Id, _Request.OrganizationName)
+                       .filter(_Request.Id.in_(chunk))
+                       .with_for_update())
+
+    taken = set()
+    approve_names = [pending[request_id] for request_id in approve_ids if request_id in pending]
+    for chunk in _chunks(approve_names):
+        taken.update(name for name, in session.query(Organization.Name).filter(Organization.Name.in_(chunk)))
+
+    approved = [request_id for request_id in approve_ids if request_id in pending and pending[request_id] not in taken]
+    rejected = [request_id for request_id in reject_ids if request_id in pending]
+    for request_id in approve_ids:
+        if request_id in pending and pending[request_id] in taken:
+            results[request_id] = (NAME_TAKEN, None)
+
+    next_refresh_at = now + timedelta(days=refresh_interval_in_days)
+    for chunk in _chunks(approved):
+        session.execute(_create_organizations(chunk, organization_type, refresh_amount, refresh_interval_in_days,
+                                              now, next_refresh_at))
+        session.execute(_archive(chunk, True, decided_by, now))
+    for chunk in _chunks(rejected):
+        session.execute(_archive(chunk, False, decided_by, now))
+    for chunk in _chunks(approved + rejected):
+        session.query(_Request).filter(_Request.Id.in_(chunk)).delete(synchronize_session=False)
+
+    organization_ids = {}
+    for chunk in _chunks([pending[request_id] for request_id in approved]):
+        organization_ids.update(session.query(Organization.Name, Organization.Id).filter(Organization.Name.in_(chunk)))
+    for request_id in approved:
+        results[request_id] = (APPROVED, organization_ids[pending[request_id]])
+    for request_id in rejected:
+        results[request_id] = (REJECTED, None)
+    return results
+
+
+def _create_organizations(request_ids: List[int], organization_type: int, refresh_amount: int,
+                          refresh_interval_in_days: int, now: datetime, next_refresh_at: datetime) -> Any:
+    # The budget starts full, as if the organization had just been refreshed.
+    rows = select([_Request.OrganizationName, _Request.SubmittingUserId, literal(organization_type, Integer),
+                   literal(refresh_amount, Integer), literal(refresh_amount, Integer), literal(now, DateTime),
+                   literal(refresh_interval_in_days, Integer), literal(refresh_amount, Integer),
+                   literal(next_refresh_at, DateTime)]) \
+        .where(and_(_Request.Id.in_(request_ids),
+                    ~exists().where(Organization.Name == _Request.OrganizationName)))
+    return Organization.__table__.insert().from_select(
+        ['Name', 'OwnerId', 'Type', 'PointsToDistribute', 'PointsToConsume', 'LastRefreshInstant',
+         'RefreshIntervalInDays', 'RefreshAmount', 'NextRefreshAt'], rows)
+
+
+def _archive(request_ids: List[int], approved: bool, decided_by: int, now: datetime) -> Any:
+    if approved:
+        organization_id = select([Organization.Id]).where(Organization.Name == _Request.OrganizationName) \
+            .as_scalar()
+    else:
+        organization_id = literal(None, Integer)
+    rows = select([_Request.Id, _Request.SubmittingUserId, _Request.OrganizationName, _Request.Message,
+                   _Request.ContactPhoneNumber, _Request.ContactEmail, _Request.OrganizationURL,
+                   literal(approved, Boolean), organization_id, literal(decided_by, Integer),
+                   literal(now, DateTime)]) \
+        .where(_Request.Id.in_(request_ids))
+    return OrganizationRegistrationDecision.__table__.insert().from_select(
+        ['RequestId', 'SubmittingUserId', 'OrganizationName', 'Message', 'ContactPhoneNumber', 'ContactEmail',
+         'OrganizationURL', 'Approved', 'OrganizationId', 'DecidedBy', 'DecidedAt'], rows)
+
+
+def _chunks(items: List[Any]) -> Iterable[List[Any]]:
+    for start in range(0, len(items), CHUNK_SIZE):
+        yield items[start:start + CHUNK_SIZE]
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from typing import Tuple, Dict, List, Any, Iterable, Set, Callable
+from sqlalchemy.exc import IntegrityError
+import backend.api.errors as errors
+from backend.data_model.db_interface import session_scope, Session, get_organization_type_ids
+from backend.data_model.data_model import User, Organization
+
+'''
+Set-based writes for bulk imports.  Callers hand over one chunk of already
+validated rows at a time; each chunk costs one IN query per lookup and one
+bulk_insert_mappings, in a single transaction, and every row gets back either
+None (inserted) or the error code saying why it was not.
+
+A row that loses a race with a concurrent registration makes the insert fail
+on the unique index; the chunk is then looked up again and retried once.
+'''
+
+# Rows per chunk, and so values per IN list, well under SQLite's bound parameter limit.
+CHUNK_SIZE = 500
+
+
+def find_registered_emails(emails: List[str]) -> Tuple[Set[str], int]:
+    """The emails among these that already belong to a user, so their passwords needn't be hashed."""
+    try:
+        with session_scope() as session:
+            return _registered_emails(emails, session), None
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_USER_CODE, str(e), 'backend.data_model.bulk_import',
+                         'find_registered_emails')
+        return None, errors.FAILED_TO_QUERY_FOR_USER_CODE
+
+
+def insert_users(users: List[Dict[str, Any]]) -> Tuple[List[int], int]:
+    """Insert users given as User column mappings.  Returns (an error code or None per user, error code)."""
+    return _write_retrying_once(lambda session: _insert_users(users, session), 'insert_users')
+
+
+def insert_organizations(organizations: List[Dict[str, Any]], now: datetime = None) -> Tuple[List[int], int]:
+    """Insert organizations given as name, owner_email, type, refresh_amount and refresh_interval_in_days.
+
+    Returns (an error code or None per organization, error code).  Each starts with a full point budget
+    and its first refresh scheduled, as an approved request would.
+    """
+    now = now or datetime.utcnow()
+    return _write_retrying_once(lambda session: _insert_organizations(organizations, now, session),
+                                'insert_organizations')
+
+
+def _write_retrying_once(write: Callable[[Session], List[int]], function_name: str) -> Tuple[List[int], int]:
+    try:
+        try:
+            with session_scope() as session:
+                return write(session), None
+        except IntegrityError:
+            # Lost a race with a concurrent insert, which the lookups now see.
+            with session_scope() as session:
+                return write(session), None
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_IMPORT_CODE, str(e), 'backend.data_model.bulk_import', function_name)
+        return None, errors.FAILED_TO_IMPORT_CODE
+
+
+def _insert_users(users: List[Dict[str, Any]], session: Session) -> List[int]:
+    registered = _registered_emails([user['Email'] for user in users], session)
+    session.bulk_insert_mappings(User, [user for user in users if user['Email'] not in registered])
+    return [errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE if user['Email'] in registered else None for user in users]
+
+
+def _insert_organizations(organizations: List[Dict[str, Any]], now: datetime, session: Session) -> List[int]:
+    owner_emails = set(organization['owner_email'] for organization in organizations)
+    owners = dict(session.query(User.Email, User.Id).filter(User.Email.in_(owner_emails)))
+    taken = set(name for name, in session.query(Organization.Name)
+                .filter(Organization.Name.in_(set(organization['name'] for organization in organizations))))
+
+    types = get_organization_type_ids(session)
+
+    results, mappings = [], []
+    for organization in organizations:
+        owner_id = owners.get(organization['owner_email'])
+        if owner_id is None:
+            results.append(errors.OWNER_NOT_FOUND_CODE)
+        elif organization['type'] not in types:
+            results.append(errors.ORGANIZATION_TYPE_INVALID_CODE)
+        elif organization['name'] in taken:
+            results.append(errors.ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_CODE)
+        else:
+            results.append(None)
+            mappings.append({
+                'Name': organization['name'], 'OwnerId': owner_id, 'Type': organization['type'],
+                'PointsToDistribute': organization['refresh_amount'],
+                'PointsToConsume': organization['refresh_amount'], 'LastRefreshInstant': now,
+                'RefreshIntervalInDays': organization['refresh_interval_in_days'],
+                'RefreshAmount': organization['refresh_amount'],
+                'NextRefreshAt': now + timedelta(days=organization['refresh_interval_in_days'])})
+    session.bulk_insert_mappings(Organization, mappings)
+    return results
+
+
+def _registered_emails(emails: Iterable[str], session: Session) -> Set[str]:
+    return set(email for email, in session.query(User.Email).filter(User.Email.in_(set(emails))))
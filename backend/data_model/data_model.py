@@ -0,0 +1,315 @@
+from typing import Optional, List, Any
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Float, Index
+from sqlalchemy.orm import sessionmaker
+import sqlalchemy_utils
+import backend.data_model.db_config as db_config
+
+
+PRODUCTION_NAME = "volunteer"
+
+
+class Database:
+
+    Engine = None
+    Base = declarative_base()
+    Session = None
+
+    @staticmethod
+    def init_engine(name: Optional[str]=None) -> None:
+        """Build this process's engine and session factory.  Does not touch the schema."""
+        db_url = db_config.get_database_url(name, PRODUCTION_NAME)
+        Database.Engine = Database.create_engine(db_url)
+        Database.Session = sessionmaker(bind=Database.Engine)
+
+    @staticmethod
+    def create_database(name: Optional[str]=None) -> None:
+        """Create the database and schema if needed, seeding type tables on first creation."""
+        db_url = db_config.get_database_url(name, PRODUCTION_NAME)
+        db_exists = sqlalchemy_utils.database_exists(db_url)
+
+        if not db_exists and not db_config.is_sqlite(db_url):
+            sqlalchemy_utils.create_database(db_url)
+
+        if Database.Engine is None or str(Database.Engine.url) != db_url:
+            Database.init_engine(name)
+        Database.Base.metadata.create_all(Database.Engine)
+
+        if not db_exists:
+            Database._initialize_org_types()
+
+    @staticmethod
+    def reset_pool_after_fork() -> None:
+        """Give a forked child its own connection pool.
+
+        The inherited connections are dropped without being closed; closing
+        them here would also close the parent's sockets.
+        """
+        if Database.Engine is not None:
+            Database.Engine.pool = Database.Engine.pool.recreate()
+
+    @staticmethod
+    def create_engine(db_url: str) -> Any:
+        engine = create_engine(db_url, **db_config.get_engine_kwargs(db_url))
+        if db_config.is_sqlite(db_url):
+            event.listen(engine, 'connect', Database._set_sqlite_pragmas)
+        return engine
+
+    @staticmethod
+    def _set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma, value in db_config.get_sqlite_pragmas().items():
+            cursor.execute('PRAGMA %s=%s' % (pragma, value))
+        cursor.close()
+
+    @staticmethod
+    def _initialize_types() -> None:
+        Database._initialize_org_types()
+        Database._initialize_visibility_types()
+
+    @staticmethod
+    def _initialize_org_types() -> None:
+        org_types = []
+        org_types.append(OrganizationType(Id=1, Name="Contributing"))
+        org_types.append(OrganizationType(Id=2, Name="Consuming"))
+        org_types.append(OrganizationType(Id=3, Name="Hybrid"))
+        Database._add_all_types(org_types)
+
+    @staticmethod
+    def _initialize_visibility_types() -> None:
+        visibility_types = []
+        visibility_types.append(Visibility(Id=1, Name="Public"))
+        visibility_types.append(Visibility(Id=2, Name="Private"))
+        Database._add_all_types(visibility_types)
+
+    @staticmethod
+    def _add_all_types(types: List[Any]) -> None:
+        try:
+            session = Database.Session()
+            session.add_all(types)
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    @staticmethod
+    def drop_all_test_database(name: Optional[str]=None) -> None:
+        if name == PRODUCTION_NAME:
+            raise ValueError("Can't drop production database.")
+        # drop_all orders the drops by foreign key, which PostgreSQL enforces.
+        Database.Base.metadata.drop_all(Database.Engine)
+
+    @staticmethod
+    def _get_orm_classes() -> List[type]:
+        raise NotImplementedError()
+
+
+class User(Database.Base):
+    __tablename__ = "User"
+
+    Id = Column(Integer, primary_key=True)
+    Email = Column(String, nullable=False, index=True, unique=True)
+    PasswordHash = Column(String, nullable=False)
+    FirstName = Column(String, nullable=True)
+    LastName = Column(String, nullable=False)
+    PhoneNumber = Column(String, nullable=False)
+
+
+def next_refresh_at(last_refresh_instant: datetime, refresh_interval_in_days: int) -> datetime:
+    return last_refresh_instant + timedelta(days=refresh_interval_in_days)
+
+
+def _default_next_refresh_at(context: Any) -> datetime:
+    parameters = context.get_current_parameters()
+    return next_refresh_at(parameters['LastRefreshInstant'], parameters['RefreshIntervalInDays'])
+
+
+class Organization(Database.Base):
+    __tablename__ = "Organization"
+
+    Id = Column(Integer, primary_key=True)
+    Name = Column(String, nullable=False, unique=True)
+    OwnerId = Column(Integer, ForeignKey('User.Id'), nullable=False)
+    Type = Column(Integer, ForeignKey('OrganizationType.Id'), nullable=False)
+    PointsToDistribute = Column(Integer, nullable=False)
+    PointsToConsume = Column(Integer, nullable=False)
+    LastRefreshInstant = Column(DateTime, nullable=False)
+    RefreshIntervalInDays = Column(Integer, nullable=False)
+    RefreshAmount = Column(Integer, nullable=False)
+    # LastRefreshInstant + RefreshIntervalInDays, indexed so the refresh
+    # scheduler only reads the organizations that are due.
+    NextRefreshAt = Column(DateTime, nullable=False, index=True, default=_default_next_refresh_at)
+    # Degrees; null until the organization sets its location.  Nearby
+    # searches use backend.api.geo_index, which re-reads rows whose
+    # LocationUpdatedAt is newer than its last sync.
+    Latitude = Column(Float, nullable=True)
+    Longitude = Column(Float, nullable=True)
+    LocationUpdatedAt = Column(DateTime, nullable=True, index=True)
+
+
+class OrganizationType(Database.Base):
+    __tablename__ = "OrganizationType"
+
+    Id = Column(Integer, primary_key=True)
+    Name = Column(String, nullable=False)
+
+
+class RewardTransaction(Database.Base):
+    __tablename__ = "RewardTransaction"
+    # A user's history, newest first, is read a page at a time along this index.
+    __table_args__ = (Index('ix_RewardTransaction_UserId_Instant_Id', 'UserId', 'Instant', 'Id'),)
+
+    Id = Column(Integer, primary_key=True)
+    UserId = Column(Integer, ForeignKey('User.Id'), nullable=False)
+    Points = Column(Integer, nullable=False)
+    OrganizationId = Column(Integer, ForeignKey('Organization.Id'), nullable=False, index=True)
+    Instant = Column(DateTime, nullable=False)
+    Reward = Column(Integer, ForeignKey('Reward.Id'), nullable=False)
+
+
+class ActivityTransaction(Database.Base):
+    __tablename__ = "ActivityTransaction"
+    # A user's history, newest first, is read a page at a time along this index.
+    __table_args__ = (Index('ix_ActivityTransaction_UserId_Instant_Id', 'UserId', 'Instant', 'Id'),)
+
+    Id = Column(Integer, primary_key=True)
+    UserId = Column(Integer, ForeignKey('User.Id'), nullable=False)
+    Points = Column(Integer, nullable=False)
+    OrganizationId = Column(Integer, ForeignKey('Organization.Id'), nullable=False, index=True)
+    Instant = Column(DateTime, nullable=False)
+    Activity = Column(Integer, ForeignKey('Activity.Id'), nullable=True)
+
+
+class UserBalance(Database.Base):
+    """Materialized sum of a user's ActivityTransaction minus RewardTransaction points."""
+    __tablename__ = "UserBalance"
+
+    UserId = Column(Integer, ForeignKey('User.Id'), primary_key=True)
+    Points = Column(Integer, nullable=False)
+
+
+class OrganizationBalance(Database.Base):
+    """Materialized totals of the points an organization has awarded and redeemed."""
+    __tablename__ = "OrganizationBalance"
+
+    OrganizationId = Column(Integer, ForeignKey('Organization.Id'), primary_key=True)
+    PointsDistributed = Column(Integer, nullable=False)
+    PointsConsumed = Column(Integer, nullable=False)
+
+
+class UserStats(Database.Base):
+    """A user's ledger totals for one day, week or month, kept current by backend.data_model.stats."""
+    __tablename__ = "UserStats"
+
+    UserId = Column(Integer, ForeignKey('User.Id'), primary_key=True)
+    Period = Column(Integer, primary_key=True)
+    BucketStart = Column(DateTime, primary_key=True)
+    PointsEarned = Column(Integer, nullable=False)
+    PointsSpent = Column(Integer, nullable=False)
+    Activities = Column(Integer, nullable=False)
+    Rewards = Column(Integer, nullable=False)
+
+
+class OrganizationStats(Database.Base):
+    """An organization's ledger totals for one day, week or month, kept current by backend.data_model.stats."""
+    __tablename__ = "OrganizationStats"
+
+    OrganizationId = Column(Integer, ForeignKey('Organization.Id'), primary_key=True)
+    Period = Column(Integer, primary_key=True)
+    BucketStart = Column(DateTime, primary_key=True)
+    PointsDistributed = Column(Integer, nullable=False)
+    PointsConsumed = Column(Integer, nullable=False)
+    Activities = Column(Integer, nullable=False)
+    Rewards = Column(Integer, nullable=False)
+
+
+class RefreshEvent(Database.Base):
+    __tablename__ = "RefreshEvent"
+
+    Id = Column(Integer, primary_key=True)
+    Points = Column(Integer, nullable=False)
+    Type = Column(Integer, nullable=False)
+    OrganizationId = Column(Integer, ForeignKey('Organization.Id'), nullable=False)
+    Instant = Column(DateTime, nullable=False)
+
+
+class Activity(Database.Base):
+    __tablename__ = "Activity"
+    # An organization's catalog is read a page at a time along this index.
+    __table_args__ = (Index('ix_Activity_AssociatedOrganization_Visibility_Id', 'AssociatedOrganization', 'Visibility',
+                            'Id'),)
+
+    Id = Column(Integer, primary_key=True)
+    PointsPerHour = Column(Integer, nullable=False)
+    PointsPerCompletion = Column(Integer, nullable=False)
+    OneTime = Column(Boolean, nullable=False)
+    Visibility = Column(Integer, ForeignKey('Visibility.Id'), nullable=False)
+    AssociatedOrganization = Column(Integer, ForeignKey('Organization.Id'), nullable=True)
+    Description = Column(String, nullable=False)
+
+
+class Reward(Database.Base):
+    __tablename__ = "Reward"
+    # An organization's catalog is read a page at a time along this index.
+    __table_args__ = (Index('ix_Reward_AssociatedOrganization_Visibility_Id', 'AssociatedOrganization', 'Visibility',
+                            'Id'),)
+
+    Id = Column(Integer, primary_key=True)
+    OneTime = Column(Boolean, nullable=False)
+    PointsPerReward = Column(Integer, nullable=False)
+    Visibility = Column(Integer, ForeignKey('Visibility.Id'), nullable=False)
+    AssociatedOrganization = Column(Integer, ForeignKey('Organization.Id'), nullable=True)
+    Description = Column(String, nullable=False)
+
+
+class OrganizationRegistrationRequest(Database.Base):
+    __tablename__ = "OrganizationRegistrationRequest"
+    # Decided requests are deleted; without AUTOINCREMENT SQLite would hand their Ids, already
+    # OrganizationRegistrationDecision.RequestId, to new requests.
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    Id = Column(Integer, primary_key=True)
+    SubmittingUserId = Column(Integer, ForeignKey('User.Id'), nullable=False, index=True)
+    OrganizationName = Column(String, nullable=False, index=True, unique=True)
+    Message = Column(String, nullable=False)
+    ContactPhoneNumber = Column(String, nullable=False)
+    ContactEmail = Column(String, nullable=False)
+    OrganizationURL = Column(String, nullable=False)
+
+
+class OrganizationRegistrationDecision(Database.Base):
+    """An approved or rejected OrganizationRegistrationRequest, moved here when the decision is made."""
+    __tablename__ = "OrganizationRegistrationDecision"
+
+    RequestId = Column(Integer, primary_key=True)
+    SubmittingUserId = Column(Integer, ForeignKey('User.Id'), nullable=False, index=True)
+    OrganizationName = Column(String, nullable=False)
+    Message = Column(String, nullable=False)
+    ContactPhoneNumber = Column(String, nullable=False)
+    ContactEmail = Column(String, nullable=False)
+    OrganizationURL = Column(String, nullable=False)
+    Approved = Column(Boolean, nullable=False)
+    # The organization created on approval.
+    OrganizationId = Column(Integer, ForeignKey('Organization.Id'), nullable=True)
+    DecidedBy = Column(Integer, ForeignKey('User.Id'), nullable=True)
+    DecidedAt = Column(DateTime, nullable=False, index=True)
+
+
+class RevokedToken(Database.Base):
+    """JWTs revoked before their expiry, by jti.  Rows can be purged once ExpiresAt has passed."""
+    __tablename__ = "RevokedToken"
+
+    Jti = Column(String, primary_key=True)
+    ExpiresAt = Column(DateTime, nullable=False, index=True)
+    RevokedAt = Column(DateTime, nullable=False, index=True)
+
+
+class Visibility(Database.Base):
+    __tablename__ = "Visibility"
+
+    Id = Column(Integer, primary_key=True)
+    Name = Column(String, nullable=False)
@@ -0,0 +1,492 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Any, List, Dict, Set, Callable, AsyncIterator
+from datetime import datetime
+from contextlib import contextmanager, asynccontextmanager
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+import backend.api.errors as errors
+import backend.api.hashing as hashing
+import backend.data_model.db_config as db_config
+from backend.data_model.data_model import (User, Database, OrganizationRegistrationRequest,
+                                           Organization, OrganizationType, RevokedToken, Activity, Reward)
+
+# Bound by set_database() once the application has built its engine.
+Session = sessionmaker()
+
+# Threads the ASGI app's queries run on.  SQLAlchemy 1.3 and its drivers only
+# block, so there are as many as the engine has connections.
+ASYNC_DB_THREADS = int(os.environ.get('VOLUNTEER_ASYNC_DB_THREADS', db_config.POOL_SIZE + db_config.MAX_OVERFLOW))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@contextmanager
+def session_scope():
+    """Provide a transactional scope around a series of operations."""
+    session = Session()
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+class AsyncSession:
+    """The session of an async_session_scope.  Its work is done by passing functions of it to run."""
+
+    def __init__(self, session: Session) -> None:
+        self._session = session
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """func(*args, session), on a database thread."""
+        return await run_in_database_thread(func, *args, self._session)
+
+
+@asynccontextmanager
+async def async_session_scope() -> AsyncIterator[AsyncSession]:
+    """session_scope for coroutines: the event loop keeps running while the session waits on the database."""
+    session = Session()
+    try:
+        yield AsyncSession(session)
+        await run_in_database_thread(_commit_and_close, session)
+    except BaseException:
+        # Closing rolls back whatever is still open.
+        await run_in_database_thread(session.close)
+        raise
+
+
+async def run_in_database_thread(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking database function without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+
+
+def shutdown_database_threads() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=ASYNC_DB_THREADS, thread_name_prefix='database')
+    return _executor
+
+
+def _commit_and_close(session: Session) -> None:
+    try:
+        session.commit()
+    finally:
+        session.close()
+
+
+def reinit_session():
+    global Session
+    Session = sessionmaker(bind=Database.Engine)
+
+
+'''
+===================================================================================
+=================================LOGIN=============================================
+===================================================================================
+'''
+
+
+def check_login(email: str, password: str) -> Tuple[bool, int]:
+    """Verify a user's password.  Returns (valid, error_code)."""
+    try:
+        with session_scope() as session:
+            row = _get_login_row(normalize_email(email), session)
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_USER_CODE, str(e), 'backend.data_model.db_interface',
+                         'check_login')
+        return False, errors.FAILED_TO_QUERY_FOR_USER_CODE
+
+    if row is None:
+        # Spend the same time as a real check so unknown emails can't be told apart.
+        hashing.dummy_verify(password)
+        return False, None
+
+    if not hashing.verify_password(password, row.PasswordHash):
+        return False, None
+
+    if hashing.needs_rehash(row.PasswordHash):
+        _rehash_password(row.Id, password)
+
+    return True, None
+
+
+async def check_login_async(email: str, password: str) -> Tuple[bool, int]:
+    """check_login for coroutines.  The query runs on a database thread and bcrypt in the hashing pool."""
+    try:
+        async with async_session_scope() as session:
+            row = await session.run(_get_login_row, normalize_email(email))
+    except Exception as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_USER_CODE, str(e), 'backend.data_model.db_interface',
+                         'check_login_async')
+        return False, errors.FAILED_TO_QUERY_FOR_USER_CODE
+
+    if row is None:
+        await hashing.dummy_verify_async(password)
+        return False, None
+
+    if not await hashing.verify_password_async(password, row.PasswordHash):
+        return False, None
+
+    if hashing.needs_rehash(row.PasswordHash):
+        await run_in_database_thread(_rehash_password, row.Id, password)
+
+    return True, None
+
+
+def get_user_id(email: str) -> Tuple[int, int]:
+    """Return (user id, error code) for an email; the id is None if no such user exists."""
+    try:
+        with session_scope() as session:
+            user_id = session.query(User.Id).filter(User.Email == normalize_email(email)).scalar()
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_USER_CODE, str(e), 'backend.data_model.db_interface',
+                         'get_user_id')
+        return None, errors.FAILED_TO_QUERY_FOR_USER_CODE
+
+    return user_id, None
+
+
+def get_user_display_names(user_ids: List[int]) -> Tuple[Dict[int, str], int]:
+    """Map of id to first name and last initial, e.g. "Ada L.", for a page of users."""
+    if not user_ids:
+        return {}, None
+    try:
+        with session_scope() as session:
+            rows = session.query(User.Id, User.FirstName, User.LastName).filter(User.Id.in_(user_ids))
+            return {user_id: ((first_name or '') + ' ' + last_name[:1] + '.').strip()
+                    for user_id, first_name, last_name in rows}, None
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_USER_CODE, str(e), 'backend.data_model.db_interface',
+                         'get_user_display_names')
+        return None, errors.FAILED_TO_QUERY_FOR_USER_CODE
+
+
+def _get_login_row(email: str, session: Session) -> Any:
+    # Only the two columns login needs, through the unique Email index.
+    return session.query(User.Id, User.PasswordHash).filter(User.Email == email).first()
+
+
+def _rehash_password(user_id: int, password: str) -> None:
+    # A failed upgrade must not fail the login; the hash is retried next time.
+    try:
+        password_hash = hashing.hash_password(password)
+        with session_scope() as session:
+            session.query(User).filter_by(Id=user_id).update({User.PasswordHash: password_hash},
+                                                             synchronize_session=False)
+    except hashing.HashingServiceBusyError:
+        return
+    except BaseException:
+        errors.log_error(errors.FAILED_TO_UPDATE_PASSWORD_HASH_CODE)
+
+
+'''
+===================================================================================
+================================REGISTER===========================================
+===================================================================================
+'''
+
+
+def save_login(user: User) -> int:
+    """Save a new User to the database."""
+    user.Email = normalize_email(user.Email)
+    with session_scope() as session:
+        return _save_login_internal(user, session)
+
+
+def _save_login_internal(user: User, session: Session) -> int:
+    # Insert first and let the unique Email index reject duplicates, so the
+    # common case is a single round trip and there is no check-then-insert race.
+    try:
+        session.add(user)
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        if _user_already_exists(user.Email, session):
+            errors.log_error(errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE)
+            return errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE
+        errors.log_error(errors.FAILED_TO_COMMIT_USER_CODE)
+        return errors.FAILED_TO_COMMIT_USER_CODE
+    except BaseException:
+        session.rollback()
+        errors.log_error(errors.FAILED_TO_COMMIT_USER_CODE)
+        return errors.FAILED_TO_COMMIT_USER_CODE
+
+    return None
+
+
+def _user_already_exists(email: str, session: Session) -> bool:
+    try:
+        return _exists(session.query(User).filter_by(Email=email), session)
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_USER_CODE, str(e), 'backend.data_model.db_interface',
+                         '_user_already_exists')
+        return None
+
+
+'''
+===================================================================================
+==============================REGISTER ORGANIZATION================================
+===================================================================================
+'''
+
+
+def save_org_request(org_request: OrganizationRegistrationRequest) -> int:
+    with session_scope() as session:
+        return _save_org_request_internal(org_request, session)
+
+
+def _save_org_request_internal(org_request: OrganizationRegistrationRequest, session: Session) -> int:
+    # Requests are guarded by their own unique index; only the Organization
+    # table needs probing up front.
+    org_exists = _org_exists(org_request.OrganizationName, session)
+
+    if org_exists is None:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_ORG_CODE)
+        return errors.FAILED_TO_QUERY_FOR_ORG_CODE
+    elif org_exists:
+        errors.log_error(errors.ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_CODE)
+        return errors.ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_CODE
+
+    try:
+        session.add(org_request)
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        if _org_req_exists(org_request.OrganizationName, session):
+            errors.log_error(errors.ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_CODE)
+            return errors.ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_CODE
+        errors.log_error(errors.FAILED_TO_COMMIT_ORG_REQUEST_CODE)
+        return errors.FAILED_TO_COMMIT_ORG_REQUEST_CODE
+    except BaseException:
+        session.rollback()
+        errors.log_error(errors.FAILED_TO_COMMIT_ORG_REQUEST_CODE)
+        return errors.FAILED_TO_COMMIT_ORG_REQUEST_CODE
+
+    return None
+
+
+def _org_req_exists(organization_name: str, session: Session) -> bool:
+    try:
+        query = session.query(OrganizationRegistrationRequest).filter_by(OrganizationName=organization_name)
+        return _exists(query, session)
+    except:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_ORG_CODE)
+        return None
+
+
+def _org_exists(organization_name: str, session: Session) -> bool:
+    try:
+        return _exists(session.query(Organization).filter_by(Name=organization_name), session)
+    except:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_ORG_CODE)
+        return None
+
+
+def get_organization_type_ids(session: Session) -> Set[int]:
+    """The OrganizationType ids, one of which an Organization's Type must be."""
+    return set(type_id for type_id, in session.query(OrganizationType.Id))
+
+
+'''
+===================================================================================
+=============================ORGANIZATION LOCATIONS================================
+===================================================================================
+'''
+
+LOCATION_BATCH_SIZE = 50000
+
+
+def set_organization_location(organization_id: int, latitude: float, longitude: float) -> int:
+    """Set or, with None for both, clear a location.  Either way LocationUpdatedAt tells the geo indexes."""
+    try:
+        with session_scope() as session:
+            session.query(Organization).filter(Organization.Id == organization_id) \
+                .update({Organization.Latitude: latitude, Organization.Longitude: longitude,
+                         Organization.LocationUpdatedAt: datetime.utcnow()}, synchronize_session=False)
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_UPDATE_ORG_CODE, str(e), 'backend.data_model.db_interface',
+                         'set_organization_location')
+        return errors.FAILED_TO_UPDATE_ORG_CODE
+    return None
+
+
+def get_organization_locations(updated_since: datetime = None) -> Tuple[List[Tuple[int, float, float, int]], int]:
+    """(Id, Latitude, Longitude, Type) of every located organization.
+
+    Given a time, of every organization whose location was set or cleared since then instead; cleared ones
+    have None coordinates.
+    """
+    try:
+        with session_scope() as session:
+            query = session.query(Organization.Id, Organization.Latitude, Organization.Longitude,
+                                  Organization.Type)
+            if updated_since is None:
+                query = query.filter(Organization.Latitude.isnot(None), Organization.Longitude.isnot(None))
+            else:
+                query = query.filter(Organization.LocationUpdatedAt >= updated_since)
+            return [tuple(row) for row in query.yield_per(LOCATION_BATCH_SIZE)], None
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_ORG_CODE, str(e), 'backend.data_model.db_interface',
+                         'get_organization_locations')
+        return None, errors.FAILED_TO_QUERY_FOR_ORG_CODE
+
+
+def get_organization_summaries(organization_ids: List[int]) -> Tuple[Dict[int, Tuple[str, int]], int]:
+    """Map of id to (Name, Type) for a page of organizations."""
+    if not organization_ids:
+        return {}, None
+    try:
+        with session_scope() as session:
+            rows = session.query(Organization.Id, Organization.Name, Organization.Type) \
+                .filter(Organization.Id.in_(organization_ids))
+            return {org_id: (name, org_type) for org_id, name, org_type in rows}, None
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_ORG_CODE, str(e), 'backend.data_model.db_interface',
+                         'get_organization_summaries')
+        return None, errors.FAILED_TO_QUERY_FOR_ORG_CODE
+
+
+def get_organization_owner_id(organization_id: int) -> Tuple[int, int]:
+    """Return (owner's user id, error code); the id is None if no such organization exists."""
+    try:
+        with session_scope() as session:
+            owner_id = session.query(Organization.OwnerId).filter(Organization.Id == organization_id).scalar()
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_ORG_CODE, str(e), 'backend.data_model.db_interface',
+                         'get_organization_owner_id')
+        return None, errors.FAILED_TO_QUERY_FOR_ORG_CODE
+
+    return owner_id, None
+
+
+'''
+===================================================================================
+====================================CATALOG========================================
+===================================================================================
+'''
+
+
+def get_activity_points(activity_id: int, organization_id: int) -> Tuple[Tuple[int, int], int]:
+    """(PointsPerHour, PointsPerCompletion) of one of an organization's activities, or None if it has no such one."""
+    try:
+        with session_scope() as session:
+            row = session.query(Activity.PointsPerHour, Activity.PointsPerCompletion) \
+                .filter(Activity.Id == activity_id, Activity.AssociatedOrganization == organization_id).first()
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_ORG_CODE, str(e), 'backend.data_model.db_interface',
+                         'get_activity_points')
+        return None, errors.FAILED_TO_QUERY_FOR_ORG_CODE
+
+    return (tuple(row) if row is not None else None), None
+
+
+def get_reward_points(reward_id: int, organization_id: int) -> Tuple[int, int]:
+    """PointsPerReward of one of an organization's rewards, or None if it has no such one."""
+    try:
+        with session_scope() as session:
+            points = session.query(Reward.PointsPerReward) \
+                .filter(Reward.Id == reward_id, Reward.AssociatedOrganization == organization_id).scalar()
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_ORG_CODE, str(e), 'backend.data_model.db_interface',
+                         'get_reward_points')
+        return None, errors.FAILED_TO_QUERY_FOR_ORG_CODE
+
+    return points, None
+
+
+'''
+===================================================================================
+================================REVOKED TOKENS=====================================
+===================================================================================
+'''
+
+
+def save_revoked_token(jti: str, expires_at: datetime) -> int:
+    """Record a revoked token.  Revoking an already revoked token is not an error."""
+    try:
+        with session_scope() as session:
+            session.add(RevokedToken(Jti=jti, ExpiresAt=expires_at, RevokedAt=datetime.utcnow()))
+    except IntegrityError:
+        return None
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_REVOKE_TOKEN_CODE, str(e), 'backend.data_model.db_interface',
+                         'save_revoked_token')
+        return errors.FAILED_TO_REVOKE_TOKEN_CODE
+    return None
+
+
+def is_token_revoked(jti: str) -> Tuple[bool, int]:
+    try:
+        with session_scope() as session:
+            return _exists(session.query(RevokedToken).filter(RevokedToken.Jti == jti), session), None
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_REVOKED_TOKEN_CODE, str(e), 'backend.data_model.db_interface',
+                         'is_token_revoked')
+        return None, errors.FAILED_TO_QUERY_FOR_REVOKED_TOKEN_CODE
+
+
+def get_revoked_token_ids(revoked_since: datetime = None) -> Tuple[List[str], int]:
+    """Jtis of unexpired revoked tokens, optionally only those revoked since a time."""
+    try:
+        with session_scope() as session:
+            query = session.query(RevokedToken.Jti).filter(RevokedToken.ExpiresAt > datetime.utcnow())
+            if revoked_since is not None:
+                query = query.filter(RevokedToken.RevokedAt >= revoked_since)
+            return [jti for jti, in query], None
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_REVOKED_TOKEN_CODE, str(e), 'backend.data_model.db_interface',
+                         'get_revoked_token_ids')
+        return None, errors.FAILED_TO_QUERY_FOR_REVOKED_TOKEN_CODE
+
+
+def delete_expired_revoked_tokens() -> Tuple[int, int]:
+    try:
+        with session_scope() as session:
+            deleted = session.query(RevokedToken).filter(RevokedToken.ExpiresAt <= datetime.utcnow()) \
+                .delete(synchronize_session=False)
+            return deleted, None
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_REVOKED_TOKEN_CODE, str(e), 'backend.data_model.db_interface',
+                         'delete_expired_revoked_tokens')
+        return None, errors.FAILED_TO_QUERY_FOR_REVOKED_TOKEN_CODE
+
+
+'''
+===================================================================================
+====================================SHARED=========================================
+===================================================================================
+'''
+
+
+def _exists(query: Any, session: Session) -> bool:
+    """SELECT EXISTS(...) for a query, without loading any rows."""
+    return session.query(query.exists()).scalar()
+
+
+def normalize_email(email: str) -> str:
+    """Emails are stored and looked up lowercased so the unique index is case-insensitive."""
+    if email is None:
+        return None
+    return email.strip().lower()
+
+
+def set_database(engine: Any) -> None:
+    Database.Engine = engine
+    reinit_session()
@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Tuple, Any, List, Iterator, Callable, Sequence
+from sqlalchemy import select
+import backend.api.errors as errors
+from backend.data_model.db_interface import session_scope, Session
+from backend.data_model.data_model import ActivityTransaction, RewardTransaction
+
+'''
+Streaming exports of a user's transactions and an organization's ledger.
+
+Rows are read through a server-side cursor (stream_results, FETCH_SIZE rows
+at a time) and written as CSV or NDJSON into a buffer that is handed out
+every CHUNK_BYTES, optionally gzip compressed, so an export of any length
+is produced in constant memory:
+
+    chunks = exports.stream(*exports.user_transactions(user_id, exports.ACTIVITIES), exports.CSV)
+    Response(chunks, mimetype=exports.MIMETYPES[exports.CSV])
+
+The database is only read as the chunks are consumed.  An error part way
+through is logged and re-raised, which drops the connection rather than
+ending a truncated export cleanly.
+'''
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+MIMETYPES = {CSV: 'text/csv', NDJSON: 'application/x-ndjson'}
+
+ACTIVITIES = 'activities'
+REWARDS = 'rewards'
+
+FETCH_SIZE = 1000
+CHUNK_BYTES = 64 * 1024
+
+Columns = List[str]
+Rows = Callable[[Session], Iterator[Sequence[Any]]]
+
+_ACTIVITY_COLUMNS = ['id', 'instant', 'points', 'organization_id', 'activity_id']
+_REWARD_COLUMNS = ['id', 'instant', 'points', 'organization_id', 'reward_id']
+_LEDGER_COLUMNS = ['kind', 'id', 'instant', 'user_id', 'points', 'item_id']
+
+
+def user_transactions(user_id: int, kind: str) -> Tuple[Columns, Rows]:
+    """A user's ACTIVITIES or REWARDS transactions, oldest first."""
+    table, item, columns = (ActivityTransaction, ActivityTransaction.Activity, _ACTIVITY_COLUMNS) \
+        if kind == ACTIVITIES else (RewardTransaction, RewardTransaction.Reward, _REWARD_COLUMNS)
+    query = select([table.Id, table.Instant, table.Points, table.OrganizationId, item]) \
+        .where(table.UserId == user_id) \
+        .order_by(table.Instant, table.Id)
+    return columns, lambda session: _fetch(session, query)
+
+
+def organization_ledger(organization_id: int) -> Tuple[Columns, Rows]:
+    """The activities an organization paid points for, then the rewards it redeemed, each in Id order."""
+    activities = select([ActivityTransaction.Id, ActivityTransaction.Instant, ActivityTransaction.UserId,
+                         ActivityTransaction.Points, ActivityTransaction.Activity]) \
+        .where(ActivityTransaction.OrganizationId == organization_id) \
+        .order_by(ActivityTransaction.Id)
+    rewards = select([RewardTransaction.Id, RewardTransaction.Instant, RewardTransaction.UserId,
+                      RewardTransaction.Points, RewardTransaction.Reward]) \
+        .where(RewardTransaction.OrganizationId == organization_id) \
+        .order_by(RewardTransaction.Id)
+
+    def rows(session: Session) -> Iterator[Sequence[Any]]:
+        for row in _fetch(session, activities):
+            yield ('activity',) + tuple(row)
+        for row in _fetch(session, rewards):
+            yield ('reward',) + tuple(row)
+    return _LEDGER_COLUMNS, rows
+
+
+def stream(columns: Columns, rows: Rows, export_format: str, compress: bool = False) -> Iterator[bytes]:
+    """The export as a series of chunks of about CHUNK_BYTES, gzip compressed if compress is set."""
+    chunks = _csv_chunks(columns, _read(rows)) if export_format == CSV else _ndjson_chunks(columns, _read(rows))
+    if not compress:
+        yield from chunks
+        return
+
+    compressor = zlib.compressobj(wbits=31)
+    try:
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+    finally:
+        # Closes the database cursor now if the client stopped reading.
+        chunks.close()
+    yield compressor.flush()
+
+
+def _read(rows: Rows) -> Iterator[Sequence[Any]]:
+    try:
+        with session_scope() as session:
+            yield from rows(session)
+    except GeneratorExit:
+        # The client went away; session_scope has already rolled back.
+        raise
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_EXPORT_CODE, str(e), 'backend.data_model.exports', '_read')
+        raise
+
+
+def _fetch(session: Session, query: Any) -> Iterator[Sequence[Any]]:
+    result = session.execute(query.execution_options(stream_results=True))
+    try:
+        while True:
+            rows = result.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        result.close()
+
+
+def _csv_chunks(columns: Columns, rows: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(columns: Columns, rows: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+    lines, size = [], 0
+    for row in rows:
+        line = json.dumps(dict(zip(columns, row)), default=_isoformat, separators=(',', ':'))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_BYTES:
+            lines.append('')
+            yield '\n'.join(lines).encode()
+            lines, size = [], 0
+    if lines:
+        lines.append('')
+        yield '\n'.join(lines).encode()
+
+
+def _isoformat(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError('Not JSON serializable: ' + type(value).__name__)
@@ -0,0 +1,243 @@
+import os
+import threading
+from typing import Tuple, Dict, Any, List, Optional
+from sortedcontainers import SortedList
+from sqlalchemy import func
+import backend.api.errors as errors
+from backend.data_model.db_interface import session_scope
+from backend.data_model.data_model import ActivityTransaction
+
+'''
+Leaderboards of top contributors, overall and per organization.  A user's
+score is the points they have earned through ActivityTransactions.
+
+Each board is an order-statistic structure, so "my rank" is O(log n) and a
+page of the top k is O(log n + k), with no ORDER BY over aggregates.  The
+in-process SortedLeaderboard is enough for a single worker; set
+VOLUNTEER_LEADERBOARD_URL=redis://... (defaults to VOLUNTEER_CLAIM_STORE_URL)
+to share Redis sorted sets between workers.
+
+The boards are built from the ledger in one streaming GROUP BY the first time
+they are used, and the ledger adds to them after each activity commits.
+'''
+
+OVERALL = 0
+LEADERBOARD_URL = os.environ.get('VOLUNTEER_LEADERBOARD_URL', os.environ.get('VOLUNTEER_CLAIM_STORE_URL'))
+STREAM_CHUNK_SIZE = 50000
+
+_leaderboard = None
+_lock = threading.Lock()
+# Activities committed while the boards load: (transaction id, user id, organization id, points).
+_pending = None
+_pending_lock = threading.Lock()
+
+
+class SortedLeaderboard:
+    """One SortedList per board of a single int per user, ordered by points descending then user id."""
+
+    # User ids must be below 2 ** _ID_BITS.
+    _ID_BITS = 40
+
+    def __init__(self) -> None:
+        # board -> user id -> sort key; board -> SortedList of sort keys
+        self._keys = {}
+        self._ranked = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def add(self, board: int, user_id: int, points: int) -> None:
+        with self._lock:
+            keys = self._keys.get(board)
+            if keys is None:
+                keys = self._keys[board] = {}
+                self._ranked[board] = SortedList()
+            ranked = self._ranked[board]
+            old_key = keys.get(user_id)
+            if old_key is not None:
+                ranked.remove(old_key)
+                points += self._points(old_key)
+            keys[user_id] = new_key = self._key(user_id, points)
+            ranked.add(new_key)
+
+    def rank(self, board: int, user_id: int) -> Tuple[Optional[int], int]:
+        """(1 based rank, points), or (None, 0) for a user not on the board."""
+        with self._lock:
+            key = self._keys.get(board, {}).get(user_id)
+            if key is None:
+                return None, 0
+            return self._ranked[board].bisect_left(key) + 1, self._points(key)
+
+    def top(self, board: int, limit: int, offset: int = 0) -> Tuple[List[Tuple[int, int]], bool]:
+        """Returns ([(user id, points)] ranked offset..offset+limit, more after these)."""
+        with self._lock:
+            ranked = self._ranked.get(board)
+            if ranked is None:
+                return [], False
+            keys = list(ranked.islice(offset, offset + limit))
+            has_more = len(ranked) > offset + limit
+        return [(self._user_id(key), self._points(key)) for key in keys], has_more
+
+    def replace(self, boards: Dict[int, Dict[int, int]]) -> None:
+        """Swap in boards built from {board: {user id: points}}."""
+        keys = {board: {user_id: self._key(user_id, points) for user_id, points in scores.items()}
+                for board, scores in boards.items()}
+        ranked = {board: SortedList(board_keys.values()) for board, board_keys in keys.items()}
+        with self._lock:
+            self._keys = keys
+            self._ranked = ranked
+            self.loaded = True
+
+    def _key(self, user_id: int, points: int) -> int:
+        return (-points << self._ID_BITS) | user_id
+
+    def _points(self, key: int) -> int:
+        return -(key >> self._ID_BITS)
+
+    def _user_id(self, key: int) -> int:
+        return key & ((1 << self._ID_BITS) - 1)
+
+
+class RedisLeaderboard:
+    """One Redis sorted set per board.  Works with any client exposing the z* commands and pipeline (redis-py)."""
+
+    KEY_PREFIX = 'leaderboard:'
+    LOAD_CHUNK_SIZE = 10000
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+        self._loaded = False
+
+    @staticmethod
+    def from_url(url: str) -> 'RedisLeaderboard':
+        import redis
+        return RedisLeaderboard(redis.Redis.from_url(url))
+
+    @property
+    def loaded(self) -> bool:
+        # Built once, by whichever worker got there first.
+        if not self._loaded:
+            self._loaded = bool(self._client.exists(self._board_key(OVERALL)))
+        return self._loaded
+
+    def add(self, board: int, user_id: int, points: int) -> None:
+        self._client.zincrby(self._board_key(board), points, user_id)
+
+    def rank(self, board: int, user_id: int) -> Tuple[Optional[int], int]:
+        pipe = self._client.pipeline(transaction=False)
+        pipe.zrevrank(self._board_key(board), user_id)
+        pipe.zscore(self._board_key(board), user_id)
+        rank, points = pipe.execute()
+        if rank is None:
+            return None, 0
+        return rank + 1, int(points)
+
+    def top(self, board: int, limit: int, offset: int = 0) -> Tuple[List[Tuple[int, int]], bool]:
+        # One extra member tells whether there is another page.
+        members = self._client.zrevrange(self._board_key(board), offset, offset + limit, withscores=True)
+        return [(int(user_id), int(points)) for user_id, points in members[:limit]], len(members) > limit
+
+    def replace(self, boards: Dict[int, Dict[int, int]]) -> None:
+        # Each board is written to a scratch key and renamed over the live one,
+        # so readers never see a half loaded board.
+        for board, scores in boards.items():
+            scratch_key = self._board_key(board) + ':loading'
+            self._client.delete(scratch_key)
+            items = list(scores.items())
+            for start in range(0, len(items), self.LOAD_CHUNK_SIZE):
+                self._client.zadd(scratch_key, dict(items[start:start + self.LOAD_CHUNK_SIZE]))
+            if items:
+                self._client.rename(scratch_key, self._board_key(board))
+        self._loaded = True
+
+    def _board_key(self, board: int) -> str:
+        return self.KEY_PREFIX + str(board)
+
+
+def get_leaderboard() -> Tuple[Any, int]:
+    """The boards, loaded from the ledger first if they haven't been.  Returns (leaderboard, error code)."""
+    global _leaderboard
+    if _leaderboard is None:
+        with _lock:
+            if _leaderboard is None:
+                if LEADERBOARD_URL is not None:
+                    _leaderboard = RedisLeaderboard.from_url(LEADERBOARD_URL)
+                else:
+                    _leaderboard = SortedLeaderboard()
+
+    leaderboard = _leaderboard
+    try:
+        if not leaderboard.loaded:
+            with _lock:
+                if not leaderboard.loaded:
+                    _load(leaderboard)
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_LOAD_LEADERBOARD_CODE, str(e), 'backend.data_model.leaderboard',
+                         'get_leaderboard')
+        return None, errors.FAILED_TO_LOAD_LEADERBOARD_CODE
+    return leaderboard, None
+
+
+def set_leaderboard(leaderboard: Any) -> None:
+    global _leaderboard
+    _leaderboard = leaderboard
+
+
+def add_activity(transaction_id: int, user_id: int, organization_id: int, points: int) -> None:
+    """Count a committed ActivityTransaction.  Boards not loaded yet will read it from the ledger."""
+    with _pending_lock:
+        if _pending is not None:
+            _pending.append((transaction_id, user_id, organization_id, points))
+            return
+
+    leaderboard = _leaderboard
+    if leaderboard is None:
+        return
+    try:
+        if leaderboard.loaded:
+            leaderboard.add(OVERALL, user_id, points)
+            leaderboard.add(organization_id, user_id, points)
+    except BaseException as e:
+        # The transaction is already committed; the next reload will count it.
+        errors.log_error(errors.FAILED_TO_UPDATE_LEADERBOARD_CODE, str(e), 'backend.data_model.leaderboard',
+                         'add_activity')
+
+
+def _load(leaderboard: Any) -> None:
+    global _pending
+    with _pending_lock:
+        _pending = []
+    try:
+        boards, last_id = _read_boards()
+        leaderboard.replace(boards)
+    finally:
+        with _pending_lock:
+            pending, _pending = _pending, None
+
+    # Activities that committed during the read and weren't part of it.
+    for transaction_id, user_id, organization_id, points in pending:
+        if last_id is None or transaction_id > last_id:
+            leaderboard.add(OVERALL, user_id, points)
+            leaderboard.add(organization_id, user_id, points)
+
+
+def _read_boards() -> Tuple[Dict[int, Dict[int, int]], int]:
+    """{board: {user id: points}} summed from the ledger up to the returned transaction id."""
+    boards = {OVERALL: {}}
+    overall = boards[OVERALL]
+    with session_scope() as session:
+        last_id = session.query(func.max(ActivityTransaction.Id)).scalar()
+        if last_id is None:
+            return boards, None
+
+        rows = session.query(ActivityTransaction.UserId, ActivityTransaction.OrganizationId,
+                             func.sum(ActivityTransaction.Points)) \
+            .filter(ActivityTransaction.Id <= last_id) \
+            .group_by(ActivityTransaction.UserId, ActivityTransaction.OrganizationId) \
+            .yield_per(STREAM_CHUNK_SIZE)
+        for user_id, organization_id, points in rows:
+            scores = boards.get(organization_id)
+            if scores is None:
+                scores = boards[organization_id] = {}
+            scores[user_id] = int(points)
+            overall[user_id] = overall.get(user_id, 0) + int(points)
+    return boards, last_id
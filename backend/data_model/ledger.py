@@ -0,0 +1,320 @@
+import random
+import time
+from typing import Tuple, Dict, Any
+from datetime import datetime
+from sqlalchemy import func, select, literal
+from sqlalchemy.exc import IntegrityError, DBAPIError
+import backend.api.errors as errors
+import backend.data_model.leaderboard as leaderboard
+import backend.data_model.stats as stats
+from backend.data_model.db_interface import session_scope, Session
+from backend.data_model.data_model import (User, Organization, ActivityTransaction, RewardTransaction,
+                                           UserBalance, OrganizationBalance)
+
+'''
+Append-only point ledger.  ActivityTransaction and RewardTransaction rows are
+only ever inserted, and every insert adjusts UserBalance, OrganizationBalance
+and the stats rollups in the same database transaction.  Balances are changed
+with a single UPDATE ... SET Points = Points + :delta, which takes the row
+lock, so concurrent writers can't lose each other's updates.
+
+Each transaction is also paid from an organization budget: awarded points
+from Organization.PointsToDistribute, accepted rewards from PointsToConsume.
+The budget is debited by a conditional UPDATE ... WHERE <budget> >= :points,
+so it never goes negative however many terminals redeem at once.  On
+PostgreSQL that UPDATE and the transaction's INSERT are one statement (a
+data-modifying WITH), so the row is only written if the debit was.  Every
+transaction locks the organization row first, so they queue there rather
+than deadlock over the balance rows.
+'''
+
+RECONCILE_BATCH_SIZE = 10000
+
+# A balance row is created on a user's or org's first transaction.  Two first
+# transactions can race to insert it; the loser retries once and then finds it.
+_INSERT_RACE_RETRIES = 1
+
+# Transactions the database aborts over contention (a deadlock or
+# serialization failure on PostgreSQL, a busy wait running out on SQLite) are
+# retried this many times, the nth after a random pause of up to
+# CONTENTION_BACKOFF_SECONDS * 2 ** n, so the retries don't collide again.
+CONTENTION_RETRIES = 5
+CONTENTION_BACKOFF_SECONDS = 0.01
+_CONTENTION_PGCODES = ('40001', '40P01')
+
+
+class _Rejected(Exception):
+    """Raised inside a transaction that must not be recorded, so session_scope rolls it back."""
+
+    def __init__(self, error_code: int) -> None:
+        super().__init__(error_code)
+        self.error_code = error_code
+
+
+'''
+===================================================================================
+================================RECORD=============================================
+===================================================================================
+'''
+
+
+def record_activity(user_id: int, organization_id: int, points: int, activity_id: int = None,
+                    instant: datetime = None) -> Tuple[int, int]:
+    """Award points to a user from the organization's PointsToDistribute.  Returns (transaction id, error code).
+
+    Fails with INSUFFICIENT_ORGANIZATION_POINTS_CODE if the budget doesn't cover them.
+    """
+    transaction = dict(UserId=user_id, Points=points, OrganizationId=organization_id,
+                       Instant=instant or datetime.utcnow(), Activity=activity_id)
+    transaction_id, error_code = _record(_record_activity_internal, transaction)
+    if error_code is None:
+        leaderboard.add_activity(transaction_id, user_id, organization_id, points)
+    return transaction_id, error_code
+
+
+def record_reward(user_id: int, organization_id: int, points: int, reward_id: int,
+                  instant: datetime = None) -> Tuple[int, int]:
+    """Spend a user's points at an organization, from its PointsToConsume.
+
+    Fails with INSUFFICIENT_POINTS_CODE or INSUFFICIENT_ORGANIZATION_POINTS_CODE
+    rather than taking the user or the budget below zero.
+    """
+    transaction = dict(UserId=user_id, Points=points, OrganizationId=organization_id,
+                       Instant=instant or datetime.utcnow(), Reward=reward_id)
+    return _record(_record_reward_internal, transaction)
+
+
+def _record(record_internal: Any, transaction: Dict[str, Any]) -> Tuple[int, int]:
+    insert_races = contentions = 0
+    while True:
+        try:
+            with session_scope() as session:
+                transaction_id = record_internal(transaction, session)
+        except _Rejected as e:
+            return None, e.error_code
+        except IntegrityError as e:
+            if insert_races < _INSERT_RACE_RETRIES:
+                insert_races += 1
+                continue
+            errors.log_error(errors.FAILED_TO_COMMIT_TRANSACTION_CODE, str(e), 'backend.data_model.ledger',
+                             '_record')
+            break
+        except DBAPIError as e:
+            if _is_contention(e) and contentions < CONTENTION_RETRIES:
+                time.sleep(random.uniform(0, CONTENTION_BACKOFF_SECONDS * 2 ** contentions))
+                contentions += 1
+                continue
+            errors.log_error(errors.FAILED_TO_COMMIT_TRANSACTION_CODE, str(e), 'backend.data_model.ledger',
+                             '_record')
+            break
+        except BaseException as e:
+            errors.log_error(errors.FAILED_TO_COMMIT_TRANSACTION_CODE, str(e), 'backend.data_model.ledger',
+                             '_record')
+            break
+
+        stats.invalidate(transaction['UserId'], transaction['OrganizationId'])
+        return transaction_id, None
+
+    return None, errors.FAILED_TO_COMMIT_TRANSACTION_CODE
+
+
+def _is_contention(error: DBAPIError) -> bool:
+    return getattr(error.orig, 'pgcode', None) in _CONTENTION_PGCODES or 'database is locked' in str(error.orig)
+
+
+def _record_activity_internal(transaction: Dict[str, Any], session: Session) -> int:
+    points = transaction['Points']
+    transaction_id = _debit_and_insert(Organization.PointsToDistribute, ActivityTransaction, transaction, session)
+    _add_to_user_balance(transaction['UserId'], points, session)
+    _add_to_org_balance(transaction['OrganizationId'], points, 0, session)
+    stats.add_activity(transaction, session)
+    return transaction_id
+
+
+def _record_reward_internal(transaction: Dict[str, Any], session: Session) -> int:
+    points = transaction['Points']
+    transaction_id = _debit_and_insert(Organization.PointsToConsume, RewardTransaction, transaction, session)
+    if not _add_to_user_balance(transaction['UserId'], -points, session):
+        raise _Rejected(errors.INSUFFICIENT_POINTS_CODE)
+    _add_to_org_balance(transaction['OrganizationId'], 0, points, session)
+    stats.add_reward(transaction, session)
+    return transaction_id
+
+
+def _debit_and_insert(budget: Any, table: Any, transaction: Dict[str, Any], session: Session) -> int:
+    """Take the transaction's points from an organization budget column and insert it.  Returns its id."""
+    points = transaction['Points']
+    debit = Organization.__table__.update() \
+        .where(Organization.Id == transaction['OrganizationId']) \
+        .where(budget >= points) \
+        .values({budget: budget - points})
+
+    if session.get_bind().dialect.name == 'postgresql':
+        debited = debit.returning(Organization.Id).cte('debited')
+        columns = [column for column in transaction if column != 'OrganizationId']
+        # A row per debited organization: none if the budget was short.
+        rows = select([literal(transaction[column], table.__table__.c[column].type) for column in columns] +
+                      [debited.c.Id]).select_from(debited)
+        transaction_id = session.execute(table.__table__.insert()
+                                         .from_select(columns + ['OrganizationId'], rows)
+                                         .returning(table.Id)).scalar()
+        if transaction_id is None:
+            raise _Rejected(errors.INSUFFICIENT_ORGANIZATION_POINTS_CODE)
+        return transaction_id
+
+    if session.execute(debit).rowcount == 0:
+        raise _Rejected(errors.INSUFFICIENT_ORGANIZATION_POINTS_CODE)
+    return _insert_transaction(table, transaction, session)
+
+
+def _insert_transaction(table: Any, transaction: Dict[str, Any], session: Session) -> int:
+    result = session.execute(table.__table__.insert().values(**transaction))
+    return result.inserted_primary_key[0]
+
+
+def _add_to_user_balance(user_id: int, delta: int, session: Session) -> bool:
+    query = session.query(UserBalance).filter(UserBalance.UserId == user_id)
+    if delta < 0:
+        query = query.filter(UserBalance.Points >= -delta)
+
+    updated = query.update({UserBalance.Points: UserBalance.Points + delta}, synchronize_session=False)
+    if updated:
+        return True
+    if delta < 0:
+        return False
+
+    session.execute(UserBalance.__table__.insert().values(UserId=user_id, Points=delta))
+    return True
+
+
+def _add_to_org_balance(organization_id: int, distributed: int, consumed: int, session: Session) -> None:
+    updated = session.query(OrganizationBalance).filter(
+        OrganizationBalance.OrganizationId == organization_id).update(
+            {OrganizationBalance.PointsDistributed: OrganizationBalance.PointsDistributed + distributed,
+             OrganizationBalance.PointsConsumed: OrganizationBalance.PointsConsumed + consumed},
+            synchronize_session=False)
+    if not updated:
+        session.execute(OrganizationBalance.__table__.insert().values(
+            OrganizationId=organization_id, PointsDistributed=distributed, PointsConsumed=consumed))
+
+
+'''
+===================================================================================
+================================BALANCES===========================================
+===================================================================================
+'''
+
+
+def get_balance(user_id: int) -> Tuple[int, int]:
+    """Return (points, error code) for a user from the materialized balance."""
+    try:
+        with session_scope() as session:
+            points = session.query(UserBalance.Points).filter(UserBalance.UserId == user_id).scalar()
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_BALANCE_CODE, str(e), 'backend.data_model.ledger',
+                         'get_balance')
+        return None, errors.FAILED_TO_QUERY_FOR_BALANCE_CODE
+
+    return points or 0, None
+
+
+def get_org_balance(organization_id: int) -> Tuple[Tuple[int, int], int]:
+    """Return ((points distributed, points consumed), error code) for an organization."""
+    try:
+        with session_scope() as session:
+            row = session.query(OrganizationBalance.PointsDistributed, OrganizationBalance.PointsConsumed) \
+                .filter(OrganizationBalance.OrganizationId == organization_id).first()
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_BALANCE_CODE, str(e), 'backend.data_model.ledger',
+                         'get_org_balance')
+        return None, errors.FAILED_TO_QUERY_FOR_BALANCE_CODE
+
+    if row is None:
+        return (0, 0), None
+    return (row.PointsDistributed, row.PointsConsumed), None
+
+
+'''
+===================================================================================
+==============================RECONCILIATION=======================================
+===================================================================================
+'''
+
+
+def reconcile_balances(batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    """Rebuild every balance from the raw transactions.  Returns the number of balances corrected.
+
+    Users and organizations are walked in Id order, batch_size at a time, each
+    batch in its own transaction, so memory stays flat however large the ledger is.
+    Run it while transactions are not being recorded; a write landing between a
+    batch's sums and its corrections would be overwritten.
+    """
+    corrected = 0
+    corrected += _reconcile_in_batches(User.Id, batch_size, _reconcile_user_batch)
+    corrected += _reconcile_in_batches(Organization.Id, batch_size, _reconcile_org_batch)
+    return corrected
+
+
+def _reconcile_in_batches(id_column: Any, batch_size: int, reconcile_batch: Any) -> int:
+    corrected = 0
+    last_id = None
+    while True:
+        with session_scope() as session:
+            query = session.query(id_column).order_by(id_column)
+            if last_id is not None:
+                query = query.filter(id_column > last_id)
+            ids = [row[0] for row in query.limit(batch_size)]
+            if not ids:
+                return corrected
+
+            corrected += reconcile_batch(ids[0], ids[-1], session)
+            last_id = ids[-1]
+
+
+def _reconcile_user_batch(first_id: int, last_id: int, session: Session) -> int:
+    earned = _sum_points_by(ActivityTransaction, ActivityTransaction.UserId, first_id, last_id, session)
+    spent = _sum_points_by(RewardTransaction, RewardTransaction.UserId, first_id, last_id, session)
+    expected = {user_id: earned.get(user_id, 0) - spent.get(user_id, 0)
+                for user_id in set(earned) | set(spent)}
+
+    actual = dict(session.query(UserBalance.UserId, UserBalance.Points)
+                  .filter(UserBalance.UserId.between(first_id, last_id)))
+
+    return _apply_corrections(UserBalance, UserBalance.UserId, expected, actual,
+                              lambda user_id, points: {'UserId': user_id, 'Points': points}, session)
+
+
+def _reconcile_org_batch(first_id: int, last_id: int, session: Session) -> int:
+    distributed = _sum_points_by(ActivityTransaction, ActivityTransaction.OrganizationId,
+                                 first_id, last_id, session)
+    consumed = _sum_points_by(RewardTransaction, RewardTransaction.OrganizationId, first_id, last_id, session)
+    expected = {org_id: (distributed.get(org_id, 0), consumed.get(org_id, 0))
+                for org_id in set(distributed) | set(consumed)}
+
+    actual = {row.OrganizationId: (row.PointsDistributed, row.PointsConsumed)
+              for row in session.query(OrganizationBalance)
+              .filter(OrganizationBalance.OrganizationId.between(first_id, last_id))}
+
+    return _apply_corrections(OrganizationBalance, OrganizationBalance.OrganizationId, expected, actual,
+                              lambda org_id, points: {'OrganizationId': org_id, 'PointsDistributed': points[0],
+                                                      'PointsConsumed': points[1]}, session)
+
+
+def _sum_points_by(table: Any, key_column: Any, first_id: int, last_id: int,
+                   session: Session) -> Dict[int, int]:
+    return dict(session.query(key_column, func.sum(table.Points))
+                .filter(key_column.between(first_id, last_id))
+                .group_by(key_column))
+
+
+def _apply_corrections(balance_table: Any, key_column: Any, expected: Dict[int, Any], actual: Dict[int, Any],
+                       to_row: Any, session: Session) -> int:
+    wrong = [key for key in set(expected) | set(actual) if expected.get(key) != actual.get(key)]
+    if not wrong:
+        return 0
+
+    session.query(balance_table).filter(key_column.in_(wrong)).delete(synchronize_session=False)
+    rows = [to_row(key, expected[key]) for key in wrong if key in expected]
+    if rows:
+        session.execute(balance_table.__table__.insert(), rows)
+    return len(wrong)
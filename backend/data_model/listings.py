@@ -0,0 +1,159 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Tuple, Dict, Any, List, Optional, Sequence
+from sqlalchemy import tuple_
+import backend.api.errors as errors
+from backend.data_model.db_interface import session_scope
+from backend.data_model.data_model import (ActivityTransaction, RewardTransaction, Activity, Reward,
+                                           OrganizationRegistrationRequest)
+
+'''
+Paged listings of transaction history, organization catalogs and pending
+organization requests.
+
+Pages are keyset paginated: each page ends with a cursor holding the sort key
+of its last row, and the next page is read with WHERE (key columns) < cursor
+along a composite index, so page 100000 costs the same as page 1.  Only the
+columns a listing returns are selected.
+
+A cursor is opaque to clients: urlsafe base64 of the JSON list of key values.
+'''
+
+PUBLIC_VISIBILITY = 1
+PRIVATE_VISIBILITY = 2
+
+Page = Tuple[List[Dict[str, Any]], Optional[str]]
+
+
+class _Listing:
+    """A query shape: selected columns and their names, sort key columns, and the key's value types."""
+
+    def __init__(self, columns: Sequence[Any], names: Sequence[str], key: Sequence[Any], key_types: Sequence[type],
+                 descending: bool) -> None:
+        self.columns = tuple(columns)
+        self.names = tuple(names)
+        self.key = tuple(key)
+        self.key_types = tuple(key_types)
+        self.descending = descending
+        # Positions of the key columns among the selected ones.
+        self.key_positions = tuple(self.columns.index(column) for column in self.key)
+
+
+def _transaction_listing(table: Any, item_column: Any, item_name: str) -> _Listing:
+    return _Listing([table.Id, table.Instant, table.Points, table.OrganizationId, item_column],
+                    ['id', 'instant', 'points', 'organization_id', item_name],
+                    [table.Instant, table.Id], [datetime, int], descending=True)
+
+
+def _catalog_listing(table: Any, points_columns: Sequence[Any], points_names: Sequence[str]) -> _Listing:
+    return _Listing([table.Id, table.Description, table.OneTime] + list(points_columns),
+                    ['id', 'description', 'one_time'] + list(points_names),
+                    [table.Id], [int], descending=False)
+
+
+_ACTIVITY_TRANSACTIONS = _transaction_listing(ActivityTransaction, ActivityTransaction.Activity, 'activity_id')
+_REWARD_TRANSACTIONS = _transaction_listing(RewardTransaction, RewardTransaction.Reward, 'reward_id')
+_ACTIVITIES = _catalog_listing(Activity, [Activity.PointsPerHour, Activity.PointsPerCompletion],
+                               ['points_per_hour', 'points_per_completion'])
+_REWARDS = _catalog_listing(Reward, [Reward.PointsPerReward], ['points_per_reward'])
+_ORGANIZATION_REQUESTS = _Listing(
+    [OrganizationRegistrationRequest.Id, OrganizationRegistrationRequest.OrganizationName,
+     OrganizationRegistrationRequest.SubmittingUserId, OrganizationRegistrationRequest.ContactEmail,
+     OrganizationRegistrationRequest.ContactPhoneNumber, OrganizationRegistrationRequest.OrganizationURL,
+     OrganizationRegistrationRequest.Message],
+    ['id', 'organization_name', 'submitting_user_id', 'contact_email', 'contact_phone_number', 'organization_url',
+     'message'],
+    [OrganizationRegistrationRequest.Id], [int], descending=False)
+
+
+def list_activity_transactions(user_id: int, limit: int, cursor: str = None) -> Tuple[Page, int]:
+    """A user's ActivityTransactions, newest first.  Returns ((rows, next cursor), error code)."""
+    return _list(_ACTIVITY_TRANSACTIONS, [ActivityTransaction.UserId == user_id], limit, cursor,
+                 errors.FAILED_TO_QUERY_FOR_TRANSACTIONS_CODE)
+
+
+def list_reward_transactions(user_id: int, limit: int, cursor: str = None) -> Tuple[Page, int]:
+    return _list(_REWARD_TRANSACTIONS, [RewardTransaction.UserId == user_id], limit, cursor,
+                 errors.FAILED_TO_QUERY_FOR_TRANSACTIONS_CODE)
+
+
+def list_activities(organization_id: int, visibility: int, limit: int, cursor: str = None) -> Tuple[Page, int]:
+    """An organization's activities of one Visibility, in Id order."""
+    return _list(_ACTIVITIES, [Activity.AssociatedOrganization == organization_id, Activity.Visibility == visibility],
+                 limit, cursor, errors.FAILED_TO_QUERY_FOR_ORG_CODE)
+
+
+def list_rewards(organization_id: int, visibility: int, limit: int, cursor: str = None) -> Tuple[Page, int]:
+    return _list(_REWARDS, [Reward.AssociatedOrganization == organization_id, Reward.Visibility == visibility],
+                 limit, cursor, errors.FAILED_TO_QUERY_FOR_ORG_CODE)
+
+
+def list_organization_requests(limit: int, cursor: str = None) -> Tuple[Page, int]:
+    """Pending organization requests, oldest first."""
+    return _list(_ORGANIZATION_REQUESTS, [], limit, cursor, errors.FAILED_TO_QUERY_FOR_ORG_CODE)
+
+
+def _list(listing: _Listing, filters: List[Any], limit: int, cursor: Optional[str],
+          query_error_code: int) -> Tuple[Page, int]:
+    after = None
+    if cursor is not None:
+        after = _decode_cursor(cursor, listing.key_types)
+        if after is None:
+            return None, errors.CURSOR_INVALID_CODE
+
+    try:
+        with session_scope() as session:
+            query = session.query(*listing.columns).filter(*filters)
+            if after is not None:
+                key = tuple_(*listing.key)
+                query = query.filter(key < tuple_(*after) if listing.descending else key > tuple_(*after))
+            order = [column.desc() for column in listing.key] if listing.descending else listing.key
+            # One extra row tells whether there is another page.
+            rows = query.order_by(*order).limit(limit + 1).all()
+    except BaseException as e:
+        errors.log_error(query_error_code, str(e), 'backend.data_model.listings', '_list')
+        return None, query_error_code
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor([rows[-1][position] for position in listing.key_positions])
+    return ([_to_dict(listing.names, row) for row in rows], next_cursor), None
+
+
+def _to_dict(names: Sequence[str], row: Sequence[Any]) -> Dict[str, Any]:
+    item = dict(zip(names, row))
+    instant = item.get('instant')
+    if instant is not None:
+        item['instant'] = instant.isoformat()
+    return item
+
+
+def _encode_cursor(values: List[Any]) -> str:
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode()
+
+
+def _decode_cursor(cursor: str, key_types: Sequence[type]) -> Optional[List[Any]]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        return None
+    if type(values) != list or len(values) != len(key_types):
+        return None
+
+    decoded = []
+    for value, key_type in zip(values, key_types):
+        if key_type == datetime:
+            if type(value) != str:
+                return None
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                return None
+        elif type(value) != key_type:
+            return None
+        decoded.append(value)
+    return decoded
@@ -0,0 +1,83 @@
+from typing import Tuple, List
+from datetime import datetime
+from sqlalchemy import select, literal
+import backend.api.errors as errors
+from backend.data_model.db_interface import session_scope, Session
+from backend.data_model.data_model import Organization, RefreshEvent, next_refresh_at
+
+'''
+Periodic organization point refreshes.  Every RefreshIntervalInDays an
+organization's PointsToDistribute is reset to its RefreshAmount and a
+RefreshEvent is written.
+
+Each tick reads only the due organizations through the NextRefreshAt index and
+handles them in batches with set-based statements.  Due rows are locked with
+FOR UPDATE SKIP LOCKED (PostgreSQL), and every statement re-checks
+NextRefreshAt <= now, so several nodes can tick at once and an organization is
+still refreshed exactly once per interval.
+'''
+
+DISTRIBUTE_REFRESH_TYPE = 1
+REFRESH_BATCH_SIZE = 5000
+
+
+def run_due_refreshes(now: datetime = None, batch_size: int = REFRESH_BATCH_SIZE) -> Tuple[int, int]:
+    """Refresh every organization due at now.  Returns (organizations refreshed, error code)."""
+    now = now or datetime.utcnow()
+    refreshed = 0
+    while True:
+        try:
+            with session_scope() as session:
+                selected, updated = _refresh_batch(now, batch_size, session)
+        except BaseException as e:
+            errors.log_error(errors.FAILED_TO_REFRESH_ORGANIZATIONS_CODE, str(e),
+                             'backend.data_model.refresh', 'run_due_refreshes')
+            return refreshed, errors.FAILED_TO_REFRESH_ORGANIZATIONS_CODE
+
+        refreshed += updated
+        if selected < batch_size:
+            return refreshed, None
+
+
+def _refresh_batch(now: datetime, batch_size: int, session: Session) -> Tuple[int, int]:
+    """Returns (organizations selected as due, organizations this call refreshed)."""
+    due = session.query(Organization.Id, Organization.RefreshIntervalInDays) \
+        .filter(Organization.NextRefreshAt <= now) \
+        .order_by(Organization.NextRefreshAt) \
+        .limit(batch_size) \
+        .with_for_update(skip_locked=True) \
+        .all()
+    if not due:
+        return 0, 0
+
+    ids_by_interval = {}
+    for org_id, interval in due:
+        ids_by_interval.setdefault(interval, []).append(org_id)
+    ids = [org_id for org_id, _ in due]
+
+    # Without row locks (SQLite) another node may have refreshed some of these
+    # since the SELECT; the NextRefreshAt guard makes both statements skip them.
+    _insert_refresh_events(ids, now, session)
+    updated = 0
+    for interval, interval_ids in ids_by_interval.items():
+        updated += _apply_refresh(interval_ids, now, next_refresh_at(now, interval), session)
+    return len(due), updated
+
+
+def _insert_refresh_events(ids: List[int], now: datetime, session: Session) -> None:
+    # INSERT ... SELECT, so the events come from the same rows the UPDATE touches.
+    source = select([Organization.RefreshAmount, literal(DISTRIBUTE_REFRESH_TYPE), Organization.Id,
+                     literal(now)]) \
+        .where(Organization.Id.in_(ids)) \
+        .where(Organization.NextRefreshAt <= now)
+    session.execute(RefreshEvent.__table__.insert().from_select(
+        ['Points', 'Type', 'OrganizationId', 'Instant'], source))
+
+
+def _apply_refresh(ids: List[int], now: datetime, next_refresh: datetime, session: Session) -> int:
+    return session.query(Organization) \
+        .filter(Organization.Id.in_(ids)) \
+        .filter(Organization.NextRefreshAt <= now) \
+        .update({Organization.PointsToDistribute: Organization.RefreshAmount,
+                 Organization.LastRefreshInstant: now,
+                 Organization.NextRefreshAt: next_refresh}, synchronize_session=False)
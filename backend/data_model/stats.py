@@ -0,0 +1,333 @@
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Tuple, Dict, Any, List, Optional
+from sqlalchemy import and_, or_
+import backend.api.errors as errors
+from backend.data_model.db_interface import session_scope, Session
+from backend.data_model.data_model import (User, Organization, ActivityTransaction, RewardTransaction,
+                                           UserStats, OrganizationStats)
+
+'''
+User and organization statistics (plan item 7).
+
+UserStats and OrganizationStats hold per day, week and month totals of the
+ledger.  backend.data_model.ledger adds each transaction to its six rollup
+rows in the same database transaction that records it, so a stats page reads
+a handful of rows by primary key instead of grouping the raw transactions.
+
+Results are cached per user or organization for STATS_CACHE_SECONDS.  The
+ledger invalidates an entry as soon as it records a transaction for it; other
+workers see the change once their entry expires.  rebuild_stats() recomputes
+every rollup from the transactions.
+'''
+
+DAY = 1
+WEEK = 2
+MONTH = 3
+PERIODS = (DAY, WEEK, MONTH)
+
+USER = 'user'
+ORGANIZATION = 'organization'
+
+STATS_CACHE_SIZE = int(os.environ.get('VOLUNTEER_STATS_CACHE_SIZE', 10000))
+STATS_CACHE_SECONDS = float(os.environ.get('VOLUNTEER_STATS_CACHE_SECONDS', 30))
+REBUILD_BATCH_SIZE = 100
+STREAM_CHUNK_SIZE = 10000
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Columns read for a stats page, and their names in the result.
+_columns = {USER: (UserStats.BucketStart, UserStats.PointsEarned, UserStats.PointsSpent, UserStats.Activities,
+                   UserStats.Rewards),
+            ORGANIZATION: (OrganizationStats.BucketStart, OrganizationStats.PointsDistributed,
+                           OrganizationStats.PointsConsumed, OrganizationStats.Activities, OrganizationStats.Rewards)}
+_names = {USER: ('start', 'points_earned', 'points_spent', 'activities', 'rewards'),
+          ORGANIZATION: ('start', 'points_distributed', 'points_consumed', 'activities', 'rewards')}
+
+
+def bucket_start(instant: datetime, period: int) -> datetime:
+    """Midnight of the day, of the week's Monday, or of the first of the month containing instant."""
+    day = datetime(instant.year, instant.month, instant.day)
+    if period == DAY:
+        return day
+    if period == WEEK:
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def shift_bucket(start: datetime, period: int, count: int) -> datetime:
+    """The start of the bucket count periods after (or before, if negative) the one starting at start."""
+    if period == DAY:
+        return start + timedelta(days=count)
+    if period == WEEK:
+        return start + timedelta(weeks=count)
+    months = start.year * 12 + start.month - 1 + count
+    return start.replace(year=months // 12, month=months % 12 + 1)
+
+
+class StatsCache:
+    """LRU map of (kind, owner id) to that owner's cached results, each valid until a deadline.
+
+    An entry's generation goes up whenever it is invalidated, so a result read
+    from the database before an invalidation is never stored after it.
+    """
+
+    def __init__(self, max_size: int = STATS_CACHE_SIZE, ttl_seconds: float = STATS_CACHE_SECONDS) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # (kind, owner id) -> [generation, {query key: (result, valid until)}]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, owner: Tuple[str, int], key: Any) -> Tuple[Any, int]:
+        """Returns (cached result or None, generation to pass to put)."""
+        with self._lock:
+            entry = self._entries.get(owner)
+            if entry is None:
+                if self.max_size <= 0:
+                    return None, None
+                entry = self._entries[owner] = [0, {}]
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(owner)
+
+            cached = entry[1].get(key)
+            if cached is not None:
+                if cached[1] > time.time():
+                    return cached[0], entry[0]
+                del entry[1][key]
+            return None, entry[0]
+
+    def put(self, owner: Tuple[str, int], key: Any, result: Any, generation: int) -> None:
+        with self._lock:
+            entry = self._entries.get(owner)
+            if entry is not None and entry[0] == generation:
+                entry[1][key] = (result, time.time() + self.ttl_seconds)
+
+    def invalidate(self, owner: Tuple[str, int]) -> None:
+        with self._lock:
+            entry = self._entries.get(owner)
+            if entry is not None:
+                entry[0] += 1
+                entry[1].clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                entry[0] += 1
+                entry[1].clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def get_cache() -> StatsCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = StatsCache()
+    return _cache
+
+
+def set_cache(cache: Optional[StatsCache]) -> None:
+    global _cache
+    _cache = cache
+
+
+'''
+===================================================================================
+=================================ROLLUPS===========================================
+===================================================================================
+'''
+
+
+def add_activity(transaction: Dict[str, Any], session: Session) -> None:
+    """Count an ActivityTransaction in its user's and organization's rollups, in the caller's transaction."""
+    points = transaction['Points']
+    _add_to_rollups(transaction, (points, 0, 1, 0), session)
+
+
+def add_reward(transaction: Dict[str, Any], session: Session) -> None:
+    points = transaction['Points']
+    _add_to_rollups(transaction, (0, points, 0, 1), session)
+
+
+def invalidate(user_id: int, organization_id: int) -> None:
+    cache = get_cache()
+    cache.invalidate((USER, user_id))
+    cache.invalidate((ORGANIZATION, organization_id))
+
+
+def _add_to_rollups(transaction: Dict[str, Any], deltas: Tuple[int, int, int, int], session: Session) -> None:
+    instant = transaction['Instant']
+    buckets = [(period, bucket_start(instant, period)) for period in PERIODS]
+    _add_to_rollup(UserStats, UserStats.UserId, transaction['UserId'], buckets,
+                   ('PointsEarned', 'PointsSpent', 'Activities', 'Rewards'), deltas, session)
+    _add_to_rollup(OrganizationStats, OrganizationStats.OrganizationId, transaction['OrganizationId'], buckets,
+                   ('PointsDistributed', 'PointsConsumed', 'Activities', 'Rewards'), deltas, session)
+
+
+def _add_to_rollup(table: Any, owner_column: Any, owner_id: int, buckets: List[Tuple[int, datetime]],
+                   columns: Tuple[str, ...], deltas: Tuple[int, ...], session: Session) -> None:
+    # Like the ledger's balances: one UPDATE ... SET x = x + delta for the
+    # day, week and month rows together, then an insert of whichever rows
+    # don't exist yet.  An insert race raises IntegrityError, which the ledger retries.
+    in_buckets = or_(*[and_(table.Period == period, table.BucketStart == start) for period, start in buckets])
+    updated = session.query(table).filter(owner_column == owner_id, in_buckets) \
+        .update({getattr(table, name): getattr(table, name) + delta for name, delta in zip(columns, deltas)},
+                synchronize_session=False)
+    if updated == len(buckets):
+        return
+
+    existing = set(session.query(table.Period).filter(owner_column == owner_id, in_buckets))
+    rows = []
+    for period, start in buckets:
+        if (period,) not in existing:
+            row = {owner_column.key: owner_id, 'Period': period, 'BucketStart': start}
+            row.update(zip(columns, deltas))
+            rows.append(row)
+    session.execute(table.__table__.insert(), rows)
+
+
+'''
+===================================================================================
+==================================READS============================================
+===================================================================================
+'''
+
+
+def get_user_stats(user_id: int, period: int, buckets: int, now: datetime = None) -> Tuple[List[Dict[str, Any]], int]:
+    """The user's last buckets periods, oldest first, skipping empty ones.  Returns (stats, error code)."""
+    return _get_stats(USER, user_id, UserStats, UserStats.UserId, period, buckets, now)
+
+
+def get_organization_stats(organization_id: int, period: int, buckets: int,
+                           now: datetime = None) -> Tuple[List[Dict[str, Any]], int]:
+    return _get_stats(ORGANIZATION, organization_id, OrganizationStats, OrganizationStats.OrganizationId,
+                      period, buckets, now)
+
+
+def _get_stats(kind: str, owner_id: int, table: Any, owner_column: Any, period: int, buckets: int,
+               now: Optional[datetime]) -> Tuple[List[Dict[str, Any]], int]:
+    current = bucket_start(now or datetime.utcnow(), period)
+    # The current bucket is part of the key, so a cached result ends with its period.
+    key = (period, buckets, current)
+    cache = get_cache()
+    result, generation = cache.get((kind, owner_id), key)
+    if result is not None:
+        return result, None
+
+    since = shift_bucket(current, period, 1 - buckets)
+    try:
+        with session_scope() as session:
+            rows = session.query(*_columns[kind]) \
+                .filter(owner_column == owner_id, table.Period == period, table.BucketStart >= since,
+                        table.BucketStart <= current) \
+                .order_by(table.BucketStart) \
+                .all()
+            names = _names[kind]
+            result = [dict(zip(names, (row[0].date().isoformat(),) + tuple(row[1:]))) for row in rows]
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_STATS_CODE, str(e), 'backend.data_model.stats', '_get_stats')
+        return None, errors.FAILED_TO_QUERY_FOR_STATS_CODE
+
+    cache.put((kind, owner_id), key, result, generation)
+    return result, None
+
+
+'''
+===================================================================================
+=================================BACKFILL==========================================
+===================================================================================
+'''
+
+
+def rebuild_stats(batch_size: int = REBUILD_BATCH_SIZE) -> Tuple[int, int]:
+    """Recompute every rollup from the raw transactions.  Returns (rollup rows written, error code).
+
+    Users and organizations are walked in Id order, batch_size at a time, each
+    batch in its own transaction, and their transactions are streamed
+    STREAM_CHUNK_SIZE rows at a time, so memory stays flat however large the
+    ledger is.  Like ledger.reconcile_balances, run it while transactions are
+    not being recorded.
+    """
+    try:
+        written = _rebuild_in_batches(User.Id, batch_size, _rebuild_user_batch)
+        written += _rebuild_in_batches(Organization.Id, batch_size, _rebuild_org_batch)
+    except BaseException as e:
+        errors.log_error(errors.FAILED_TO_REBUILD_STATS_CODE, str(e), 'backend.data_model.stats', 'rebuild_stats')
+        return None, errors.FAILED_TO_REBUILD_STATS_CODE
+    finally:
+        get_cache().clear()
+
+    return written, None
+
+
+def _rebuild_in_batches(id_column: Any, batch_size: int, rebuild_batch: Any) -> int:
+    written = 0
+    last_id = None
+    while True:
+        with session_scope() as session:
+            query = session.query(id_column).order_by(id_column)
+            if last_id is not None:
+                query = query.filter(id_column > last_id)
+            ids = [row[0] for row in query.limit(batch_size)]
+            if not ids:
+                return written
+
+            written += rebuild_batch(ids[0], ids[-1], session)
+            last_id = ids[-1]
+
+
+def _rebuild_user_batch(first_id: int, last_id: int, session: Session) -> int:
+    totals = _sum_by_bucket(ActivityTransaction.UserId, RewardTransaction.UserId, first_id, last_id, session)
+    rows = [{'UserId': user_id, 'Period': period, 'BucketStart': start, 'PointsEarned': earned,
+             'PointsSpent': spent, 'Activities': activities, 'Rewards': rewards}
+            for (user_id, period, start), (earned, spent, activities, rewards) in totals.items()]
+    return _replace_rollups(UserStats, UserStats.UserId, first_id, last_id, rows, session)
+
+
+def _rebuild_org_batch(first_id: int, last_id: int, session: Session) -> int:
+    totals = _sum_by_bucket(ActivityTransaction.OrganizationId, RewardTransaction.OrganizationId,
+                            first_id, last_id, session)
+    rows = [{'OrganizationId': org_id, 'Period': period, 'BucketStart': start, 'PointsDistributed': distributed,
+             'PointsConsumed': consumed, 'Activities': activities, 'Rewards': rewards}
+            for (org_id, period, start), (distributed, consumed, activities, rewards) in totals.items()]
+    return _replace_rollups(OrganizationStats, OrganizationStats.OrganizationId, first_id, last_id, rows, session)
+
+
+def _sum_by_bucket(activity_owner: Any, reward_owner: Any, first_id: int, last_id: int,
+                   session: Session) -> Dict[Tuple[int, int, datetime], List[int]]:
+    """(owner id, period, bucket start) -> [points in, points out, activities, rewards]."""
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    # Each day's week and month buckets, worked out once per day rather than per row.
+    buckets_of_day = {}
+    for owner_column, table, points_index, count_index in [(activity_owner, ActivityTransaction, 0, 2),
+                                                           (reward_owner, RewardTransaction, 1, 3)]:
+        rows = session.query(owner_column, table.Points, table.Instant) \
+            .filter(owner_column.between(first_id, last_id)) \
+            .yield_per(STREAM_CHUNK_SIZE)
+        for owner_id, points, instant in rows:
+            day = datetime(instant.year, instant.month, instant.day)
+            buckets = buckets_of_day.get(day)
+            if buckets is None:
+                buckets = buckets_of_day[day] = [(period, bucket_start(day, period)) for period in PERIODS]
+            for period, start in buckets:
+                total = totals[(owner_id, period, start)]
+                total[points_index] += points
+                total[count_index] += 1
+    return totals
+
+
+def _replace_rollups(table: Any, owner_column: Any, first_id: int, last_id: int, rows: List[Dict[str, Any]],
+                     session: Session) -> int:
+    session.query(table).filter(owner_column.between(first_id, last_id)).delete(synchronize_session=False)
+    if rows:
+        session.execute(table.__table__.insert(), rows)
+    return len(rows)
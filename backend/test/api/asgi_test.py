@@ -0,0 +1,194 @@
+import asyncio
+import json
+import unittest
+from datetime import datetime
+from flask_jwt_extended import create_access_token
+from app import app, asgi_app
+import backend.api.claim_codes as claim_codes
+import backend.api.errors as errors
+import backend.api.hashing as hashing
+import backend.api.notifications as notifications
+import backend.api.tokens as tokens
+from backend.data_model.data_model import User, Organization, Activity
+from backend.data_model.db_interface import session_scope, _user_already_exists
+from backend.test.test_helper import DatabaseTestCase, get_valid_register_user_dict
+
+
+def request(method, path, body=None, headers=(), on_chunk=None):
+    """Run one request through asgi_app.  on_chunk(chunk) may return True to disconnect the client.
+
+    Returns (status, headers, body).
+    """
+    async def run():
+        requests = [{'type': 'http.request', 'body': json.dumps(body).encode() if body is not None else b''}]
+        disconnected = asyncio.Event()
+        response = {'chunks': []}
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = {name.decode(): value.decode() for name, value in message['headers']}
+                return
+            response['chunks'].append(message.get('body', b''))
+            if on_chunk is not None and message.get('body') and await on_chunk(message['body']):
+                disconnected.set()
+
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'root_path': '',
+                 'http_version': '1.1', 'scheme': 'http', 'server': ('testserver', 80),
+                 'headers': [(b'content-type', b'application/json')] +
+                            [(name.lower().encode(), value.encode()) for name, value in headers]}
+        await asgi_app(scope, receive, send)
+        return response['status'], response['headers'], b''.join(response['chunks'])
+
+    return asyncio.run(run())
+
+
+class AsgiTestCase(DatabaseTestCase):
+
+    def setUp(self):
+        hashing.configure(rounds=4)
+        super().setUp()
+        tokens.set_claims_cache(None)
+        tokens.set_revocations(None)
+        claim_codes.set_store(claim_codes.InMemoryClaimStore())
+        app.testing = True
+        self.addCleanup(claim_codes.set_store, None)
+
+    def authorization(self, identity='one@test.com'):
+        with app.app_context():
+            return [('Authorization', 'Bearer ' + create_access_token(identity=identity))]
+
+    def add_user_and_organization(self):
+        with session_scope() as session:
+            session.add(User(Id=1, Email='one@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(Organization(Id=1, Name='Test Org', OwnerId=1, Type=1, PointsToDistribute=1000,
+                                     PointsToConsume=1000, LastRefreshInstant=datetime.utcnow(),
+                                     RefreshIntervalInDays=30, RefreshAmount=1000))
+            session.add(Activity(Id=1, PointsPerHour=0, PointsPerCompletion=7, OneTime=False, Visibility=1,
+                                 AssociatedOrganization=1, Description='Activity 1'))
+
+    def test__random__not_a_loop_route__served_by_flask(self):
+        status, headers, body = request('GET', '/random')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(int(headers['content-length']), len(body))
+        self.assertIsInstance(json.loads(body)['randomNumber'], int)
+
+    def test__issue_claim_code__body_and_authorization__passed_to_flask(self):
+        self.add_user_and_organization()
+        with app.app_context():
+            token = create_access_token(identity='one@test.com')
+
+        status, _, body = request('POST', '/claim-code', {'kind': claim_codes.ACTIVITY},
+                                  [('Authorization', 'Bearer ' + token)])
+
+        self.assertEqual(status, 200)
+        self.assertIsNotNone(claim_codes.get_store().get(json.loads(body)['code']))
+
+    def test__register_then_login__on_loop__tokens_returned(self):
+        user = get_valid_register_user_dict()
+
+        status, _, body = request('POST', '/register-user', user)
+        self.assertEqual(status, 200)
+        self.assertIn('access_token', json.loads(body))
+        with session_scope() as session:
+            self.assertTrue(_user_already_exists(user['email'], session))
+
+        status, _, body = request('POST', '/login-user', {'email': user['email'], 'password': user['password']})
+        self.assertEqual(status, 200)
+        self.assertIn('refresh_token', json.loads(body))
+
+    def test__login_user__wrong_password__422(self):
+        user = get_valid_register_user_dict()
+        request('POST', '/register-user', user)
+
+        status, _, body = request('POST', '/login-user', {'email': user['email'], 'password': 'wrong password'})
+
+        self.assertEqual(status, 422)
+        self.assertEqual(body, errors.error_response_body(errors.LOGIN_INVALID_CODE))
+
+    def test__register_user__existing_email__same_response_as_flask(self):
+        user = get_valid_register_user_dict()
+        request('POST', '/register-user', user)
+
+        status, _, body = request('POST', '/register-user', user)
+        flask_response = app.test_client().post('/register-user', json=user)
+
+        self.assertEqual((status, body), (flask_response.status_code, flask_response.data))
+
+    def test__login_user__not_json__400(self):
+        status, _, body = request('POST', '/login-user', headers=[('content-type', 'text/plain')])
+
+        self.assertEqual(status, 400)
+        self.assertEqual(body, errors.error_response_body(errors.REQUEST_INVALID_CODE))
+
+    def test__claim_code_events__redeemed__redeemed_event_streamed(self):
+        self.add_user_and_organization()
+        claim, _ = claim_codes.issue_claim(1, claim_codes.ACTIVITY)
+
+        async def redeem_once_connected(chunk):
+            if chunk.startswith(b': connected'):
+                await asyncio.get_running_loop().run_in_executor(None, claim_codes.redeem_claim, claim.code, 1, 1)
+
+        status, headers, body = request('GET', '/claim-code/' + claim.code + '/events', headers=self.authorization(),
+                                        on_chunk=redeem_once_connected)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['content-type'], 'text/event-stream')
+        body = body.decode()
+        self.assertTrue(body.startswith(': connected\n\nevent: ' + notifications.REDEEMED_EVENT))
+        self.assertEqual(json.loads(body.split('data: ')[1])['points'], 7)
+        self.assertEqual(len(notifications.get_hub()), 0)
+
+    def test__claim_code_events__client_disconnects__unsubscribed(self):
+        self.add_user_and_organization()
+        claim, _ = claim_codes.issue_claim(1, claim_codes.ACTIVITY)
+
+        async def disconnect(chunk):
+            return True
+
+        status, _, body = request('GET', '/claim-code/' + claim.code + '/events', headers=self.authorization(),
+                                  on_chunk=disconnect)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b': connected\n\n')
+        self.assertEqual(len(notifications.get_hub()), 0)
+
+    def test__claim_code_events__unknown_code__422(self):
+        self.add_user_and_organization()
+
+        status, _, body = request('GET', '/claim-code/123456/events', headers=self.authorization())
+
+        self.assertEqual(status, 422)
+        self.assertEqual(body, errors.error_response_body(errors.CLAIM_CODE_INVALID_CODE))
+
+    def test__claim_code_events__another_users_code__422(self):
+        self.add_user_and_organization()
+        claim, _ = claim_codes.issue_claim(2, claim_codes.ACTIVITY)
+
+        status, _, body = request('GET', '/claim-code/' + claim.code + '/events', headers=self.authorization())
+
+        self.assertEqual(status, 422)
+        self.assertEqual(body, errors.error_response_body(errors.CLAIM_CODE_INVALID_CODE))
+        self.assertEqual(len(notifications.get_hub()), 0)
+
+    def test__claim_code_events__no_access_token__same_response_as_flask(self):
+        claim, _ = claim_codes.issue_claim(1, claim_codes.ACTIVITY)
+        path = '/claim-code/' + claim.code + '/events'
+
+        status, _, body = request('GET', path)
+        flask_response = app.test_client().get(path)
+
+        self.assertEqual((status, body), (401, flask_response.data))
+        self.assertEqual(flask_response.status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
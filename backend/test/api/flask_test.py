@@ -0,0 +1,629 @@
+# From flask.pocoo.org/docs/1.0/testing/
+import gzip
+import json
+import os
+from datetime import datetime
+from app import app, create_app
+import unittest
+from unittest.mock import patch
+from backend.data_model.data_model import (Database, User, Organization, OrganizationRegistrationRequest, Activity,
+                                           Reward)
+from backend.data_model.db_interface import session_scope, _user_already_exists
+import backend.api.errors as errors
+import backend.api.hashing as hashing
+import backend.api.claim_codes as claim_codes
+import backend.api.tokens as tokens
+import backend.api.geo_index as geo_index
+import backend.data_model.leaderboard as leaderboard
+import backend.data_model.stats as stats
+from backend.test.test_helper import DatabaseTestCase, get_valid_register_user_dict, add_organization_types
+
+
+class FlaskTestCase(DatabaseTestCase):
+
+    TEST_ROUNDS = 4
+
+    def setUp(self):
+        hashing.configure(rounds=self.TEST_ROUNDS)
+        super().setUp()
+        tokens.set_claims_cache(None)
+        tokens.set_revocations(None)
+        geo_index.set_index(None)
+        stats.set_cache(None)
+        leaderboard.set_leaderboard(None)
+        app.testing = True
+        self.app = app.test_client()
+
+    def test_one(self):
+        ret = self.app.get('/random')
+        self.assertTrue(type(ret.json["randomNumber"]) == int)
+
+    def test__register_user__valid_input__user_created(self):
+        test_dict = get_valid_register_user_dict()
+        ret = self.post_with_user_dict(test_dict)
+        self.assertTrue(ret.json.get('success'))
+        self.assertIsNone(ret.json.get('errors'))
+
+        with session_scope() as session:
+            self.assertTrue(_user_already_exists(test_dict['email'], session))
+
+    def test__register_user__invalid_email_and_phone_number__return_codes_no_user_created(self):
+        valid_dict = get_valid_register_user_dict()
+        invalid_phone_and_email_dict = {
+            'email': 'test_test.com',
+            'phone_number': '555-555-555'
+            }
+        test_dict = self.merge_dicts(valid_dict, invalid_phone_and_email_dict)
+        ret = self.post_with_user_dict(test_dict)
+
+        self.assertFalse(ret.json.get('success'))
+
+        expected_error_codes = set([errors.EMAIL_INVALID_CODE, errors.PHONE_NUMBER_INVALID_CODE])
+        self.assertTrue(self.contains_only_error_codes(ret.json, expected_error_codes))
+        with session_scope() as session:
+            self.assertFalse(_user_already_exists(test_dict['email'], session))
+
+    def test__register_user__invalid_password_and_last_name__return_codes_no_user_created(self):
+        valid_dict = get_valid_register_user_dict()
+        invalid_password_and_last_name_dict = {
+            'password': 'fivec',
+            'last_name': ''
+        }
+        test_dict = self.merge_dicts(valid_dict, invalid_password_and_last_name_dict)
+        ret = self.post_with_user_dict(test_dict)
+
+        self.assertFalse(ret.json.get('success'))
+
+        expected_error_codes = set([errors.NAME_INVALID_CODE, errors.PASSWORD_INVALID_CODE])
+        self.assertTrue(self.contains_only_error_codes(ret.json, expected_error_codes))
+
+        with session_scope() as session:
+            self.assertFalse(_user_already_exists(test_dict['email'], session))
+
+    def test__register_user__no_first_name__user_created(self):
+        valid_dict = get_valid_register_user_dict()
+        no_first_name_dict = {
+            'first_name': ''
+        }
+        test_dict = self.merge_dicts(valid_dict, no_first_name_dict)
+        ret = self.post_with_user_dict(test_dict)
+
+        self.assertTrue(ret.json.get('success'))
+        self.assertIsNone(ret.json.get('errors'))
+
+        with session_scope() as session:
+            self.assertTrue(_user_already_exists(test_dict['email'], session))
+
+    def test__login_user__valid_credentials__return_tokens(self):
+        test_dict = get_valid_register_user_dict()
+        self.post_with_user_dict(test_dict)
+
+        ret = self.post_login(test_dict['email'], test_dict['password'])
+
+        self.assertEqual(ret.status_code, 200)
+        self.assertTrue(ret.json.get('success'))
+        self.assertIsNotNone(ret.json.get('access_token'))
+        self.assertIsNotNone(ret.json.get('refresh_token'))
+
+    def test__login_user__wrong_password__return_code_and_422(self):
+        test_dict = get_valid_register_user_dict()
+        self.post_with_user_dict(test_dict)
+
+        ret = self.post_login(test_dict['email'], 'wrong password')
+
+        self.assertEqual(ret.status_code, 422)
+        self.assertTrue(self.contains_only_error_codes(ret.json, set([errors.LOGIN_INVALID_CODE])))
+
+    def test__login_user__outdated_cost__password_rehashed(self):
+        test_dict = get_valid_register_user_dict()
+        self.post_with_user_dict(test_dict)
+
+        hashing.configure(rounds=self.TEST_ROUNDS + 1)
+        ret = self.post_login(test_dict['email'], test_dict['password'])
+        self.assertTrue(ret.json.get('success'))
+
+        with session_scope() as session:
+            password_hash = session.query(User.PasswordHash).filter_by(Email=test_dict['email']).scalar()
+        self.assertEqual(hashing.get_cost(password_hash), self.TEST_ROUNDS + 1)
+
+    def test__login_user__email_differs_in_case__return_tokens(self):
+        test_dict = get_valid_register_user_dict()
+        self.post_with_user_dict(test_dict)
+
+        ret = self.post_login(test_dict['email'].upper(), test_dict['password'])
+
+        self.assertEqual(ret.status_code, 200)
+        self.assertTrue(ret.json.get('success'))
+
+    @patch('backend.api.hashing.dummy_verify')
+    def test__login_user__unknown_email__dummy_verify_and_422(self, m_dummy_verify):
+        ret = self.post_login('nobody@test.com', 'password')
+
+        self.assertEqual(ret.status_code, 422)
+        self.assertTrue(self.contains_only_error_codes(ret.json, set([errors.LOGIN_INVALID_CODE])))
+        m_dummy_verify.assert_called_once_with('password')
+
+    @patch('backend.api.hashing.hash_password')
+    def test__register_user__hashing_pool_saturated__return_503_and_retry_after(self, m_hash_password):
+        m_hash_password.side_effect = hashing.HashingServiceBusyError()
+
+        ret = self.post_with_user_dict(get_valid_register_user_dict())
+
+        self.assertEqual(ret.status_code, 503)
+        self.assertEqual(ret.headers.get('Retry-After'), str(hashing.RETRY_AFTER_SECONDS))
+        self.assertTrue(self.contains_only_error_codes(ret.json, set([errors.SERVER_BUSY_CODE])))
+
+    def test__create_app__no_database__schema_not_created(self):
+        lazy_name = 'lazy_test'
+        create_app(lazy_name)
+        try:
+            self.assertEqual(str(Database.Engine.url), 'sqlite:///' + lazy_name + '.db')
+            self.assertFalse(os.path.exists(lazy_name + '.db'))
+        finally:
+            Database.Engine.dispose()
+
+    def test__create_app__hashing_pool_started_before_first_request(self):
+        hashing.shutdown()
+        create_app('pool_test')
+        try:
+            self.assertIsNotNone(hashing._pool)
+        finally:
+            Database.Engine.dispose()
+
+    def test__reset_pool_after_fork__new_pool(self):
+        Database.init_engine('fork_test')
+        inherited_pool = Database.Engine.pool
+        Database.reset_pool_after_fork()
+        self.assertIsNot(Database.Engine.pool, inherited_pool)
+
+    def test__claim_code__issue_and_redeem__points_added(self):
+        test_dict = get_valid_register_user_dict()
+        access_token = self.post_with_user_dict(test_dict).json['access_token']
+        claim_codes.set_store(claim_codes.InMemoryClaimStore())
+        self.add_organization()
+
+        headers = {'Authorization': 'Bearer ' + access_token}
+
+        ret = self.app.post('/claim-code', json={'kind': claim_codes.ACTIVITY}, headers=headers)
+        self.assertEqual(ret.status_code, 200)
+        self.assertEqual(len(ret.json['code']), 6)
+        self.assertGreater(ret.json['expires_in'], 0)
+
+        redeem = {'code': ret.json['code'], 'organization_id': 1, 'item_id': 1, 'hours': 2}
+        first = self.app.post('/redeem-claim-code', json=redeem, headers=headers)
+        second = self.app.post('/redeem-claim-code', json=redeem, headers=headers)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json['points'], 9)
+        self.assertEqual(second.status_code, 422)
+        self.assertTrue(self.contains_only_error_codes(second.json, set([errors.CLAIM_CODE_INVALID_CODE])))
+
+    def test__redeem_claim_code__organization_budget_short__error_and_code_kept(self):
+        access_token = self.post_with_user_dict(get_valid_register_user_dict()).json['access_token']
+        headers = {'Authorization': 'Bearer ' + access_token}
+        claim_codes.set_store(claim_codes.InMemoryClaimStore())
+        self.add_organization(points=5)
+        code = self.app.post('/claim-code', json={'kind': claim_codes.ACTIVITY}, headers=headers).json['code']
+
+        short = self.app.post('/redeem-claim-code', json={'code': code, 'organization_id': 1, 'item_id': 1,
+                                                          'hours': 1}, headers=headers)
+        covered = self.app.post('/redeem-claim-code', json={'code': code, 'organization_id': 1, 'item_id': 1},
+                                headers=headers)
+
+        self.assertEqual(short.status_code, 200)
+        self.assertTrue(self.contains_only_error_codes(short.json,
+                                                       set([errors.INSUFFICIENT_ORGANIZATION_POINTS_CODE])))
+        self.assertEqual(covered.status_code, 200)
+        self.assertTrue(covered.json['success'])
+
+    def test__redeem_claim_code__not_owner__403_and_code_kept(self):
+        access_token = self.post_with_user_dict(get_valid_register_user_dict()).json['access_token']
+        headers = {'Authorization': 'Bearer ' + access_token}
+        claim_codes.set_store(claim_codes.InMemoryClaimStore())
+        with session_scope() as session:
+            session.add(User(Id=99, Email='owner@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(Organization(Id=2, Name='Org 2', OwnerId=99, Type=1, PointsToDistribute=1000,
+                                     PointsToConsume=1000, LastRefreshInstant=datetime.utcnow(),
+                                     RefreshIntervalInDays=30, RefreshAmount=1000))
+        code = self.app.post('/claim-code', json={'kind': claim_codes.ACTIVITY}, headers=headers).json['code']
+        redeem = {'code': code, 'organization_id': 2, 'item_id': 1}
+
+        no_token = self.app.post('/redeem-claim-code', json=redeem)
+        not_owner = self.app.post('/redeem-claim-code', json=redeem, headers=headers)
+
+        self.assertEqual(no_token.status_code, 401)
+        self.assertEqual(not_owner.status_code, 403)
+        self.assertTrue(self.contains_only_error_codes(not_owner.json, set([errors.OWNER_REQUIRED_CODE])))
+        self.assertIsNotNone(claim_codes.get_store().get(code))
+
+    def test__redeem_claim_code__reward_without_or_with_unknown_item__rejected_and_code_kept(self):
+        access_token = self.post_with_user_dict(get_valid_register_user_dict()).json['access_token']
+        headers = {'Authorization': 'Bearer ' + access_token}
+        claim_codes.set_store(claim_codes.InMemoryClaimStore())
+        self.add_organization()
+        code = self.app.post('/claim-code', json={'kind': claim_codes.REWARD}, headers=headers).json['code']
+
+        no_item = self.app.post('/redeem-claim-code', json={'code': code, 'organization_id': 1}, headers=headers)
+        unknown_item = self.app.post('/redeem-claim-code', json={'code': code, 'organization_id': 1, 'item_id': 2},
+                                     headers=headers)
+
+        self.assertEqual(no_item.status_code, 400)
+        self.assertTrue(self.contains_only_error_codes(no_item.json, set([errors.REQUEST_INVALID_CODE])))
+        self.assertEqual(unknown_item.status_code, 422)
+        self.assertTrue(self.contains_only_error_codes(unknown_item.json, set([errors.ITEM_INVALID_CODE])))
+        self.assertIsNotNone(claim_codes.get_store().get(code))
+
+    def test__claim_code__no_token__rejected(self):
+        ret = self.app.post('/claim-code', json={'kind': claim_codes.ACTIVITY})
+        self.assertEqual(ret.status_code, 401)
+
+    def test__refresh_token__refresh_token__new_access_token_accepted(self):
+        refresh_token = self.post_with_user_dict(get_valid_register_user_dict()).json['refresh_token']
+
+        ret = self.app.post('/refresh-token', headers={'Authorization': 'Bearer ' + refresh_token})
+        self.assertEqual(ret.status_code, 200)
+        self.assertIsNone(ret.json.get('refresh_token'))
+
+        events = self.app.post('/claim-code', json={'kind': claim_codes.ACTIVITY},
+                               headers={'Authorization': 'Bearer ' + ret.json['access_token']})
+        self.assertEqual(events.status_code, 200)
+
+    def test__refresh_token__access_token__rejected(self):
+        access_token = self.post_with_user_dict(get_valid_register_user_dict()).json['access_token']
+
+        ret = self.app.post('/refresh-token', headers={'Authorization': 'Bearer ' + access_token})
+        self.assertEqual(ret.status_code, 422)
+
+    def test__logout__cached_token__rejected_afterwards(self):
+        tokens_json = self.post_with_user_dict(get_valid_register_user_dict()).json
+        access_header = {'Authorization': 'Bearer ' + tokens_json['access_token']}
+        refresh_header = {'Authorization': 'Bearer ' + tokens_json['refresh_token']}
+        self.assertEqual(self.app.post('/claim-code', json={'kind': claim_codes.ACTIVITY},
+                                       headers=access_header).status_code, 200)
+
+        self.assertEqual(self.app.post('/logout', headers=access_header).status_code, 200)
+        self.assertEqual(self.app.post('/logout-refresh', headers=refresh_header).status_code, 200)
+
+        self.assertEqual(self.app.post('/claim-code', json={'kind': claim_codes.ACTIVITY},
+                                       headers=access_header).status_code, 401)
+        self.assertEqual(self.app.post('/refresh-token', headers=refresh_header).status_code, 401)
+
+    def test__nearby_organizations__query_args__nearest_of_type_paged(self):
+        self.post_with_user_dict(get_valid_register_user_dict())
+        locations = [(1, 43.07, -89.40, 1), (2, 43.20, -89.40, 1), (3, 43.08, -89.40, 2), (4, 44.00, -89.40, 1)]
+        with session_scope() as session:
+            owner_id = session.query(User.Id).scalar()
+            for org_id, _, _, org_type in locations:
+                session.add(Organization(Id=org_id, Name='Org ' + str(org_id), OwnerId=owner_id, Type=org_type,
+                                         PointsToDistribute=0, PointsToConsume=0, LastRefreshInstant=datetime.utcnow(),
+                                         RefreshIntervalInDays=30, RefreshAmount=0))
+        for location in locations:
+            self.assertIsNone(geo_index.get_index().set_location(*location))
+
+        first = self.app.get('/organizations/nearby?latitude=43.07&longitude=-89.40&type=1&limit=2')
+        second = self.app.get('/organizations/nearby?latitude=43.07&longitude=-89.40&type=1&limit=2&offset=2')
+        within = self.app.get('/organizations/nearby?latitude=43.07&longitude=-89.40&radius_km=20')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([org['id'] for org in first.json['organizations']], [1, 2])
+        self.assertEqual(first.json['organizations'][0], {'id': 1, 'name': 'Org 1', 'type': 1, 'distance_km': 0.0})
+        self.assertEqual(first.json['next_offset'], 2)
+        self.assertEqual([org['id'] for org in second.json['organizations']], [4])
+        self.assertIsNone(second.json['next_offset'])
+        self.assertEqual([org['id'] for org in within.json['organizations']], [1, 3, 2])
+
+    def test__set_organization_location__owner__found_nearby_until_cleared(self):
+        access_token = self.post_with_user_dict(get_valid_register_user_dict()).json['access_token']
+        headers = {'Authorization': 'Bearer ' + access_token}
+        self.add_organization()
+        nearby = '/organizations/nearby?latitude=43.07&longitude=-89.40'
+
+        half = self.app.put('/organizations/1/location', json={'latitude': 43.07}, headers=headers)
+        located = self.app.put('/organizations/1/location', json={'latitude': 43.07, 'longitude': -89.40},
+                               headers=headers)
+        found = self.app.get(nearby)
+        cleared = self.app.put('/organizations/1/location', json={'latitude': None, 'longitude': None},
+                               headers=headers)
+        gone = self.app.get(nearby)
+
+        self.assertEqual(half.status_code, 400)
+        self.assertTrue(self.contains_only_error_codes(half.json, set([errors.LOCATION_INVALID_CODE])))
+        self.assertEqual(located.status_code, 200)
+        self.assertEqual([org['id'] for org in found.json['organizations']], [1])
+        self.assertEqual(cleared.status_code, 200)
+        self.assertEqual(gone.json['organizations'], [])
+
+    def test__set_organization_location__not_owner__403(self):
+        access_token = self.post_with_user_dict(get_valid_register_user_dict()).json['access_token']
+        with session_scope() as session:
+            session.add(User(Id=99, Email='owner@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(Organization(Id=1, Name='Org 1', OwnerId=99, Type=1, PointsToDistribute=0,
+                                     PointsToConsume=0, LastRefreshInstant=datetime.utcnow(),
+                                     RefreshIntervalInDays=30, RefreshAmount=0))
+
+        ret = self.app.put('/organizations/1/location', json={'latitude': 43.07, 'longitude': -89.40},
+                           headers={'Authorization': 'Bearer ' + access_token})
+
+        self.assertEqual(ret.status_code, 403)
+        self.assertTrue(self.contains_only_error_codes(ret.json, set([errors.OWNER_REQUIRED_CODE])))
+
+    def test__nearby_organizations__bad_location__return_code_and_400(self):
+        ret = self.app.get('/organizations/nearby?latitude=91&longitude=east&limit=1000')
+
+        self.assertEqual(ret.status_code, 400)
+        self.assertTrue(self.contains_only_error_codes(ret.json, set([errors.LOCATION_INVALID_CODE,
+                                                                     errors.REQUEST_INVALID_CODE])))
+
+    def test__stats__after_redeeming__earned_points_in_todays_bucket(self):
+        access_token = self.post_with_user_dict(get_valid_register_user_dict()).json['access_token']
+        headers = {'Authorization': 'Bearer ' + access_token}
+        claim_codes.set_store(claim_codes.InMemoryClaimStore())
+        self.add_organization()
+        code = self.app.post('/claim-code', json={'kind': claim_codes.ACTIVITY}, headers=headers).json['code']
+        self.app.post('/redeem-claim-code', json={'code': code, 'organization_id': 1, 'item_id': 1}, headers=headers)
+
+        user = self.app.get('/stats?period=week&buckets=4', headers=headers)
+        organization = self.app.get('/organizations/1/stats', headers=headers)
+        invalid = self.app.get('/stats?period=year', headers=headers)
+
+        self.assertEqual(user.status_code, 200)
+        self.assertEqual([(b['points_earned'], b['activities']) for b in user.json['buckets']], [(5, 1)])
+        self.assertEqual([b['points_distributed'] for b in organization.json['buckets']], [5])
+        self.assertEqual(invalid.status_code, 400)
+
+    def test__organization_stats__not_owner__403(self):
+        access_token = self.post_with_user_dict(get_valid_register_user_dict()).json['access_token']
+        headers = {'Authorization': 'Bearer ' + access_token}
+        with session_scope() as session:
+            session.add(User(Id=99, Email='owner@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(Organization(Id=1, Name='Org 1', OwnerId=99, Type=1, PointsToDistribute=0,
+                                     PointsToConsume=0, LastRefreshInstant=datetime.utcnow(),
+                                     RefreshIntervalInDays=30, RefreshAmount=0))
+
+        not_owner = self.app.get('/organizations/1/stats', headers=headers)
+        missing = self.app.get('/organizations/2/stats', headers=headers)
+
+        self.assertEqual(not_owner.status_code, 403)
+        self.assertTrue(self.contains_only_error_codes(not_owner.json, set([errors.OWNER_REQUIRED_CODE])))
+        self.assertEqual(missing.status_code, 404)
+
+    def test__leaderboard__after_redeeming__user_ranked(self):
+        test_dict = get_valid_register_user_dict()
+        access_token = self.post_with_user_dict(test_dict).json['access_token']
+        headers = {'Authorization': 'Bearer ' + access_token}
+        claim_codes.set_store(claim_codes.InMemoryClaimStore())
+        self.add_organization()
+        code = self.app.post('/claim-code', json={'kind': claim_codes.ACTIVITY}, headers=headers).json['code']
+        self.app.post('/redeem-claim-code', json={'code': code, 'organization_id': 1, 'item_id': 1}, headers=headers)
+
+        top = self.app.get('/leaderboard?organization_id=1')
+        mine = self.app.get('/leaderboard/me', headers=headers)
+
+        self.assertEqual(top.status_code, 200)
+        self.assertEqual([(leader['rank'], leader['points']) for leader in top.json['leaders']], [(1, 5)])
+        self.assertEqual(top.json['leaders'][0]['name'],
+                         test_dict['first_name'] + ' ' + test_dict['last_name'][0] + '.')
+        self.assertIsNone(top.json['next_offset'])
+        self.assertEqual((mine.json['rank'], mine.json['points']), (1, 5))
+
+    def test__decide_organization_requests__admin__approved_and_rejected(self):
+        test_dict = get_valid_register_user_dict()
+        access_token = self.post_with_user_dict(test_dict).json['access_token']
+        headers = {'Authorization': 'Bearer ' + access_token}
+        with session_scope() as session:
+            add_organization_types(session)
+            for request_id in (1, 2):
+                session.add(OrganizationRegistrationRequest(
+                    Id=request_id, SubmittingUserId=1, OrganizationName='Org ' + str(request_id), Message='',
+                    ContactPhoneNumber='6086086008', ContactEmail='org@test.com', OrganizationURL='org.com'))
+
+        with patch('backend.api.api.ADMIN_EMAILS', frozenset([test_dict['email']])):
+            ret = self.app.post('/admin/organization-requests/decisions', json={'approve': [1], 'reject': [2, 3]},
+                                headers=headers)
+
+        self.assertEqual(ret.status_code, 200)
+        self.assertEqual([(result['request_id'], result['status']) for result in ret.json['results']],
+                         [(1, 'approved'), (2, 'rejected'), (3, 'not_found')])
+        self.assertIsNotNone(ret.json['results'][0]['organization_id'])
+
+    def test__decide_organization_requests__options_out_of_range_or_unknown_type__rejected(self):
+        test_dict = get_valid_register_user_dict()
+        headers = {'Authorization': 'Bearer ' + self.post_with_user_dict(test_dict).json['access_token']}
+        with session_scope() as session:
+            add_organization_types(session)
+            session.add(OrganizationRegistrationRequest(
+                Id=1, SubmittingUserId=1, OrganizationName='Org 1', Message='', ContactPhoneNumber='6086086008',
+                ContactEmail='org@test.com', OrganizationURL='org.com'))
+
+        with patch('backend.api.api.ADMIN_EMAILS', frozenset([test_dict['email']])):
+            out_of_range = self.app.post('/admin/organization-requests/decisions', headers=headers, json={
+                'approve': [1], 'refresh_interval_in_days': 10 ** 9, 'refresh_amount': 10 ** 12})
+            unknown_type = self.app.post('/admin/organization-requests/decisions', headers=headers,
+                                         json={'approve': [1], 'organization_type': 9})
+
+        self.assertEqual(out_of_range.status_code, 400)
+        self.assertTrue(self.contains_only_error_codes(out_of_range.json, set([errors.REQUEST_INVALID_CODE,
+                                                                                errors.POINTS_INVALID_CODE])))
+        self.assertEqual(unknown_type.status_code, 422)
+        self.assertTrue(self.contains_only_error_codes(unknown_type.json,
+                                                       set([errors.ORGANIZATION_TYPE_INVALID_CODE])))
+
+    def test__decide_organization_requests__not_admin__403(self):
+        access_token = self.post_with_user_dict(get_valid_register_user_dict()).json['access_token']
+
+        ret = self.app.post('/admin/organization-requests/decisions', json={'approve': [1]},
+                            headers={'Authorization': 'Bearer ' + access_token})
+        self.assertEqual(ret.status_code, 403)
+        self.assertTrue(self.contains_only_error_codes(ret.json, set([errors.ADMIN_REQUIRED_CODE])))
+
+    def test__activity_transactions__after_redeeming__paged_with_cursor(self):
+        access_token = self.post_with_user_dict(get_valid_register_user_dict()).json['access_token']
+        headers = {'Authorization': 'Bearer ' + access_token}
+        claim_codes.set_store(claim_codes.InMemoryClaimStore())
+        self.add_organization()
+        for hours in (None, 1):
+            code = self.app.post('/claim-code', json={'kind': claim_codes.ACTIVITY}, headers=headers).json['code']
+            redeem = {'code': code, 'organization_id': 1, 'item_id': 1}
+            if hours is not None:
+                redeem['hours'] = hours
+            self.app.post('/redeem-claim-code', json=redeem, headers=headers)
+
+        first = self.app.get('/transactions/activities?limit=1', headers=headers)
+        second = self.app.get('/transactions/activities?limit=1&cursor=' + first.json['next_cursor'],
+                              headers=headers)
+        invalid = self.app.get('/transactions/activities?cursor=bogus', headers=headers)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([item['points'] for item in first.json['items'] + second.json['items']], [7, 5])
+        self.assertIsNone(second.json['next_cursor'])
+        self.assertEqual(invalid.status_code, 400)
+        self.assertTrue(self.contains_only_error_codes(invalid.json, set([errors.CURSOR_INVALID_CODE])))
+
+    def test__organization_activities__private__owner_or_admin_only(self):
+        test_dict = get_valid_register_user_dict()
+        headers = {'Authorization': 'Bearer ' + self.post_with_user_dict(test_dict).json['access_token']}
+        with session_scope() as session:
+            session.add(User(Id=99, Email='owner@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(Organization(Id=1, Name='Org 1', OwnerId=99, Type=1, PointsToDistribute=0,
+                                     PointsToConsume=0, LastRefreshInstant=datetime.utcnow(),
+                                     RefreshIntervalInDays=30, RefreshAmount=0))
+            for activity_id, visibility in ((1, 1), (2, 2)):
+                session.add(Activity(Id=activity_id, PointsPerHour=0, PointsPerCompletion=5, OneTime=False,
+                                     Visibility=visibility, AssociatedOrganization=1,
+                                     Description='Activity ' + str(activity_id)))
+
+        public = self.app.get('/organizations/1/activities', headers=headers)
+        private = self.app.get('/organizations/1/activities?visibility=private', headers=headers)
+        with patch('backend.api.api.ADMIN_EMAILS', frozenset([test_dict['email']])):
+            admin = self.app.get('/organizations/1/activities?visibility=private', headers=headers)
+
+        self.assertEqual([item['id'] for item in public.json['items']], [1])
+        self.assertEqual(private.status_code, 403)
+        self.assertTrue(self.contains_only_error_codes(private.json, set([errors.OWNER_REQUIRED_CODE])))
+        self.assertEqual([item['id'] for item in admin.json['items']], [2])
+
+    def test__organization_requests__admin__pending_requests_listed(self):
+        test_dict = get_valid_register_user_dict()
+        headers = {'Authorization': 'Bearer ' + self.post_with_user_dict(test_dict).json['access_token']}
+        with session_scope() as session:
+            session.add(OrganizationRegistrationRequest(
+                Id=1, SubmittingUserId=1, OrganizationName='Org 1', Message='', ContactPhoneNumber='6086086008',
+                ContactEmail='org@test.com', OrganizationURL='org.com'))
+
+        not_admin = self.app.get('/admin/organization-requests', headers=headers)
+        with patch('backend.api.api.ADMIN_EMAILS', frozenset([test_dict['email']])):
+            admin = self.app.get('/admin/organization-requests', headers=headers)
+
+        self.assertEqual(not_admin.status_code, 403)
+        self.assertEqual([item['organization_name'] for item in admin.json['items']], ['Org 1'])
+        self.assertIsNone(admin.json['next_cursor'])
+
+    def test__export_activity_transactions__gzip_accepted__compressed_csv(self):
+        access_token = self.post_with_user_dict(get_valid_register_user_dict()).json['access_token']
+        headers = {'Authorization': 'Bearer ' + access_token}
+        claim_codes.set_store(claim_codes.InMemoryClaimStore())
+        self.add_organization()
+        code = self.app.post('/claim-code', json={'kind': claim_codes.ACTIVITY}, headers=headers).json['code']
+        self.app.post('/redeem-claim-code', json={'code': code, 'organization_id': 1, 'item_id': 1}, headers=headers)
+
+        plain = self.app.get('/transactions/activities/export', headers=headers)
+        compressed = self.app.get('/transactions/activities/export?format=ndjson',
+                                  headers=dict(headers, **{'Accept-Encoding': 'gzip'}))
+        invalid = self.app.get('/transactions/activities/export?format=xml', headers=headers)
+
+        self.assertEqual(plain.status_code, 200)
+        self.assertEqual(plain.mimetype, 'text/csv')
+        self.assertEqual([line.split(',')[2] for line in plain.data.decode().splitlines()], ['points', '5'])
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(compressed.data))['points'], 5)
+        self.assertEqual(invalid.status_code, 400)
+
+    def test__export_organization_ledger__not_owner__403(self):
+        access_token = self.post_with_user_dict(get_valid_register_user_dict()).json['access_token']
+        headers = {'Authorization': 'Bearer ' + access_token}
+        with session_scope() as session:
+            session.add(User(Id=99, Email='owner@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(Organization(Id=1, Name='Org 1', OwnerId=99, Type=1, PointsToDistribute=0,
+                                     PointsToConsume=0, LastRefreshInstant=datetime.utcnow(),
+                                     RefreshIntervalInDays=30, RefreshAmount=0))
+
+        not_owner = self.app.get('/organizations/1/ledger/export', headers=headers)
+        missing = self.app.get('/organizations/2/ledger/export', headers=headers)
+
+        self.assertEqual(not_owner.status_code, 403)
+        self.assertTrue(self.contains_only_error_codes(not_owner.json, set([errors.OWNER_REQUIRED_CODE])))
+        self.assertEqual(missing.status_code, 404)
+
+    def test__import_users__admin_uploads_csv__imported_and_failures_reported(self):
+        test_dict = get_valid_register_user_dict()
+        headers = {'Authorization': 'Bearer ' + self.post_with_user_dict(test_dict).json['access_token']}
+        body = ('email,password,last_name,phone_number\n'
+                'new@test.com,password,last,6086086008\n'
+                '%s,password,last,6086086008\n' % test_dict['email'])
+
+        not_admin = self.app.post('/admin/import/users', data=body, content_type='text/csv', headers=headers)
+        with patch('backend.api.api.ADMIN_EMAILS', frozenset([test_dict['email']])):
+            ret = self.app.post('/admin/import/users', data=body, content_type='text/csv', headers=headers)
+            unsupported = self.app.post('/admin/import/users', data=body, content_type='text/plain',
+                                        headers=headers)
+
+        self.assertEqual(not_admin.status_code, 403)
+        self.assertEqual(ret.status_code, 200)
+        self.assertEqual(ret.json['imported'], 1)
+        self.assertEqual(ret.json['failed'], [{'row': 2, 'errors': [errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE]}])
+        self.assertEqual(self.post_login('new@test.com', 'password').status_code, 200)
+        self.assertEqual(unsupported.status_code, 415)
+
+    def post_login(self, email, password):
+        return self.app.post('/login-user', json={'email': email, 'password': password},
+                             follow_redirects=True)
+
+    def add_organization(self, points=1000):
+        """Organization 1, owned by the first registered user, with points to distribute and consume.
+
+        Its activity 1 pays 5 points plus 2 an hour and its reward 1 costs 3.
+        """
+        with session_scope() as session:
+            owner_id = session.query(User.Id).order_by(User.Id).limit(1).scalar()
+            session.add(Organization(Id=1, Name='Org 1', OwnerId=owner_id, Type=1, PointsToDistribute=points,
+                                     PointsToConsume=points, LastRefreshInstant=datetime.utcnow(),
+                                     RefreshIntervalInDays=30, RefreshAmount=points))
+            session.add(Activity(Id=1, PointsPerHour=2, PointsPerCompletion=5, OneTime=False, Visibility=1,
+                                 AssociatedOrganization=1, Description='Activity 1'))
+            session.add(Reward(Id=1, OneTime=False, PointsPerReward=3, Visibility=1, AssociatedOrganization=1,
+                               Description='Reward 1'))
+
+    def post_with_user_dict(self, user_dict):
+        return self.app.post('/register-user', json=user_dict, follow_redirects=True)
+
+    def merge_dicts(self, source, target):
+        dic = source.copy()
+        dic.update(target)
+        return dic
+
+    def contains_only_error_codes(self, json, expected_codes_set):
+        errors = json.get('errors')
+        if errors is None:
+            return False
+
+        found_codes_set = set()
+        for error in errors:
+            error = error.get('error')
+            if error is None:
+                continue
+            error_code = error.get('error_code')
+            if error_code is None:
+                continue
+            found_codes_set.add(error_code)
+
+        symmetric_difference = found_codes_set.symmetric_difference(expected_codes_set)
+        return len(symmetric_difference) == 0
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+'''
+Approving --requests organization requests with one decide_org_requests()
+call, against promoting them one transaction at a time through the ORM.
+
+    python -m backend.test.benchmark.approvals_bench --requests 10000
+'''
+import argparse
+import time
+from datetime import datetime, timedelta
+import backend.data_model.approvals as approvals
+import backend.data_model.db_interface as db_int
+from backend.data_model.data_model import (Database, User, Organization, OrganizationType,
+                                           OrganizationRegistrationRequest, OrganizationRegistrationDecision)
+
+BENCH_DB = 'bench'
+
+
+def seed(requests: int) -> None:
+    Database.create_database(BENCH_DB)
+    db_int.set_database(Database.Engine)
+    with db_int.session_scope() as session:
+        # drop_all leaves the file of an earlier run, and create_database only seeds a new one.
+        if session.query(OrganizationType).count() == 0:
+            Database._initialize_org_types()
+    with Database.Engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [{'Id': 1, 'Email': 'owner@bench.com', 'PasswordHash': 'hash',
+                                                      'LastName': 'last', 'PhoneNumber': '6086086008'}])
+        connection.execute(OrganizationRegistrationRequest.__table__.insert(), [
+            {'Id': i, 'SubmittingUserId': 1, 'OrganizationName': 'Org %d' % i, 'Message': '',
+             'ContactPhoneNumber': '6086086008', 'ContactEmail': 'org@bench.com', 'OrganizationURL': 'org.com'}
+            for i in range(1, requests + 1)])
+
+
+def approve_one_at_a_time(request_ids: list) -> None:
+    now = datetime.utcnow()
+    for request_id in request_ids:
+        with db_int.session_scope() as session:
+            request = session.query(OrganizationRegistrationRequest).get(request_id)
+            organization = Organization(Name=request.OrganizationName, OwnerId=request.SubmittingUserId,
+                                        Type=approvals.DEFAULT_ORGANIZATION_TYPE,
+                                        PointsToDistribute=approvals.DEFAULT_REFRESH_AMOUNT,
+                                        PointsToConsume=approvals.DEFAULT_REFRESH_AMOUNT, LastRefreshInstant=now,
+                                        RefreshIntervalInDays=approvals.DEFAULT_REFRESH_INTERVAL_IN_DAYS,
+                                        RefreshAmount=approvals.DEFAULT_REFRESH_AMOUNT,
+                                        NextRefreshAt=now + timedelta(days=approvals.DEFAULT_REFRESH_INTERVAL_IN_DAYS))
+            session.add(organization)
+            session.flush()
+            session.add(OrganizationRegistrationDecision(
+                RequestId=request.Id, SubmittingUserId=request.SubmittingUserId,
+                OrganizationName=request.OrganizationName, Message=request.Message,
+                ContactPhoneNumber=request.ContactPhoneNumber, ContactEmail=request.ContactEmail,
+                OrganizationURL=request.OrganizationURL, Approved=True, OrganizationId=organization.Id,
+                DecidedAt=now))
+            session.delete(request)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=10000)
+    args = parser.parse_args()
+    request_ids = list(range(1, args.requests + 1))
+
+    for label, approve in [('one at a time', approve_one_at_a_time),
+                           ('decide_org_requests', lambda ids: approvals.decide_org_requests(ids, []))]:
+        seed(args.requests)
+        try:
+            start = time.perf_counter()
+            approve(request_ids)
+            elapsed = time.perf_counter() - start
+            with db_int.session_scope() as session:
+                assert session.query(Organization).count() == args.requests
+            print('%-20s %7.2fs (%.0f requests/s)' % (label, elapsed, args.requests / elapsed))
+        finally:
+            Database.drop_all_test_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
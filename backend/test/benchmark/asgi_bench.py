@@ -0,0 +1,290 @@
+'''
+Concurrency one worker can hold, served as WSGI and as ASGI.  The WSGI server
+is werkzeug's, threaded, as in load_bench; asgi_app runs under the minimal
+HTTP/1.1 server below, since this environment has no ASGI server; deploy it
+under uvicorn or similar.
+
+For each --waiters level a fresh server is started and that many clients
+open a claim code event stream and keep it open, as devices showing a code
+do.  While they wait, --concurrency clients log in (bcrypt at --rounds) for
+--duration seconds, then fetch /random for as long.  Printed per server and
+level: the streams held, the server's threads and resident memory, and
+throughput and p50/p99 latency of the logins and of /random.
+
+    python -m backend.test.benchmark.asgi_bench --waiters 0 --waiters 1000 --waiters 4000
+'''
+import argparse
+import asyncio
+import http
+import json
+import multiprocessing
+import random
+import signal
+import sys
+import time
+from typing import Dict, Any, List, Tuple, Optional
+from urllib.parse import unquote
+from flask_jwt_extended import create_access_token
+import backend.api.asgi as asgi
+import backend.api.claim_codes as claim_codes
+import backend.api.hashing as hashing
+import backend.data_model.db_interface as db_int
+from backend.data_model.data_model import Database, User
+from backend.test.benchmark.load_bench import percentile, _QuietRequestHandler
+from app import create_app
+
+BENCH_DB = 'bench'
+PASSWORD = 'asgi-password'
+USERS = 100
+# Streams opened at once; werkzeug's listen backlog is 128.
+CONNECT_BATCH = 100
+
+
+def email(user_id: int) -> str:
+    return 'user%d@asgi.bench' % user_id
+
+
+'''
+===================================================================================
+===================================SERVERS=========================================
+===================================================================================
+'''
+
+
+def serve(connection: Any, kind: str, rounds: int) -> None:
+    """Child process: serve the app on a free port and report the port back."""
+    hashing.configure(rounds=rounds, use_pool=True)
+    hashing.start()
+    app = create_app(BENCH_DB)
+    # terminate() sends SIGTERM; exit through the finally so the hashing pool's workers are not orphaned.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        if kind == 'wsgi':
+            from werkzeug.serving import make_server
+            server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietRequestHandler)
+            connection.send(server.server_port)
+            server.serve_forever()
+        else:
+            asyncio.run(_serve_asgi(connection, asgi.AsgiApp(app)))
+    finally:
+        hashing.shutdown()
+
+
+async def _serve_asgi(connection: Any, app: asgi.AsgiApp) -> None:
+    server = await asyncio.start_server(lambda reader, writer: _handle(app, reader, writer), '127.0.0.1', 0,
+                                        backlog=1024)
+    connection.send(server.sockets[0].getsockname()[1])
+    await server.serve_forever()
+
+
+async def _handle(app: asgi.AsgiApp, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """One request per connection; the response is delimited by closing it."""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+        request_line, *header_lines = head.decode('latin-1').rstrip('\r\n').split('\r\n')
+        method, target, version = request_line.split(' ')
+        headers = [(name.strip().lower().encode('latin-1'), value.strip().encode('latin-1'))
+                   for name, value in (line.split(':', 1) for line in header_lines)]
+        length = int(dict(headers).get(b'content-length', b'0'))
+        body = await reader.readexactly(length) if length else b''
+    except (asyncio.IncompleteReadError, ValueError, ConnectionError):
+        writer.close()
+        return
+
+    path, _, query = target.partition('?')
+    scope = {'type': 'http', 'method': method, 'path': unquote(path), 'query_string': query.encode('latin-1'),
+             'root_path': '', 'http_version': version.split('/')[1], 'scheme': 'http', 'headers': headers,
+             'server': writer.get_extra_info('sockname')[:2], 'client': writer.get_extra_info('peername')[:2]}
+    requests = [{'type': 'http.request', 'body': body}]
+
+    async def receive() -> Dict[str, Any]:
+        if requests:
+            return requests.pop()
+        # Anything after the request, or the end of the stream, means the client has gone.
+        await reader.read(1)
+        return {'type': 'http.disconnect'}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            lines = ['HTTP/1.1 %d %s' % (status, http.HTTPStatus(status).phrase), 'connection: close']
+            lines += [name.decode('latin-1') + ': ' + value.decode('latin-1') for name, value in message['headers']]
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        else:
+            writer.write(message.get('body', b''))
+        await writer.drain()
+
+    try:
+        await app(scope, receive, send)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+'''
+===================================================================================
+===================================CLIENTS=========================================
+===================================================================================
+'''
+
+
+async def fetch(port: int, method: str, path: str, body: Any = None) -> int:
+    """One request on its own connection.  Returns the status, or 0 if it failed."""
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        return 0
+    try:
+        payload = json.dumps(body).encode() if body is not None else b''
+        writer.write(('%s %s HTTP/1.1\r\nHost: bench\r\nConnection: close\r\nContent-Type: application/json\r\n'
+                      'Content-Length: %d\r\n\r\n' % (method, path, len(payload))).encode() + payload)
+        response = await reader.read()
+        return int(response.split(b' ', 2)[1]) if response else 0
+    except (OSError, ValueError, IndexError):
+        return 0
+    finally:
+        writer.close()
+
+
+async def open_waiter(port: int, code: str, access_token: str) -> Optional[asyncio.StreamWriter]:
+    """An event stream that has been answered, or None if the server did not answer within 30 seconds."""
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(('GET /claim-code/%s/events HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer %s\r\n\r\n'
+                      % (code, access_token)).encode())
+        await asyncio.wait_for(reader.readuntil(b': connected\n\n'), 30)
+        return writer
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        return None
+
+
+async def drive(port: int, concurrency: int, duration: float, request: Any) -> Dict[str, Any]:
+    latencies = []
+    failures = [0]
+    deadline = time.perf_counter() + duration
+
+    async def client(index: int) -> None:
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = await fetch(port, *request(rng))
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures[0] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {'requests_per_second': len(latencies) / elapsed, 'p50_ms': percentile(latencies, 0.50),
+            'p99_ms': percentile(latencies, 0.99), 'failures': failures[0]}
+
+
+def _login(rng: random.Random) -> Tuple[str, str, Any]:
+    return 'POST', '/login-user', {'email': email(rng.randint(1, USERS)), 'password': PASSWORD}
+
+
+def _random(rng: random.Random) -> Tuple[str, str, Any]:
+    return 'GET', '/random', None
+
+
+async def run_level(port: int, pid: int, codes: List[Tuple[str, str]], args: argparse.Namespace) -> Dict[str, Any]:
+    """codes are (code, access token of the user it was issued to)."""
+    writers = []
+    for start in range(0, len(codes), CONNECT_BATCH):
+        writers += await asyncio.gather(*(open_waiter(port, code, access_token)
+                                          for code, access_token in codes[start:start + CONNECT_BATCH]))
+    held = [writer for writer in writers if writer is not None]
+    try:
+        result = {'held': len(held), 'login': await drive(port, args.concurrency, args.duration, _login),
+                  'random': await drive(port, args.concurrency, args.duration, _random)}
+        result.update(process_status(pid))
+        return result
+    finally:
+        for writer in held:
+            writer.close()
+
+
+def process_status(pid: int) -> Dict[str, Any]:
+    with open('/proc/%d/status' % pid) as status_file:
+        fields = dict(line.split(':', 1) for line in status_file)
+    return {'threads': int(fields['Threads']), 'rss_mb': int(fields['VmRSS'].split()[0]) / 1024}
+
+
+'''
+===================================================================================
+===================================RUNNING=========================================
+===================================================================================
+'''
+
+
+def run(kind: str, waiters: int, access_tokens: Dict[int, str], args: argparse.Namespace) -> Dict[str, Any]:
+    # Issued here and inherited by the forked server's in-process claim store.
+    claim_codes.set_store(claim_codes.InMemoryClaimStore())
+    user_ids = [1 + i % USERS for i in range(waiters)]
+    codes = [(claim_codes.issue_claim(user_id, claim_codes.ACTIVITY)[0].code, access_tokens[user_id])
+             for user_id in user_ids]
+
+    Database.Engine.dispose()
+    parent_end, child_end = multiprocessing.Pipe()
+    server = multiprocessing.get_context('fork').Process(target=serve, args=(child_end, kind, args.rounds))
+    server.start()
+    try:
+        if not parent_end.poll(60):
+            raise RuntimeError('the server did not start')
+        return asyncio.run(run_level(parent_end.recv(), server.pid, codes, args))
+    finally:
+        server.terminate()
+        server.join()
+
+
+def print_result(kind: str, waiters: int, result: Dict[str, Any]) -> None:
+    print('%-4s waiters %5d  held %5d  threads %5d  rss %6.1fMB' % (
+        kind, waiters, result['held'], result['threads'], result['rss_mb']))
+    for name in ('login', 'random'):
+        scenario = result[name]
+        print('      %-7s %8.1f req/s  p50 %8s  p99 %8s  failures %d' % (
+            name, scenario['requests_per_second'], _ms(scenario['p50_ms']), _ms(scenario['p99_ms']),
+            scenario['failures']))
+
+
+def _ms(value: Optional[float]) -> str:
+    return '-' if value is None else '%.1fms' % value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--waiters', type=int, action='append', default=None,
+                        help='open event streams, repeat for several levels')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    parser.add_argument('--rounds', type=int, default=hashing.BCRYPT_ROUNDS, help='bcrypt cost')
+    parser.add_argument('--server', action='append', choices=['wsgi', 'asgi'], default=None)
+    args = parser.parse_args()
+
+    # Codes must outlive every level's run.
+    claim_codes.CODE_TTL_SECONDS = 3600
+    hashing.configure(rounds=args.rounds, use_pool=False)
+    app = create_app(BENCH_DB)
+    Database.create_database(BENCH_DB)
+    db_int.set_database(Database.Engine)
+    try:
+        password_hash = hashing.hash_password(PASSWORD)
+        with Database.Engine.begin() as connection:
+            connection.execute(User.__table__.insert(), [
+                {'Id': i, 'Email': email(i), 'PasswordHash': password_hash, 'LastName': 'Last',
+                 'PhoneNumber': '6086086008'} for i in range(1, USERS + 1)])
+        with app.app_context():
+            access_tokens = {i: create_access_token(identity=email(i)) for i in range(1, USERS + 1)}
+
+        for waiters in args.waiters or [0, 1000, 4000]:
+            for kind in args.server or ['wsgi', 'asgi']:
+                print_result(kind, waiters, run(kind, waiters, access_tokens, args))
+    finally:
+        Database.drop_all_test_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
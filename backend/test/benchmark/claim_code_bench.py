@@ -0,0 +1,56 @@
+'''
+Claim code issue/redeem throughput, and a contention check: every code is
+redeemed by several threads at once and must be taken exactly once.
+
+    python -m backend.test.benchmark.claim_code_bench --codes 20000 --contenders 4
+    python -m backend.test.benchmark.claim_code_bench --redis-url redis://localhost:6379/0
+'''
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import backend.api.claim_codes as claim_codes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--codes', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--contenders', type=int, default=4, help='Threads redeeming each code at once')
+    parser.add_argument('--redis-url', default=None)
+    args = parser.parse_args()
+
+    if args.redis_url is not None:
+        claim_codes.set_store(claim_codes.RedisClaimStore.from_url(args.redis_url))
+    else:
+        claim_codes.set_store(claim_codes.InMemoryClaimStore())
+    store = claim_codes.get_store()
+
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        start = time.perf_counter()
+        claims = list(executor.map(lambda i: claim_codes.issue_claim(i, claim_codes.ACTIVITY)[0],
+                                   range(args.codes)))
+        elapsed = time.perf_counter() - start
+    print('issue:  %.0f codes/s' % (args.codes / elapsed))
+
+    taken = {}
+    lock = threading.Lock()
+
+    def redeem(code: str) -> None:
+        if store.take(code) is not None:
+            with lock:
+                taken[code] = taken.get(code, 0) + 1
+
+    attempts = [claim.code for claim in claims for _ in range(args.contenders)]
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        start = time.perf_counter()
+        list(executor.map(redeem, attempts))
+        elapsed = time.perf_counter() - start
+
+    doubles = sum(1 for count in taken.values() if count > 1)
+    print('redeem: %.0f attempts/s, %d/%d codes redeemed, %d double redemptions' % (
+        len(attempts) / elapsed, len(taken), args.codes, doubles))
+
+
+if __name__ == '__main__':
+    main()
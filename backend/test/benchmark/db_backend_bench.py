@@ -0,0 +1,61 @@
+'''
+Database throughput per backend: concurrent threads each register users and
+look them up again through db_interface, using the engine settings from
+db_config (pooling for PostgreSQL, WAL for SQLite).
+
+    python -m backend.test.benchmark.db_backend_bench \
+        --url sqlite:///bench.db --url postgresql://postgres@localhost/bench
+'''
+import argparse
+import threading
+import time
+from typing import Dict, Any
+import backend.data_model.db_interface as db_int
+from backend.data_model.data_model import Database, User
+
+
+def run(url: str, threads: int, operations: int) -> Dict[str, Any]:
+    engine = Database.create_engine(url)
+    Database.Base.metadata.drop_all(engine)
+    Database.Base.metadata.create_all(engine)
+    db_int.set_database(engine)
+
+    failures = []
+    per_thread = operations // threads
+
+    def worker(thread_index: int) -> None:
+        for i in range(per_thread):
+            email = 'user%d_%d@bench.com' % (thread_index, i)
+            user = User(Email=email, PasswordHash='hash', LastName='last', PhoneNumber='6086086008')
+            if db_int.save_login(user) is not None:
+                failures.append(email)
+            with db_int.session_scope() as session:
+                db_int._get_login_row(email, session)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    Database.Base.metadata.drop_all(engine)
+    engine.dispose()
+    return {'ops_per_sec': per_thread * threads * 2 / elapsed, 'failed_writes': len(failures)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', action='append', default=None)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--operations', type=int, default=4000)
+    args = parser.parse_args()
+
+    for url in args.url or ['sqlite:///bench.db']:
+        result = run(url, args.threads, args.operations)
+        print('%-50s ops/s=%.0f failed_writes=%d' % (url, result['ops_per_sec'], result['failed_writes']))
+
+
+if __name__ == '__main__':
+    main()
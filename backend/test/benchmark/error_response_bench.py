@@ -0,0 +1,60 @@
+'''
+Error responses per second: building ErrorObject/ErrorList and running jsonify
+on every rejection, against the pre-serialized bodies from
+errors.error_response_body().
+
+    python -m backend.test.benchmark.error_response_bench --iterations 100000
+'''
+import argparse
+import time
+from typing import Any, Callable
+from flask import Flask, Response, jsonify
+import backend.api.errors as errors
+
+MULTIPLE_CODES = [errors.EMAIL_INVALID_CODE, errors.PASSWORD_INVALID_CODE, errors.PHONE_NUMBER_INVALID_CODE]
+
+
+def jsonify_single() -> Any:
+    return jsonify(errors.create_single_error_response(errors.LOGIN_INVALID_CODE).to_response_dict())
+
+
+def jsonify_multiple() -> Any:
+    return jsonify(errors.create_multiple_error_response(MULTIPLE_CODES).to_response_dict())
+
+
+def cached_single() -> Any:
+    return Response(errors.error_response_body(errors.LOGIN_INVALID_CODE), mimetype='application/json')
+
+
+def cached_multiple() -> Any:
+    return Response(errors.error_response_body(MULTIPLE_CODES), mimetype='application/json')
+
+
+def time_responses(name: str, build: Callable[[], Any], iterations: int) -> None:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        build()
+    elapsed = time.perf_counter() - start
+    print('%-18s %10.0f responses/s (%.2fus each)' % (name, iterations / elapsed, elapsed / iterations * 1e6))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=100000)
+    args = parser.parse_args()
+
+    with Flask(__name__).app_context():
+        for name, build in [('jsonify single', jsonify_single), ('cached single', cached_single),
+                            ('jsonify multiple', jsonify_multiple), ('cached multiple', cached_multiple)]:
+            time_responses(name, build, args.iterations)
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        errors.error_response_body(errors.LOGIN_INVALID_CODE)
+    elapsed = time.perf_counter() - start
+    print('%-18s %10.0f bodies/s (%.2fus each)' % ('body only', args.iterations / elapsed,
+                                                   elapsed / args.iterations * 1e6))
+
+
+if __name__ == '__main__':
+    main()
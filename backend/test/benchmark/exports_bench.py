@@ -0,0 +1,92 @@
+'''
+Peak RSS of a streamed export.  --rows ActivityTransactions are seeded for
+one organization with a single INSERT ... SELECT (so seeding itself holds no
+rows in Python), then its ledger is exported through exports.stream() in
+each format, reading and discarding the chunks as a client would.  Last, for
+comparison, the first --in-memory-rows rows are exported the naive way:
+query(...).all() and one joined string.
+
+    python -m backend.test.benchmark.exports_bench --rows 10000000
+'''
+import argparse
+import resource
+import time
+from datetime import datetime
+from sqlalchemy import text
+import backend.data_model.db_interface as db_int
+import backend.data_model.exports as exports
+from backend.data_model.data_model import Database, User, Organization, ActivityTransaction
+
+BENCH_DB = 'bench'
+ORGANIZATION_ID = 1
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed(rows: int) -> None:
+    now = datetime.utcnow()
+    with Database.Engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [{'Id': 1, 'Email': 'owner@bench.com', 'PasswordHash': 'hash',
+                                                      'LastName': 'last', 'PhoneNumber': '6086086008'}])
+        connection.execute(Organization.__table__.insert(), [
+            {'Id': ORGANIZATION_ID, 'Name': 'Org', 'OwnerId': 1, 'Type': 1, 'PointsToDistribute': 0,
+             'PointsToConsume': 0, 'LastRefreshInstant': now, 'RefreshIntervalInDays': 30, 'RefreshAmount': 0}])
+        connection.execute(text(
+            'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :rows) '
+            'INSERT INTO "ActivityTransaction" ("UserId", "Points", "OrganizationId", "Instant") '
+            'SELECT 1, 1 + i % 100, :organization_id, :instant FROM n'),
+            rows=rows, organization_id=ORGANIZATION_ID, instant=now)
+
+
+def export(export_format: str, compress: bool) -> None:
+    start = time.perf_counter()
+    size = 0
+    for chunk in exports.stream(*exports.organization_ledger(ORGANIZATION_ID), export_format, compress):
+        size += len(chunk)
+    elapsed = time.perf_counter() - start
+    print('%-12s %8.1fs %10.1f MB written   peak RSS %6.1f MB' % (
+        export_format + (' gzip' if compress else ''), elapsed, size / 1e6, peak_rss_mb()))
+
+
+def export_in_memory(rows: int) -> None:
+    start = time.perf_counter()
+    with db_int.session_scope() as session:
+        result = session.query(ActivityTransaction.Id, ActivityTransaction.Instant, ActivityTransaction.UserId,
+                               ActivityTransaction.Points, ActivityTransaction.Activity) \
+            .filter(ActivityTransaction.OrganizationId == ORGANIZATION_ID) \
+            .order_by(ActivityTransaction.Id) \
+            .limit(rows) \
+            .all()
+        body = '\n'.join(','.join(str(value) for value in row) for row in result).encode()
+    elapsed = time.perf_counter() - start
+    print('%-12s %8.1fs %10.1f MB written   peak RSS %6.1f MB  (%d rows)' % (
+        'in memory', elapsed, len(body) / 1e6, peak_rss_mb(), rows))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000000)
+    parser.add_argument('--in-memory-rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    Database.create_database(BENCH_DB)
+    db_int.set_database(Database.Engine)
+    try:
+        start = time.perf_counter()
+        seed(args.rows)
+        print('seeded %d rows in %.1fs, peak RSS %.1f MB' % (args.rows, time.perf_counter() - start,
+                                                             peak_rss_mb()))
+        export(exports.CSV, False)
+        export(exports.NDJSON, False)
+        export(exports.CSV, True)
+        if args.in_memory_rows > 0:
+            export_in_memory(min(args.rows, args.in_memory_rows))
+    finally:
+        Database.drop_all_test_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+'''
+"Find participating orgs near me" queries per second against GeoIndex, next
+to a NumPy scan of every organization, for k-nearest and radius queries with
+and without a type filter.  Organizations are clustered around random city
+centers, with a share scattered uniformly.
+
+    python -m backend.test.benchmark.geo_bench --orgs 1000000 --queries 2000
+'''
+import argparse
+import math
+import time
+from typing import Callable
+import numpy as np
+import backend.api.geo_index as geo_index
+
+
+def run(label: str, query: Callable[[float, float], object], points: np.ndarray) -> None:
+    start = time.perf_counter()
+    for lat, lon in points:
+        query(lat, lon)
+    elapsed = time.perf_counter() - start
+    print('%-30s %8.0f queries/s (%.0fus each)' % (label, len(points) / elapsed, elapsed / len(points) * 1e6))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orgs', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--cities', type=int, default=500)
+    parser.add_argument('--types', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--radius-km', type=float, default=25)
+    parser.add_argument('--cell-degrees', type=float, default=geo_index.CELL_DEGREES)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    cities = np.column_stack([rng.uniform(-60, 70, args.cities), rng.uniform(-180, 180, args.cities)])
+    clustered = int(args.orgs * 0.9)
+    centers = cities[rng.integers(0, args.cities, clustered)]
+    lats = np.concatenate([np.clip(centers[:, 0] + rng.normal(0, 0.3, clustered), -90, 90),
+                           rng.uniform(-90, 90, args.orgs - clustered)])
+    lons = np.concatenate([(centers[:, 1] + rng.normal(0, 0.3, clustered) + 180) % 360 - 180,
+                           rng.uniform(-180, 180, args.orgs - clustered)])
+    types = rng.integers(1, args.types + 1, args.orgs)
+    ids = np.arange(1, args.orgs + 1)
+
+    index = geo_index.GeoIndex(args.cell_degrees)
+    start = time.perf_counter()
+    index.upsert_many(zip(ids.tolist(), lats.tolist(), lons.tolist(), types.tolist()))
+    print('loaded %d organizations in %.1fs' % (args.orgs, time.perf_counter() - start))
+
+    # Queries are made near a city, as real users mostly are.
+    query_centers = cities[rng.integers(0, args.cities, args.queries)]
+    queries = query_centers + rng.normal(0, 0.2, (args.queries, 2))
+    # Warm every cell's arrays so the first queries don't pay for building them.
+    for lat, lon in queries:
+        index.nearest(lat, lon, args.limit)
+
+    lat_radians = np.radians(lats)
+    lon_radians = np.radians(lons)
+
+    def scan_nearest(lat: float, lon: float, organization_type: int = None) -> None:
+        distances = geo_index.haversine_km(math.radians(lat), math.radians(lon), lat_radians, lon_radians)
+        if organization_type is not None:
+            distances = np.where(types == organization_type, distances, np.inf)
+        nearest = np.argpartition(distances, args.limit)[:args.limit]
+        nearest[np.argsort(distances[nearest])]
+
+    def scan_within(lat: float, lon: float) -> None:
+        distances = geo_index.haversine_km(math.radians(lat), math.radians(lon), lat_radians, lon_radians)
+        inside = np.flatnonzero(distances <= args.radius_km)
+        inside[np.argsort(distances[inside])][:args.limit]
+
+    scan_queries = queries[:max(1, args.queries // 20)]
+    run('scan, nearest', scan_nearest, scan_queries)
+    run('scan, nearest of type', lambda lat, lon: scan_nearest(lat, lon, 1), scan_queries)
+    run('scan, within %gkm' % args.radius_km, scan_within, scan_queries)
+    run('index, nearest', lambda lat, lon: index.nearest(lat, lon, args.limit), queries)
+    run('index, nearest of type', lambda lat, lon: index.nearest(lat, lon, args.limit, organization_type=1),
+        queries)
+    run('index, nearest, page 5', lambda lat, lon: index.nearest(lat, lon, args.limit, 4 * args.limit), queries)
+    run('index, within %gkm' % args.radius_km, lambda lat, lon: index.within(lat, lon, args.radius_km, args.limit),
+        queries)
+
+    start = time.perf_counter()
+    for org_id, lat, lon in zip(range(1, args.queries + 1), queries[:, 0], queries[:, 1]):
+        index.upsert(org_id, lat, lon, 1)
+    elapsed = time.perf_counter() - start
+    print('%-30s %8.0f updates/s' % ('index, upsert', args.queries / elapsed))
+
+
+if __name__ == '__main__':
+    main()
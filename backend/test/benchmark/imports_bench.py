@@ -0,0 +1,82 @@
+'''
+Importing --users users from a CSV file with imports.import_users(), against
+registering --baseline-users of them one at a time as register_user does
+(one hash, one insert, one commit each).  bcrypt dominates both, so the cost
+is lowered with --rounds; hashing runs in a pool of --workers processes.
+
+    python -m backend.test.benchmark.imports_bench --users 1000000 --rounds 4
+'''
+import argparse
+import os
+import resource
+import tempfile
+import time
+import backend.api.hashing as hashing
+import backend.api.imports as imports
+import backend.data_model.db_interface as db_int
+from backend.data_model.data_model import Database, User
+
+BENCH_DB = 'bench'
+
+
+def write_csv(path: str, users: int) -> None:
+    with open(path, 'w') as output:
+        output.write('email,password,first_name,last_name,phone_number\n')
+        for i in range(users):
+            output.write('user%d@bench.com,password%d,First,Last,608-608-%04d\n' % (i, i, i % 10000))
+        # A tenth as many again: duplicates and invalid rows, reported per row.
+        for i in range(0, users, 20):
+            output.write('user%d@bench.com,password,First,Last,6086086008\n' % i)
+            output.write('bad email %d,short,,Last,6086086008\n' % i)
+
+
+def register_one_at_a_time(users: int) -> None:
+    for i in range(users):
+        user = User(Email='single%d@bench.com' % i, PasswordHash=hashing.hash_password('password%d' % i),
+                    FirstName='First', LastName='Last', PhoneNumber='6086086008')
+        assert db_int.save_login(user) is None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--baseline-users', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    hashing.configure(rounds=args.rounds, workers=args.workers, use_pool=True)
+
+    Database.create_database(BENCH_DB)
+    db_int.set_database(Database.Engine)
+    path = tempfile.mktemp(suffix='.csv')
+    try:
+        write_csv(path, args.users)
+        start = time.perf_counter()
+        with open(path, 'rb') as stream:
+            result, error_code = imports.import_users(imports.read_rows(stream, imports.CSV))
+        elapsed = time.perf_counter() - start
+        assert error_code is None and result.imported == args.users
+        print('bulk import    %8d users %8.1fs %8.0f users/s   %d rows reported, peak RSS %.0f MB' % (
+            result.imported, elapsed, result.imported / elapsed, len(result.failed),
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+        start = time.perf_counter()
+        for _ in hashing.hash_passwords('password%d' % i for i in range(args.baseline_users)):
+            pass
+        elapsed = time.perf_counter() - start
+        print('bcrypt alone   %8d hashes%8.1fs %8.0f hashes/s' % (args.baseline_users, elapsed,
+                                                                  args.baseline_users / elapsed))
+
+        start = time.perf_counter()
+        register_one_at_a_time(args.baseline_users)
+        elapsed = time.perf_counter() - start
+        print('one at a time  %8d users %8.1fs %8.0f users/s' % (args.baseline_users, elapsed,
+                                                                 args.baseline_users / elapsed))
+    finally:
+        hashing.shutdown()
+        os.remove(path)
+        Database.drop_all_test_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+'''
+Leaderboard top-k and "my rank" reads.  SortedLeaderboard is loaded with
+--users random scores and timed for replace(), rank(), top() and add().  For
+comparison the same reads are made with GROUP BY / ORDER BY over a seeded
+ledger of --sql-rows ActivityTransactions.
+
+    python -m backend.test.benchmark.leaderboard_bench --users 5000000 --sql-rows 1000000
+'''
+import argparse
+import random
+import time
+from datetime import datetime
+from typing import Callable
+from sqlalchemy import func
+import backend.data_model.db_interface as db_int
+import backend.data_model.leaderboard as leaderboard
+from backend.data_model.data_model import Database, User, Organization, ActivityTransaction
+
+BENCH_DB = 'bench'
+INSERT_CHUNK = 50000
+TOP_K = 20
+
+
+def run(label: str, operation: Callable[[int], object], user_ids: list) -> None:
+    start = time.perf_counter()
+    for user_id in user_ids:
+        operation(user_id)
+    elapsed = time.perf_counter() - start
+    print('%-26s %9.0f ops/s (%.1fus each)' % (label, len(user_ids) / elapsed, elapsed / len(user_ids) * 1e6))
+
+
+def seed(rows: int, users: int) -> None:
+    now = datetime.utcnow()
+    with Database.Engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'Id': i, 'Email': 'user%d@bench.com' % i, 'PasswordHash': 'hash', 'LastName': 'last',
+             'PhoneNumber': '6086086008'} for i in range(1, users + 1)])
+        connection.execute(Organization.__table__.insert(), [
+            {'Id': 1, 'Name': 'Org', 'OwnerId': 1, 'Type': 1, 'PointsToDistribute': 0, 'PointsToConsume': 0,
+             'LastRefreshInstant': now, 'RefreshIntervalInDays': 30, 'RefreshAmount': 0}])
+    for start in range(0, rows, INSERT_CHUNK):
+        with Database.Engine.begin() as connection:
+            connection.execute(ActivityTransaction.__table__.insert(), [
+                {'UserId': random.randint(1, users), 'Points': random.randint(1, 100), 'OrganizationId': 1,
+                 'Instant': now} for _ in range(start, min(rows, start + INSERT_CHUNK))])
+
+
+def sql_top(_: int) -> None:
+    with db_int.session_scope() as session:
+        session.query(ActivityTransaction.UserId, func.sum(ActivityTransaction.Points).label('points')) \
+            .group_by(ActivityTransaction.UserId) \
+            .order_by(func.sum(ActivityTransaction.Points).desc()) \
+            .limit(TOP_K) \
+            .all()
+
+
+def sql_rank(user_id: int) -> None:
+    with db_int.session_scope() as session:
+        mine = session.query(func.coalesce(func.sum(ActivityTransaction.Points), 0)) \
+            .filter(ActivityTransaction.UserId == user_id).scalar()
+        totals = session.query(func.sum(ActivityTransaction.Points).label('points')) \
+            .group_by(ActivityTransaction.UserId) \
+            .having(func.sum(ActivityTransaction.Points) > mine) \
+            .subquery()
+        session.query(func.count()).select_from(totals).scalar()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=5000000)
+    parser.add_argument('--operations', type=int, default=100000)
+    parser.add_argument('--sql-rows', type=int, default=200000)
+    parser.add_argument('--sql-users', type=int, default=20000)
+    parser.add_argument('--sql-operations', type=int, default=50)
+    args = parser.parse_args()
+
+    scores = {user_id: random.randint(0, 100000) for user_id in range(1, args.users + 1)}
+    board = leaderboard.SortedLeaderboard()
+    start = time.perf_counter()
+    board.replace({leaderboard.OVERALL: scores})
+    print('replace: %d users in %.1fs' % (args.users, time.perf_counter() - start))
+    del scores
+
+    user_ids = [random.randint(1, args.users) for _ in range(args.operations)]
+    run('sorted rank', lambda user_id: board.rank(leaderboard.OVERALL, user_id), user_ids)
+    run('sorted top %d' % TOP_K, lambda _: board.top(leaderboard.OVERALL, TOP_K), user_ids)
+    run('sorted top %d, page 50' % TOP_K, lambda _: board.top(leaderboard.OVERALL, TOP_K, 49 * TOP_K), user_ids)
+    run('sorted add', lambda user_id: board.add(leaderboard.OVERALL, user_id, 10), user_ids)
+
+    if args.sql_rows <= 0:
+        return
+    Database.create_database(BENCH_DB)
+    db_int.set_database(Database.Engine)
+    try:
+        seed(args.sql_rows, args.sql_users)
+        print('seeded %d ledger rows for %d users' % (args.sql_rows, args.sql_users))
+        sql_user_ids = [random.randint(1, args.sql_users) for _ in range(args.sql_operations)]
+        run('SQL rank', sql_rank, sql_user_ids)
+        run('SQL top %d' % TOP_K, sql_top, sql_user_ids)
+
+        leaderboard.set_leaderboard(leaderboard.SortedLeaderboard())
+        start = time.perf_counter()
+        leaderboard.get_leaderboard()
+        print('load from ledger: %.1fs' % (time.perf_counter() - start))
+    finally:
+        Database.drop_all_test_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
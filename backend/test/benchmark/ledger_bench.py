@@ -0,0 +1,83 @@
+'''
+Balance reads and ledger writes against a large ledger.  The ledger is seeded
+with bulk inserts, balances are built with reconcile_balances(), then
+get_balance() and record_activity() are timed.
+
+    python -m backend.test.benchmark.ledger_bench --rows 10000000 --users 100000
+'''
+import argparse
+import random
+import time
+from datetime import datetime
+import backend.data_model.db_interface as db_int
+import backend.data_model.ledger as ledger
+from backend.data_model.data_model import (Database, User, Organization, ActivityTransaction,
+                                           RewardTransaction)
+
+BENCH_DB = 'bench'
+INSERT_CHUNK = 50000
+
+
+def seed(rows: int, users: int, orgs: int) -> None:
+    now = datetime.utcnow()
+    with Database.Engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'Id': i, 'Email': 'user%d@bench.com' % i, 'PasswordHash': 'hash', 'LastName': 'last',
+             'PhoneNumber': '6086086008'} for i in range(1, users + 1)])
+        connection.execute(Organization.__table__.insert(), [
+            {'Id': i, 'Name': 'Org %d' % i, 'OwnerId': 1, 'Type': 1, 'PointsToDistribute': 0,
+             'PointsToConsume': 0, 'LastRefreshInstant': now, 'RefreshIntervalInDays': 30,
+             'RefreshAmount': 0} for i in range(1, orgs + 1)])
+
+    # Nine awards for every redemption, so balances stay positive.
+    for start in range(0, rows, INSERT_CHUNK):
+        chunk = range(start, min(rows, start + INSERT_CHUNK))
+        activities = [{'UserId': i % users + 1, 'Points': 10, 'OrganizationId': i % orgs + 1,
+                       'Instant': now} for i in chunk if i % 10]
+        rewards = [{'UserId': i % users + 1, 'Points': 5, 'OrganizationId': i % orgs + 1,
+                    'Instant': now, 'Reward': 1} for i in chunk if not i % 10]
+        with Database.Engine.begin() as connection:
+            connection.execute(ActivityTransaction.__table__.insert(), activities)
+            if rewards:
+                connection.execute(RewardTransaction.__table__.insert(), rewards)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--orgs', type=int, default=100)
+    parser.add_argument('--operations', type=int, default=5000)
+    args = parser.parse_args()
+
+    Database.create_database(BENCH_DB)
+    db_int.set_database(Database.Engine)
+    try:
+        start = time.perf_counter()
+        seed(args.rows, args.users, args.orgs)
+        print('seeded %d ledger rows in %.1fs' % (args.rows, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        ledger.reconcile_balances()
+        print('reconcile: %.1fs' % (time.perf_counter() - start))
+
+        user_ids = [random.randint(1, args.users) for _ in range(args.operations)]
+
+        start = time.perf_counter()
+        for user_id in user_ids:
+            ledger.get_balance(user_id)
+        elapsed = time.perf_counter() - start
+        print('get_balance: %.0f reads/s (%.0fus each)' % (len(user_ids) / elapsed, elapsed / len(user_ids) * 1e6))
+
+        start = time.perf_counter()
+        for user_id in user_ids:
+            ledger.record_activity(user_id, user_id % args.orgs + 1, 1)
+        elapsed = time.perf_counter() - start
+        print('record_activity: %.0f writes/s (%.0fus each)' % (len(user_ids) / elapsed,
+                                                                elapsed / len(user_ids) * 1e6))
+    finally:
+        Database.drop_all_test_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+'''
+Latency of page N of one user's activity history, read with a keyset cursor
+against the same page read with OFFSET.  --rows ActivityTransactions are
+seeded for a single user (plus --other-rows for others), and pages of --limit
+rows are timed at each depth in --pages.
+
+    python -m backend.test.benchmark.listings_bench --rows 100000 --pages 1 10 100 1000 2000
+'''
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+import backend.data_model.db_interface as db_int
+import backend.data_model.listings as listings
+from backend.data_model.data_model import Database, User, Organization, ActivityTransaction
+
+BENCH_DB = 'bench'
+INSERT_CHUNK = 50000
+USER_ID = 1
+REPEATS = 20
+
+
+def seed(rows: int, other_rows: int, other_users: int) -> None:
+    now = datetime.utcnow()
+    with Database.Engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'Id': i, 'Email': 'user%d@bench.com' % i, 'PasswordHash': 'hash', 'LastName': 'last',
+             'PhoneNumber': '6086086008'} for i in range(1, other_users + 2)])
+        connection.execute(Organization.__table__.insert(), [
+            {'Id': 1, 'Name': 'Org', 'OwnerId': 1, 'Type': 1, 'PointsToDistribute': 0, 'PointsToConsume': 0,
+             'LastRefreshInstant': now, 'RefreshIntervalInDays': 30, 'RefreshAmount': 0}])
+    # Owners are shuffled so the user's rows are spread through the table, as they would be in a real ledger.
+    owners = [USER_ID] * rows + [random.randint(2, other_users + 1) for _ in range(other_rows)]
+    random.shuffle(owners)
+    for start in range(0, len(owners), INSERT_CHUNK):
+        with Database.Engine.begin() as connection:
+            connection.execute(ActivityTransaction.__table__.insert(), [
+                {'UserId': owner, 'Points': 1, 'OrganizationId': 1, 'Activity': None,
+                 'Instant': now - timedelta(seconds=random.randint(0, 86400 * 365))}
+                for owner in owners[start:start + INSERT_CHUNK]])
+
+
+def offset_page(limit: int, offset: int) -> list:
+    with db_int.session_scope() as session:
+        return session.query(ActivityTransaction.Id, ActivityTransaction.Instant, ActivityTransaction.Points,
+                             ActivityTransaction.OrganizationId, ActivityTransaction.Activity) \
+            .filter(ActivityTransaction.UserId == USER_ID) \
+            .order_by(ActivityTransaction.Instant.desc(), ActivityTransaction.Id.desc()) \
+            .offset(offset) \
+            .limit(limit) \
+            .all()
+
+
+def cursors_at(pages: list, limit: int) -> dict:
+    """The cursor that starts each page, found by walking the listing once."""
+    wanted, cursors, cursor = set(pages), {}, None
+    for page in range(1, max(pages) + 1):
+        if page in wanted:
+            cursors[page] = cursor
+        (_, cursor), error_code = listings.list_activity_transactions(USER_ID, limit, cursor)
+        assert error_code is None
+        if cursor is None:
+            break
+    return cursors
+
+
+def timed(operation, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        operation()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--other-rows', type=int, default=100000)
+    parser.add_argument('--other-users', type=int, default=1000)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100, 1000, 2000])
+    args = parser.parse_args()
+
+    Database.create_database(BENCH_DB)
+    db_int.set_database(Database.Engine)
+    try:
+        seed(args.rows, args.other_rows, args.other_users)
+        pages = [page for page in args.pages if (page - 1) * args.limit < args.rows]
+        cursors = cursors_at(pages, args.limit)
+        print('%d rows for the user, %d for others, %d rows a page' % (args.rows, args.other_rows, args.limit))
+        print('%8s %12s %12s' % ('page', 'keyset ms', 'offset ms'))
+        for page in pages:
+            keyset_page = listings.list_activity_transactions(USER_ID, args.limit, cursors[page])[0][0]
+            assert [item['id'] for item in keyset_page] == \
+                [row[0] for row in offset_page(args.limit, (page - 1) * args.limit)]
+            keyset = timed(lambda: listings.list_activity_transactions(USER_ID, args.limit, cursors[page]), REPEATS)
+            offset = timed(lambda: offset_page(args.limit, (page - 1) * args.limit), REPEATS)
+            print('%8d %12.2f %12.2f' % (page, keyset, offset))
+    finally:
+        Database.drop_all_test_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
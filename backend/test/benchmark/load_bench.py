@@ -0,0 +1,437 @@
+'''
+Load test of the HTTP API.  For each --url (SQLite by default, or a local
+PostgreSQL), a synthetic dataset of --users users, --organizations orgs with
+their activities, --transactions activity transactions and
+--organization-requests pending org requests is seeded.  The app is then
+served from a child process (werkzeug, threaded) and each scenario is driven
+for --duration seconds by --concurrency client threads on keep-alive
+connections.  Throughput, p50/p95/p99 latency and response statuses per
+scenario are printed and written to --output as JSON, named after the
+current commit by default, so two commits can be compared:
+
+    python -m backend.test.benchmark.load_bench --rounds 4 \
+        --url sqlite:///bench.db --url postgresql://postgres@localhost/bench
+    python -m backend.test.benchmark.load_bench --compare load-2881cc8.json load-69074f1.json
+
+--seed fixes the dataset and every client's choice of users and orgs.  New
+endpoints are load tested by adding a Scenario to SCENARIOS.
+'''
+import argparse
+import http.client
+import json
+import math
+import multiprocessing
+import platform
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Tuple, Callable, Optional
+from flask_jwt_extended import create_access_token
+from sqlalchemy.engine.url import make_url
+from werkzeug.serving import make_server, WSGIRequestHandler
+import backend.api.api as api
+import backend.api.hashing as hashing
+import backend.data_model.db_config as db_config
+import backend.data_model.db_interface as db_int
+from backend.data_model.data_model import (Database, User, Organization, OrganizationType, Visibility, Activity,
+                                           ActivityTransaction, OrganizationRegistrationRequest)
+from app import create_app
+
+BENCH_DB = 'bench'
+INSERT_CHUNK = 10000
+PASSWORD = 'load-password'
+ADMIN_USER_ID = 1
+# Requests each client makes before the timed part of a scenario, so
+# connections are open and caches are warm.
+WARMUP_REQUESTS = 20
+
+
+def email(user_id: int) -> str:
+    return 'user%d@load.bench' % user_id
+
+
+'''
+===================================================================================
+=================================SCENARIOS=========================================
+===================================================================================
+'''
+
+# A request: (method, path, JSON body or None, user id to authenticate as or None).
+Request = Tuple[str, str, Any, Optional[int]]
+
+
+class Client:
+    """One load generating thread's connection, random generator and per-scenario state."""
+
+    def __init__(self, port: int, index: int, seed: int, scale: Dict[str, int]) -> None:
+        self.port = port
+        self.index = index
+        self.random = random.Random('%d-%d' % (seed, index))
+        self.scale = scale
+        self.state = {}
+        self.connection = None
+
+    def random_user(self) -> int:
+        return self.random.randint(1, self.scale['users'])
+
+    def random_organization(self) -> int:
+        return self.random.randint(1, self.scale['organizations'])
+
+    def send(self, method: str, path: str, body: Any, headers: Dict[str, str]) -> Tuple[int, bytes]:
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            raise
+
+
+class Scenario:
+    """request builds the next request; response, if given, sees every response's status and body."""
+
+    def __init__(self, name: str, request: Callable[[Client], Request],
+                 response: Callable[[Client, int, bytes], None] = None) -> None:
+        self.name = name
+        self.request = request
+        self.response = response
+
+
+def _register_user(client: Client) -> Request:
+    count = client.state['registered'] = client.state.get('registered', 0) + 1
+    return ('POST', '/register-user', {'email': 'load%d_%d@load.bench' % (client.index, count),
+                                       'password': PASSWORD, 'first_name': 'First', 'last_name': 'Last',
+                                       'phone_number': '608-608-6008'}, None)
+
+
+def _login_user(client: Client) -> Request:
+    return 'POST', '/login-user', {'email': email(client.random_user()), 'password': PASSWORD}, None
+
+
+def _organization_requests(client: Client) -> Request:
+    # Pages through the pending requests like an admin would, starting over at the end.
+    cursor = client.state.get('cursor')
+    return 'GET', '/admin/organization-requests' + ('?cursor=' + cursor if cursor else ''), None, ADMIN_USER_ID
+
+
+def _next_organization_requests_page(client: Client, status: int, body: bytes) -> None:
+    client.state['cursor'] = json.loads(body).get('next_cursor') if status == 200 else None
+
+
+def _activity_history(client: Client) -> Request:
+    return 'GET', '/transactions/activities', None, client.random_user()
+
+
+def _organization_activities(client: Client) -> Request:
+    return 'GET', '/organizations/%d/activities' % client.random_organization(), None, client.random_user()
+
+
+SCENARIOS = [
+    Scenario('register_user', _register_user),
+    Scenario('login_user', _login_user),
+    Scenario('organization_requests', _organization_requests, _next_organization_requests_page),
+    Scenario('activity_history', _activity_history),
+    Scenario('organization_activities', _organization_activities),
+]
+
+
+'''
+===================================================================================
+==================================SEEDING==========================================
+===================================================================================
+'''
+
+
+def seed(scale: Dict[str, int], seed_value: int) -> None:
+    """Insert the dataset in chunks, bypassing the API.  Every user's password is PASSWORD."""
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    # Reused for every user; hashed at the server's cost so logins verify as they would in production.
+    password_hash = hashing.hash_password(PASSWORD)
+
+    with db_int.session_scope() as session:
+        # drop_all leaves an existing PostgreSQL database without its type rows.
+        if session.query(OrganizationType).count() == 0:
+            Database._initialize_org_types()
+        if session.query(Visibility).count() == 0:
+            Database._initialize_visibility_types()
+
+    _insert(User, ({'Id': i, 'Email': email(i), 'PasswordHash': password_hash, 'FirstName': 'First',
+                    'LastName': 'Last', 'PhoneNumber': '6086086008'} for i in range(1, scale['users'] + 1)))
+    _insert(Organization, ({'Id': i, 'Name': 'Organization %d' % i, 'OwnerId': rng.randint(1, scale['users']),
+                            'Type': 3, 'PointsToDistribute': 100000, 'PointsToConsume': 0,
+                            'LastRefreshInstant': now, 'RefreshIntervalInDays': 30, 'RefreshAmount': 100000}
+                           for i in range(1, scale['organizations'] + 1)))
+    _insert(Activity, ({'PointsPerHour': 10, 'PointsPerCompletion': 10, 'OneTime': False,
+                        'Visibility': 1 + (i % 5 == 0), 'AssociatedOrganization': organization_id,
+                        'Description': 'Activity %d' % i}
+                       for organization_id in range(1, scale['organizations'] + 1)
+                       for i in range(scale['activities_per_organization'])))
+    _insert(ActivityTransaction, ({'UserId': rng.randint(1, scale['users']), 'Points': rng.randint(1, 50),
+                                   'OrganizationId': rng.randint(1, scale['organizations']), 'Activity': None,
+                                   'Instant': now - timedelta(seconds=rng.randint(0, 86400 * 365))}
+                                  for _ in range(scale['transactions'])))
+    _insert(OrganizationRegistrationRequest, ({'SubmittingUserId': rng.randint(1, scale['users']),
+                                               'OrganizationName': 'Requested organization %d' % i,
+                                               'Message': 'Please approve', 'ContactPhoneNumber': '6086086008',
+                                               'ContactEmail': email(1), 'OrganizationURL': 'https://load.bench'}
+                                              for i in range(scale['organization_requests'])))
+
+
+def _insert(table: Any, rows: Any) -> None:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == INSERT_CHUNK:
+            _insert_chunk(table, chunk)
+            chunk = []
+    if chunk:
+        _insert_chunk(table, chunk)
+
+
+def _insert_chunk(table: Any, chunk: List[Dict[str, Any]]) -> None:
+    with Database.Engine.begin() as connection:
+        connection.execute(table.__table__.insert(), chunk)
+
+
+'''
+===================================================================================
+===================================RUNNING=========================================
+===================================================================================
+'''
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args: Any) -> None:
+        pass
+
+
+def serve(connection: Any, rounds: int) -> None:
+    """Child process: serve the app on a free port and report the port back."""
+    hashing.configure(rounds=rounds, use_pool=True)
+    app = create_app(BENCH_DB)
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietRequestHandler)
+    # terminate() sends SIGTERM; exit through the finally so the hashing pool's workers are not orphaned.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        connection.send(server.server_port)
+        server.serve_forever()
+    finally:
+        hashing.shutdown()
+
+
+def run_scenario(scenario: Scenario, port: int, token: Callable[[int], str], args: argparse.Namespace,
+                 scale: Dict[str, int]) -> Dict[str, Any]:
+    clients = [Client(port, i, args.seed, scale) for i in range(args.concurrency)]
+    latencies = [[] for _ in clients]
+    statuses = [{} for _ in clients]
+    start_barrier = threading.Barrier(len(clients) + 1)
+    deadline = [0.0]
+
+    def one_request(client: Client) -> Tuple[int, float]:
+        method, path, body, user_id = scenario.request(client)
+        headers = {'Content-Type': 'application/json'}
+        if user_id is not None:
+            headers['Authorization'] = 'Bearer ' + token(user_id)
+        start = time.perf_counter()
+        try:
+            status, response_body = client.send(method, path, json.dumps(body) if body is not None else None,
+                                                headers)
+        except (OSError, http.client.HTTPException):
+            return 0, time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+        if scenario.response is not None:
+            scenario.response(client, status, response_body)
+        return status, elapsed
+
+    def drive(client: Client) -> None:
+        for _ in range(WARMUP_REQUESTS):
+            one_request(client)
+        start_barrier.wait()
+        while time.perf_counter() < deadline[0]:
+            status, elapsed = one_request(client)
+            latencies[client.index].append(elapsed)
+            statuses[client.index][status] = statuses[client.index].get(status, 0) + 1
+        if client.connection is not None:
+            client.connection.close()
+
+    threads = [threading.Thread(target=drive, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + 3600
+    start_barrier.wait()
+    start = time.perf_counter()
+    deadline[0] = start + args.duration
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = sorted(latency for client_latencies in latencies for latency in client_latencies)
+    all_statuses = {}
+    for client_statuses in statuses:
+        for status, count in client_statuses.items():
+            all_statuses[str(status)] = all_statuses.get(str(status), 0) + count
+    errors = sum(count for status, count in all_statuses.items() if not 200 <= int(status) < 300)
+    return {
+        'requests': len(all_latencies),
+        'errors': errors,
+        'statuses': all_statuses,
+        'requests_per_second': len(all_latencies) / elapsed,
+        'mean_ms': sum(all_latencies) / len(all_latencies) * 1000 if all_latencies else None,
+        'p50_ms': percentile(all_latencies, 0.50),
+        'p95_ms': percentile(all_latencies, 0.95),
+        'p99_ms': percentile(all_latencies, 0.99),
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile, in milliseconds."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)] * 1000
+
+
+def run(url: str, args: argparse.Namespace, scale: Dict[str, int]) -> Dict[str, Any]:
+    db_config.DATABASE_URL = url
+    hashing.configure(rounds=args.rounds, use_pool=False)
+    app = create_app(BENCH_DB)
+    Database.create_database(BENCH_DB)
+    db_int.set_database(Database.Engine)
+    Database.drop_all_test_database(BENCH_DB)
+    Database.create_database(BENCH_DB)
+
+    start = time.perf_counter()
+    seed(scale, args.seed)
+    seed_seconds = time.perf_counter() - start
+    tokens = {}
+
+    def token(user_id: int) -> str:
+        # Minted on first use, so a large --users costs nothing for users the clients never pick.
+        if user_id not in tokens:
+            with app.app_context():
+                tokens[user_id] = create_access_token(identity=email(user_id))
+        return tokens[user_id]
+
+    # The server is forked, so it inherits the admin list; this process's connections are not shared with it.
+    api.ADMIN_EMAILS = frozenset([email(ADMIN_USER_ID)])
+    Database.Engine.dispose()
+    parent_end, child_end = multiprocessing.Pipe()
+    server = multiprocessing.get_context('fork').Process(target=serve, args=(child_end, args.rounds))
+    server.start()
+    try:
+        if not parent_end.poll(60):
+            raise RuntimeError('the server did not start')
+        port = parent_end.recv()
+        results = {}
+        for scenario in SCENARIOS:
+            if args.scenario and scenario.name not in args.scenario:
+                continue
+            results[scenario.name] = run_scenario(scenario, port, token, args, scale)
+            print_result(url, scenario.name, results[scenario.name])
+    finally:
+        server.terminate()
+        server.join()
+        Database.drop_all_test_database(BENCH_DB)
+        Database.Engine.dispose()
+
+    return {'database': make_url(url).get_backend_name(), 'url': repr(make_url(url)),
+            'seed_seconds': seed_seconds, 'scenarios': results}
+
+
+def print_result(label: str, name: str, result: Dict[str, Any]) -> None:
+    if not result['requests']:
+        print('%-30s %-24s no requests completed' % (label, name))
+        return
+    print('%-30s %-24s %8.1f req/s  p50 %7.1fms  p95 %7.1fms  p99 %7.1fms  errors %d' % (
+        label, name, result['requests_per_second'], result['p50_ms'], result['p95_ms'], result['p99_ms'],
+        result['errors']))
+
+
+'''
+===================================================================================
+==================================COMPARING========================================
+===================================================================================
+'''
+
+
+def compare(baseline_path: str, current_path: str) -> None:
+    """Print each scenario's change in throughput and tail latency between two result files."""
+    with open(baseline_path) as baseline_file, open(current_path) as current_file:
+        baseline, current = json.load(baseline_file), json.load(current_file)
+    print('%s (%s) -> %s (%s)' % (baseline_path, baseline['commit'], current_path, current['commit']))
+    if baseline['scale'] != current['scale']:
+        print('warning: the datasets differ in scale')
+
+    baseline_runs = {run_result['database']: run_result for run_result in baseline['runs']}
+    for run_result in current['runs']:
+        before_run = baseline_runs.get(run_result['database'])
+        if before_run is None:
+            continue
+        for name, after in run_result['scenarios'].items():
+            before = before_run['scenarios'].get(name)
+            if before is None or not before['requests'] or not after['requests']:
+                continue
+            print('%-12s %-24s req/s %+6.1f%%  p50 %+6.1f%%  p95 %+6.1f%%  p99 %+6.1f%%' % (
+                run_result['database'], name, _change(before, after, 'requests_per_second'),
+                _change(before, after, 'p50_ms'), _change(before, after, 'p95_ms'),
+                _change(before, after, 'p99_ms')))
+
+
+def _change(before: Dict[str, Any], after: Dict[str, Any], key: str) -> float:
+    return (after[key] - before[key]) / before[key] * 100
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', action='append', default=None)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--organizations', type=int, default=200)
+    parser.add_argument('--activities-per-organization', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=200000)
+    parser.add_argument('--organization-requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per scenario')
+    parser.add_argument('--rounds', type=int, default=hashing.BCRYPT_ROUNDS, help='bcrypt cost')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--scenario', action='append', default=None,
+                        choices=[scenario.name for scenario in SCENARIOS], help='run only these')
+    parser.add_argument('--output', default=None, help='JSON results path, load-<commit>.json by default')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), default=None,
+                        help='compare two result files instead of running')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    scale = {'users': args.users, 'organizations': args.organizations,
+             'activities_per_organization': args.activities_per_organization,
+             'transactions': args.transactions, 'organization_requests': args.organization_requests}
+    commit = current_commit()
+    results = {'commit': commit, 'created': datetime.utcnow().isoformat() + 'Z', 'python': platform.python_version(),
+               'scale': scale, 'concurrency': args.concurrency, 'duration': args.duration, 'rounds': args.rounds,
+               'seed': args.seed, 'runs': [run(url, args, scale) for url in args.url or ['sqlite:///bench.db']]}
+
+    output = args.output or 'load-%s.json' % commit
+    with open(output, 'w') as output_file:
+        json.dump(results, output_file, indent=2, sort_keys=True)
+    print('results written to %s' % output)
+
+
+if __name__ == '__main__':
+    main()
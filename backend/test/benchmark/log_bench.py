@@ -0,0 +1,89 @@
+'''
+Per-request logging cost seen by request threads, before and after the queue
+pipeline.  Each simulated request logs two DEBUG lines and one error through
+log_error.  "before" is the old setup: basicConfig(level=DEBUG) writing to a
+file synchronously, with the old string-building log_error (reproduced below).
+
+    python -m backend.test.benchmark.log_bench --threads 8 --requests 20000
+'''
+import argparse
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import backend.api.errors as errors
+import backend.api.logs as logs
+
+
+def legacy_log_error(code: int = None, error_string_override: str = None, module_name: str = None,
+                     function_name: str = None) -> None:
+    err_parts = []
+    if code is not None:
+        err_parts.append(code)
+    if module_name is not None:
+        err_parts.append(module_name)
+    if function_name is not None:
+        err_parts.append(function_name)
+    err_parts.append(error_string_override if error_string_override is not None else errors.get_error_string(code))
+
+    full_error_string = ""
+    for i, part in enumerate(err_parts):
+        if i != 0:
+            full_error_string += ":"
+        full_error_string += str(part)
+    logging.error(full_error_string)
+
+
+def simulated_request(log_error: object, i: int) -> None:
+    logging.debug('handling request %d', i)
+    log_error(errors.FAILED_TO_QUERY_FOR_USER_CODE, 'lookup failed for user %d' % (i % 50),
+              'backend.data_model.db_interface', 'get_user_id')
+    logging.debug('finished request %d', i)
+
+
+def run(label: str, log_error: object, threads: int, requests: int) -> None:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda i: simulated_request(log_error, i), range(requests)))
+    elapsed = time.perf_counter() - start
+    print('%-8s %8.1fus per request (%d threads, %d requests)' % (label, elapsed / requests * 1e6, threads,
+                                                                  requests))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--sample-limit', type=int, default=logs.LOG_SAMPLE_LIMIT,
+                        help='0 turns sampling off, so every error is written')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    root = logging.getLogger()
+
+    before_file = os.path.join(directory, 'before.log')
+    handler = logging.FileHandler(before_file)
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+    run('before', legacy_log_error, args.threads, args.requests)
+    root.removeHandler(handler)
+    handler.close()
+
+    after_file = os.path.join(directory, 'after.log')
+    logs.configure_logging(after_file, level='INFO', sample_limit=args.sample_limit)
+    run('after', errors.log_error, args.threads, args.requests)
+    start = time.perf_counter()
+    logs.shutdown_logging()
+    print('after: listener drained its queue in %.2fs, %d records dropped' % (time.perf_counter() - start,
+                                                                              logs.dropped_records()))
+
+    for name in (before_file, after_file):
+        with open(name) as log_file:
+            print('%s: %d lines' % (os.path.basename(name), sum(1 for _ in log_file)))
+        os.remove(name)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+'''
+Login latency and throughput under concurrent clients, with bcrypt run inline
+on the request thread versus in the bounded hashing pool.
+
+    python -m backend.test.benchmark.login_bench --clients 50 --requests 1000
+'''
+import argparse
+import os
+import threading
+import time
+from typing import List, Dict, Any
+from app import app
+import backend.api.hashing as hashing
+from backend.data_model.data_model import Database
+from backend.data_model.db_interface import set_database
+from backend.test.test_helper import get_valid_register_user_dict
+
+BENCH_DB = 'bench'
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_logins(clients: int, total_requests: int, credentials: Dict[str, Any]) -> Dict[str, Any]:
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    per_client = total_requests // clients
+
+    def client_loop():
+        client = app.test_client()
+        local_latencies = []
+        local_statuses = {}
+        for _ in range(per_client):
+            start = time.perf_counter()
+            ret = client.post('/login-user', json=credentials)
+            local_latencies.append(time.perf_counter() - start)
+            local_statuses[ret.status_code] = local_statuses.get(ret.status_code, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for code, count in local_statuses.items():
+                statuses[code] = statuses.get(code, 0) + count
+
+    threads = [threading.Thread(target=client_loop) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'requests_per_sec': len(latencies) / elapsed,
+        'statuses': statuses
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=hashing.BCRYPT_ROUNDS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    Database.create_database(BENCH_DB)
+    set_database(Database.Engine)
+    app.testing = True
+
+    user_dict = get_valid_register_user_dict()
+    credentials = {'email': user_dict['email'], 'password': user_dict['password']}
+
+    try:
+        hashing.configure(rounds=args.rounds, use_pool=False)
+        app.test_client().post('/register-user', json=user_dict)
+
+        for use_pool in (False, True):
+            hashing.configure(workers=args.workers, max_queue_depth=args.clients * 2, use_pool=use_pool)
+            result = run_logins(args.clients, args.requests, credentials)
+            print('%-8s p50=%.1fms p99=%.1fms rps=%.1f statuses=%s' % (
+                'pool' if use_pool else 'inline', result['p50_ms'], result['p99_ms'],
+                result['requests_per_sec'], result['statuses']))
+    finally:
+        hashing.shutdown()
+        Database.drop_all_test_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+'''
+Cost of the login lookup (db_interface._get_login_row) as the User table grows.
+The table is grown in steps up to the largest size and the lookup is timed at
+each step, so a flat line means the unique Email index is doing its job.
+
+    python -m backend.test.benchmark.login_lookup_bench --url sqlite:///bench.db
+    python -m backend.test.benchmark.login_lookup_bench --url postgresql://localhost/bench
+'''
+import argparse
+import random
+import time
+from typing import List
+from sqlalchemy import create_engine
+import backend.api.hashing as hashing
+import backend.data_model.db_interface as db_int
+from backend.data_model.data_model import Database, User
+
+INSERT_CHUNK = 10000
+
+
+def email_for(index: int) -> str:
+    return 'user%d@bench.com' % index
+
+
+def grow_users(engine, start: int, stop: int, password_hash: str) -> None:
+    for chunk_start in range(start, stop, INSERT_CHUNK):
+        chunk_stop = min(stop, chunk_start + INSERT_CHUNK)
+        rows = [{'Email': email_for(i), 'PasswordHash': password_hash,
+                 'LastName': 'last', 'PhoneNumber': '6086086008'}
+                for i in range(chunk_start, chunk_stop)]
+        with engine.begin() as connection:
+            connection.execute(User.__table__.insert(), rows)
+
+
+def time_lookups(size: int, lookups: int) -> float:
+    emails = [email_for(random.randrange(size)) for _ in range(lookups)]
+    with db_int.session_scope() as session:
+        start = time.perf_counter()
+        for email in emails:
+            db_int._get_login_row(email, session)
+        elapsed = time.perf_counter() - start
+    return elapsed / lookups * 1e6
+
+
+def run(url: str, sizes: List[int], lookups: int) -> None:
+    engine = create_engine(url)
+    Database.Base.metadata.drop_all(engine, tables=[User.__table__])
+    Database.Base.metadata.create_all(engine, tables=[User.__table__])
+    db_int.set_database(engine)
+
+    password_hash = hashing._hash('password', 4)
+    grown = 0
+    try:
+        for size in sizes:
+            grow_users(engine, grown, size, password_hash)
+            grown = size
+            print('%-12s users=%-9d lookup=%.1fus' % (engine.dialect.name, size, time_lookups(size, lookups)))
+    finally:
+        Database.Base.metadata.drop_all(engine, tables=[User.__table__])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', action='append', default=None,
+                        help='SQLAlchemy URL, may be repeated (default sqlite:///bench.db)')
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    for url in args.url or ['sqlite:///bench.db']:
+        run(url, sizes, args.lookups)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+'''
+Cost of the metrics middleware: the same requests against an app built with
+metrics on and one built with them off (and the SQL listeners removed),
+alternating request by request; the median request of each is compared.
+/random is the cheapest route there is; /organizations/1/activities checks a
+token and runs a catalog query, as most routes do.
+
+    python -m backend.test.benchmark.metrics_bench --requests 20000
+'''
+import argparse
+import statistics
+import time
+from datetime import datetime
+from unittest.mock import patch
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import backend.api.metrics as metrics
+import backend.data_model.db_interface as db_int
+from backend.data_model.data_model import Database, User, Organization, Activity
+from app import create_app
+
+BENCH_DB = 'bench'
+ACTIVITIES = 50
+
+
+def seed() -> None:
+    with Database.Engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'Id': 1, 'Email': 'user@bench.com', 'PasswordHash': 'hash', 'LastName': 'last',
+             'PhoneNumber': '6086086008'}])
+        connection.execute(Organization.__table__.insert(), [
+            {'Id': 1, 'Name': 'Org', 'OwnerId': 1, 'Type': 1, 'PointsToDistribute': 0, 'PointsToConsume': 0,
+             'LastRefreshInstant': datetime.utcnow(), 'RefreshIntervalInDays': 30, 'RefreshAmount': 0}])
+        connection.execute(Activity.__table__.insert(), [
+            {'PointsPerHour': 1, 'PointsPerCompletion': 1, 'OneTime': False, 'Visibility': 1,
+             'AssociatedOrganization': 1, 'Description': 'activity %d' % i} for i in range(ACTIVITIES)])
+
+
+def set_sql_listeners(on: bool) -> None:
+    for name, listener in (('before_cursor_execute', metrics._before_cursor_execute),
+                           ('after_cursor_execute', metrics._after_cursor_execute)):
+        if on and not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
+        elif not on and event.contains(Engine, name, listener):
+            event.remove(Engine, name, listener)
+
+
+def time_request(client, path: str, headers: dict) -> float:
+    start = time.perf_counter()
+    response = client.get(path, headers=headers)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.data
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--warmup', type=int, default=500)
+    args = parser.parse_args()
+
+    with patch.object(metrics, 'METRICS_ENABLED', False):
+        app_off = create_app(BENCH_DB)
+    app_on = create_app(BENCH_DB)
+    Database.create_database(BENCH_DB)
+    db_int.set_database(Database.Engine)
+    try:
+        seed()
+        with app_on.app_context():
+            headers = {'Authorization': 'Bearer ' + create_access_token(identity='user@bench.com')}
+        clients = {'off': app_off.test_client(), 'on': app_on.test_client()}
+
+        for path in ('/random', '/organizations/1/activities'):
+            timings = {'off': [], 'on': []}
+            for i in range(args.warmup + args.requests):
+                # Alternate request by request, so drift in the machine's speed lands on both.
+                for label in ('off', 'on') if i % 2 else ('on', 'off'):
+                    set_sql_listeners(label == 'on')
+                    elapsed = time_request(clients[label], path, headers)
+                    if i >= args.warmup:
+                        timings[label].append(elapsed)
+            off, on = statistics.median(timings['off']), statistics.median(timings['on'])
+            print('%-30s off %7.1fus  on %7.1fus  overhead %+5.1fus (%+.2f%%)' % (
+                path, off * 1e6, on * 1e6, (on - off) * 1e6, (on - off) / off * 100))
+    finally:
+        set_sql_listeners(True)
+        Database.drop_all_test_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+'''
+One refresh tick over many organizations, a fraction of them due.  Times
+run_due_refreshes() against the scan it replaces, which reads every
+organization and checks LastRefreshInstant + RefreshIntervalInDays in Python.
+
+    python -m backend.test.benchmark.refresh_bench --orgs 1000000 --due 0.01
+'''
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+import backend.data_model.db_interface as db_int
+import backend.data_model.refresh as refresh
+from backend.data_model.data_model import Database, User, Organization, RefreshEvent, next_refresh_at
+
+BENCH_DB = 'bench'
+INSERT_CHUNK = 50000
+
+
+def seed(orgs: int, due: float, now: datetime) -> int:
+    with Database.Engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'Id': 1, 'Email': 'owner@bench.com', 'PasswordHash': 'hash', 'LastName': 'last',
+             'PhoneNumber': '6086086008'}])
+
+    due_count = 0
+    for start in range(0, orgs, INSERT_CHUNK):
+        rows = []
+        for i in range(start + 1, min(orgs, start + INSERT_CHUNK) + 1):
+            interval = random.choice((7, 30, 90))
+            if random.random() < due:
+                last_refresh = now - timedelta(days=interval, hours=random.randint(0, 48))
+                due_count += 1
+            else:
+                last_refresh = now - timedelta(days=random.randint(0, interval - 1))
+            rows.append({'Id': i, 'Name': 'Org %d' % i, 'OwnerId': 1, 'Type': 1, 'PointsToDistribute': 0,
+                         'PointsToConsume': 0, 'LastRefreshInstant': last_refresh,
+                         'RefreshIntervalInDays': interval, 'RefreshAmount': 1000,
+                         'NextRefreshAt': next_refresh_at(last_refresh, interval)})
+        with Database.Engine.begin() as connection:
+            connection.execute(Organization.__table__.insert(), rows)
+    return due_count
+
+
+def full_scan(now: datetime) -> int:
+    with db_int.session_scope() as session:
+        rows = session.query(Organization.Id, Organization.LastRefreshInstant,
+                             Organization.RefreshIntervalInDays).all()
+    return sum(1 for _, last_refresh, interval in rows if next_refresh_at(last_refresh, interval) <= now)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orgs', type=int, default=1000000)
+    parser.add_argument('--due', type=float, default=0.01)
+    parser.add_argument('--batch-size', type=int, default=refresh.REFRESH_BATCH_SIZE)
+    args = parser.parse_args()
+
+    Database.create_database(BENCH_DB)
+    db_int.set_database(Database.Engine)
+    now = datetime.utcnow()
+    try:
+        start = time.perf_counter()
+        due_count = seed(args.orgs, args.due, now)
+        print('seeded %d organizations (%d due) in %.1fs' % (args.orgs, due_count, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        found = full_scan(now)
+        print('full scan: %.2fs to find %d due' % (time.perf_counter() - start, found))
+
+        start = time.perf_counter()
+        refreshed, _ = refresh.run_due_refreshes(now, args.batch_size)
+        elapsed = time.perf_counter() - start
+        print('run_due_refreshes: %.2fs for %d organizations (%.0f/s)' % (elapsed, refreshed, refreshed / elapsed))
+
+        start = time.perf_counter()
+        refreshed, _ = refresh.run_due_refreshes(now, args.batch_size)
+        print('idle tick: %.1fms, %d refreshed' % ((time.perf_counter() - start) * 1000, refreshed))
+
+        with db_int.session_scope() as session:
+            print('refresh events written: %d' % session.query(RefreshEvent).count())
+    finally:
+        Database.drop_all_test_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+'''
+Holds N simulated waiting clients on the notification hub, then redeems every
+code and measures publish-to-wake latency and memory per waiting connection.
+
+Clients are threads with a small stack here; under gunicorn -k gevent they
+are greenlets, which are cheaper still.  "hub" memory is the Python objects
+the hub keeps per subscriber; "rss" also includes the waiting thread.
+
+    python -m backend.test.benchmark.sse_bench --clients 10000
+'''
+import argparse
+import threading
+import time
+import tracemalloc
+import backend.api.notifications as notifications
+
+
+def rss_kb() -> int:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=10000)
+    parser.add_argument('--stack-kb', type=int, default=256)
+    args = parser.parse_args()
+
+    threading.stack_size(args.stack_kb * 1024)
+    hub = notifications.get_hub()
+    latencies = []
+    latencies_lock = threading.Lock()
+    subscribed = threading.Semaphore(0)
+
+    tracemalloc.start()
+    rss_before = rss_kb()
+    hub_before = tracemalloc.get_traced_memory()[0]
+    subscriptions = [hub.subscribe(notifications.claim_key('%06d' % i)) for i in range(args.clients)]
+    hub_after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    def client(subscription):
+        subscribed.release()
+        message = subscription.wait(60)
+        woke = time.perf_counter()
+        hub.unsubscribe(subscription)
+        if message is not None:
+            with latencies_lock:
+                latencies.append(woke - message['sent'])
+
+    threads = [threading.Thread(target=client, args=(subscription,), daemon=True)
+               for subscription in subscriptions]
+    for thread in threads:
+        thread.start()
+    for _ in threads:
+        subscribed.acquire()
+    rss_waiting = rss_kb()
+
+    start = time.perf_counter()
+    for i in range(args.clients):
+        hub.publish(notifications.claim_key('%06d' % i), {'sent': time.perf_counter()})
+    publish_elapsed = time.perf_counter() - start
+    for thread in threads:
+        thread.join()
+
+    print('clients=%d delivered=%d publish=%.0f/s' % (args.clients, len(latencies),
+                                                      args.clients / publish_elapsed))
+    print('latency p50=%.2fms p99=%.2fms max=%.2fms' % (percentile(latencies, 50) * 1000,
+                                                        percentile(latencies, 99) * 1000,
+                                                        max(latencies) * 1000))
+    print('memory per connection: hub=%.0fB rss=%.1fKB' % ((hub_after - hub_before) / args.clients,
+                                                           (rss_waiting - rss_before) / args.clients))
+    print('subscribers left=%d' % len(hub))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+'''
+Cold-start time and RSS of the app, and RSS of workers forked from it (as
+gunicorn --preload would).  Each sample runs in a fresh interpreter.
+
+    python -m backend.test.benchmark.startup_bench --samples 10 --workers 4
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r'''
+import json, os, resource, sys, time
+start = time.perf_counter()
+import app
+elapsed_ms = (time.perf_counter() - start) * 1000
+parent_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def rss_kb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+worker_rss = []
+for _ in range(int(sys.argv[1])):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        app.app.test_client().get('/random')
+        os.write(write_fd, str(rss_kb()).encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    worker_rss.append(int(os.read(read_fd, 64)))
+    os.close(read_fd)
+    os.close(write_fd)
+
+print(json.dumps({'startup_ms': elapsed_ms, 'rss_kb': parent_rss, 'worker_rss_kb': worker_rss}))
+'''
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--samples', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    samples = []
+    for _ in range(args.samples):
+        output = subprocess.check_output([sys.executable, '-c', PROBE, str(args.workers)], cwd=root)
+        samples.append(json.loads(output.decode().strip().splitlines()[-1]))
+
+    worker_rss = [rss for sample in samples for rss in sample['worker_rss_kb']]
+    print('startup median=%.1fms min=%.1fms' % (statistics.median(s['startup_ms'] for s in samples),
+                                                min(s['startup_ms'] for s in samples)))
+    print('master rss median=%dKB' % statistics.median(s['rss_kb'] for s in samples))
+    if worker_rss:
+        print('worker rss median=%dKB' % statistics.median(worker_rss))
+
+
+if __name__ == '__main__':
+    main()
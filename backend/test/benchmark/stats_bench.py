@@ -0,0 +1,113 @@
+'''
+Stats reads against a large ledger.  Transactions spread over a year are bulk
+inserted, the rollups are built with rebuild_stats(), then a user's last 30
+days are read three ways, with p50/p99 latencies: GROUP BY over the raw
+transactions, the rollup rows, and the rollup rows through the cache.
+
+    python -m backend.test.benchmark.stats_bench --rows 10000000 --users 100000
+'''
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+from sqlalchemy import func
+import backend.data_model.db_interface as db_int
+import backend.data_model.ledger as ledger
+import backend.data_model.stats as stats
+from backend.data_model.data_model import (Database, User, Organization, ActivityTransaction,
+                                           RewardTransaction)
+
+BENCH_DB = 'bench'
+INSERT_CHUNK = 50000
+DAYS = 365
+BUCKETS = 30
+
+
+def seed(rows: int, users: int, orgs: int, now: datetime) -> None:
+    with Database.Engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'Id': i, 'Email': 'user%d@bench.com' % i, 'PasswordHash': 'hash', 'LastName': 'last',
+             'PhoneNumber': '6086086008'} for i in range(1, users + 1)])
+        connection.execute(Organization.__table__.insert(), [
+            {'Id': i, 'Name': 'Org %d' % i, 'OwnerId': 1, 'Type': 1, 'PointsToDistribute': 0,
+             'PointsToConsume': 0, 'LastRefreshInstant': now, 'RefreshIntervalInDays': 30,
+             'RefreshAmount': 0} for i in range(1, orgs + 1)])
+
+    first = now - timedelta(days=DAYS)
+    for start in range(0, rows, INSERT_CHUNK):
+        chunk = range(start, min(rows, start + INSERT_CHUNK))
+        instants = [first + timedelta(seconds=random.randrange(DAYS * 86400)) for _ in chunk]
+        activities = [{'UserId': i % users + 1, 'Points': 10, 'OrganizationId': i % orgs + 1,
+                       'Instant': instant} for i, instant in zip(chunk, instants) if i % 10]
+        rewards = [{'UserId': i % users + 1, 'Points': 5, 'OrganizationId': i % orgs + 1,
+                    'Instant': instant, 'Reward': 1} for i, instant in zip(chunk, instants) if not i % 10]
+        with Database.Engine.begin() as connection:
+            connection.execute(ActivityTransaction.__table__.insert(), activities)
+            if rewards:
+                connection.execute(RewardTransaction.__table__.insert(), rewards)
+
+
+def group_by_on_demand(user_id: int, now: datetime) -> None:
+    since = stats.shift_bucket(stats.bucket_start(now, stats.DAY), stats.DAY, 1 - BUCKETS)
+    with db_int.session_scope() as session:
+        for table in (ActivityTransaction, RewardTransaction):
+            session.query(func.date(table.Instant), func.sum(table.Points), func.count()) \
+                .filter(table.UserId == user_id, table.Instant >= since) \
+                .group_by(func.date(table.Instant)) \
+                .all()
+
+
+def run(label: str, read: Callable[[int], None], user_ids: List[int]) -> None:
+    latencies = []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        read(user_id)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print('%-22s p50 %7.3fms  p99 %7.3fms' % (label, latencies[len(latencies) // 2] * 1e3,
+                                              latencies[int(len(latencies) * 0.99)] * 1e3))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--orgs', type=int, default=100)
+    parser.add_argument('--reads', type=int, default=2000)
+    args = parser.parse_args()
+
+    Database.create_database(BENCH_DB)
+    db_int.set_database(Database.Engine)
+    now = datetime.utcnow()
+    try:
+        start = time.perf_counter()
+        seed(args.rows, args.users, args.orgs, now)
+        print('seeded %d ledger rows in %.1fs' % (args.rows, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        written, _ = stats.rebuild_stats()
+        elapsed = time.perf_counter() - start
+        print('rebuild_stats: %d rollup rows in %.1fs (%.0f ledger rows/s)' % (written, elapsed,
+                                                                               args.rows / elapsed))
+
+        # Users read more than once, as a dashboard being reloaded would be.
+        user_ids = [random.randint(1, max(1, args.users // 10)) for _ in range(args.reads)]
+        run('GROUP BY on demand', lambda user_id: group_by_on_demand(user_id, now), user_ids)
+        stats.set_cache(stats.StatsCache(max_size=0))
+        run('rollups', lambda user_id: stats.get_user_stats(user_id, stats.DAY, BUCKETS, now), user_ids)
+        stats.set_cache(stats.StatsCache())
+        run('rollups, cached', lambda user_id: stats.get_user_stats(user_id, stats.DAY, BUCKETS, now), user_ids)
+
+        start = time.perf_counter()
+        for user_id in user_ids:
+            ledger.record_activity(user_id, user_id % args.orgs + 1, 1)
+        elapsed = time.perf_counter() - start
+        print('record_activity: %.0f writes/s (%.0fus each)' % (len(user_ids) / elapsed,
+                                                                elapsed / len(user_ids) * 1e6))
+    finally:
+        Database.drop_all_test_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
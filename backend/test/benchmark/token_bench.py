@@ -0,0 +1,94 @@
+'''
+Authenticated requests per second through the Flask test client, for a route
+protected by flask_jwt_extended's jwt_required and by
+tokens.access_token_required with and without the claims cache.  A share of
+the requests use revoked tokens, to show the Bloom filter only sends those to
+the database.
+
+    python -m backend.test.benchmark.token_bench --requests 20000 --users 100
+'''
+import argparse
+import random
+import time
+from typing import List, Dict
+from flask_jwt_extended import jwt_required, create_access_token
+from app import create_app
+import backend.api.tokens as tokens
+import backend.data_model.db_interface as db_int
+from backend.data_model.data_model import Database
+
+BENCH_DB = 'bench'
+
+
+def run(label: str, client: object, path: str, headers: List[Dict[str, str]], requests: int) -> None:
+    start = time.perf_counter()
+    for i in range(requests):
+        client.get(path, headers=random.choice(headers))
+    elapsed = time.perf_counter() - start
+    print('%-22s %8.0f requests/s (%.0fus each)' % (label, requests / elapsed, elapsed / requests * 1e6))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--revoked', type=int, default=1, help='of the users, how many have revoked tokens')
+    args = parser.parse_args()
+
+    app = create_app(BENCH_DB)
+    Database.create_database(BENCH_DB)
+    db_int.set_database(Database.Engine)
+
+    @app.route('/bench/library')
+    @jwt_required
+    def library_protected():
+        return 'ok'
+
+    @app.route('/bench/tokens')
+    @tokens.access_token_required
+    def tokens_protected():
+        return 'ok'
+
+    try:
+        with app.app_context():
+            encoded = [create_access_token(identity='user%d@bench.com' % i) for i in range(args.users)]
+        headers = [{'Authorization': 'Bearer ' + token} for token in encoded]
+        client = app.test_client()
+
+        tokens.set_revocations(tokens.RevocationIndex())
+        for header in headers[:args.revoked]:
+            with app.test_request_context(headers=header):
+                tokens.revoke(tokens.verify_token_in_request(tokens.ACCESS))
+        live = headers[args.revoked:]
+
+        # Token checks alone, inside one request context per token.
+        for label, cache in [('verify, no cache', tokens.ClaimsCache(max_size=0)),
+                             ('verify, claims cache', tokens.ClaimsCache())]:
+            tokens.set_claims_cache(cache)
+            contexts = [app.test_request_context(headers=header) for header in live]
+            start = time.perf_counter()
+            for i in range(args.requests):
+                context = contexts[i % len(contexts)]
+                context.push()
+                tokens.verify_token_in_request(tokens.ACCESS)
+                context.pop()
+            elapsed = time.perf_counter() - start
+            print('%-22s %8.0f checks/s (%.1fus each)' % (label, args.requests / elapsed,
+                                                          elapsed / args.requests * 1e6))
+
+        run('jwt_required', client, '/bench/library', headers, args.requests)
+
+        tokens.set_claims_cache(tokens.ClaimsCache(max_size=0))
+        tokens.get_revocations().database_checks = 0
+        run('tokens, no cache', client, '/bench/tokens', headers, args.requests)
+
+        tokens.set_claims_cache(tokens.ClaimsCache())
+        run('tokens, claims cache', client, '/bench/tokens', headers, args.requests)
+        print('database revocation checks: %d of %d requests' % (tokens.get_revocations().database_checks,
+                                                                 2 * args.requests))
+    finally:
+        Database.drop_all_test_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+'''
+Validations per second for the compiled schemas against the hand-coded checks
+they replaced (reproduced below as the baseline).  Register requests are
+validated without hashing the password.
+
+    python -m backend.test.benchmark.validation_bench --iterations 200000
+'''
+import argparse
+import re
+import time
+from typing import Dict, Any, List
+import backend.api.errors as errors
+import backend.api.validation as validation
+
+VALID_REQUEST = {'email': 'test@test.com', 'password': 'password', 'first_name': 'first',
+                 'last_name': 'last', 'phone_number': '608-608-6008'}
+INVALID_REQUEST = {'email': 'test_test.com', 'password': 'five', 'first_name': 'first',
+                   'last_name': '', 'phone_number': '555-555-555'}
+
+
+def _legacy_phone_number_regex(phone_number: str) -> bool:
+    if re.match(r"\A\d{3}-\d{3}-\d{4}\Z", phone_number):
+        return True
+    elif re.match(r"\A1\d{3}-\d{3}-\d{4}\Z", phone_number):
+        return True
+    elif re.match(r"\A\d{10}\Z", phone_number):
+        return True
+    elif re.match(r"\A1\d{10}\Z", phone_number):
+        return True
+    return False
+
+
+def _legacy_validate_phone_number(phone_number: str) -> bool:
+    if phone_number is None:
+        return False
+    return _legacy_phone_number_regex(phone_number.strip())
+
+
+def _legacy_validate_email(email: str) -> bool:
+    return email is not None and re.match(r"[^@]+@[^@]+\.[^@]+", email) is not None
+
+
+def legacy_validate_register(request: Dict[str, Any]) -> List[int]:
+    error_codes = []
+    if not _legacy_validate_email(request.get('email')):
+        error_codes.append(errors.EMAIL_INVALID_CODE)
+    if len(request.get('password')) < 6:
+        error_codes.append(errors.PASSWORD_INVALID_CODE)
+    last_name = request.get('last_name')
+    if not (last_name is not None and len(last_name) > 0):
+        error_codes.append(errors.NAME_INVALID_CODE)
+    if not _legacy_validate_phone_number(request.get('phone_number')):
+        error_codes.append(errors.PHONE_NUMBER_INVALID_CODE)
+    return error_codes
+
+
+def time_validator(name: str, validate: Any, request: Dict[str, Any], iterations: int) -> None:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        validate(request)
+    elapsed = time.perf_counter() - start
+    print('%-28s %10.0f validations/s (%.2fus each)' % (name, iterations / elapsed, elapsed / iterations * 1e6))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+
+    for label, request in [('valid', VALID_REQUEST), ('invalid', INVALID_REQUEST)]:
+        time_validator('legacy register (' + label + ')', legacy_validate_register, request, args.iterations)
+        time_validator('schema register (' + label + ')', validation.REGISTER_USER, request, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
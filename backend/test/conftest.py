@@ -0,0 +1,15 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+'''
+Loaded by pytest before any test module, and imported first by
+backend_test_suite.py.  Importing app configures logging, so the log file is
+moved out of the working directory here, before any test module can import
+it.  The directory is removed at exit, after logging's own atexit flush.
+'''
+
+_log_directory = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, _log_directory, True)
+os.environ.setdefault('VOLUNTEER_LOG_FILE', os.path.join(_log_directory, 'logfile'))
@@ -0,0 +1,197 @@
+import atexit
+import os
+import shutil
+import tempfile
+import unittest
+from typing import Dict, Any, Callable
+import sqlalchemy_utils
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+import backend.data_model.db_config as db_config
+import backend.data_model.db_interface as db_interface
+from backend.data_model.data_model import Database, OrganizationType
+
+'''
+Test database fixture.  The schema is built once per test process, on an
+in-memory SQLite database by default, and every DatabaseTestCase test runs
+inside a transaction on it that is rolled back afterwards:
+
+  * each session the code under test opens starts a SAVEPOINT, so its commit
+    releases the savepoint and its rollback returns to it, while the
+    enclosing transaction is left open;
+  * the enclosing transaction is rolled back when the test ends, so no rows
+    are deleted and no tables dropped between tests.
+
+VOLUNTEER_TEST_DATABASE_URL points the fixture elsewhere, e.g.
+sqlite:////dev/shm/volunteer_test.db for a file on tmpfs or a local
+PostgreSQL URL.  Under pytest-xdist (pytest -n auto) each worker gets its
+own database, named after the worker.
+
+A test that needs transactions that really commit, e.g. to race threads on
+separate connections, is decorated with @committed.  It runs against a
+file database whose rows are deleted afterwards; on SQLite the file is kept
+in a temporary directory removed at exit.
+'''
+
+TEST_DATABASE_URL = os.environ.get('VOLUNTEER_TEST_DATABASE_URL', 'sqlite://')
+COMMITTED_DATABASE_NAME = 'committed_test'
+# Set by pytest-xdist in each worker process: gw0, gw1, ...
+WORKER = os.environ.get('PYTEST_XDIST_WORKER')
+
+# committed -> engine, each built on first use.
+_engines = {}
+_temporary_directory = None
+
+
+def get_valid_register_user_dict() -> Dict[str, Any]:
+    return {
+        'email': 'test@test.com',
+        'password': 'password',
+        'first_name': 'first',
+        'last_name': 'last',
+        'phone_number': '608-608-6008'
+    }
+
+
+def add_organization_types(session: Session) -> None:
+    """The OrganizationType rows Database.create_database seeds, which the test schema is built without."""
+    session.add_all([OrganizationType(Id=1, Name='Contributing'), OrganizationType(Id=2, Name='Consuming'),
+                     OrganizationType(Id=3, Name='Hybrid')])
+
+
+def committed(test: Callable[..., None]) -> Callable[..., None]:
+    """Run a DatabaseTestCase test without the enclosing transaction."""
+    test.committed_database = True
+    return test
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Binds db_interface to the shared test database for the duration of each test."""
+
+    def setUp(self):
+        super().setUp()
+        test = getattr(self, self._testMethodName)
+        if getattr(test, 'committed_database', False):
+            engine = get_test_engine(committed=True)
+            db_interface.set_database(engine)
+            self.addCleanup(_delete_all_rows, engine)
+            return
+
+        engine = get_test_engine()
+        connection = engine.connect()
+        transaction = connection.begin()
+        Database.Engine = engine
+        db_interface.Session = sessionmaker(bind=connection, class_=_SavepointSession)
+        # Cleanups run last in, first out.
+        self.addCleanup(connection.close)
+        self.addCleanup(transaction.rollback)
+
+
+def worker_database_name(name: str) -> str:
+    """name, made distinct per pytest-xdist worker, for tests that manage their own database."""
+    return name if WORKER is None else '%s_%s' % (name, WORKER)
+
+
+def remove_database_file(engine: Any) -> None:
+    """Delete a SQLite file database a test created with Database.create_database once it is dropped."""
+    engine.dispose()
+    if engine.url.get_backend_name() == 'sqlite' and not _is_memory(str(engine.url)):
+        os.remove(engine.url.database)
+
+
+def get_test_engine(committed: bool = False) -> Any:
+    """This process's test engine, with the schema built on first use."""
+    engine = _engines.get(committed)
+    if engine is None:
+        engine = _engines[committed] = _build_engine(_worker_url(committed), savepoints=not committed)
+    return engine
+
+
+class _SavepointSession(Session):
+    """A session that keeps its work in a SAVEPOINT of the test's transaction."""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.begin_nested()
+
+    def rollback(self) -> None:
+        # Returns to the savepoint; start another so work after the rollback can be undone too.
+        super().rollback()
+        if self.transaction is not None and not self.transaction.nested:
+            self.begin_nested()
+
+
+def _worker_url(committed: bool) -> str:
+    url = TEST_DATABASE_URL
+    if committed and db_config.is_sqlite(url):
+        url = 'sqlite:///' + os.path.join(_get_temporary_directory(), COMMITTED_DATABASE_NAME + '.db')
+    if WORKER is None or _is_memory(url):
+        return url
+
+    url = make_url(url)
+    if db_config.is_sqlite(str(url)):
+        root, extension = os.path.splitext(url.database)
+        url.database = '%s_%s%s' % (root, WORKER, extension)
+    else:
+        url.database = '%s_%s' % (url.database, WORKER)
+    return str(url)
+
+
+def _get_temporary_directory() -> str:
+    global _temporary_directory
+    if _temporary_directory is None:
+        _temporary_directory = tempfile.mkdtemp()
+        # Registered before any engine's _drop, so it runs after them.
+        atexit.register(shutil.rmtree, _temporary_directory, True)
+    return _temporary_directory
+
+
+def _build_engine(url: str, savepoints: bool) -> Any:
+    if not db_config.is_sqlite(url):
+        if not sqlalchemy_utils.database_exists(url):
+            sqlalchemy_utils.create_database(url)
+        engine = Database.create_engine(url)
+    elif savepoints:
+        # A test's one connection is also used by any threads the test starts.
+        # In memory, it must also be the only connection: each has its own database.
+        engine = create_engine(url, connect_args={'check_same_thread': False},
+                               **({'poolclass': StaticPool} if _is_memory(url) else {}))
+        _emit_sqlite_begin(engine)
+    else:
+        engine = Database.create_engine(url)
+    if not _is_memory(url):
+        atexit.register(_drop, engine)
+
+    Database.Base.metadata.drop_all(engine)
+    Database.Base.metadata.create_all(engine)
+    return engine
+
+
+def _emit_sqlite_begin(engine: Any) -> None:
+    # pysqlite begins transactions itself, lazily, and commits before a
+    # SAVEPOINT.  Taking that over lets SQLAlchemy's SAVEPOINTs nest.
+    @event.listens_for(engine, 'connect')
+    def disable_pysqlite_transactions(dbapi_connection: Any, connection_record: Any) -> None:
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def begin(connection: Any) -> None:
+        connection.execute('BEGIN')
+
+
+def _delete_all_rows(engine: Any) -> None:
+    with engine.begin() as connection:
+        for table in reversed(Database.Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+
+
+def _drop(engine: Any) -> None:
+    Database.Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def _is_memory(url: str) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
@@ -0,0 +1,111 @@
+import unittest
+from datetime import datetime, timedelta
+import backend.api.errors as errors
+import backend.data_model.approvals as approvals
+import backend.data_model.db_interface as db_interface
+import backend.data_model.refresh as refresh
+from backend.data_model.data_model import (User, Organization, OrganizationRegistrationRequest,
+                                           OrganizationRegistrationDecision)
+from backend.test.test_helper import DatabaseTestCase, add_organization_types
+
+
+class TestApprovals(DatabaseTestCase):
+
+    NOW = datetime(2019, 7, 17, 12)
+
+    def setUp(self):
+        super().setUp()
+
+        with db_interface.session_scope() as session:
+            add_organization_types(session)
+            session.add(User(Id=1, Email='one@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(User(Id=2, Email='admin@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(Organization(Id=1, Name='Existing Org', OwnerId=1, Type=1, PointsToDistribute=0,
+                                     PointsToConsume=0, LastRefreshInstant=self.NOW, RefreshIntervalInDays=30,
+                                     RefreshAmount=0))
+            for request_id in range(1, 5):
+                session.add(OrganizationRegistrationRequest(
+                    Id=request_id, SubmittingUserId=1, OrganizationName='Org ' + str(request_id), Message='',
+                    ContactPhoneNumber='6086086008', ContactEmail='org@test.com', OrganizationURL='org.com'))
+            session.add(OrganizationRegistrationRequest(
+                Id=5, SubmittingUserId=1, OrganizationName='Existing Org', Message='', ContactPhoneNumber='6086086008',
+                ContactEmail='org@test.com', OrganizationURL='org.com'))
+
+    def test__decide_org_requests__mixed_batch__result_per_request(self):
+        results, error_code = approvals.decide_org_requests([1, 2, 5, 99], [3], decided_by=2, refresh_amount=500,
+                                                            refresh_interval_in_days=7, now=self.NOW)
+
+        self.assertIsNone(error_code)
+        self.assertEqual({request_id: status for request_id, (status, _) in results.items()},
+                         {1: approvals.APPROVED, 2: approvals.APPROVED, 5: approvals.NAME_TAKEN,
+                          99: approvals.NOT_FOUND, 3: approvals.REJECTED})
+        with db_interface.session_scope() as session:
+            org = session.query(Organization).filter(Organization.Name == 'Org 1').one()
+            self.assertEqual(results[1][1], org.Id)
+            self.assertEqual((org.OwnerId, org.Type, org.PointsToDistribute, org.RefreshAmount),
+                             (1, approvals.DEFAULT_ORGANIZATION_TYPE, 500, 500))
+            self.assertEqual(org.LastRefreshInstant, self.NOW)
+            self.assertEqual(org.NextRefreshAt, self.NOW + timedelta(days=7))
+
+            pending = [request.Id for request in session.query(OrganizationRegistrationRequest)
+                       .order_by(OrganizationRegistrationRequest.Id)]
+            self.assertEqual(pending, [4, 5])
+            decisions = {decision.RequestId: (decision.Approved, decision.OrganizationId, decision.DecidedBy)
+                         for decision in session.query(OrganizationRegistrationDecision)}
+            self.assertEqual(decisions, {1: (True, results[1][1], 2), 2: (True, results[2][1], 2),
+                                         3: (False, None, 2)})
+
+    def test__decide_org_requests__decided_twice__not_found_second_time(self):
+        approvals.decide_org_requests([1], [], now=self.NOW)
+
+        results, error_code = approvals.decide_org_requests([1], [], now=self.NOW)
+        self.assertIsNone(error_code)
+        self.assertEqual(results, {1: (approvals.NOT_FOUND, None)})
+
+    def test__decide_org_requests__newest_decided_then_new_request__new_one_decided(self):
+        approvals.decide_org_requests([], [5], now=self.NOW)
+        with db_interface.session_scope() as session:
+            request = OrganizationRegistrationRequest(
+                SubmittingUserId=1, OrganizationName='Org 6', Message='', ContactPhoneNumber='6086086008',
+                ContactEmail='org@test.com', OrganizationURL='org.com')
+            session.add(request)
+            session.flush()
+            request_id = request.Id
+
+        results, error_code = approvals.decide_org_requests([request_id], [], now=self.NOW)
+
+        self.assertIsNone(error_code)
+        self.assertNotEqual(request_id, 5)
+        self.assertEqual(results[request_id][0], approvals.APPROVED)
+
+    def test__decide_org_requests__unknown_type__nothing_decided(self):
+        results, error_code = approvals.decide_org_requests([1], [2], organization_type=9, now=self.NOW)
+
+        self.assertEqual((results, error_code), (None, errors.ORGANIZATION_TYPE_INVALID_CODE))
+        with db_interface.session_scope() as session:
+            self.assertEqual(session.query(OrganizationRegistrationRequest).count(), 5)
+
+    def test__decide_org_requests__approved__refreshed_when_due(self):
+        approvals.decide_org_requests([1], [], refresh_interval_in_days=1, now=self.NOW)
+
+        self.assertEqual(refresh.run_due_refreshes(self.NOW + timedelta(days=1)), (1, None))
+
+    def test__decide_org_requests__more_than_a_chunk__all_approved(self):
+        with db_interface.session_scope() as session:
+            session.execute(OrganizationRegistrationRequest.__table__.insert(), [
+                {'Id': request_id, 'SubmittingUserId': 1, 'OrganizationName': 'Bulk ' + str(request_id),
+                 'Message': '', 'ContactPhoneNumber': '6086086008', 'ContactEmail': 'org@test.com',
+                 'OrganizationURL': 'org.com'} for request_id in range(100, 100 + approvals.CHUNK_SIZE * 2 + 1)])
+        request_ids = list(range(100, 100 + approvals.CHUNK_SIZE * 2 + 1))
+
+        results, error_code = approvals.decide_org_requests(request_ids, [], now=self.NOW)
+
+        self.assertIsNone(error_code)
+        self.assertTrue(all(status == approvals.APPROVED for status, _ in results.values()))
+        self.assertEqual(len(set(org_id for _, org_id in results.values())), len(request_ids))
+
+
+if __name__ == '__main__':
+    unittest.main()
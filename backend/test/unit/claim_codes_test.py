@@ -0,0 +1,116 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import backend.api.claim_codes as claim_codes
+import backend.api.errors as errors
+import backend.data_model.db_interface as db_interface
+import backend.data_model.ledger as ledger
+from backend.data_model.data_model import User, Organization, ActivityTransaction, Activity, Reward
+from backend.test.test_helper import DatabaseTestCase
+
+
+class TestInMemoryClaimStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = claim_codes.InMemoryClaimStore()
+
+    def test__add__active_code__rejected(self):
+        self.assertTrue(self.store.add(claim_codes.Claim('123456', 1, claim_codes.ACTIVITY, time.time() + 60)))
+        self.assertFalse(self.store.add(claim_codes.Claim('123456', 2, claim_codes.ACTIVITY, time.time() + 60)))
+        self.assertEqual(self.store.get('123456').user_id, 1)
+
+    def test__take__twice__second_returns_none(self):
+        self.store.add(claim_codes.Claim('123456', 1, claim_codes.REWARD, time.time() + 60))
+
+        self.assertEqual(self.store.take('123456').kind, claim_codes.REWARD)
+        self.assertIsNone(self.store.take('123456'))
+
+    def test__take__expired__return_none(self):
+        self.store.add(claim_codes.Claim('123456', 1, claim_codes.ACTIVITY, time.time() - 1))
+        self.assertIsNone(self.store.take('123456'))
+
+    def test__sweep__expired_codes__removed_and_code_reusable(self):
+        self.store.add(claim_codes.Claim('111111', 1, claim_codes.ACTIVITY, time.time() + 0.05))
+        self.store.add(claim_codes.Claim('222222', 1, claim_codes.ACTIVITY, time.time() + 60))
+        time.sleep(0.1)
+
+        self.assertEqual(self.store.sweep(), 1)
+        self.assertEqual(len(self.store), 1)
+        self.assertTrue(self.store.add(claim_codes.Claim('111111', 2, claim_codes.ACTIVITY, time.time() + 60)))
+
+
+class TestClaimCodes(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        claim_codes.set_store(claim_codes.InMemoryClaimStore())
+
+        with db_interface.session_scope() as session:
+            session.add(User(Id=1, Email='one@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(Organization(Id=1, Name='Test Org', OwnerId=1, Type=1, PointsToDistribute=1000,
+                                     PointsToConsume=1000, LastRefreshInstant=datetime.utcnow(),
+                                     RefreshIntervalInDays=30, RefreshAmount=1000))
+            session.add(Activity(Id=1, PointsPerHour=2, PointsPerCompletion=10, OneTime=False, Visibility=1,
+                                 AssociatedOrganization=1, Description='Activity 1'))
+            session.add(Reward(Id=1, OneTime=False, PointsPerReward=10, Visibility=1, AssociatedOrganization=1,
+                               Description='Reward 1'))
+
+    def tearDown(self):
+        claim_codes.set_store(None)
+
+    def test__issue_claim__many_codes__all_distinct_six_digits(self):
+        codes = [claim_codes.issue_claim(1, claim_codes.ACTIVITY)[0].code for _ in range(1000)]
+
+        self.assertEqual(len(set(codes)), 1000)
+        self.assertTrue(all(len(code) == 6 and code.isdigit() for code in codes))
+
+    def test__redeem_claim__activity__points_added(self):
+        claim, _ = claim_codes.issue_claim(1, claim_codes.ACTIVITY)
+
+        redeemed, error_code = claim_codes.redeem_claim(claim.code, 1, 1, hours=3)
+
+        self.assertIsNone(error_code)
+        self.assertEqual((redeemed.claim.user_id, redeemed.points), (1, 16))
+        self.assertEqual(ledger.get_balance(1), (16, None))
+        self.assertEqual(claim_codes.redeem_claim(claim.code, 1, 1), (None, errors.CLAIM_CODE_INVALID_CODE))
+
+    def test__redeem_claim__insufficient_points__code_restored(self):
+        claim, _ = claim_codes.issue_claim(1, claim_codes.REWARD)
+
+        self.assertEqual(claim_codes.redeem_claim(claim.code, 1, 1), (None, errors.INSUFFICIENT_POINTS_CODE))
+        self.assertIsNotNone(claim_codes.get_store().get(claim.code))
+
+    def test__redeem_claim__item_not_at_organization__code_restored(self):
+        claim, _ = claim_codes.issue_claim(1, claim_codes.ACTIVITY)
+
+        self.assertEqual(claim_codes.redeem_claim(claim.code, 1, 2), (None, errors.ITEM_INVALID_CODE))
+        self.assertEqual(claim_codes.redeem_claim(claim.code, 2, 1), (None, errors.ITEM_INVALID_CODE))
+        self.assertIsNotNone(claim_codes.get_store().get(claim.code))
+        self.assertEqual(ledger.get_balance(1), (0, None))
+
+    def test__redeem_claim__code_cannot_be_restored__logged_and_ledger_error_returned(self):
+        claim, _ = claim_codes.issue_claim(1, claim_codes.REWARD)
+        claim_codes.get_store().add = lambda restored: False
+
+        with self.assertLogs('backend.api.errors', 'ERROR') as logs:
+            self.assertEqual(claim_codes.redeem_claim(claim.code, 1, 1), (None, errors.INSUFFICIENT_POINTS_CODE))
+
+        self.assertEqual(logs.records[0].error_code, errors.FAILED_TO_RESTORE_CLAIM_CODE_CODE)
+        self.assertIsNone(claim_codes.get_store().get(claim.code))
+
+    def test__redeem_claim__contended_code__exactly_one_redemption(self):
+        claim, _ = claim_codes.issue_claim(1, claim_codes.ACTIVITY)
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            results = list(executor.map(lambda _: claim_codes.redeem_claim(claim.code, 1, 1), range(20)))
+
+        self.assertEqual(sum(1 for _, error_code in results if error_code is None), 1)
+        with db_interface.session_scope() as session:
+            self.assertEqual(session.query(ActivityTransaction).count(), 1)
+        self.assertEqual(ledger.get_balance(1), (10, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
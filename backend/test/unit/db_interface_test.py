@@ -0,0 +1,114 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import backend.api.errors as errors
+import backend.api.hashing as hashing
+import backend.data_model.db_interface as db_interface
+from backend.data_model.data_model import User, OrganizationRegistrationRequest
+from backend.api.api import _create_user
+from backend.test.test_helper import DatabaseTestCase, committed
+
+
+class TestDBInterfaceRegister(DatabaseTestCase):
+
+    def setUp(self):
+        hashing.configure(rounds=4)
+        super().setUp()
+
+    def _get_users_with_email(self, email):
+        with db_interface.session_scope() as session:
+            query = session.query(User).filter_by(Email=email)
+            users = query.all()
+            return users
+
+    def _insert_user_with_email(self, email, hash):
+        with db_interface.session_scope() as session:
+            user = User(Email=email, PasswordHash=hash)
+            session.add(user)
+
+    def _create_org_request(self, name):
+        return OrganizationRegistrationRequest(SubmittingUserId=1, OrganizationName=name,
+                                               Message="Please", ContactPhoneNumber='6086086008',
+                                               ContactEmail='test@test.com', OrganizationURL='test.com')
+
+    def test__save_login__insert_user__user_exists(self):
+        email = "testemail@email.com"
+        password = 'hash'
+        last_name = "last"
+        first_name = "first"
+        phone_number = "6086086008"
+
+        user = _create_user(email, password, last_name, phone_number, first_name)
+
+        db_interface.save_login(user)
+
+        users = self._get_users_with_email(email)
+        self.assertEqual(len(users), 1)
+
+    def test__user_already_exists__no_user__return_false(self):
+        email = "testemail@email.com"
+        exists = None
+
+        with db_interface.session_scope() as session:
+            exists = db_interface._user_already_exists(email, session)
+
+        self.assertEqual(exists, False)
+
+    def test__user_already_exists__multiple_users__return_true(self):
+        email = "testemail@email.com"
+        password = 'hash'
+        last_name = "last"
+        first_name = "first"
+        phone_number = "6086086008"
+
+        user = _create_user(email, password, last_name, phone_number, first_name)
+        db_interface.save_login(user)
+
+        user = _create_user(email, password, last_name, phone_number, first_name)
+        db_interface.save_login(user)
+
+        with db_interface.session_scope() as session:
+            exists = db_interface._user_already_exists(email, session)
+
+        self.assertEqual(exists, True)
+
+    @committed
+    def test__save_login__100_parallel_same_email__exactly_one_succeeds(self):
+        users = [User(Email="testemail@email.com", PasswordHash='hash', LastName="last",
+                      PhoneNumber="6086086008") for _ in range(100)]
+
+        with ThreadPoolExecutor(max_workers=100) as executor:
+            codes = list(executor.map(db_interface.save_login, users))
+
+        self.assertEqual(codes.count(None), 1)
+        self.assertEqual(codes.count(errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE), 99)
+        self.assertEqual(len(self._get_users_with_email("testemail@email.com")), 1)
+
+    def test__save_org_request__duplicate_name__return_code(self):
+        first = self._create_org_request("Test Org")
+        second = self._create_org_request("Test Org")
+
+        self.assertIsNone(db_interface.save_org_request(first))
+        self.assertEqual(db_interface.save_org_request(second),
+                         errors.ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_CODE)
+
+        with db_interface.session_scope() as session:
+            self.assertTrue(db_interface._org_req_exists("Test Org", session))
+            self.assertFalse(db_interface._org_exists("Test Org", session))
+
+    def test__check_login__valid_password_mixed_case_email__return_valid(self):
+        user = _create_user("TestEmail@Email.com", 'password', "last", "6086086008", "first")
+        db_interface.save_login(user)
+
+        self.assertEqual(db_interface.check_login("testemail@email.com", 'password'), (True, None))
+        self.assertEqual(db_interface.check_login(" TESTEMAIL@EMAIL.COM", 'password'), (True, None))
+
+    def test__check_login__wrong_password_or_unknown_email__return_invalid(self):
+        user = _create_user("testemail@email.com", 'password', "last", "6086086008", "first")
+        db_interface.save_login(user)
+
+        self.assertEqual(db_interface.check_login("testemail@email.com", 'wrong'), (False, None))
+        self.assertEqual(db_interface.check_login("other@email.com", 'password'), (False, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
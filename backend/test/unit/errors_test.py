@@ -0,0 +1,41 @@
+import json
+import unittest
+from flask import Flask, jsonify
+import backend.api.errors as errors
+
+
+class TestErrorResponseBody(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    def test__error_response_body__single_code__matches_jsonify(self):
+        with self.app.app_context():
+            expected = jsonify(errors.create_single_error_response(errors.LOGIN_INVALID_CODE).to_response_dict())
+
+        self.assertEqual(errors.error_response_body(errors.LOGIN_INVALID_CODE), expected.get_data())
+
+    def test__error_response_body__multiple_codes__matches_and_cached(self):
+        codes = [errors.EMAIL_INVALID_CODE, errors.PASSWORD_INVALID_CODE]
+        with self.app.app_context():
+            expected = jsonify(errors.create_multiple_error_response(codes).to_response_dict())
+
+        body = errors.error_response_body(codes)
+
+        self.assertEqual(body, expected.get_data())
+        self.assertIs(errors.error_response_body(list(codes)), body)
+        self.assertEqual([error['error']['error_code'] for error in json.loads(body)['errors']], codes)
+
+    def test__error_response_body__invalid_code__raise(self):
+        with self.assertRaises(ValueError):
+            errors.error_response_body(9999)
+        with self.assertRaises(ValueError):
+            errors.error_response_body([errors.EMAIL_INVALID_CODE, 9999])
+
+    def test__error_object__slots__no_instance_dict(self):
+        self.assertFalse(hasattr(errors.ErrorObject(errors.EMAIL_INVALID_CODE), '__dict__'))
+        self.assertFalse(hasattr(errors.ErrorList(), '__dict__'))
+
+
+if __name__ == '__main__':
+    unittest.main()
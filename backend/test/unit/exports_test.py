@@ -0,0 +1,86 @@
+import csv
+import gzip
+import io
+import json
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import backend.data_model.db_interface as db_interface
+import backend.data_model.exports as exports
+from backend.data_model.data_model import (User, Organization, ActivityTransaction, RewardTransaction)
+from backend.test.test_helper import DatabaseTestCase
+
+
+class TestExports(DatabaseTestCase):
+
+    NOW = datetime(2019, 7, 17, 12)
+    ROWS = 2500
+
+    def setUp(self):
+        super().setUp()
+
+        with db_interface.session_scope() as session:
+            for user_id in (1, 2):
+                session.add(User(Id=user_id, Email=str(user_id) + '@test.com', PasswordHash='hash',
+                                 LastName='last', PhoneNumber='6086086008'))
+            for org_id in (1, 2):
+                session.add(Organization(Id=org_id, Name='Org ' + str(org_id), OwnerId=1, Type=1,
+                                         PointsToDistribute=0, PointsToConsume=0, LastRefreshInstant=self.NOW,
+                                         RefreshIntervalInDays=30, RefreshAmount=0))
+            # More rows than FETCH_SIZE, newest Ids first so the export's Instant order differs from Id order.
+            session.execute(ActivityTransaction.__table__.insert(), [
+                {'Id': transaction_id, 'UserId': 1, 'Points': transaction_id, 'OrganizationId': 1,
+                 'Instant': self.NOW - timedelta(minutes=transaction_id), 'Activity': None}
+                for transaction_id in range(1, self.ROWS + 1)])
+            session.add(ActivityTransaction(Id=self.ROWS + 1, UserId=2, Points=1, OrganizationId=2,
+                                            Instant=self.NOW))
+            session.add(RewardTransaction(Id=1, UserId=2, Points=3, OrganizationId=1, Instant=self.NOW, Reward=4))
+
+    def test__stream__csv__header_then_rows_oldest_first(self):
+        body = b''.join(exports.stream(*exports.user_transactions(1, exports.ACTIVITIES), exports.CSV))
+        rows = list(csv.reader(io.StringIO(body.decode())))
+
+        self.assertEqual(rows[0], ['id', 'instant', 'points', 'organization_id', 'activity_id'])
+        self.assertEqual(len(rows), self.ROWS + 1)
+        self.assertEqual(rows[1], [str(self.ROWS), (self.NOW - timedelta(minutes=self.ROWS)).isoformat(),
+                                   str(self.ROWS), '1', ''])
+        self.assertEqual(rows[-1][0], '1')
+
+    def test__stream__ndjson_gzip__one_object_per_line(self):
+        chunks = list(exports.stream(*exports.user_transactions(2, exports.REWARDS), exports.NDJSON, compress=True))
+        lines = gzip.decompress(b''.join(chunks)).decode().splitlines()
+
+        self.assertEqual([json.loads(line) for line in lines],
+                         [{'id': 1, 'instant': self.NOW.isoformat(), 'points': 3, 'organization_id': 1,
+                           'reward_id': 4}])
+
+    def test__stream__large_export__chunks_bounded(self):
+        with patch.object(exports, 'CHUNK_BYTES', 1024):
+            chunks = list(exports.stream(*exports.user_transactions(1, exports.ACTIVITIES), exports.NDJSON))
+
+        self.assertGreater(len(chunks), 10)
+        self.assertTrue(all(len(chunk) < 1024 + 200 for chunk in chunks))
+        self.assertEqual(b''.join(chunks).count(b'\n'), self.ROWS)
+
+    def test__stream__organization_ledger__activities_then_rewards(self):
+        body = b''.join(exports.stream(*exports.organization_ledger(1), exports.CSV)).decode()
+        rows = list(csv.reader(io.StringIO(body)))
+
+        self.assertEqual(rows[0], ['kind', 'id', 'instant', 'user_id', 'points', 'item_id'])
+        self.assertEqual([row[1] for row in rows[1:3]], ['1', '2'])
+        self.assertEqual(len(rows), self.ROWS + 2)
+        self.assertEqual(rows[-1], ['reward', '1', self.NOW.isoformat(), '2', '3', '4'])
+
+    def test__stream__closed_early__session_released(self):
+        chunks = exports.stream(*exports.user_transactions(1, exports.ACTIVITIES), exports.CSV, compress=True)
+        with patch.object(exports, 'CHUNK_BYTES', 256):
+            next(chunks)
+            chunks.close()
+
+        # The streamed read left nothing behind that would block a write.
+        with db_interface.session_scope() as session:
+            session.query(ActivityTransaction).filter(ActivityTransaction.UserId == 2).delete()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import math
+import random
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+import backend.api.geo_index as geo_index
+import backend.data_model.db_interface as db_interface
+from backend.data_model.data_model import User, Organization
+from backend.test.test_helper import DatabaseTestCase
+
+
+def _brute_force(points, latitude, longitude, organization_type=None, radius_km=None):
+    ranked = []
+    for org_id, (lat, lon, org_type) in points.items():
+        if organization_type is not None and org_type != organization_type:
+            continue
+        distance = float(geo_index.haversine_km(math.radians(latitude), math.radians(longitude),
+                                                np.array([math.radians(lat)]), np.array([math.radians(lon)]))[0])
+        if radius_km is None or distance <= radius_km:
+            ranked.append((distance, org_id))
+    return [org_id for _, org_id in sorted(ranked)]
+
+
+class TestGeoIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.random = random.Random(7)
+        self.points = {}
+        for org_id in range(1, 2001):
+            # Mostly clustered around a few cities, some anywhere.
+            if org_id % 4 == 0:
+                lat, lon = self.random.uniform(-89, 89), self.random.uniform(-180, 180)
+            else:
+                center = [(43.07, -89.40), (51.5, -0.12), (-33.9, 151.2)][org_id % 3]
+                lat, lon = center[0] + self.random.gauss(0, 0.5), center[1] + self.random.gauss(0, 0.5)
+            self.points[org_id] = (lat, lon, 1 + org_id % 3)
+
+        self.index = geo_index.GeoIndex(cell_degrees=0.5)
+        self.index.upsert_many((org_id, lat, lon, org_type) for org_id, (lat, lon, org_type) in self.points.items())
+
+    def test__haversine_km__one_degree_on_equator__about_111_km(self):
+        distance = geo_index.haversine_km(0.0, 0.0, np.array([0.0]), np.array([math.radians(1)]))[0]
+        self.assertAlmostEqual(distance, 111.195, places=2)
+
+    def test__nearest__random_queries__same_as_brute_force(self):
+        for _ in range(50):
+            lat, lon = self.random.uniform(-90, 90), self.random.uniform(-180, 180)
+            organization_type = self.random.choice([None, 1, 2, 3])
+            found, has_more = self.index.nearest(lat, lon, 10, organization_type=organization_type)
+
+            self.assertEqual([org_id for org_id, _ in found],
+                             _brute_force(self.points, lat, lon, organization_type)[:10])
+            self.assertTrue(has_more)
+
+    def test__within__random_queries__same_as_brute_force(self):
+        for _ in range(50):
+            lat, lon = self.random.uniform(-90, 90), self.random.uniform(-180, 180)
+            radius_km = self.random.choice([50, 500, 5000])
+            expected = _brute_force(self.points, lat, lon, radius_km=radius_km)
+            found, has_more = self.index.within(lat, lon, radius_km, 100)
+
+            self.assertEqual([org_id for org_id, _ in found], expected[:100])
+            self.assertEqual(has_more, len(expected) > 100)
+            self.assertTrue(all(distance <= radius_km for _, distance in found))
+
+    def test__nearest__paged__pages_join_up(self):
+        pages = []
+        offset = 0
+        while offset < 60:
+            found, has_more = self.index.nearest(43.07, -89.40, 20, offset, organization_type=2)
+            pages.extend(org_id for org_id, _ in found)
+            offset += 20
+
+        self.assertEqual(pages, _brute_force(self.points, 43.07, -89.40, 2)[:60])
+
+    def test__nearest__across_antimeridian__wraps(self):
+        index = geo_index.GeoIndex(cell_degrees=1)
+        index.upsert(1, 0.0, 179.9, 1)
+        index.upsert(2, 0.0, 170.0, 1)
+        index.upsert(3, 0.0, -179.9, 1)
+
+        found, has_more = index.nearest(0.0, -179.95, 2)
+        self.assertEqual([org_id for org_id, _ in found], [3, 1])
+        self.assertTrue(has_more)
+
+    def test__within__near_pole__all_longitudes_searched(self):
+        index = geo_index.GeoIndex(cell_degrees=1)
+        index.upsert(1, 89.5, 0.0, 1)
+        index.upsert(2, 89.5, 180.0, 1)
+
+        found, has_more = index.within(89.9, 90.0, 200, 10)
+        self.assertEqual(sorted(org_id for org_id, _ in found), [1, 2])
+        self.assertFalse(has_more)
+
+    def test__upsert__moved_organization__found_at_new_location(self):
+        self.index.upsert(1, -45.0, 170.0, 9)
+
+        found, _ = self.index.nearest(-45.0, 170.0, 1, organization_type=9)
+        self.assertEqual(found[0][0], 1)
+        self.assertAlmostEqual(found[0][1], 0.0)
+        self.assertEqual(len(self.index), len(self.points))
+
+    def test__remove__organization__not_returned(self):
+        nearest_id = self.index.nearest(43.07, -89.40, 1)[0][0][0]
+        self.index.remove(nearest_id)
+
+        found, _ = self.index.nearest(43.07, -89.40, 1)
+        self.assertNotEqual(found[0][0], nearest_id)
+        self.assertEqual(len(self.index), len(self.points) - 1)
+
+    def test__nearest__empty_index__no_results(self):
+        self.assertEqual(geo_index.GeoIndex().nearest(0.0, 0.0, 10), ([], False))
+
+
+class TestSyncedGeoIndex(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        now = datetime.utcnow()
+        with db_interface.session_scope() as session:
+            session.add(User(Id=1, Email='one@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            for org_id, lat, lon in [(1, 43.07, -89.40), (2, 43.10, -89.35), (3, None, None)]:
+                session.add(Organization(Id=org_id, Name='Test Org ' + str(org_id), OwnerId=1, Type=1,
+                                         PointsToDistribute=5, PointsToConsume=1000, LastRefreshInstant=now,
+                                         RefreshIntervalInDays=30, RefreshAmount=100, Latitude=lat,
+                                         Longitude=lon, LocationUpdatedAt=None if lat is None else now))
+
+    def test__get__first_call__located_organizations_loaded(self):
+        index, error_code = geo_index.SyncedGeoIndex().get()
+
+        self.assertIsNone(error_code)
+        self.assertEqual(len(index), 2)
+        self.assertEqual([org_id for org_id, _ in index.nearest(43.07, -89.40, 5)[0]], [1, 2])
+
+    def test__set_location__organization__indexed_and_saved(self):
+        synced = geo_index.SyncedGeoIndex()
+        synced.get()
+
+        self.assertIsNone(synced.set_location(3, 43.08, -89.39, 1))
+        self.assertEqual([org_id for org_id, _ in synced.index.nearest(43.08, -89.39, 1)[0]], [3])
+        with db_interface.session_scope() as session:
+            self.assertEqual(session.query(Organization).get(3).Latitude, 43.08)
+
+    def test__sync__location_changed_elsewhere__picked_up(self):
+        synced = geo_index.SyncedGeoIndex()
+        synced.get()
+
+        with db_interface.session_scope() as session:
+            org = session.query(Organization).get(3)
+            org.Latitude, org.Longitude = 51.5, -0.12
+            org.LocationUpdatedAt = datetime.utcnow() + timedelta(seconds=1)
+
+        self.assertIsNone(synced.sync())
+        self.assertEqual(len(synced.index), 3)
+        self.assertEqual(synced.index.nearest(51.5, -0.12, 1)[0][0][0], 3)
+
+    def test__sync__location_cleared_elsewhere__removed(self):
+        synced = geo_index.SyncedGeoIndex()
+        synced.get()
+
+        self.assertIsNone(db_interface.set_organization_location(1, None, None))
+
+        self.assertIsNone(synced.sync())
+        self.assertEqual([org_id for org_id, _ in synced.index.nearest(43.07, -89.40, 5)[0]], [2])
+
+    def test__sync__reload_due__deleted_organization_dropped(self):
+        synced = geo_index.SyncedGeoIndex(reload_seconds=0)
+        synced.get()
+
+        with db_interface.session_scope() as session:
+            session.query(Organization).filter(Organization.Id == 2).delete()
+
+        self.assertIsNone(synced.sync())
+        self.assertEqual([org_id for org_id, _ in synced.index.nearest(43.07, -89.40, 5)[0]], [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
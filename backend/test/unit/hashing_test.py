@@ -0,0 +1,87 @@
+import threading
+import unittest
+import bcrypt
+import backend.api.hashing as hashing
+
+
+class TestHashing(unittest.TestCase):
+
+    TEST_ROUNDS = 4
+
+    def setUp(self):
+        hashing.configure(rounds=self.TEST_ROUNDS, workers=2, max_queue_depth=8, use_pool=True)
+
+    def tearDown(self):
+        hashing.shutdown()
+
+    def test__hash_password__same_password__different_salts(self):
+        first = hashing.hash_password('password')
+        second = hashing.hash_password('password')
+
+        self.assertNotEqual(first, second)
+        self.assertTrue(hashing.verify_password('password', first))
+        self.assertTrue(hashing.verify_password('password', second))
+
+    def test__verify_password__wrong_password__return_false(self):
+        password_hash = hashing.hash_password('password')
+        self.assertFalse(hashing.verify_password('not password', password_hash))
+
+    def test__verify_password__malformed_hash__return_false(self):
+        self.assertFalse(hashing.verify_password('password', 'not a hash'))
+
+    def test__verify_password__legacy_bytes_hash__return_true(self):
+        legacy_hash = bcrypt.hashpw(b'password', bcrypt.gensalt(self.TEST_ROUNDS))
+        self.assertTrue(hashing.verify_password('password', legacy_hash))
+
+    def test__needs_rehash__cost_changed__return_true(self):
+        password_hash = hashing.hash_password('password')
+        self.assertFalse(hashing.needs_rehash(password_hash))
+
+        hashing.configure(rounds=self.TEST_ROUNDS + 1)
+        self.assertTrue(hashing.needs_rehash(password_hash))
+        self.assertEqual(hashing.get_cost(password_hash), self.TEST_ROUNDS)
+
+    def test__hash_password__queue_full__raise_busy(self):
+        hashing.configure(max_queue_depth=1)
+        held = threading.Event()
+        release = threading.Event()
+
+        # Occupy the only slot with a slow hash so the next submission is rejected.
+        def slow_hash():
+            hashing._slots.acquire()
+            held.set()
+            release.wait()
+            hashing._slots.release()
+
+        thread = threading.Thread(target=slow_hash)
+        thread.start()
+        held.wait()
+        try:
+            with self.assertRaises(hashing.HashingServiceBusyError):
+                hashing.hash_password('password')
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertTrue(hashing.verify_password('password', hashing.hash_password('password')))
+
+    def test__hash_passwords__more_than_in_flight__hashes_in_order(self):
+        hashing.configure(max_queue_depth=1)
+        passwords = ['password' + str(i) for i in range(10)]
+
+        hashes = list(hashing.hash_passwords(passwords))
+
+        self.assertEqual(len(hashes), len(passwords))
+        self.assertTrue(all(hashing.verify_password(password, password_hash)
+                            for password, password_hash in zip(passwords, hashes)))
+
+    def test__hash_password__no_pool__runs_inline(self):
+        hashing.configure(use_pool=False)
+        password_hash = hashing.hash_password('password')
+
+        self.assertIsNone(hashing._pool)
+        self.assertTrue(hashing.verify_password('password', password_hash))
+
+
+if __name__ == '__main__':
+    unittest.main()
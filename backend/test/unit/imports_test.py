@@ -0,0 +1,135 @@
+import io
+import json
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+import backend.api.errors as errors
+import backend.api.hashing as hashing
+import backend.api.imports as imports
+import backend.data_model.approvals as approvals
+import backend.data_model.bulk_import as bulk_import
+import backend.data_model.db_interface as db_interface
+from backend.data_model.data_model import User, Organization
+from backend.test.test_helper import DatabaseTestCase, add_organization_types
+
+
+class TestImports(DatabaseTestCase):
+
+    TEST_ROUNDS = 4
+    NOW = datetime(2019, 7, 17, 12)
+
+    def setUp(self):
+        hashing.configure(rounds=self.TEST_ROUNDS, use_pool=False)
+        super().setUp()
+
+        with db_interface.session_scope() as session:
+            add_organization_types(session)
+            session.add(User(Id=1, Email='taken@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(Organization(Id=1, Name='Existing Org', OwnerId=1, Type=1, PointsToDistribute=0,
+                                     PointsToConsume=0, LastRefreshInstant=self.NOW, RefreshIntervalInDays=30,
+                                     RefreshAmount=0))
+
+    def tearDown(self):
+        hashing.configure(use_pool=True)
+
+    def test__import_users__csv__invalid_and_duplicate_rows_reported(self):
+        body = ('email,password,first_name,last_name,phone_number\n'
+                'Ada@Test.com,password,Ada,Lovelace,608-608-6008\n'
+                'not an email,password,,Nobody,6086086008\n'
+                'ada@test.com,password,,Again,6086086008\n'
+                'taken@test.com,password,,Taken,6086086008\n'
+                'grace@test.com,password,,Hopper,6086086008\n')
+
+        result, error_code = imports.import_users(imports.read_rows(io.BytesIO(body.encode()), imports.CSV))
+
+        self.assertIsNone(error_code)
+        self.assertEqual(result.imported, 2)
+        self.assertEqual(result.failed, [(2, [errors.EMAIL_INVALID_CODE]),
+                                         (3, [errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE]),
+                                         (4, [errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE])])
+        with db_interface.session_scope() as session:
+            ada = session.query(User).filter(User.Email == 'ada@test.com').one()
+            self.assertEqual((ada.FirstName, ada.PhoneNumber), ('Ada', '6086086008'))
+            self.assertTrue(hashing.verify_password('password', ada.PasswordHash))
+            self.assertIsNone(session.query(User.FirstName).filter(User.Email == 'grace@test.com').scalar())
+
+    def test__import_users__ndjson_across_chunks__duplicates_found_in_earlier_chunks(self):
+        rows = [{'email': 'user%d@test.com' % (i % 5), 'password': 'password', 'last_name': 'last',
+                 'phone_number': '6086086008'} for i in range(10)]
+        body = '\n'.join(json.dumps(row) for row in rows) + '\n\n{not json\n'
+
+        with patch.object(bulk_import, 'CHUNK_SIZE', 3):
+            result, error_code = imports.import_users(imports.read_rows(io.BytesIO(body.encode()),
+                                                                        imports.NDJSON))
+
+        self.assertIsNone(error_code)
+        self.assertEqual(result.imported, 5)
+        self.assertEqual(result.failed[:5], [(i, [errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE])
+                                             for i in range(6, 11)])
+        self.assertEqual(result.failed[5], (11, [errors.REQUEST_INVALID_CODE]))
+
+    def test__import_users__insert_loses_race__retried_and_reported(self):
+        real_find = bulk_import.find_registered_emails
+
+        def find_then_race(emails):
+            registered, error_code = real_find(emails)
+            with db_interface.session_scope() as session:
+                session.add(User(Email='racer@test.com', PasswordHash='hash', LastName='last',
+                                 PhoneNumber='6086086008'))
+            return registered, error_code
+
+        rows = [{'email': email, 'password': 'password', 'last_name': 'last', 'phone_number': '6086086008'}
+                for email in ('racer@test.com', 'other@test.com')]
+        with patch.object(bulk_import, 'find_registered_emails', find_then_race):
+            result, error_code = imports.import_users(rows)
+
+        self.assertIsNone(error_code)
+        self.assertEqual(result.imported, 1)
+        self.assertEqual(result.failed, [(1, [errors.USER_WITH_EMAIL_ALREADY_EXISTS_CODE])])
+
+    def test__import_organizations__owners_resolved_and_names_checked(self):
+        body = ('name,owner_email,type,refresh_amount,refresh_interval_in_days\n'
+                'Food Bank,TAKEN@test.com,,250,7\n'
+                'Existing Org,taken@test.com,,,\n'
+                'Shelter,nobody@test.com,,,\n'
+                'Library,taken@test.com,,-5,\n')
+
+        with patch('backend.data_model.bulk_import.datetime') as m_datetime:
+            m_datetime.utcnow.return_value = self.NOW
+            result, error_code = imports.import_organizations(imports.read_rows(io.BytesIO(body.encode()),
+                                                                                imports.CSV))
+
+        self.assertIsNone(error_code)
+        self.assertEqual(result.imported, 1)
+        self.assertEqual(result.failed, [(2, [errors.ORG_OR_ORG_REQUEST_WITH_NAME_ALREADY_EXISTS_CODE]),
+                                         (3, [errors.OWNER_NOT_FOUND_CODE]),
+                                         (4, [errors.POINTS_INVALID_CODE])])
+        with db_interface.session_scope() as session:
+            org = session.query(Organization).filter(Organization.Name == 'Food Bank').one()
+            self.assertEqual((org.OwnerId, org.Type, org.PointsToDistribute, org.RefreshIntervalInDays),
+                             (1, approvals.DEFAULT_ORGANIZATION_TYPE, 250, 7))
+            self.assertIsNotNone(org.NextRefreshAt)
+
+    def test__import_organizations__unknown_type_or_refresh_out_of_range__reported_per_row(self):
+        body = ('name,owner_email,type,refresh_amount,refresh_interval_in_days\n'
+                'Food Bank,taken@test.com,3,,\n'
+                'Shelter,taken@test.com,9,,\n'
+                'Library,taken@test.com,,,1000000000\n'
+                'Museum,taken@test.com,,4294967296,\n')
+
+        result, error_code = imports.import_organizations(imports.read_rows(io.BytesIO(body.encode()),
+                                                                            imports.CSV))
+
+        self.assertIsNone(error_code)
+        self.assertEqual(result.imported, 1)
+        self.assertEqual(result.failed, [(2, [errors.ORGANIZATION_TYPE_INVALID_CODE]),
+                                         (3, [errors.REQUEST_INVALID_CODE]),
+                                         (4, [errors.POINTS_INVALID_CODE])])
+        with db_interface.session_scope() as session:
+            org = session.query(Organization).filter(Organization.Name == 'Food Bank').one()
+            self.assertEqual(org.Type, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
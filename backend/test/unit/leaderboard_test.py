@@ -0,0 +1,114 @@
+import random
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+import backend.data_model.db_interface as db_interface
+import backend.data_model.leaderboard as leaderboard
+import backend.data_model.ledger as ledger
+from backend.data_model.data_model import User, Organization
+from backend.test.test_helper import DatabaseTestCase
+
+
+class TestSortedLeaderboard(unittest.TestCase):
+
+    def setUp(self):
+        self.board = leaderboard.SortedLeaderboard()
+
+    def test__add__repeated__points_summed_and_reranked(self):
+        self.board.add(1, 10, 5)
+        self.board.add(1, 20, 8)
+        self.board.add(1, 10, 4)
+
+        self.assertEqual(self.board.rank(1, 10), (1, 9))
+        self.assertEqual(self.board.rank(1, 20), (2, 8))
+        self.assertEqual(self.board.top(1, 10), ([(10, 9), (20, 8)], False))
+
+    def test__rank__tied_points__lower_user_id_first(self):
+        self.board.replace({1: {30: 5, 10: 5, 20: 7}})
+
+        self.assertEqual(self.board.top(1, 3)[0], [(20, 7), (10, 5), (30, 5)])
+        self.assertEqual(self.board.rank(1, 30), (3, 5))
+
+    def test__rank__unknown_user_or_board__none(self):
+        self.board.add(1, 10, 5)
+
+        self.assertEqual(self.board.rank(1, 11), (None, 0))
+        self.assertEqual(self.board.rank(2, 10), (None, 0))
+        self.assertEqual(self.board.top(2, 10), ([], False))
+
+    def test__top__random_scores__pages_match_sorted(self):
+        rng = random.Random(3)
+        scores = {user_id: rng.randrange(100) for user_id in range(1, 501)}
+        self.board.replace({1: scores})
+        expected = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+        pages = []
+        offset = 0
+        has_more = True
+        while has_more:
+            page, has_more = self.board.top(1, 40, offset)
+            pages.extend(page)
+            offset += 40
+        self.assertEqual(pages, expected)
+        for rank, (user_id, points) in enumerate(expected, 1):
+            self.assertEqual(self.board.rank(1, user_id), (rank, points))
+
+
+class TestLeaderboardFromLedger(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        leaderboard.set_leaderboard(leaderboard.SortedLeaderboard())
+
+        with db_interface.session_scope() as session:
+            for user_id in (1, 2, 3):
+                session.add(User(Id=user_id, Email=str(user_id) + '@test.com', PasswordHash='hash',
+                                 LastName='last', PhoneNumber='6086086008'))
+            for org_id in (1, 2):
+                session.add(Organization(Id=org_id, Name='Org ' + str(org_id), OwnerId=1, Type=1,
+                                         PointsToDistribute=1000, PointsToConsume=1000,
+                                         LastRefreshInstant=datetime.utcnow(), RefreshIntervalInDays=30,
+                                         RefreshAmount=1000))
+
+        ledger.record_activity(1, 1, 10)
+        ledger.record_activity(2, 1, 4)
+        ledger.record_activity(2, 2, 9)
+        ledger.record_reward(2, 2, 3, reward_id=1)
+
+    def tearDown(self):
+        leaderboard.set_leaderboard(None)
+
+    def test__get_leaderboard__first_use__loaded_from_ledger(self):
+        board, error_code = leaderboard.get_leaderboard()
+
+        self.assertIsNone(error_code)
+        self.assertEqual(board.top(leaderboard.OVERALL, 10), ([(2, 13), (1, 10)], False))
+        self.assertEqual(board.top(1, 10), ([(1, 10), (2, 4)], False))
+        self.assertEqual(board.rank(2, 2), (1, 9))
+
+    def test__record_activity__after_load__boards_updated(self):
+        board, _ = leaderboard.get_leaderboard()
+
+        ledger.record_activity(3, 2, 20)
+
+        self.assertEqual(board.rank(leaderboard.OVERALL, 3), (1, 20))
+        self.assertEqual(board.top(2, 10)[0], [(3, 20), (2, 9)])
+
+    def test__record_activity__during_load__counted_once(self):
+        read_boards = leaderboard._read_boards
+
+        def read_then_record():
+            boards = read_boards()
+            ledger.record_activity(3, 1, 1)
+            return boards
+
+        with patch('backend.data_model.leaderboard._read_boards', side_effect=read_then_record):
+            board, _ = leaderboard.get_leaderboard()
+
+        self.assertEqual(board.rank(leaderboard.OVERALL, 3), (3, 1))
+        self.assertEqual(board.rank(1, 3), (3, 1))
+        self.assertEqual(board.rank(1, 1), (1, 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
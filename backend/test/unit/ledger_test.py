@@ -0,0 +1,181 @@
+import sqlite3
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import OperationalError
+import backend.api.errors as errors
+import backend.data_model.db_interface as db_interface
+import backend.data_model.ledger as ledger
+from backend.data_model.data_model import (User, Organization, ActivityTransaction, RewardTransaction,
+                                           UserBalance)
+from backend.test.test_helper import DatabaseTestCase, committed
+
+
+class TestLedger(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        with db_interface.session_scope() as session:
+            session.add(User(Id=1, Email='one@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(User(Id=2, Email='two@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(Organization(Id=1, Name='Test Org', OwnerId=1, Type=1, PointsToDistribute=1000,
+                                     PointsToConsume=1000, LastRefreshInstant=datetime.utcnow(),
+                                     RefreshIntervalInDays=30, RefreshAmount=1000))
+
+    def test__record_activity__new_user__balance_created(self):
+        transaction_id, error_code = ledger.record_activity(1, 1, 10)
+
+        self.assertIsNotNone(transaction_id)
+        self.assertIsNone(error_code)
+        self.assertEqual(ledger.get_balance(1), (10, None))
+        self.assertEqual(ledger.get_org_balance(1), ((10, 0), None))
+
+    def test__record_reward__enough_points__balance_decreased(self):
+        ledger.record_activity(1, 1, 10)
+        transaction_id, error_code = ledger.record_reward(1, 1, 4, reward_id=1)
+
+        self.assertIsNotNone(transaction_id)
+        self.assertIsNone(error_code)
+        self.assertEqual(ledger.get_balance(1), (6, None))
+        self.assertEqual(ledger.get_org_balance(1), ((10, 4), None))
+
+    def test__record_reward__insufficient_points__rejected_and_not_recorded(self):
+        ledger.record_activity(1, 1, 3)
+
+        self.assertEqual(ledger.record_reward(1, 1, 4, reward_id=1), (None, errors.INSUFFICIENT_POINTS_CODE))
+        self.assertEqual(ledger.record_reward(2, 1, 1, reward_id=1), (None, errors.INSUFFICIENT_POINTS_CODE))
+        self.assertEqual(ledger.get_balance(1), (3, None))
+        self.assertEqual(ledger.get_org_balance(1), ((3, 0), None))
+
+    def test__record_activity__budget_short__rejected_and_nothing_recorded(self):
+        ledger.record_activity(1, 1, 600)
+
+        self.assertEqual(ledger.record_activity(2, 1, 401), (None, errors.INSUFFICIENT_ORGANIZATION_POINTS_CODE))
+        self.assertEqual(ledger.record_activity(2, 2, 1), (None, errors.INSUFFICIENT_ORGANIZATION_POINTS_CODE))
+        self.assertEqual(self.budget(), (400, 1000))
+        self.assertEqual(ledger.get_balance(2), (0, None))
+        self.assertEqual(ledger.get_org_balance(1), ((600, 0), None))
+
+    def test__record_reward__user_short__budget_debit_rolled_back(self):
+        ledger.record_activity(1, 1, 10)
+
+        self.assertEqual(ledger.record_reward(1, 1, 11, reward_id=1), (None, errors.INSUFFICIENT_POINTS_CODE))
+        self.assertEqual(ledger.record_reward(1, 1, 6, reward_id=1)[1], None)
+        self.assertEqual(self.budget(), (990, 994))
+        with db_interface.session_scope() as session:
+            self.assertEqual(session.query(RewardTransaction).count(), 1)
+
+    def test__record_activity__database_locked__retried(self):
+        record_internal = ledger._record_activity_internal
+        locked = OperationalError('UPDATE', {}, sqlite3.OperationalError('database is locked'))
+
+        attempts = [locked, locked]
+
+        def record_after_locks(*args):
+            if attempts:
+                raise attempts.pop()
+            return record_internal(*args)
+
+        with patch('backend.data_model.ledger._record_activity_internal', side_effect=record_after_locks), \
+                patch('backend.data_model.ledger.time.sleep') as m_sleep:
+            transaction_id, error_code = ledger.record_activity(1, 1, 10)
+
+        self.assertIsNotNone(transaction_id)
+        self.assertIsNone(error_code)
+        self.assertEqual(m_sleep.call_count, 2)
+        self.assertLessEqual(m_sleep.call_args[0][0], ledger.CONTENTION_BACKOFF_SECONDS * 2)
+        self.assertEqual(self.budget(), (990, 1000))
+
+    def test__debit_and_insert__postgresql__one_statement(self):
+        session = MagicMock()
+        session.get_bind.return_value.dialect.name = 'postgresql'
+        session.execute.return_value.scalar.return_value = 7
+        transaction = dict(UserId=1, Points=5, OrganizationId=1, Instant=datetime.utcnow(), Activity=None)
+
+        transaction_id = ledger._debit_and_insert(Organization.PointsToDistribute, ActivityTransaction,
+                                                  transaction, session)
+
+        self.assertEqual(transaction_id, 7)
+        statement, = [call[0][0] for call in session.execute.call_args_list]
+        sql = ' '.join(str(statement.compile(dialect=postgresql.dialect())).split())
+        self.assertTrue(sql.startswith('WITH debited AS (UPDATE "Organization" SET "PointsToDistribute"='))
+        self.assertIn('"Organization"."PointsToDistribute" >= ', sql)
+        self.assertIn('INSERT INTO "ActivityTransaction"', sql)
+        self.assertTrue(sql.endswith('FROM debited RETURNING "ActivityTransaction"."Id"'))
+
+    def test__get_balance__no_transactions__return_zero(self):
+        self.assertEqual(ledger.get_balance(2), (0, None))
+
+    @committed
+    def test__record_activity__concurrent_writers__no_lost_updates(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: ledger.record_activity(1, 1, 1), range(50)))
+
+        self.assertTrue(all(error_code is None for _, error_code in results))
+        self.assertEqual(ledger.get_balance(1), (50, None))
+
+    @committed
+    def test__record__500_concurrent_terminals__no_budget_drift(self):
+        with db_interface.session_scope() as session:
+            session.query(Organization).filter_by(Id=1).update({Organization.PointsToDistribute: 200,
+                                                                Organization.PointsToConsume: 100})
+        start = threading.Barrier(500)
+
+        def terminal(index):
+            start.wait()
+            user_id = 1 + index // 2 % 2
+            if index % 2 == 0:
+                return 'activity', ledger.record_activity(user_id, 1, 1)[1]
+            return 'reward', ledger.record_reward(user_id, 1, 1, reward_id=1)[1]
+
+        with ThreadPoolExecutor(max_workers=500) as executor:
+            results = list(executor.map(terminal, range(500)))
+
+        recorded = {kind: sum(1 for result in results if result == (kind, None)) for kind in ('activity', 'reward')}
+        self.assertTrue(all(error_code in (None, errors.INSUFFICIENT_POINTS_CODE,
+                                           errors.INSUFFICIENT_ORGANIZATION_POINTS_CODE)
+                            for _, error_code in results))
+        self.assertEqual(recorded['activity'], 200)
+        with db_interface.session_scope() as session:
+            distributed = session.query(func.sum(ActivityTransaction.Points)).scalar()
+            consumed = session.query(func.sum(RewardTransaction.Points)).scalar() or 0
+            balances = session.query(func.sum(UserBalance.Points)).scalar()
+        self.assertEqual((distributed, consumed), (recorded['activity'], recorded['reward']))
+        self.assertEqual(self.budget(), (200 - distributed, 100 - consumed))
+        self.assertEqual(balances, distributed - consumed)
+        self.assertEqual(ledger.get_org_balance(1), ((distributed, consumed), None))
+        self.assertEqual(ledger.reconcile_balances(), 0)
+
+    def test__reconcile_balances__drifted_balances__rebuilt_from_transactions(self):
+        ledger.record_activity(1, 1, 10)
+        ledger.record_activity(2, 1, 5)
+        ledger.record_reward(1, 1, 3, reward_id=1)
+
+        with db_interface.session_scope() as session:
+            session.query(UserBalance).filter_by(UserId=1).update({UserBalance.Points: 999})
+            session.query(UserBalance).filter_by(UserId=2).delete()
+            session.add(ActivityTransaction(UserId=2, Points=2, OrganizationId=1, Instant=datetime.utcnow()))
+
+        corrected = ledger.reconcile_balances(batch_size=1)
+
+        self.assertEqual(corrected, 3)
+        self.assertEqual(ledger.get_balance(1), (7, None))
+        self.assertEqual(ledger.get_balance(2), (7, None))
+        self.assertEqual(ledger.get_org_balance(1), ((17, 3), None))
+        self.assertEqual(ledger.reconcile_balances(), 0)
+
+    def budget(self):
+        with db_interface.session_scope() as session:
+            return tuple(session.query(Organization.PointsToDistribute, Organization.PointsToConsume)
+                         .filter(Organization.Id == 1).one())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from datetime import datetime, timedelta
+import backend.api.errors as errors
+import backend.data_model.db_interface as db_interface
+import backend.data_model.listings as listings
+from backend.data_model.data_model import (User, Organization, ActivityTransaction, Activity, Reward,
+                                           OrganizationRegistrationRequest)
+from backend.test.test_helper import DatabaseTestCase
+
+
+class TestListings(DatabaseTestCase):
+
+    NOW = datetime(2019, 7, 17, 12)
+
+    def setUp(self):
+        super().setUp()
+
+        with db_interface.session_scope() as session:
+            for user_id in (1, 2):
+                session.add(User(Id=user_id, Email=str(user_id) + '@test.com', PasswordHash='hash',
+                                 LastName='last', PhoneNumber='6086086008'))
+            session.add(Organization(Id=1, Name='Test Org', OwnerId=1, Type=1, PointsToDistribute=1000,
+                                     PointsToConsume=1000, LastRefreshInstant=self.NOW,
+                                     RefreshIntervalInDays=30, RefreshAmount=1000))
+            session.add(Activity(Id=1, PointsPerHour=0, PointsPerCompletion=5, OneTime=False, Visibility=1,
+                                 AssociatedOrganization=1, Description='Cleanup'))
+            # Ids 1-4 share an Instant, so the page boundary falls between ties.
+            session.execute(ActivityTransaction.__table__.insert(), [
+                {'Id': transaction_id, 'UserId': 1, 'Points': transaction_id, 'OrganizationId': 1,
+                 'Instant': self.NOW - timedelta(hours=max(0, transaction_id - 4)), 'Activity': 1}
+                for transaction_id in range(1, 8)])
+            session.add(ActivityTransaction(Id=8, UserId=2, Points=1, OrganizationId=1, Instant=self.NOW))
+
+    def _all_pages(self, list_page, limit):
+        items, cursor = [], None
+        while True:
+            (page, cursor), error_code = list_page(limit, cursor)
+            self.assertIsNone(error_code)
+            self.assertLessEqual(len(page), limit)
+            items.extend(page)
+            if cursor is None:
+                return items
+
+    def test__list_activity_transactions__paged__newest_first_without_gaps(self):
+        items = self._all_pages(lambda limit, cursor: listings.list_activity_transactions(1, limit, cursor), 3)
+
+        self.assertEqual([item['id'] for item in items], [4, 3, 2, 1, 5, 6, 7])
+        self.assertEqual(items[0], {'id': 4, 'instant': self.NOW.isoformat(), 'points': 4, 'organization_id': 1,
+                                    'activity_id': 1})
+
+    def test__list_activity_transactions__last_page_full__no_next_cursor(self):
+        (page, cursor), error_code = listings.list_activity_transactions(1, 7)
+
+        self.assertIsNone(error_code)
+        self.assertEqual(len(page), 7)
+        self.assertIsNone(cursor)
+
+    def test__list_activity_transactions__bad_cursor__cursor_invalid(self):
+        for cursor in ('not base64!', listings._encode_cursor([1, 2]), listings._encode_cursor(['2019-07-17']),
+                       listings._encode_cursor({'id': 1})):
+            self.assertEqual(listings.list_activity_transactions(1, 3, cursor), (None, errors.CURSOR_INVALID_CODE))
+
+    def test__list_activities__by_visibility__only_that_visibility(self):
+        with db_interface.session_scope() as session:
+            for activity_id in range(2, 6):
+                session.add(Activity(Id=activity_id, PointsPerHour=10, PointsPerCompletion=0, OneTime=True,
+                                     Visibility=1 + activity_id % 2, AssociatedOrganization=1,
+                                     Description='Activity ' + str(activity_id)))
+            session.add(Reward(Id=1, OneTime=False, PointsPerReward=20, Visibility=1, AssociatedOrganization=1,
+                               Description='Mug'))
+
+        public = self._all_pages(lambda limit, cursor: listings.list_activities(
+            1, listings.PUBLIC_VISIBILITY, limit, cursor), 2)
+        private = self._all_pages(lambda limit, cursor: listings.list_activities(
+            1, listings.PRIVATE_VISIBILITY, limit, cursor), 2)
+        (rewards, _), _ = listings.list_rewards(1, listings.PUBLIC_VISIBILITY, 10)
+
+        self.assertEqual([item['id'] for item in public], [1, 2, 4])
+        self.assertEqual([item['id'] for item in private], [3, 5])
+        self.assertEqual(rewards, [{'id': 1, 'description': 'Mug', 'one_time': False, 'points_per_reward': 20}])
+
+    def test__list_organization_requests__paged__oldest_first(self):
+        with db_interface.session_scope() as session:
+            for request_id in range(1, 6):
+                session.add(OrganizationRegistrationRequest(
+                    Id=request_id, SubmittingUserId=1, OrganizationName='Org ' + str(request_id), Message='',
+                    ContactPhoneNumber='6086086008', ContactEmail='org@test.com', OrganizationURL='org.com'))
+
+        items = self._all_pages(listings.list_organization_requests, 2)
+
+        self.assertEqual([item['id'] for item in items], [1, 2, 3, 4, 5])
+        self.assertEqual(items[0]['organization_name'], 'Org 1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+from app import create_app
+import backend.api.errors as errors
+import backend.api.logs as logs
+
+
+class TestLogs(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.log_file = tempfile.mkstemp()
+        os.close(handle)
+        logs.configure_logging(self.log_file, level='INFO', sample_limit=2, sample_window_seconds=60)
+
+    def tearDown(self):
+        logs.configure_logging()
+        os.remove(self.log_file)
+
+    def read_records(self):
+        logs.shutdown_logging()
+        with open(self.log_file) as log_file:
+            return [json.loads(line) for line in log_file]
+
+    def test__log_error__json_record_with_code_module_and_function(self):
+        errors.log_error(errors.FAILED_TO_COMMIT_USER_CODE, module_name='backend.api.api', function_name='f')
+
+        record, = self.read_records()
+        self.assertEqual(record['level'], 'ERROR')
+        self.assertEqual(record['message'], errors.FAILED_TO_COMMIT_USER_STRING)
+        self.assertEqual(record['error_code'], errors.FAILED_TO_COMMIT_USER_CODE)
+        self.assertEqual(record['error_module'], 'backend.api.api')
+        self.assertEqual(record['error_function'], 'f')
+
+    def test__log_error__invalid_code__raise(self):
+        with self.assertRaises(ValueError):
+            errors.log_error(9999)
+
+    def test__debug__info_level__not_written(self):
+        logging.debug('hidden %s', 'detail')
+        logging.info('shown %s', 'detail')
+
+        self.assertEqual([record['message'] for record in self.read_records()], ['shown detail'])
+
+    def test__repeated_error__sampled_and_suppressed_count_reported(self):
+        sampling_filter = logs._queue_handler.filters[0]
+        for _ in range(5):
+            errors.log_error(errors.FAILED_TO_QUERY_FOR_USER_CODE)
+        # Start a new window for the code.
+        for window in sampling_filter._windows.values():
+            window[0] -= 60
+        errors.log_error(errors.FAILED_TO_QUERY_FOR_USER_CODE)
+
+        records = self.read_records()
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[2]['suppressed'], 3)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+    def test__forked_child__writes_its_own_file(self):
+        logging.warning('parent')
+        pid = os.fork()
+        if pid == 0:
+            try:
+                logging.warning('child')
+                logs.shutdown_logging()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        child_file = logs.worker_log_file(self.log_file, pid)
+        try:
+            with open(child_file) as log_file:
+                self.assertEqual([json.loads(line)['message'] for line in log_file], ['child'])
+        finally:
+            os.remove(child_file)
+        self.assertEqual([record['message'] for record in self.read_records()], ['parent'])
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+    def test__forked_child_never_logs__no_file_created(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                logs.shutdown_logging()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        self.assertFalse(os.path.exists(logs.worker_log_file(self.log_file, pid)))
+
+    def test__request__id_on_records_and_response(self):
+        app = create_app('test')
+        logs.configure_logging(self.log_file, level='INFO')
+
+        @app.route('/log-test')
+        def log_test():
+            logging.warning('inside request')
+            return 'ok'
+
+        response = app.test_client().get('/log-test', headers={logs.REQUEST_ID_HEADER: 'abc123'})
+
+        self.assertEqual(response.headers[logs.REQUEST_ID_HEADER], 'abc123')
+        record, = self.read_records()
+        self.assertEqual(record['request_id'], 'abc123')
+
+
+if __name__ == '__main__':
+    unittest.main()
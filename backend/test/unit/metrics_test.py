@@ -0,0 +1,127 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from app import create_app
+import backend.api.hashing as hashing
+import backend.api.metrics as metrics
+import backend.data_model.db_interface as db_interface
+from backend.data_model.data_model import Database, User
+from backend.test.test_helper import worker_database_name, remove_database_file
+
+
+# Not a DatabaseTestCase: its SAVEPOINTs would be counted as the routes' queries.
+class TestMetrics(unittest.TestCase):
+
+    TEST_DB = worker_database_name('metrics_test')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.app = create_app(self.TEST_DB)
+        Database.create_database(self.TEST_DB)
+        db_interface.set_database(Database.Engine)
+        metrics.reset()
+
+        @self.app.route('/metrics-test/<int:user_id>')
+        def users(user_id):
+            with db_interface.session_scope() as session:
+                session.query(User).filter(User.Id == user_id).all()
+                session.query(User).count()
+            return 'ok'
+
+        @self.app.route('/metrics-test/hash')
+        def hash_password():
+            hashing.hash_password('password')
+            return 'ok'
+
+        @self.app.route('/metrics-test/slow')
+        def slow():
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+            return 'ok'
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        Database.drop_all_test_database(self.TEST_DB)
+        remove_database_file(Database.Engine)
+        shutil.rmtree(self.directory)
+        metrics.reset()
+
+    def samples(self, text):
+        """Map of 'name{labels}' to value for every sample line."""
+        return {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+                for line in text.splitlines() if line and not line.startswith('#')}
+
+    def test__request__latency_status_and_queries_under_route_rule(self):
+        self.client.get('/metrics-test/1')
+        self.client.get('/metrics-test/2')
+
+        response = self.client.get('/metrics')
+        samples = self.samples(response.data.decode())
+
+        self.assertEqual(response.headers['Content-Type'], metrics.CONTENT_TYPE)
+        labels = 'route="/metrics-test/<int:user_id>",method="GET"'
+        self.assertEqual(samples['volunteer_request_duration_seconds_count{%s}' % labels], 2)
+        self.assertEqual(samples['volunteer_request_duration_seconds_bucket{%s,le="+Inf"}' % labels], 2)
+        self.assertEqual(samples['volunteer_requests_total{%s,status="200"}' % labels], 2)
+        self.assertEqual(samples['volunteer_db_queries_total{%s}' % labels], 4)
+        self.assertGreater(samples['volunteer_db_query_seconds_total{%s}' % labels], 0)
+
+    def test__request__bcrypt_time_charged_to_route(self):
+        hashing.configure(rounds=4, use_pool=False)
+        try:
+            self.client.get('/metrics-test/hash')
+        finally:
+            hashing.configure(use_pool=True)
+
+        samples = self.samples(metrics.render())
+        labels = 'route="/metrics-test/hash",method="GET"'
+        self.assertEqual(samples['volunteer_bcrypt_calls_total{%s}' % labels], 1)
+        self.assertGreater(samples['volunteer_bcrypt_seconds_total{%s}' % labels], 0)
+
+    def test__render__metrics_dir__other_workers_summed(self):
+        other_worker = {'series': [['/metrics-test/<int:user_id>', 'GET',
+                                    [1] + [0] * (len(metrics.LATENCY_BUCKETS)) + [0.001, 1, 3, 0.002, 0, 0]]],
+                        'statuses': [['/metrics-test/<int:user_id>', 'GET', 404, 1]]}
+        with open(os.path.join(self.directory, 'metrics-99999.json'), 'w') as snapshot_file:
+            json.dump(other_worker, snapshot_file)
+
+        with patch.object(metrics, 'METRICS_DIR', self.directory):
+            self.client.get('/metrics-test/1')
+            samples = self.samples(metrics.render())
+
+        labels = 'route="/metrics-test/<int:user_id>",method="GET"'
+        self.assertEqual(samples['volunteer_request_duration_seconds_count{%s}' % labels], 2)
+        self.assertEqual(samples['volunteer_db_queries_total{%s}' % labels], 5)
+        self.assertEqual(samples['volunteer_requests_total{%s,status="404"}' % labels], 1)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'metrics-%d.json' % os.getpid())))
+
+    def test__method_not_allowed__counted_as_unmatched(self):
+        self.client.post('/random')
+
+        samples = self.samples(metrics.render())
+        self.assertEqual(samples['volunteer_requests_total{route="%s",method="POST",status="405"}'
+                                 % metrics.UNMATCHED_ROUTE], 1)
+
+    def test__profiler__slow_request__folded_stacks_written(self):
+        with patch.object(metrics, 'PROFILE_SLOW_MS', 20), patch.object(metrics, 'PROFILE_INTERVAL_MS', 1), \
+                patch.object(metrics, 'PROFILE_DIR', self.directory):
+            self.client.get('/metrics-test/1')
+            self.client.get('/metrics-test/slow')
+
+        profile, = glob.glob(os.path.join(self.directory, '*.folded'))
+        self.assertIn('GET-metrics-test_slow', os.path.basename(profile))
+        with open(profile) as profile_file:
+            stacks = [line.rsplit(' ', 1) for line in profile_file.read().splitlines()]
+        self.assertTrue(any(stack.endswith('metrics_test.py:slow') for stack, _ in stacks))
+        self.assertTrue(all(count.isdigit() for _, count in stacks))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import json
+import threading
+import unittest
+from datetime import datetime
+from flask_jwt_extended import create_access_token
+from app import app
+import backend.api.claim_codes as claim_codes
+import backend.api.notifications as notifications
+import backend.api.tokens as tokens
+import backend.data_model.db_interface as db_interface
+from backend.data_model.data_model import User, Organization, Activity
+from backend.test.test_helper import DatabaseTestCase
+
+
+class TestNotificationHub(unittest.TestCase):
+
+    def setUp(self):
+        self.hub = notifications.NotificationHub()
+
+    def test__publish__subscribers_of_key__all_woken(self):
+        first = self.hub.subscribe('claim:123456')
+        second = self.hub.subscribe('claim:123456')
+        other = self.hub.subscribe('claim:654321')
+
+        self.assertEqual(self.hub.publish('claim:123456', {'points': 5}), 2)
+
+        self.assertEqual(first.wait(1), {'points': 5})
+        self.assertEqual(second.wait(1), {'points': 5})
+        self.assertIsNone(other.wait(0.01))
+
+    def test__wait__message_from_other_thread__returned(self):
+        subscription = self.hub.subscribe('user:1')
+        threading.Timer(0.05, self.hub.publish, args=('user:1', {'points': 1})).start()
+
+        self.assertEqual(subscription.wait(5), {'points': 1})
+
+    def test__unsubscribe__last_subscriber__key_removed(self):
+        subscription = self.hub.subscribe('user:1')
+        self.hub.unsubscribe(subscription)
+        self.hub.unsubscribe(subscription)
+
+        self.assertEqual(len(self.hub), 0)
+        self.assertEqual(self.hub.publish('user:1', {}), 0)
+
+    def test__stream_events__timeout__expired_event(self):
+        subscription = notifications.get_hub().subscribe('user:1')
+        events = list(notifications.stream_events(subscription, 0.01))
+
+        self.assertEqual(events[-1], notifications.format_event(notifications.EXPIRED_EVENT, {}))
+
+
+class TestClaimCodeEvents(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        claim_codes.set_store(claim_codes.InMemoryClaimStore())
+        tokens.set_claims_cache(None)
+        tokens.set_revocations(None)
+        app.testing = True
+        self.app = app.test_client()
+        with app.app_context():
+            self.headers = {'Authorization': 'Bearer ' + create_access_token(identity='one@test.com')}
+
+        with db_interface.session_scope() as session:
+            session.add(User(Id=1, Email='one@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            session.add(Organization(Id=1, Name='Test Org', OwnerId=1, Type=1, PointsToDistribute=1000,
+                                     PointsToConsume=1000, LastRefreshInstant=datetime.utcnow(),
+                                     RefreshIntervalInDays=30, RefreshAmount=1000))
+            session.add(Activity(Id=1, PointsPerHour=0, PointsPerCompletion=7, OneTime=False, Visibility=1,
+                                 AssociatedOrganization=1, Description='Activity 1'))
+
+    def tearDown(self):
+        claim_codes.set_store(None)
+
+    def test__claim_code_events__redeemed__redeemed_event_streamed(self):
+        claim, _ = claim_codes.issue_claim(1, claim_codes.ACTIVITY)
+        ret = self.app.get('/claim-code/' + claim.code + '/events', headers=self.headers, buffered=False)
+        self.assertEqual(ret.mimetype, 'text/event-stream')
+
+        claim_codes.redeem_claim(claim.code, 1, 1)
+
+        body = b''.join(ret.response).decode()
+        ret.close()
+        self.assertTrue(body.startswith(': connected\n\nevent: ' + notifications.REDEEMED_EVENT))
+        data = json.loads(body.split('data: ')[1])
+        self.assertEqual(data['points'], 7)
+        self.assertEqual(len(notifications.get_hub()), 0)
+
+    def test__claim_code_events__unknown_code__return_422(self):
+        ret = self.app.get('/claim-code/123456/events', headers=self.headers)
+        self.assertEqual(ret.status_code, 422)
+
+    def test__claim_code_events__another_users_code__same_422_as_unknown(self):
+        claim, _ = claim_codes.issue_claim(2, claim_codes.ACTIVITY)
+
+        ret = self.app.get('/claim-code/' + claim.code + '/events', headers=self.headers)
+
+        self.assertEqual(ret.status_code, 422)
+        self.assertEqual(ret.data, self.app.get('/claim-code/123456/events', headers=self.headers).data)
+        self.assertEqual(len(notifications.get_hub()), 0)
+
+    def test__claim_code_events__no_access_token__401(self):
+        claim, _ = claim_codes.issue_claim(1, claim_codes.ACTIVITY)
+
+        ret = self.app.get('/claim-code/' + claim.code + '/events')
+
+        self.assertEqual(ret.status_code, 401)
+        self.assertEqual(len(notifications.get_hub()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import backend.data_model.db_interface as db_interface
+import backend.data_model.refresh as refresh
+from backend.data_model.data_model import User, Organization, RefreshEvent
+from backend.test.test_helper import DatabaseTestCase, committed
+
+
+class TestRefresh(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.now = datetime.utcnow()
+
+        with db_interface.session_scope() as session:
+            session.add(User(Id=1, Email='one@test.com', PasswordHash='hash', LastName='last',
+                             PhoneNumber='6086086008'))
+            # Orgs 1-3 are due (two different intervals), org 4 is not.
+            for org_id, days_ago, interval in [(1, 31, 30), (2, 8, 7), (3, 40, 30), (4, 1, 30)]:
+                session.add(Organization(Id=org_id, Name='Test Org ' + str(org_id), OwnerId=1, Type=1,
+                                         PointsToDistribute=5, PointsToConsume=1000,
+                                         LastRefreshInstant=self.now - timedelta(days=days_ago),
+                                         RefreshIntervalInDays=interval, RefreshAmount=100 * org_id))
+
+    def test__new_organization__next_refresh_at_defaulted(self):
+        with db_interface.session_scope() as session:
+            org = session.query(Organization).get(4)
+            self.assertEqual(org.NextRefreshAt, org.LastRefreshInstant + timedelta(days=30))
+
+    def test__run_due_refreshes__due_orgs__refreshed_in_batches(self):
+        self.assertEqual(refresh.run_due_refreshes(self.now, batch_size=2), (3, None))
+
+        with db_interface.session_scope() as session:
+            orgs = {org.Id: org for org in session.query(Organization)}
+            events = session.query(RefreshEvent).order_by(RefreshEvent.OrganizationId).all()
+
+            self.assertEqual([orgs[i].PointsToDistribute for i in range(1, 5)], [100, 200, 300, 5])
+            self.assertEqual(orgs[1].NextRefreshAt, self.now + timedelta(days=30))
+            self.assertEqual(orgs[2].NextRefreshAt, self.now + timedelta(days=7))
+            self.assertEqual(orgs[3].LastRefreshInstant, self.now)
+            self.assertEqual([(e.OrganizationId, e.Points, e.Type) for e in events],
+                             [(1, 100, 1), (2, 200, 1), (3, 300, 1)])
+
+    def test__run_due_refreshes__repeated_tick__idempotent(self):
+        refresh.run_due_refreshes(self.now)
+
+        self.assertEqual(refresh.run_due_refreshes(self.now), (0, None))
+        with db_interface.session_scope() as session:
+            self.assertEqual(session.query(RefreshEvent).count(), 3)
+
+    @committed
+    def test__run_due_refreshes__concurrent_ticks__each_org_refreshed_once(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: refresh.run_due_refreshes(self.now, batch_size=1), range(4)))
+
+        self.assertEqual(sum(refreshed for refreshed, _ in results), 3)
+        with db_interface.session_scope() as session:
+            self.assertEqual(session.query(RefreshEvent).count(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from datetime import datetime
+import backend.data_model.db_interface as db_interface
+import backend.data_model.ledger as ledger
+import backend.data_model.stats as stats
+from backend.data_model.data_model import User, Organization, UserStats, OrganizationStats
+from backend.test.test_helper import DatabaseTestCase
+
+
+class TestStats(DatabaseTestCase):
+
+    # A Wednesday.
+    NOW = datetime(2019, 7, 17, 15, 30)
+
+    def setUp(self):
+        super().setUp()
+        stats.set_cache(stats.StatsCache())
+
+        with db_interface.session_scope() as session:
+            for user_id in (1, 2):
+                session.add(User(Id=user_id, Email=str(user_id) + '@test.com', PasswordHash='hash',
+                                 LastName='last', PhoneNumber='6086086008'))
+            session.add(Organization(Id=1, Name='Test Org', OwnerId=1, Type=1, PointsToDistribute=1000,
+                                     PointsToConsume=1000, LastRefreshInstant=self.NOW,
+                                     RefreshIntervalInDays=30, RefreshAmount=1000))
+
+        ledger.record_activity(1, 1, 10, instant=datetime(2019, 6, 30, 9))
+        ledger.record_activity(1, 1, 5, instant=datetime(2019, 7, 15, 9))
+        ledger.record_activity(1, 1, 7, instant=datetime(2019, 7, 17, 9))
+        ledger.record_reward(1, 1, 4, reward_id=1, instant=datetime(2019, 7, 17, 12))
+        ledger.record_activity(2, 1, 1, instant=datetime(2019, 7, 16, 9))
+
+    def test__bucket_start__each_period__start_of_bucket(self):
+        self.assertEqual(stats.bucket_start(self.NOW, stats.DAY), datetime(2019, 7, 17))
+        self.assertEqual(stats.bucket_start(self.NOW, stats.WEEK), datetime(2019, 7, 15))
+        self.assertEqual(stats.bucket_start(self.NOW, stats.MONTH), datetime(2019, 7, 1))
+
+    def test__shift_bucket__months_across_year__wraps(self):
+        self.assertEqual(stats.shift_bucket(datetime(2019, 2, 1), stats.MONTH, -3), datetime(2018, 11, 1))
+        self.assertEqual(stats.shift_bucket(datetime(2019, 12, 1), stats.MONTH, 1), datetime(2020, 1, 1))
+
+    def test__get_user_stats__weeks__recent_buckets_only(self):
+        buckets, error_code = stats.get_user_stats(1, stats.WEEK, 2, now=self.NOW)
+
+        self.assertIsNone(error_code)
+        self.assertEqual(buckets, [{'start': '2019-07-15', 'points_earned': 12, 'points_spent': 4,
+                                    'activities': 2, 'rewards': 1}])
+
+    def test__get_organization_stats__months__both_users_counted(self):
+        buckets, error_code = stats.get_organization_stats(1, stats.MONTH, 12, now=self.NOW)
+
+        self.assertIsNone(error_code)
+        self.assertEqual([(b['start'], b['points_distributed'], b['points_consumed'], b['activities'])
+                          for b in buckets], [('2019-06-01', 10, 0, 1), ('2019-07-01', 13, 4, 3)])
+
+    def test__get_user_stats__cached__invalidated_by_new_transaction(self):
+        before, _ = stats.get_user_stats(2, stats.DAY, 7, now=self.NOW)
+        with db_interface.session_scope() as session:
+            session.query(UserStats).filter(UserStats.UserId == 2).delete()
+        self.assertEqual(stats.get_user_stats(2, stats.DAY, 7, now=self.NOW), (before, None))
+
+        ledger.record_activity(2, 1, 3, instant=datetime(2019, 7, 17, 9))
+
+        buckets, _ = stats.get_user_stats(2, stats.DAY, 7, now=self.NOW)
+        self.assertEqual([(b['start'], b['points_earned']) for b in buckets], [('2019-07-17', 3)])
+
+    def test__cache__invalidated_while_querying__stale_result_not_stored(self):
+        cache = stats.StatsCache()
+        _, generation = cache.get((stats.USER, 1), 'key')
+        cache.invalidate((stats.USER, 1))
+        cache.put((stats.USER, 1), 'key', ['stale'], generation)
+
+        self.assertEqual(cache.get((stats.USER, 1), 'key')[0], None)
+
+    def test__rebuild_stats__rollups_lost__same_as_incremental(self):
+        expected = self._rollup_rows()
+        with db_interface.session_scope() as session:
+            session.query(UserStats).delete()
+            session.query(OrganizationStats).filter(OrganizationStats.Period == stats.WEEK).delete()
+
+        written, error_code = stats.rebuild_stats(batch_size=1)
+
+        self.assertIsNone(error_code)
+        self.assertEqual(written, len(expected))
+        self.assertEqual(self._rollup_rows(), expected)
+
+    def _rollup_rows(self):
+        with db_interface.session_scope() as session:
+            users = session.query(UserStats.UserId, UserStats.Period, UserStats.BucketStart, UserStats.PointsEarned,
+                                  UserStats.PointsSpent, UserStats.Activities, UserStats.Rewards)
+            orgs = session.query(OrganizationStats.OrganizationId, OrganizationStats.Period,
+                                 OrganizationStats.BucketStart, OrganizationStats.PointsDistributed,
+                                 OrganizationStats.PointsConsumed, OrganizationStats.Activities,
+                                 OrganizationStats.Rewards)
+            return sorted(('user',) + tuple(row) for row in users) + sorted(('org',) + tuple(row) for row in orgs)
+
+
+if __name__ == '__main__':
+    unittest.main()
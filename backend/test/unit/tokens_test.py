@@ -0,0 +1,112 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import backend.api.tokens as tokens
+from backend.test.test_helper import DatabaseTestCase
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test__contains__added_keys__always_found(self):
+        bloom = tokens.BloomFilter(1000, 0.01)
+        keys = ['jti-%d' % i for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(1 for i in range(10000) if 'other-%d' % i in bloom)
+        self.assertLess(false_positives, 300)
+
+
+class TestClaimsCache(unittest.TestCase):
+
+    def test__put__over_capacity__least_recently_used_evicted(self):
+        cache = tokens.ClaimsCache(max_size=2, ttl_seconds=60)
+        cache.put('a', {'identity': 'a'})
+        cache.put('b', {'identity': 'b'})
+        cache.get('a')
+        cache.put('c', {'identity': 'c'})
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'identity': 'a'})
+        self.assertEqual(len(cache), 2)
+
+    def test__get__token_expired__return_none(self):
+        cache = tokens.ClaimsCache(max_size=2, ttl_seconds=60)
+        cache.put('a', {'exp': time.time() - 1})
+
+        self.assertIsNone(cache.get('a'))
+
+    def test__put__disabled__not_cached(self):
+        cache = tokens.ClaimsCache(max_size=0)
+        cache.put('a', {})
+
+        self.assertIsNone(cache.get('a'))
+
+
+class TestRevocationIndex(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.expires_at = datetime.utcnow() + timedelta(minutes=15)
+
+    @patch('backend.data_model.db_interface.is_token_revoked')
+    def test__is_revoked__not_in_filter__no_database_check(self, m_is_token_revoked):
+        index = tokens.RevocationIndex(capacity=100)
+
+        self.assertFalse(index.is_revoked('unknown'))
+        m_is_token_revoked.assert_not_called()
+
+    @patch('backend.data_model.db_interface.is_token_revoked', return_value=(True, None))
+    @patch('backend.data_model.db_interface.get_revoked_token_ids', return_value=(None, 218))
+    def test__is_revoked__never_synced__database_checked(self, m_get_revoked_token_ids, m_is_token_revoked):
+        index = tokens.RevocationIndex(capacity=100)
+
+        self.assertTrue(index.is_revoked('revoked-elsewhere'))
+        m_is_token_revoked.assert_called_once_with('revoked-elsewhere')
+
+    def test__is_revoked__concurrent_requests_when_due__one_sync(self):
+        index = tokens.RevocationIndex(capacity=100)
+        calls = []
+
+        def slow_sync(since):
+            calls.append(since)
+            time.sleep(0.05)
+            return [], None
+
+        with patch('backend.data_model.db_interface.get_revoked_token_ids', side_effect=slow_sync):
+            threads = [threading.Thread(target=index.is_revoked, args=('jti',)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+
+    def test__revoke__other_worker__revoked_after_sync(self):
+        revoking = tokens.RevocationIndex(capacity=100, sync_seconds=60)
+        other = tokens.RevocationIndex(capacity=100, sync_seconds=60)
+        self.assertFalse(other.is_revoked('jti-1'))
+
+        self.assertIsNone(revoking.revoke('jti-1', self.expires_at))
+        self.assertIsNone(revoking.revoke('jti-1', self.expires_at))
+
+        self.assertTrue(revoking.is_revoked('jti-1'))
+        self.assertFalse(other.is_revoked('jti-1'))
+        other.sync()
+        self.assertTrue(other.is_revoked('jti-1'))
+
+    def test__purge_expired__expired_rows_deleted(self):
+        index = tokens.RevocationIndex(capacity=100)
+        index.revoke('old', datetime.utcnow() - timedelta(seconds=1))
+        index.revoke('current', self.expires_at)
+
+        self.assertEqual(index.purge_expired(), (1, None))
+        self.assertFalse(index.is_revoked('old'))
+        self.assertTrue(index.is_revoked('current'))
+
+
+if __name__ == '__main__':
+    unittest.main()
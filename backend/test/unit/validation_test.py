@@ -0,0 +1,52 @@
+import unittest
+import backend.api.errors as errors
+import backend.api.validation as validation
+
+
+class TestParsers(unittest.TestCase):
+
+    def test__parse_phone_number__accepted_formats__normalized_to_ten_digits(self):
+        for phone_number in ['608-608-6008', '6086086008', '16086086008', '1-608-608-6008', ' 608-608-6008 ']:
+            self.assertEqual(validation.parse_phone_number(phone_number), '6086086008')
+
+    def test__parse_phone_number__invalid__return_invalid(self):
+        for phone_number in ['555-555-555', '26086086008', '608 608 6008', '', 6086086008]:
+            self.assertIs(validation.parse_phone_number(phone_number), validation.INVALID)
+
+    def test__parse_email__mixed_case__lowercased_and_stripped(self):
+        self.assertEqual(validation.parse_email(' Test@Test.COM '), 'test@test.com')
+        self.assertIs(validation.parse_email('test@test'), validation.INVALID)
+        self.assertIs(validation.parse_email('te st@test.com'), validation.INVALID)
+
+    def test__parse_page_size__non_ascii_digits__return_invalid(self):
+        for limit in ['²', '١٠', '10²']:
+            self.assertIs(validation.parse_page_size(limit), validation.INVALID)
+        self.assertEqual(validation.parse_page_size(' 10 '), 10)
+
+    def test__parse_id__bool__return_invalid(self):
+        self.assertIs(validation.parse_id(True), validation.INVALID)
+        self.assertEqual(validation.parse_id(3), 3)
+
+
+class TestCompileSchema(unittest.TestCase):
+
+    def test__validator__not_a_dict__return_request_invalid(self):
+        self.assertEqual(validation.LOGIN_USER(['email']), (None, [errors.REQUEST_INVALID_CODE]))
+
+    def test__validator__many_invalid_fields__every_code_once(self):
+        values, error_codes = validation.REDEEM_CLAIM_CODE({'code': '12', 'hours': 0, 'item_id': 'x'})
+
+        self.assertIsNone(values)
+        self.assertEqual(error_codes, [errors.CLAIM_CODE_INVALID_CODE, errors.REQUEST_INVALID_CODE])
+
+    def test__validator__optional_fields_missing__filled_with_none(self):
+        values, error_codes = validation.REGISTER_USER({'email': 'test@test.com', 'password': 'password',
+                                                        'last_name': 'last', 'phone_number': '608-608-6008'})
+
+        self.assertIsNone(error_codes)
+        self.assertIsNone(values['first_name'])
+        self.assertEqual(values['phone_number'], '6086086008')
+
+
+if __name__ == '__main__':
+    unittest.main()
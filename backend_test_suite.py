@@ -1,13 +1,22 @@
+import os
 import unittest
-from backend.test.db_interface_test import TestDBInterfaceRegister
+# Before any test module imports app.
+import backend.test.conftest  # noqa: F401
+
+TEST_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'test')
+# Benchmarks, in backend/test/benchmark, are run on their own.
+TEST_PACKAGES = ['unit', 'api']
 
 
 def create_suite():
     test_suite = unittest.TestSuite()
-    test_suite.addTest(TestDBInterfaceRegister())
-    test_suite.addTest(
+    for package in TEST_PACKAGES:
+        # A loader keeps the top-level directory of its first discover, so each package gets its own.
+        test_suite.addTests(unittest.TestLoader().discover(os.path.join(TEST_DIRECTORY, package),
+                                                           pattern='*_test.py'))
     return test_suite
 
+
 if __name__ == '__main__':
     suite = create_suite()
 